@@ -0,0 +1,157 @@
+#! /usr/bin/env python
+#
+"""
+Time adding, removing and progressing many tasks in a GC3Pie `Engine`.
+
+For each task count given on the command line, this measures:
+
+* `Engine.TaskQueue` alone: putting all tasks in the queue, then
+  removing them in random order;
+* a whole `Engine` running on a no-op backend: adding all tasks, one
+  `progress()` pass that submits them, one `progress()` pass that
+  polls them all, and finally removing all tasks in random order.
+
+Wall-clock times are printed as a table.  Example::
+
+    python engine_taskqueue_benchmark.py 100000 1000000
+
+Use option ``--no-engine`` to time only the bare `TaskQueue`, which
+is much faster for very large task counts.
+"""
+# Copyright (C) 2019, University of Zurich. All rights reserved.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import (absolute_import, division, print_function)
+
+import argparse
+import random
+import time
+
+import gc3libs
+import gc3libs.config
+from gc3libs.core import Core, Engine
+from gc3libs.quantity import GB, hours
+
+
+def make_tasks(count):
+    """
+    Return a list of `count` no-op applications.
+    """
+    return [
+        gc3libs.Application(
+            arguments=['/bin/true'],
+            inputs=[],
+            outputs=[],
+            output_dir='/tmp',
+            jobname='noop-%07d' % n,
+            requested_cores=1)
+        for n in range(count)
+    ]
+
+
+def make_engine(count):
+    """
+    Return an `Engine` with a single no-op resource, large enough
+    to run `count` tasks at the same time.
+    """
+    cfg = gc3libs.config.Configuration()
+    cfg.TYPE_CONSTRUCTOR_MAP['noop'] = ('gc3libs.backends.noop', 'NoOpLrms')
+    cfg.resources['noop'].update(
+        name='noop',
+        type='noop',
+        auth='none',
+        transport='local',
+        max_cores_per_job=1,
+        max_memory_per_core=1*GB,
+        max_walltime=8*hours,
+        max_cores=count,
+        architecture=gc3libs.Run.Arch.X86_64,
+    )
+    # poll every task at each `progress()` pass
+    return Engine(Core(cfg), min_poll_interval=0, max_poll_interval=0,
+                  max_in_flight=0, max_submitted=0)
+
+
+def timed(func, *args):
+    start = time.time()
+    func(*args)
+    return time.time() - start
+
+
+def bench_queue(tasks, order):
+    queue = Engine.TaskQueue()
+
+    def add_all():
+        for task in tasks:
+            queue.put(task)
+
+    def remove_all():
+        for task in order:
+            queue.remove(task)
+
+    return [
+        ('TaskQueue.put', timed(add_all)),
+        ('TaskQueue.remove', timed(remove_all)),
+    ]
+
+
+def bench_engine(tasks, order):
+    engine = make_engine(len(tasks))
+
+    def add_all():
+        for task in tasks:
+            engine.add(task)
+
+    def remove_all():
+        for task in order:
+            engine.remove(task)
+
+    return [
+        ('Engine.add', timed(add_all)),
+        ('Engine.progress (submit)', timed(engine.progress)),
+        ('Engine.progress (poll)', timed(engine.progress)),
+        ('Engine.remove', timed(remove_all)),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--no-engine', dest='engine', action='store_false',
+                        help="Only time the bare `Engine.TaskQueue`")
+    parser.add_argument('--seed', type=int, default=0,
+                        help="Seed for the removal order (default: %(default)s)")
+    parser.add_argument('counts', nargs='*', type=int,
+                        default=[10**5],
+                        help="Numbers of tasks to time (default: 100000)")
+    args = parser.parse_args()
+
+    # silence per-task log messages from the Engine
+    gc3libs.log.setLevel(gc3libs.logging.WARNING)
+
+    print("%-26s %10s %10s %12s" % ('operation', 'tasks', 'time (s)', 'us/task'))
+    for count in args.counts:
+        tasks = make_tasks(count)
+        order = list(tasks)
+        random.Random(args.seed).shuffle(order)
+        results = bench_queue(tasks, order)
+        if args.engine:
+            results += bench_engine(tasks, order)
+        for name, elapsed in results:
+            print("%-26s %10d %10.3f %12.2f"
+                  % (name, count, elapsed, 1e6 * elapsed / count))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+#! /usr/bin/env python
+#
+"""
+Compare on-disk size and save/load time of GC3Pie stores across codecs.
+
+A task tree resembling a real session (a `ParallelTaskCollection` of
+`Application` tasks, each with a few dozen history entries) is saved
+into a fresh store for every codec given on the command line, then
+loaded back; bytes written and wall-clock times are printed as a
+table.  Example::
+
+    python store_codec_benchmark.py --tasks 2000 pickle pickle+zlib pickle+lzma
+
+Use option ``--store sqlite`` to benchmark `SqlStore` instead of
+`FilesystemStore`.
+"""
+# Copyright (C) 2019, University of Zurich. All rights reserved.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import (absolute_import, division, print_function)
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import gc3libs
+from gc3libs.persistence import make_store
+from gc3libs.workflow import ParallelTaskCollection
+
+
+def make_tree(count, history_length):
+    """
+    Return a `ParallelTaskCollection` with `count` applications.
+    """
+    tasks = []
+    for n in range(count):
+        app = gc3libs.Application(
+            arguments=['/usr/bin/env', 'simulate', '--seed', str(n),
+                       'input.dat'],
+            inputs=['/data/project/inputs/input-%05d.dat' % n],
+            outputs=['output.dat', 'stats.csv'],
+            output_dir='/data/project/results/run-%05d' % n,
+            stdout='simulate.log',
+            join=True,
+            requested_cores=1,
+            jobname='simulate-%05d' % n)
+        for m in range(history_length):
+            app.execution.history.append(
+                "Submitted to 'cluster' at %s (attempt %d)" % (time.ctime(), m))
+        app.execution.state = gc3libs.Run.State.SUBMITTED
+        app.execution.state = gc3libs.Run.State.RUNNING
+        tasks.append(app)
+    return ParallelTaskCollection(tasks, jobname='benchmark')
+
+
+def disk_usage(path):
+    """
+    Return total size in bytes of the files under `path`.
+    """
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            total += os.path.getsize(os.path.join(dirpath, name))
+    return total
+
+
+def run(kind, codec, tree, workdir):
+    if kind == 'sqlite':
+        location = os.path.join(workdir, 'store.db')
+        url = 'sqlite:///%s#codec=%s' % (location, codec)
+    else:
+        location = os.path.join(workdir, 'store')
+        url = 'file://%s#codec=%s' % (location, codec)
+    store = make_store(url)
+    start = time.time()
+    id_ = store.save(tree)
+    saved = time.time() - start
+    size = disk_usage(location)
+    # use a fresh store, so objects are really read back from disk
+    store = make_store(url)
+    start = time.time()
+    store.load(id_)
+    loaded = time.time() - start
+    return size, saved, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--tasks', type=int, default=1000,
+                        help="Number of tasks in the tree (default: %(default)s)")
+    parser.add_argument('--history', type=int, default=20,
+                        help="History entries per task (default: %(default)s)")
+    parser.add_argument('--store', choices=['file', 'sqlite'], default='file',
+                        help="Kind of store to use (default: %(default)s)")
+    parser.add_argument('codecs', nargs='*',
+                        default=['pickle', 'pickle+zlib', 'pickle+lzma'],
+                        help="Codec specifications, e.g., 'pickle5+zlib'")
+    args = parser.parse_args()
+
+    tree = make_tree(args.tasks, args.history)
+    print("%-20s %12s %10s %10s" % ('codec', 'bytes', 'save (s)', 'load (s)'))
+    for codec in args.codecs:
+        workdir = tempfile.mkdtemp(prefix='gc3pie.benchmark.')
+        try:
+            size, saved, loaded = run(args.store, codec, tree, workdir)
+            print("%-20s %12d %10.3f %10.3f" % (codec, size, saved, loaded))
+        except Exception as err:
+            print("%-20s failed: %s" % (codec, err))
+        finally:
+            shutil.rmtree(workdir)
+        # later saves must not be skipped as "unchanged"
+        for task in [tree] + tree.tasks:
+            task.changed = True
+            if hasattr(task, 'persistent_id'):
+                del task.persistent_id
+
+
+if __name__ == '__main__':
+    main()
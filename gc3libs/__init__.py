@@ -65,6 +65,7 @@ except ImportError:
 
 import gc3libs.defaults
 from gc3libs.quantity import MB, hours, minutes, seconds, MiB
+import gc3libs.events
 from gc3libs.events import TaskStateChange, TermStatusChange
 from gc3libs.compat._collections import OrderedDict
 from gc3libs.compat._inspect import getargspec
@@ -1256,6 +1257,43 @@ class Application(Task):
                     selected.append(lrms)
         return selected
 
+    def requirements_signature(self):
+        """
+        Return a hashable summary of the requirements used to select resources.
+
+        Two tasks with equal signatures get the same result from
+        `compatible_resources`:meth: and `rank_resources`:meth: when
+        given the same resources in the same state, so the
+        `gc3libs.core.MatchMaker`:class: can compute these only once
+        per signature.  The signature includes the requested cores,
+        memory, walltime and architecture, the URL schemes of input
+        and output files, and the resources where the task has
+        already been run.
+
+        Return ``None`` (meaning: matchmaking results cannot be
+        shared with other tasks) if a derived class overrides the
+        resource selection methods but not this one.
+        """
+        cls = type(self)
+        if (cls.requirements_signature is Application.requirements_signature
+                and (cls.compatible_resources
+                     is not Application.compatible_resources
+                     or cls.rank_resources is not Application.rank_resources
+                     or cls._resource_sorting_key
+                     is not Application._resource_sorting_key)):
+            return None
+        return (
+            self.requested_cores,
+            (self.requested_memory.amount(gc3libs.quantity.Memory.B)
+             if self.requested_memory is not None else None),
+            (self.requested_walltime.amount(gc3libs.quantity.Duration.s)
+             if self.requested_walltime is not None else None),
+            self.requested_architecture,
+            frozenset(url.scheme for url in self.inputs.keys()),
+            frozenset(url.scheme for url in self.outputs.values()),
+            tuple(self.execution.get('_execution_targets', ())),
+        )
+
 
     ##
     # backend interface methods
@@ -1722,6 +1760,10 @@ class Run(Struct):
     the ``.`` syntax; see `gc3libs.utils.Struct` for examples.
     """
 
+    # fixed fields are kept out of the instance dictionary; they are
+    # not visible through the ``[...]`` syntax
+    __slots__ = ('_ref', '_state', '_exitcode', '_signal')
+
     def __init__(self, initializer=None, attach=None, **keywd):
         """
         Create a new Run object; constructor accepts the same
@@ -1760,6 +1802,9 @@ class Run(Struct):
         self._state = Run.State.NEW
         self._exitcode = None
         self._signal = None
+        if isinstance(initializer, Run):
+            for name in Run.__slots__:
+                setattr(self, name, getattr(initializer, name))
 
         # to overcome the "black hole" effect
         self._execution_targets = []
@@ -1767,10 +1812,24 @@ class Run(Struct):
         Struct.__init__(self, initializer, **keywd)
 
         if 'history' not in self:
-            self.history = History()
+            self.history = History(
+                max_length=(gc3libs.defaults.HISTORY_MAX_LENGTH or None))
         if 'timestamp' not in self:
             self.timestamp = OrderedDict()
 
+    def __getstate__(self):
+        # same format as when all fields were kept in `__dict__`
+        state = self.__dict__.copy()
+        for name in Run.__slots__:
+            state[name] = getattr(self, name)
+        return state
+
+    def __setstate__(self, state):
+        state = dict(state)
+        for name in Run.__slots__:
+            setattr(self, name, state.pop(name, None))
+        self.__dict__.update(state)
+
     @property
     def info(self):
         """
@@ -1917,18 +1976,20 @@ class Run(Struct):
         self.timestamp[value] = time.time()
         # record state-transition in Task execution history
         # (can be later queried with `ginfo` for e.g. debugging)
+        # (transition messages are shared among all tasks' histories)
         if value == Run.State.TERMINATED:
-            self.history.append(
+            self.history.append(History.intern(
                 "Transition from state {0} to state {1} (returncode: {2})"
-                .format(self._state, value, self.returncode))
+                .format(self._state, value, self.returncode)))
         else:
-            self.history.append(
+            self.history.append(History.intern(
                 "Transition from state {0} to state {1}"
-                .format(self._state, value))
+                .format(self._state, value)))
         if self._ref is not None:
             self._ref.changed = True
             # signal state-transition
-            TaskStateChange.send(
+            gc3libs.events.send(
+                TaskStateChange,
                 self._ref, from_state=self._state, to_state=value)
         # finally, update state
         self._state = value
@@ -2064,8 +2125,9 @@ class Run(Struct):
                 self.exitcode = (int(value) >> 8) & 0xff
                 self.signal = int(value) & 0x7f
         if self._ref is not None:
-            if self.exitcode != old_exitcode and self.signal != old_signal:
-                TermStatusChange.send(
+            if self.exitcode != old_exitcode or self.signal != old_signal:
+                gc3libs.events.send(
+                    TermStatusChange,
                     self._ref,
                     from_returncode=self._make_termstatus(old_exitcode, old_signal),
                     to_returncode=self._make_termstatus(self.exitcode, self.signal))
@@ -2134,6 +2196,52 @@ class Run(Struct):
             return (0, rc)
 
 
+# transition messages are saved as small integer codes in
+# `Run.history`: the code of each message is its position in this
+# list, so entries must never be changed or removed, only appended
+_HISTORY_CODEBOOK = (
+    "Transition from state NEW to state RUNNING",
+    "Transition from state NEW to state STOPPED",
+    "Transition from state NEW to state SUBMITTED",
+    "Transition from state NEW to state TERMINATING",
+    "Transition from state NEW to state UNKNOWN",
+    "Transition from state RUNNING to state NEW",
+    "Transition from state RUNNING to state STOPPED",
+    "Transition from state RUNNING to state SUBMITTED",
+    "Transition from state RUNNING to state TERMINATING",
+    "Transition from state RUNNING to state UNKNOWN",
+    "Transition from state STOPPED to state NEW",
+    "Transition from state STOPPED to state RUNNING",
+    "Transition from state STOPPED to state SUBMITTED",
+    "Transition from state STOPPED to state TERMINATING",
+    "Transition from state STOPPED to state UNKNOWN",
+    "Transition from state SUBMITTED to state NEW",
+    "Transition from state SUBMITTED to state RUNNING",
+    "Transition from state SUBMITTED to state STOPPED",
+    "Transition from state SUBMITTED to state TERMINATING",
+    "Transition from state SUBMITTED to state UNKNOWN",
+    "Transition from state TERMINATED to state NEW",
+    "Transition from state TERMINATED to state RUNNING",
+    "Transition from state TERMINATED to state STOPPED",
+    "Transition from state TERMINATED to state SUBMITTED",
+    "Transition from state TERMINATED to state TERMINATING",
+    "Transition from state TERMINATED to state UNKNOWN",
+    "Transition from state TERMINATING to state NEW",
+    "Transition from state TERMINATING to state RUNNING",
+    "Transition from state TERMINATING to state STOPPED",
+    "Transition from state TERMINATING to state SUBMITTED",
+    "Transition from state TERMINATING to state UNKNOWN",
+    "Transition from state UNKNOWN to state NEW",
+    "Transition from state UNKNOWN to state RUNNING",
+    "Transition from state UNKNOWN to state STOPPED",
+    "Transition from state UNKNOWN to state SUBMITTED",
+    "Transition from state UNKNOWN to state TERMINATING",
+)
+for _code, _message in enumerate(_HISTORY_CODEBOOK):
+    History.register(_message, _code)
+del _code, _message
+
+
 # Factory functions to create Core and Engine instances
 
 def _split_specific_args(fn, argdict):
@@ -27,6 +27,7 @@ __docformat__ = 'reStructuredText'
 from functools import wraps
 
 import gc3libs
+import gc3libs.defaults
 import gc3libs.exceptions
 from gc3libs.quantity import Memory
 from gc3libs.quantity import Duration
@@ -105,6 +106,11 @@ class LRMS(gc3libs.utils.Struct):
     queued               int
     ===================  =====
 
+    The values above are considered current for `status_ttl` seconds
+    after a successful update (optional configuration key; default
+    `gc3libs.defaults.RESOURCE_STATUS_TTL`), see
+    `gc3libs.core.Core.update_resources`:meth:.
+
     """
 
     def __init__(self, name,
@@ -116,6 +122,9 @@ class LRMS(gc3libs.utils.Struct):
 
         self.name = str(name)
         self.updated = False
+        self.status_ttl = float(extra_args.get(
+            'status_ttl', gc3libs.defaults.RESOURCE_STATUS_TTL))
+        self.status_timestamp = 0
 
         if len(architecture) == 0:
             raise gc3libs.exceptions.InvalidType(
@@ -251,6 +260,32 @@ class LRMS(gc3libs.utils.Struct):
             "Abstract method `LRMS.update_state()` called "
             "- this should have been defined in a derived class.")
 
+    def update_job_states(self, apps):
+        """
+        Query the state of the remote jobs associated with each task
+        in `apps` and update their `.execution.state` accordingly.
+
+        Return a list with one item per task in `apps`, in the same
+        order: each item is either the new `Run.State` of the task, or
+        the exception that was raised while updating it.  Errors in
+        updating one task do not stop the update of the others.
+
+        The default implementation just calls `update_job_state`:meth:
+        on each task in turn; backends that can query the state of
+        many jobs in one go should override this method.
+        """
+        results = []
+        for app in apps:
+            try:
+                results.append(self.update_job_state(app))
+            # pylint: disable=broad-except
+            except Exception as err:
+                gc3libs.log.debug(
+                    "Error updating state of task %s: %s: %s",
+                    app, err.__class__.__name__, err, exc_info=True)
+                results.append(err)
+        return results
+
     def submit_job(self, application, job):
         """
         Submit an `Application` instance to the configured
@@ -30,15 +30,19 @@ import os
 import posixpath
 import shlex
 import sys
+import tarfile
 import tempfile
 import time
 import uuid
+from io import BytesIO
 
 import gc3libs
 from gc3libs import log, Run
 import gc3libs.defaults
 from gc3libs.backends import LRMS
+from gc3libs.quantity import B, seconds
 from gc3libs.utils import same_docstring_as, sh_quote_safe
+import gc3libs.backends.inputcache
 import gc3libs.backends.transport
 
 # Define some commonly used functions
@@ -69,10 +73,11 @@ def generic_filename_mapping(jobname, jobid, file_name):
         return file_name
 
 
-def _make_remote_and_local_path_pair(transport, job, remote_relpath,
+def _make_remote_and_local_path_pair(job, remote_relpath,
                                      local_root_dir, local_relpath):
     """
-    Return list of (remote_path, local_path) pairs corresponding to
+    Return the (remote_path, local_path) pair corresponding to an
+    entry in `Application.outputs`.
     """
     # see https://github.com/fabric/fabric/issues/306 about why it is
     # correct to use `posixpath.join` for remote paths (instead of
@@ -82,17 +87,7 @@ def _make_remote_and_local_path_pair(transport, job, remote_relpath,
                                                           job.lrms_jobid,
                                                           remote_relpath))
     local_path = os.path.join(local_root_dir, local_relpath)
-    if transport.isdir(remote_path):
-        # recurse, accumulating results
-        result = []
-        for entry in transport.listdir(remote_path):
-            result += _make_remote_and_local_path_pair(
-                transport, job,
-                posixpath.join(remote_relpath, entry),
-                local_path, entry)
-        return result
-    else:
-        return [(remote_path, local_path)]
+    return (remote_path, local_path)
 
 
 class BatchSystem(LRMS):
@@ -128,7 +123,14 @@ class BatchSystem(LRMS):
                  ssh_timeout=None,
                  large_file_threshold=None,
                  large_file_chunk_size=None,
+                 ssh_max_connections=None,
+                 ssh_max_channels_per_connection=None,
+                 ssh_keepalive=None,
+                 ssh_idle_timeout=None,
                  spooldir=gc3libs.defaults.SPOOLDIR,
+                 staging='files',
+                 input_cache_quota=None,
+                 input_cache_dir=None,
                  **extra_args):
 
         # init base class
@@ -140,6 +142,12 @@ class BatchSystem(LRMS):
         # backend-specific setup
         self.frontend = frontend
         self.spooldir = spooldir
+        if staging not in ('files', 'tar'):
+            raise gc3libs.exceptions.ConfigurationError(
+                "Invalid value '{0}' for configuration option `staging`"
+                " of resource '{1}': must be either 'files' or 'tar'."
+                .format(staging, name))
+        self.staging = staging
         if transport == 'local':
             self.transport = gc3libs.backends.transport.LocalTransport()
             self._username = getuser()
@@ -157,11 +165,23 @@ class BatchSystem(LRMS):
                 timeout=(ssh_timeout or auth.timeout),
                 large_file_threshold=large_file_threshold,
                 large_file_chunk_size=large_file_chunk_size,
+                max_connections=ssh_max_connections,
+                max_channels_per_connection=ssh_max_channels_per_connection,
+                keepalive=ssh_keepalive,
+                idle_timeout=ssh_idle_timeout,
             )
         else:
             raise gc3libs.exceptions.TransportError(
                 "Unknown transport '%s'" % transport)
         self.accounting_delay = accounting_delay
+        if input_cache_quota:
+            self._input_cache = gc3libs.backends.inputcache.InputCache(
+                self.transport,
+                (input_cache_dir
+                 or posixpath.join(self.spooldir, 'input_cache')),
+                input_cache_quota)
+        else:
+            self._input_cache = None
 
 
     def get_jobid_from_submit_output(self, output, regexp):
@@ -296,6 +316,29 @@ class BatchSystem(LRMS):
         """
         pass
 
+    def _stat_command_many(self, jobids):
+        """
+        Return a string containing the command to issue to get status
+        information about all the jobs listed in `jobids` at once.
+
+        Return ``None`` (default) if the batch system provides no such
+        command; in this case, the "stat" command is run separately
+        for each job.
+        """
+        return None
+
+    def _split_stat_output(self, stdout):
+        """
+        Split the output of `_stat_command_many` into per-job chunks.
+
+        Return a dictionary mapping each job ID found in `stdout` into
+        the portion of text that `_parse_stat_output` should parse to
+        get that job's status.
+        """
+        raise NotImplementedError(
+            "Abstract method `_split_stat_output()` called - "
+            "this should have been defined in a derived class.")
+
     def _acct_command(self, job):
         """
         Return a string containing the command to issue to get accounting
@@ -319,6 +362,30 @@ class BatchSystem(LRMS):
             "Abstract method `_parse_acct_output()` called - "
             "this should have been defined in a derived class.")
 
+    def _acct_command_many(self, jobids):
+        """
+        Return a string containing the command to issue to get
+        accounting information about all the jobs listed in `jobids`
+        at once.
+
+        Return ``None`` (default) if the batch system provides no such
+        command; in this case, the "acct" command is run separately
+        for each job.
+        """
+        return None
+
+    def _split_acct_output(self, stdout):
+        """
+        Split the output of `_acct_command_many` into per-job chunks.
+
+        Return a dictionary mapping each job ID found in `stdout` into
+        the portion of text that `_parse_acct_output` should parse to
+        get that job's accounting information.
+        """
+        raise NotImplementedError(
+            "Abstract method `_split_acct_output()` called - "
+            "this should have been defined in a derived class.")
+
     def _secondary_acct_command(self, job):
         """
         Like `_acct_command` but called only if it exits with non-0 status.
@@ -352,6 +419,36 @@ class BatchSystem(LRMS):
             "Abstract method `_cancel_command()` called -"
             " this should have been defined in a derived class.")
 
+    def _run_aggregated(self, cmd, program, **variables):
+        """
+        Run `cmd` and return the output of `awk` `program` over it.
+
+        The output of `cmd` is processed by `awk` on the front-end
+        host, so only the (presumably short) result is transferred
+        back; it is returned as a list of lines.  Keyword arguments
+        are set as `awk` variables, e.g., ``FS='^'`` or ``me='alice'``.
+
+        Raise `LRMSError` if `cmd` exits with a non-zero code.
+        """
+        # `cmd`'s exit code would be lost in the pipe, so we print it
+        # on a line of its own (prefixed with ``!``) upon failure
+        cmdline = ("(%s || echo '!'$?) | awk %s %s" % (
+            cmd,
+            ' '.join('-v %s' % sh_quote_safe('%s=%s' % item)
+                     for item in sorted(variables.items())),
+            sh_quote_safe('/^!/ { print; next } ' + program)))
+        log.debug("Running `%s`...", cmdline)
+        exit_code, stdout, stderr = self.transport.execute_command(cmdline)
+        lines = stdout.splitlines()
+        if lines and lines[-1].startswith('!'):
+            exit_code = int(lines[-1][1:])
+        if exit_code != 0:
+            raise gc3libs.exceptions.LRMSError(
+                "%s backend failed executing '%s':"
+                " exit code: %d; stderr: '%s'"
+                % (self._batchsys_name, cmd, exit_code, stderr))
+        return lines
+
     def _get_prepost_scripts(self, app, scriptnames):
         script_txt = []
         for script in scriptnames:
@@ -399,15 +496,153 @@ class BatchSystem(LRMS):
                      app.application_name + '_epilogue_content']
         return self._get_prepost_scripts(app, epilogues)
 
+    def _make_job_script(self, app, aux_script):
+        """
+        Return the text of the job script for `app`.
+
+        The script is made of the resource prologue, the `aux_script`
+        returned by `_submit_command`, and the resource epilogue.
+        """
+        script = ['#!/bin/sh\n']
+        # Add preamble file
+        prologue = self.get_prologue_script(app)
+        if prologue:
+            script.append(prologue)
+
+        script.append(aux_script)
+
+        # Add epilogue files
+        epilogue = self.get_epilogue_script(app)
+        if epilogue:
+            script.append(epilogue)
+        return ''.join(script)
+
+    def _make_sandbox_archive(self, app, inputs, script, script_filename):
+        """
+        Return a temporary file holding a TAR archive of the job sandbox.
+
+        The archive contains the input files listed in `inputs` as
+        *(local_url, remote_path)* pairs (with their permission bits),
+        the directories where STDOUT and STDERR of `app` should be
+        saved, and, if `script` is not empty, the job script, stored
+        as executable file `script_filename`.
+        """
+        archive = tempfile.TemporaryFile()
+        tar = tarfile.open(fileobj=archive, mode='w')
+        try:
+            for local_path, remote_path in inputs:
+                log.debug("Adding file '%s' as '%s' to sandbox archive",
+                          local_path.path, remote_path)
+                tar.add(local_path.path, arcname=remote_path)
+            # if STDOUT/STDERR should be saved in a directory, ensure it
+            # exists (see Issue 495 for details)
+            for dest in (app.stdout, app.stderr):
+                if dest:
+                    destdir = os.path.dirname(dest)
+                    if destdir:
+                        info = tarfile.TarInfo(destdir)
+                        info.type = tarfile.DIRTYPE
+                        info.mode = 0o755
+                        info.mtime = time.time()
+                        tar.addfile(info)
+            if script:
+                data = script.encode('utf-8')
+                info = tarfile.TarInfo(posixpath.normpath(script_filename))
+                info.mode = 0o755
+                info.size = len(data)
+                info.mtime = time.time()
+                tar.addfile(info, BytesIO(data))
+        finally:
+            tar.close()
+        archive.seek(0)
+        return archive
+
+    def _stage_and_submit(self, app, sub_cmd, script, script_filename):
+        """
+        Create the job sandbox and submit the job with a single remote command.
+
+        The job sandbox is uploaded as a TAR archive through the
+        standard input of the remote command, which also creates the
+        job directory and runs the submission command `sub_cmd` there.
+
+        Return a tuple *(remote_folder, exit_code, stdout, stderr)*
+        where the last three items refer to the submission command.
+        """
+        if self._input_cache:
+            link_cmd, inputs = self._input_cache.stage_inputs(app)
+        else:
+            link_cmd, inputs = '', list(app.inputs.items())
+        archive = self._make_sandbox_archive(
+            app, inputs, script, script_filename)
+        steps = [
+            "mkdir -p {0}".format(self.spooldir),
+            "d=$(mktemp -d {0}/batch_job.XXXXXXXXXX)".format(self.spooldir),
+            # first line of output is the name of the job directory
+            'echo "$d"',
+            'cd "$d"',
+            "tar -x -f -",
+        ]
+        if link_cmd:
+            steps.append(link_cmd)
+        if app.arguments[0].startswith('./'):
+            steps.append("chmod 755 %s" % sh_quote_safe(app.arguments[0]))
+        steps.append("%s %s" % (sub_cmd, script_filename))
+        cmd = "/bin/sh -c %s" % sh_quote_safe(' && '.join(steps))
+        try:
+            exit_code, stdout, stderr = self.transport.execute_command(
+                cmd, stdin=archive)
+        finally:
+            archive.close()
+        remote_folder, _, stdout = stdout.partition('\n')
+        if not remote_folder:
+            raise gc3libs.exceptions.SpoolDirError(
+                "Cannot create temporary job working directory"
+                " on resource '%s'; command '%s' exited"
+                " with code: %d and stderr: '%s'."
+                % (self.name, cmd, exit_code, stderr))
+        return remote_folder, exit_code, stdout, stderr
+
     @LRMS.authenticated
     def submit_job(self, app):
         """This method will create a remote directory to store job's
         sandbox, and will copy the sandbox in there.
+
+        If the `staging` option of this resource is ``'tar'``, the
+        whole sandbox is instead uploaded as a single TAR stream, and
+        unpacked and submitted with one remote command; see
+        `_stage_and_submit`:meth:.
         """
-        job = app.execution
+        self.transport.connect()
+
+        if self.staging == 'tar':
+            try:
+                sub_cmd, aux_script = self._submit_command(app)
+                if aux_script != '':
+                    script_filename = ('./script.%s.sh' % uuid.uuid4())
+                    script = self._make_job_script(app, aux_script)
+                else:
+                    script_filename = ''
+                    script = ''
+                ssh_remote_folder, exit_code, stdout, stderr = \
+                    self._stage_and_submit(
+                        app, sub_cmd, script, script_filename)
+                if exit_code != 0:
+                    if self._input_cache:
+                        self._input_cache.discard(app)
+                    raise gc3libs.exceptions.LRMSError(
+                        "Failed executing command 'cd %s && %s %s' on resource"
+                        " '%s'; exit code: %d, stderr: '%s'."
+                        % (ssh_remote_folder, sub_cmd, script_filename,
+                           self.name, exit_code, stderr))
+                return self.__record_submission(
+                    app, ssh_remote_folder, stdout, stderr)
+            except:
+                log.critical(
+                    "Failure submitting job to resource '%s' - "
+                    "see log file for errors", self.name)
+                raise
 
         # Create the remote directory.
-        self.transport.connect()
         cmd = (
             "mkdir -p {0};"
             " mktemp -d {0}/batch_job.XXXXXXXXXX"
@@ -422,7 +657,11 @@ class BatchSystem(LRMS):
         ssh_remote_folder = stdout.split('\n')[0]
 
         # Copy the input file(s) to remote directory.
-        for local_path, remote_path in list(app.inputs.items()):
+        if self._input_cache:
+            inputs = self._input_cache.stage_into(app, ssh_remote_folder)
+        else:
+            inputs = list(app.inputs.items())
+        for local_path, remote_path in inputs:
             remote_path = os.path.join(ssh_remote_folder, remote_path)
             remote_parent = os.path.dirname(remote_path)
             try:
@@ -464,19 +703,7 @@ class BatchSystem(LRMS):
                 script_filename = ('./script.%s.sh' % uuid.uuid4())
                 # save script to a temporary file and submit that one instead
                 local_script_file = tempfile.NamedTemporaryFile(mode='wt')
-                local_script_file.write('#!/bin/sh\n')
-                # Add preamble file
-                prologue = self.get_prologue_script(app)
-                if prologue:
-                    local_script_file.write(prologue)
-
-                local_script_file.write(aux_script)
-
-                # Add epilogue files
-                epilogue = self.get_epilogue_script(app)
-                if epilogue:
-                    local_script_file.write(epilogue)
-
+                local_script_file.write(self._make_job_script(app, aux_script))
                 local_script_file.flush()
                 # upload script to remote location
                 self.transport.put(
@@ -506,40 +733,8 @@ class BatchSystem(LRMS):
                     % (ssh_remote_folder, sub_cmd, script_filename,
                        self.name, exit_code, stderr))
 
-            jobid = self._parse_submit_output(stdout)
-            log.debug('Job submitted with jobid: %s', jobid)
-
-            job.execution_target = self.frontend
-
-            job.lrms_jobid = jobid
-            job.lrms_jobname = jobid
-            try:
-                if app.jobname:
-                    job.lrms_jobname = app.jobname
-            except:
-                pass
-
-            if 'stdout' in app:
-                job.stdout_filename = app.stdout
-            else:
-                job.stdout_filename = '%s.o%s' % (job.lrms_jobname, jobid)
-            if app.join:
-                job.stderr_filename = job.stdout_filename
-            else:
-                if 'stderr' in app:
-                    job.stderr_filename = app.stderr
-                else:
-                    job.stderr_filename = '%s.e%s' % (job.lrms_jobname, jobid)
-            job.history.append('Submitted to %s @ %s, got jobid %s'
-                               % (self._batchsys_name, self.name, jobid))
-            job.history.append("Submission command output:\n"
-                               "  === stdout ===\n%s"
-                               "  === stderr ===\n%s"
-                               "  === end ===\n"
-                               % (stdout, stderr), 'pbs', 'qsub')
-            job.ssh_remote_folder = ssh_remote_folder
-
-            return job
+            return self.__record_submission(
+                app, ssh_remote_folder, stdout, stderr)
 
         except:
             log.critical(
@@ -547,6 +742,53 @@ class BatchSystem(LRMS):
                 "see log file for errors", self.name)
             raise
 
+    def __record_submission(self, app, ssh_remote_folder, stdout, stderr):
+        """
+        Update `app.execution` from the output of the submission command.
+        """
+        job = app.execution
+
+        jobid = self._parse_submit_output(stdout)
+        log.debug('Job submitted with jobid: %s', jobid)
+
+        job.execution_target = self.frontend
+
+        job.lrms_jobid = jobid
+        job.lrms_jobname = jobid
+        try:
+            if app.jobname:
+                job.lrms_jobname = app.jobname
+        except:
+            pass
+
+        if 'stdout' in app:
+            job.stdout_filename = app.stdout
+        else:
+            job.stdout_filename = '%s.o%s' % (job.lrms_jobname, jobid)
+        if app.join:
+            job.stderr_filename = job.stdout_filename
+        else:
+            if 'stderr' in app:
+                job.stderr_filename = app.stderr
+            else:
+                job.stderr_filename = '%s.e%s' % (job.lrms_jobname, jobid)
+        job.history.append('Submitted to %s @ %s, got jobid %s'
+                           % (self._batchsys_name, self.name, jobid))
+        job.history.append("Submission command output:\n"
+                           "  === stdout ===\n%s"
+                           "  === stderr ===\n%s"
+                           "  === end ===\n"
+                           % (stdout, stderr), 'pbs', 'qsub')
+        job.ssh_remote_folder = ssh_remote_folder
+
+        # count the new job until the resource status is queried
+        # again (see `gc3libs.core.Core.update_resources`)
+        if self.updated:
+            self.queued += 1
+            self.user_queued += 1
+
+        return job
+
 
     def __run_command_and_parse_output(self, cmd, parser, kind='accounting'):
         log.debug("Checking remote job %s info with `%s` ...", kind, cmd)
@@ -598,17 +840,141 @@ class BatchSystem(LRMS):
         # output as soon as they are finished. In these cases,
         # we have to check some *accounting* command to check
         # the exit status.
+        acctinfo = self.__get_acct_info(app, [
+            # this is the regular sacct/qacct/bjobs command
+            (self._acct_command, self._parse_acct_output),
+            # This is used to distinguish between a standard
+            # Torque installation and a PBSPro where `tracejob`
+            # does not work but if `job_history_enable=True`,
+            # then we can actually access information about
+            # finished jobs with `qstat -x -f`.
+            (self._secondary_acct_command, self._parse_secondary_acct_output),
+        ])
+        return self.__set_terminal_state(app, state, termstatus, acctinfo)
+
+    @same_docstring_as(LRMS.update_job_states)
+    @LRMS.authenticated
+    def update_job_states(self, apps):
+        jobids = []
+        for app in apps:
+            try:
+                jobids.append(app.execution.lrms_jobid)
+            except AttributeError:
+                # invalid job object; error is reported below
+                jobids.append(None)
+
+        # use the batch system's multi-job "stat" command if there is
+        # one, otherwise just query each job in turn
+        stat_cmd = None
+        if len(apps) > 1:
+            stat_cmd = self._stat_command_many(
+                [jobid for jobid in jobids if jobid is not None])
+        if stat_cmd is None:
+            return LRMS.update_job_states(self, apps)
+
+        self.transport.connect()
+
+        # jobs that do not appear in the output of the "stat" command
+        # are treated exactly as if the "stat" command had failed for
+        # them in `update_job_state`; so we need not care about the
+        # exit code here, as some batch systems return non-zero when
+        # any one of the given job IDs is no longer known
+        log.debug("Checking remote status of %d jobs with `%s` ...",
+                  len(apps), stat_cmd)
+        exit_code, stdout, stderr = self.transport.execute_command(stat_cmd)
+        if exit_code != 0:
+            log.debug("Status command `%s` exited with code %d"
+                      " and stderr: '%s'", stat_cmd, exit_code, stderr)
+        stat_output = self._split_stat_output(stdout)
+
+        results = [None] * len(apps)
+        # tasks that dropped out of the queue and whose termination
+        # status must be fetched from the accounting command
+        terminated = []
+        for n, (app, jobid) in enumerate(zip(apps, jobids)):
+            if jobid is None:
+                results[n] = gc3libs.exceptions.InvalidArgument(
+                    "Job object is invalid: missing `lrms_jobid` attribute")
+                continue
+            try:
+                if jobid in stat_output:
+                    state, termstatus = self._parse_stat_output(
+                        stat_output[jobid], '')
+                else:
+                    state, termstatus = None, None
+                if state is not None and state != Run.State.TERMINATING:
+                    app.execution.state = state
+                    log.debug("Task %s state set to %s", app, state)
+                    results[n] = state
+                else:
+                    terminated.append((n, app, state, termstatus))
+            # pylint: disable=broad-except
+            except Exception as err:
+                results[n] = err
+
+        if not terminated:
+            return results
+
+        # run the multi-job accounting command, if any, on all jobs
+        # that are no longer listed as queued or running
+        acct_cmd = self._acct_command_many(
+            [app.execution.lrms_jobid for _, app, _, _ in terminated])
+        acct_output = {}
+        if acct_cmd is not None:
+            log.debug("Checking remote accounting info of %d jobs with `%s` ...",
+                      len(terminated), acct_cmd)
+            exit_code, stdout, stderr = self.transport.execute_command(acct_cmd)
+            if exit_code == 0:
+                acct_output = self._split_acct_output(stdout)
+            else:
+                log.debug("Accounting command `%s` failed with exit code %d"
+                          " and stderr: '%s'", acct_cmd, exit_code, stderr)
+
+        for n, app, state, termstatus in terminated:
+            jobid = app.execution.lrms_jobid
+            try:
+                if acct_cmd is None:
+                    acctinfo = self.__get_acct_info(app, [
+                        (self._acct_command, self._parse_acct_output),
+                        (self._secondary_acct_command,
+                         self._parse_secondary_acct_output),
+                    ])
+                else:
+                    acctinfo = {}
+                    if jobid in acct_output:
+                        try:
+                            acctinfo = self._parse_acct_output(
+                                acct_output[jobid], '')
+                        except gc3libs.exceptions.UnexpectedJobState as ex:
+                            log.debug(
+                                "Unexpected output from accounting command"
+                                " `%s` for task %s: %s.", acct_cmd, app, ex)
+                    if not acctinfo:
+                        acctinfo = self.__get_acct_info(app, [
+                            (self._secondary_acct_command,
+                             self._parse_secondary_acct_output),
+                        ])
+                results[n] = self.__set_terminal_state(
+                    app, state, termstatus, acctinfo)
+            # pylint: disable=broad-except
+            except Exception as err:
+                results[n] = err
+
+        return results
+
+    def __get_acct_info(self, app, acct_commands):
+        """
+        Return accounting info for `app` from the first command in
+        `acct_commands` that succeeds.
+
+        Argument `acct_commands` is a list of pairs *(cmd_fn,
+        parse_fn)*: *cmd_fn* is called with the `app.execution` object
+        and should return a command-line (or ``None`` to skip it),
+        whose output is then passed to *parse_fn*.
+        """
+        job = app.execution
         acctinfo = {}
-        for cmd_fn, parse_fn in [
-                # this is the regular sacct/qacct/bjobs command
-                (self._acct_command, self._parse_acct_output),
-                # This is used to distinguish between a standard
-                # Torque installation and a PBSPro where `tracejob`
-                # does not work but if `job_history_enable=True`,
-                # then we can actually access information about
-                # finished jobs with `qstat -x -f`.
-                (self._secondary_acct_command, self._parse_secondary_acct_output),
-        ]:
+        for cmd_fn, parse_fn in acct_commands:
             cmd = cmd_fn(job)
             # `._secondary_acct_command` returns ``None`` if no
             # "secondary" accouting method is defined -- skip to next
@@ -633,6 +999,15 @@ class BatchSystem(LRMS):
                     cmd, ex)
                 # try next one
                 pass
+        return acctinfo
+
+    def __set_terminal_state(self, app, state, termstatus, acctinfo):
+        """
+        Update `app.execution` from the output of the "stat" and
+        "acct" commands, for a job that is no longer queued or
+        running.  Return the new state.
+        """
+        job = app.execution
 
         # if no termination status is known and the acct
         # command provided one, use it
@@ -765,6 +1140,8 @@ class BatchSystem(LRMS):
         except Exception as err:
             log.warning("Failed removing remote folder '%s': %s: %s",
                         job.ssh_remote_folder, err.__class__, err)
+        if self._input_cache:
+            self._input_cache.release(app)
         return
 
     @same_docstring_as(LRMS.get_results)
@@ -779,29 +1156,30 @@ class BatchSystem(LRMS):
         job = app.execution
         try:
             self.transport.connect()
-            # Make list of files to copy, in the form of (remote_path,
-            # local_path) pairs.  This entails walking the
-            # `Application.outputs` list to expand wildcards and
-            # directory references.
+            # Make list of files and directories to copy, in the form
+            # of (remote_path, local_path) pairs; directories are
+            # expanded by `Transport.get_many`.
             stageout = list()
             for remote_relpath, local_url in app.outputs.items():
                 local_relpath = local_url.path
                 if remote_relpath == gc3libs.ANY_OUTPUT:
                     remote_relpath = ''
                     local_relpath = ''
-                stageout += _make_remote_and_local_path_pair(
-                    self.transport, job, remote_relpath, download_dir,
-                    local_relpath)
+                stageout.append(_make_remote_and_local_path_pair(
+                    job, remote_relpath, download_dir, local_relpath))
 
             # copy back all files, renaming them to adhere to the
             # ArcLRMS convention
             log.debug("Downloading job output into '%s' ...", download_dir)
-            for remote_path, local_path in stageout:
-                # ignore missing files (this is what ARC does too)
-                self.transport.get(remote_path, local_path,
-                                   ignore_nonexisting=True,
-                                   overwrite=overwrite,
-                                   changed_only=changed_only)
+            start = time.time()
+            # ignore missing files (this is what ARC does too)
+            files, size = self.transport.get_many(
+                stageout, ignore_nonexisting=True,
+                overwrite=overwrite, changed_only=changed_only)
+            # record retrieval statistics
+            job.download_files = files
+            job.download_bytes = size * B
+            job.download_duration = (time.time() - start) * seconds
             return
 
         except:
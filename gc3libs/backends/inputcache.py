@@ -0,0 +1,360 @@
+#! /usr/bin/env python
+#
+"""
+Content-addressed cache of input files on a remote resource.
+
+Input files that are shipped with many tasks (e.g., reference data or
+model binaries in a parameter sweep) are uploaded once into a cache
+directory on the resource, named after the SHA-256 digest of their
+contents; each task's sandbox then gets a local copy of the cached
+file (shared copy-on-write where the filesystem supports it) instead
+of a fresh transfer.
+"""
+# Copyright (C) 2009-2019  University of Zurich. All rights reserved.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+from __future__ import absolute_import, print_function, unicode_literals
+from builtins import object
+__docformat__ = 'reStructuredText'
+
+
+import hashlib
+import os
+import posixpath
+import threading
+import uuid
+
+from gc3libs import log
+from gc3libs.compat._collections import OrderedDict
+import gc3libs.defaults
+import gc3libs.exceptions
+from gc3libs.quantity import Memory
+from gc3libs.utils import sh_quote_safe, sh_quote_unsafe
+
+
+# local digests of input files, keyed by absolute path; each value is
+# a triple `(size, mtime, digest)` so that files that did not change
+# since the last time they were hashed need not be read again
+_digests = {}
+_digests_lock = threading.Lock()
+
+
+def file_digest(path, blocksize=1024*1024):
+    """
+    Return the SHA-256 hex digest of the contents of local file `path`.
+
+    Digests are memoized: if size and modification time of `path`
+    have not changed since the last call, the stored digest is
+    returned without reading the file again.
+    """
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    with _digests_lock:
+        cached = _digests.get(path)
+    if cached and cached[0] == st.st_size and cached[1] == st.st_mtime:
+        return cached[2]
+    sha = hashlib.sha256()
+    with open(path, 'rb') as stream:
+        while True:
+            block = stream.read(blocksize)
+            if not block:
+                break
+            sha.update(block)
+    digest = sha.hexdigest()
+    with _digests_lock:
+        _digests[path] = (st.st_size, st.st_mtime, digest)
+    return digest
+
+
+class InputCache(object):
+    """
+    Cache of input files in directory `root` on the host reached via
+    `transport`.
+
+    Cached files are stored read-only, with name given by the SHA-256
+    digest of their contents (plus a ``.x`` suffix for executable
+    files); tasks get a private, writable copy of them in their
+    sandbox, see `stage_inputs`:meth:.  Tasks are never handed links
+    to the cache entries: a task could otherwise modify a shared entry
+    in place, and a symbolic link would dangle as soon as another
+    process evicts the entry it points to.  Each task holds a reference to the cache
+    entries it uses (recorded in its ``execution.cached_inputs``
+    attribute) until `release`:meth: is called on them, usually when
+    the task sandbox is freed.
+
+    When the total size of cached files exceeds `quota`, the least
+    recently used entries which are not referenced by any task are
+    removed.  Note that reference counts and usage times are only
+    tracked within the running process; entries found in the cache
+    directory when the cache is first used are considered older than
+    any entry used since.
+
+    :param transport: `gc3libs.backends.transport.Transport` instance.
+    :param str root: Path to the cache directory; can contain
+        environment variable references, which are expanded by the
+        remote shell.
+    :param quota: Maximum total size of the cache (a
+        `gc3libs.quantity.Memory` instance or an integer count of bytes).
+    :param min_size: Files smaller than this are never cached but
+        always copied into the sandbox.
+    """
+
+    def __init__(self, transport, root, quota,
+                 min_size=gc3libs.defaults.INPUT_CACHE_MIN_SIZE):
+        self.transport = transport
+        self._root_raw = root
+        self.quota = self._to_bytes(quota)
+        self.min_size = self._to_bytes(min_size)
+        # map entry name to a pair `[size, refcount]`; ordered from
+        # least to most recently used
+        self._entries = OrderedDict()
+        self._size = 0
+        self._root = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _to_bytes(qty):
+        if isinstance(qty, Memory):
+            return qty.amount(Memory.B, conv=int)
+        return int(qty)
+
+    @property
+    def root(self):
+        """
+        Expanded path of the cache directory.
+
+        Accessing it the first time creates the cache directory, if
+        needed, and reads the list of already-cached files.
+        """
+        if self._root is None:
+            self._init_root()
+        return self._root
+
+    def _init_root(self):
+        self.transport.connect()
+        cmd = (
+            "mkdir -p {0} && cd {0} && pwd"
+            # list cached files, least recently accessed first
+            " && ls -1tur && echo"
+            # then their sizes
+            " && wc -c -- * 2>/dev/null; true"
+            .format(sh_quote_unsafe(self._root_raw)))
+        exit_code, stdout, stderr = self.transport.execute_command(cmd)
+        lines = stdout.split('\n')
+        if exit_code != 0 or not lines[0].startswith('/'):
+            raise gc3libs.exceptions.SpoolDirError(
+                "Cannot create input cache directory '%s':"
+                " command '%s' exited with code %d and stderr: '%s'."
+                % (self._root_raw, cmd, exit_code, stderr))
+        sizes = {}
+        sep = lines.index('', 1)
+        for line in lines[sep+1:]:
+            try:
+                size, name = line.split()
+                sizes[name] = int(size)
+            except ValueError:
+                # `total` line or empty line
+                continue
+        for name in lines[1:sep]:
+            if name in sizes:
+                self._entries[name] = [sizes[name], 0]
+                self._size += sizes[name]
+        self._root = lines[0]
+        log.debug("Input cache '%s' holds %d files (%d bytes)",
+                  self._root, len(self._entries), self._size)
+
+    def _entry_name(self, path):
+        name = file_digest(path)
+        if os.access(path, os.X_OK):
+            name += '.x'
+        return name
+
+    def _is_cacheable(self, local_path):
+        if local_path.scheme != 'file':
+            return False
+        path = local_path.path
+        return (os.path.isfile(path)
+                and os.path.getsize(path) >= self.min_size)
+
+    def add(self, path):
+        """
+        Ensure local file `path` is in the cache and take a reference to it.
+
+        Return the name of the cache entry; the file is uploaded only
+        if no entry with the same contents is already known.
+        """
+        name = self._entry_name(path)
+        root = self.root
+        with self._lock:
+            entry = self._entries.pop(name, None)
+            if entry is not None:
+                entry[1] += 1
+                self._entries[name] = entry
+                return name
+        size = os.path.getsize(path)
+        dest = posixpath.join(root, name)
+        tmp = posixpath.join(root, '.%s.%s' % (name, uuid.uuid4()))
+        log.debug("Uploading '%s' into input cache as '%s' ...", path, dest)
+        self.transport.put(path, tmp)
+        cmd = ("chmod %s %s && mv -f %s %s"
+               % ('0555' if name.endswith('.x') else '0444',
+                  sh_quote_safe(tmp), sh_quote_safe(tmp), sh_quote_safe(dest)))
+        exit_code, stdout, stderr = self.transport.execute_command(cmd)
+        if exit_code != 0:
+            raise gc3libs.exceptions.TransportError(
+                "Could not store file '%s' into input cache '%s':"
+                " command '%s' exited with code %d and stderr: '%s'."
+                % (path, root, cmd, exit_code, stderr))
+        with self._lock:
+            entry = self._entries.pop(name, None)
+            if entry is None:
+                entry = [size, 0]
+                self._size += size
+            entry[1] += 1
+            self._entries[name] = entry
+        self._evict()
+        return name
+
+    def release(self, app):
+        """
+        Drop the references to cache entries held by `app`.
+        """
+        names = app.execution.get('cached_inputs', [])
+        with self._lock:
+            for name in names:
+                entry = self._entries.get(name)
+                if entry is not None and entry[1] > 0:
+                    entry[1] -= 1
+        app.execution.cached_inputs = []
+        self._evict()
+
+    def discard(self, app):
+        """
+        Drop the references held by `app` and forget the entries it uses.
+
+        To be called when copying cached files into the sandbox of
+        `app` failed, e.g., because another process has removed
+        them from the cache directory: forgotten entries will be
+        uploaded again the next time they are needed.
+        """
+        names = app.execution.get('cached_inputs', [])
+        with self._lock:
+            for name in names:
+                entry = self._entries.pop(name, None)
+                if entry is not None:
+                    self._size -= entry[0]
+        app.execution.cached_inputs = []
+
+    def _evict(self):
+        with self._lock:
+            victims = []
+            excess = self._size - self.quota
+            for name, (size, refs) in list(self._entries.items()):
+                if excess <= 0:
+                    break
+                if refs == 0:
+                    victims.append(name)
+                    excess -= size
+            for name in victims:
+                size, _ = self._entries.pop(name)
+                self._size -= size
+        if victims:
+            log.debug("Evicting %d files from input cache '%s'",
+                      len(victims), self._root)
+            cmd = "cd %s && rm -f %s" % (
+                sh_quote_safe(self._root), ' '.join(victims))
+            exit_code, stdout, stderr = self.transport.execute_command(cmd)
+            if exit_code != 0:
+                log.warning("Failed evicting files from input cache '%s': %s",
+                            self._root, stderr)
+
+    def stage_inputs(self, app):
+        """
+        Add all cacheable input files of `app` to the cache.
+
+        Return a pair *(cmd, inputs)*: *cmd* is a shell command that,
+        when run in the task sandbox directory, copies the cached files
+        into place; *inputs* is the list of *(local_url, remote_path)*
+        pairs from `app.inputs` that were not cached and must be
+        copied into the sandbox as usual.
+
+        Names of the cache entries referenced by `app` are appended
+        to the ``app.execution.cached_inputs`` list.
+        """
+        links = []
+        inputs = []
+        names = []
+        for local_path, remote_path in list(app.inputs.items()):
+            try:
+                if self._is_cacheable(local_path):
+                    name = self.add(local_path.path)
+                    names.append(name)
+                    links.append((name, remote_path))
+                    continue
+            except Exception as err:
+                log.warning(
+                    "Could not use input cache for file '%s': %s: %s;"
+                    " will copy it into the task directory instead.",
+                    local_path.path, err.__class__.__name__, err)
+            inputs.append((local_path, remote_path))
+        cached = app.execution.get('cached_inputs', [])
+        app.execution.cached_inputs = cached + names
+        return self.link_command(links), inputs
+
+    def stage_into(self, app, destdir):
+        """
+        Copy the cached input files of `app` into directory `destdir`.
+
+        Return the list of *(local_url, remote_path)* pairs from
+        `app.inputs` that must still be uploaded into `destdir`; if
+        copying from the cache fails, this is the whole list of input
+        files.
+        """
+        cmd, inputs = self.stage_inputs(app)
+        if cmd:
+            cmd = "/bin/sh -c %s" % sh_quote_safe(
+                "cd %s && %s" % (sh_quote_safe(destdir), cmd))
+            exit_code, stdout, stderr = self.transport.execute_command(cmd)
+            if exit_code != 0:
+                log.warning(
+                    "Could not copy cached input files into '%s':"
+                    " command '%s' exited with code %d and stderr: '%s';"
+                    " will copy them instead.",
+                    destdir, cmd, exit_code, stderr)
+                self.discard(app)
+                inputs = list(app.inputs.items())
+        return inputs
+
+    def link_command(self, links):
+        """
+        Return a shell command copying cache entries into the current directory.
+
+        Argument `links` is a list of *(name, relpath)* pairs.  Each
+        entry is copied to a user-writable file, so that tasks may
+        modify their inputs without affecting the cache; a
+        copy-on-write clone is tried first (GNU ``cp --reflink``), and
+        a plain copy is made if that is not supported.
+        """
+        cmds = []
+        for name, relpath in links:
+            src = sh_quote_safe(posixpath.join(self._root, name))
+            dest = sh_quote_safe(relpath)
+            parent = posixpath.dirname(relpath)
+            if parent not in ('', '.'):
+                cmds.append("mkdir -p %s" % sh_quote_safe(parent))
+            cmds.append("{ cp -f --reflink=auto %s %s 2>/dev/null"
+                        " || cp -f %s %s; } && chmod u+w %s"
+                        % (src, dest, src, dest, dest))
+        return ' && '.join(cmds)
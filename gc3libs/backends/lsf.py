@@ -415,9 +415,31 @@ class LsfLrms(batch.BatchSystem):
     def _stat_command(self, job):
         return ("%s -l %s" % (self._bjobs, job.lrms_jobid))
 
+    def _stat_command_many(self, jobids):
+        return ("%s -l %s" % (self._bjobs, ' '.join(jobids)))
+
+    _job_record_sep_re = re.compile(r'^-+\s*$', re.M)
+    _job_record_id_re = re.compile(r'^Job <(?P<jobid>[0-9]+)>', re.M)
+
+    def _split_stat_output(self, stdout):
+        # `bjobs -l` separates the reports about different jobs with
+        # a line made only of dashes
+        chunks = {}
+        for record in self._job_record_sep_re.split(stdout):
+            match = self._job_record_id_re.search(record)
+            if match:
+                chunks[match.group('jobid')] = record
+        return chunks
+
     def _acct_command(self, job):
         return ("%s -l %s" % (self._bjobs, job.lrms_jobid))
 
+    def _acct_command_many(self, jobids):
+        return ("%s -l %s" % (self._bjobs, ' '.join(jobids)))
+
+    def _split_acct_output(self, stdout):
+        return self._split_stat_output(stdout)
+
     def _secondary_acct_command(self, job):
         return ("%s -l %s" % (self._bacct2, job.lrms_jobid))
 
@@ -54,6 +54,8 @@ _qstat_line_re = re.compile(
     r'(?P<state>[^\s]+)\s+'
     r'(?P<queue>[^\s]+)')
 
+_qstat_jobid_re = re.compile(r'^(?P<jobid>\d+)(\.[^\s]*)?\s')
+
 # convert data to GC3Pie internal format
 
 
@@ -203,6 +205,19 @@ class PbsLrms(batch.BatchSystem):
         return "%s %s | grep ^%s" % (
             self._qstat, job.lrms_jobid, job.lrms_jobid)
 
+    def _stat_command_many(self, jobids):
+        return "%s %s" % (self._qstat, ' '.join(jobids))
+
+    def _split_stat_output(self, stdout):
+        chunks = {}
+        for line in stdout.split('\n'):
+            # `qstat` prints job IDs as `NNN.server`, but we only
+            # record the numeric part (see `_qsub_jobid_re`)
+            match = _qstat_jobid_re.match(line)
+            if match:
+                chunks[match.group('jobid')] = line
+        return chunks
+
     def _acct_command(self, job):
         return "%s %s" % (self._tracejob, job.lrms_jobid)
 
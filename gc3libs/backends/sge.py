@@ -401,6 +401,19 @@ class SgeLrms(batch.BatchSystem):
     def _stat_command(self, job):
         return ("%s | egrep  '^ *%s'" % (self._qstat, job.lrms_jobid))
 
+    def _stat_command_many(self, jobids):
+        # plain `qstat` lists all the user's jobs
+        return self._qstat
+
+    def _split_stat_output(self, stdout):
+        chunks = {}
+        for line in stdout.split('\n'):
+            fields = line.split()
+            # skip header and separator lines
+            if fields and fields[0].isdigit():
+                chunks[fields[0]] = line
+        return chunks
+
     def _parse_stat_output(self, stdout, stderr):
         ge_status_code = stdout.split()[4]
         log.debug(
@@ -491,31 +504,28 @@ class SgeLrms(batch.BatchSystem):
         try:
             self.transport.connect()
 
+            # jobs are counted on the front-end, with the same
+            # rules as `count_jobs`; only the totals are transferred
             _command = ("%s -U %s" % (self._qstat, self._username))
-            log.debug("Running `%s`...", _command)
-            exit_code, qstat_stdout, stderr \
-                = self.transport.execute_command(_command)
-            if exit_code != 0:
-                # cannot continue
-                raise gc3libs.exceptions.LRMSError(
-                    "SGE backend failed executing '%s':"
-                    "exit code: %d; stdout: '%s'; stderr: '%s'." %
-                    (_command, exit_code, qstat_stdout, stderr))
-
-            _command = ("%s -F -U %s" % (self._qstat, self._username))
-            log.debug("Running `%s`...", _command)
-            exit_code, qstat_F_stdout, stderr \
-                = self.transport.execute_command(_command)
-            if exit_code != 0:
-                # cannot continue
-                raise gc3libs.exceptions.LRMSError(
-                    "SGE backend failed executing '%s':"
-                    "exit code: %d; stdout: '%s'; stderr: '%s'." %
-                    (_command, exit_code, qstat_F_stdout, stderr))
-
+            lines = self._run_aggregated(
+                _command,
+                'NR > 2 && NF >= 5 {'
+                '  if ($5 ~ /[EhTsSd]/) next;'
+                '  q = ($5 ~ /q/); r = ($5 ~ /r/);'
+                '  tq += q; tr += r;'
+                '  if ($4 == me) { uq += q; ur += r }'
+                '} END { print tr + 0, tq + 0, ur + 0, uq + 0 }',
+                me=self._username)
             (total_running, self.queued, self.user_run, self.user_queued) \
-                = count_jobs(qstat_stdout, self._username)
-            slots = compute_nr_of_slots(qstat_F_stdout)
+                = [int(n) for n in lines[0].split()]
+
+            # only queue header lines are needed to count slots, so
+            # use `qstat -f` instead of `-F` (which also lists the
+            # value of every resource on each queue) and drop job lines
+            _command = ("%s -f -U %s" % (self._qstat, self._username))
+            lines = self._run_aggregated(
+                _command, '$1 ~ /@/ { print $1, $2, $3 }')
+            slots = compute_nr_of_slots('\n'.join(lines))
             self.free_slots = int(slots['global']['available'])
             self.used_quota = -1
 
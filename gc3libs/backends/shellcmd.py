@@ -38,12 +38,16 @@ __docformat__ = 'reStructuredText'
 
 # stdlib imports
 from abc import ABCMeta, abstractmethod
-from collections import defaultdict
+from collections import defaultdict, namedtuple
+import errno
 import pickle as pickle
 from getpass import getuser
 import os
 import os.path
 import posixpath
+import subprocess
+import sys
+import threading
 import time
 
 from pkg_resources import Requirement
@@ -51,12 +55,14 @@ from pkg_resources import Requirement
 # GC3Pie imports
 import gc3libs
 import gc3libs.exceptions
+import gc3libs.backends.inputcache
 import gc3libs.backends.transport
+import gc3libs.events
 from gc3libs import log, Run
 import gc3libs.defaults
-from gc3libs.utils import same_docstring_as, Struct, sh_quote_safe, sh_quote_unsafe
+from gc3libs.utils import same_docstring_as, Struct, sh_quote_safe, sh_quote_unsafe, to_str
 from gc3libs.backends import LRMS
-from gc3libs.quantity import Duration, Memory, MB
+from gc3libs.quantity import B, Duration, Memory, MB, seconds
 
 
 ## helper functions
@@ -181,10 +187,109 @@ def _parse_returncode_string(val):
     return Run.shellexit_to_returncode(int(val))
 
 
+def _parse_rusage(rusage):
+    """
+    Convert a resource usage record, as returned by `os.wait4`, into a
+    `Struct`:class: of ``.execution`` attributes.
+
+    Attribute names are the same that `ShellcmdLrms.TIMEFMT_CONV` uses
+    for the corresponding values in the output of GNU ``time``.
+    """
+    acctinfo = Struct()
+    acctinfo['shellcmd_user_time'] = Duration(rusage.ru_utime, unit=Duration.s)
+    acctinfo['shellcmd_kernel_time'] = Duration(rusage.ru_stime, unit=Duration.s)
+    acctinfo['used_cpu_time'] = (
+        acctinfo['shellcmd_user_time'] + acctinfo['shellcmd_kernel_time'])
+    # `ru_maxrss` is in bytes on MacOSX, in KiB everywhere else
+    acctinfo['max_used_memory'] = rusage.ru_maxrss * (
+        Memory.B if sys.platform == 'darwin' else Memory.KiB)
+    acctinfo['shellcmd_major_page_faults'] = rusage.ru_majflt
+    acctinfo['shellcmd_minor_page_faults'] = rusage.ru_minflt
+    acctinfo['shellcmd_swapped'] = rusage.ru_nswap
+    acctinfo['shellcmd_involuntary_context_switches'] = rusage.ru_nivcsw
+    acctinfo['shellcmd_voluntary_context_switches'] = rusage.ru_nvcsw
+    acctinfo['shellcmd_filesystem_inputs'] = rusage.ru_inblock
+    acctinfo['shellcmd_filesystem_outputs'] = rusage.ru_oublock
+    acctinfo['shellcmd_socket_received'] = rusage.ru_msgrcv
+    acctinfo['shellcmd_socket_sent'] = rusage.ru_msgsnd
+    acctinfo['shellcmd_signals_delivered'] = rusage.ru_nsignals
+    return acctinfo
+
+
+def _format_job_ledger_record(pid, info):
+    """
+    Return the job ledger line recording that job `pid` has started.
+
+    Argument `info` is a dictionary with the same keys used in
+    `ShellcmdLrms._job_infos`; see `ShellcmdLrms.JOB_LEDGER` for the
+    format of the ledger.
+    """
+    memory = info['requested_memory']
+    return '+{pid} {cores} {memory} {execdir}'.format(
+        pid=pid,
+        cores=info['requested_cores'],
+        memory=('-' if memory is None else '%d' % memory.amount(unit=B)),
+        execdir=(info['execution_dir'] or '-'))
+
+
+def _parse_job_ledger(text):
+    """
+    Replay the job ledger `text` and return a pair *(job_infos, size)*.
+
+    The first item maps the PID of each job that is still recorded in
+    the ledger to a dictionary with the same keys used in
+    `ShellcmdLrms._job_infos`; the second item is the number of
+    records in the ledger.  An incomplete last line (e.g., being
+    written while the ledger was read) is ignored::
+
+      >>> infos, size = _parse_job_ledger(
+      ...   '+123 2 1000000 /tmp/a\\n+456 1 - /tmp/b\\n*123\\n-456\\n+78')
+      >>> size
+      4
+      >>> print(' '.join(infos))
+      123
+      >>> infos['123']['requested_cores'], infos['123']['terminated']
+      (2, True)
+      >>> infos['123']['requested_memory'] == 1*MB
+      True
+    """
+    job_infos = {}
+    lines = text.split('\n')
+    # last item is either empty or an incomplete line
+    lines.pop()
+    for line in lines:
+        kind, rest = line[:1], line[1:]
+        if kind == '+':
+            pid, cores, memory, execdir = rest.split(' ', 3)
+            job_infos[pid] = {
+                'requested_cores': int(cores),
+                'requested_memory': (None if memory == '-'
+                                     else int(memory) * B),
+                'execution_dir': (None if execdir == '-' else execdir),
+                'terminated': False,
+            }
+        elif kind == '*':
+            if rest in job_infos:
+                job_infos[rest]['terminated'] = True
+        elif kind == '-':
+            job_infos.pop(rest, None)
+    return job_infos, len(lines)
+
+
 ## interface to different OS
 #
 #
 
+_ProcessInfo = namedtuple('_ProcessInfo', ['ppid', 'state', 'elapsed'])
+"""
+Entry in the process table returned by `_Machine.get_process_table`:meth:.
+
+Field `ppid` is the PID of the parent process (as a string), `state`
+is the 1-letter process state as shown by ``ps``, and `elapsed` is a
+`Duration` object with the time elapsed since the process started.
+"""
+
+
 class _Machine(with_metaclass(ABCMeta, object)):
     """
     Base class for OS-specific shell services.
@@ -268,6 +373,32 @@ class _Machine(with_metaclass(ABCMeta, object)):
             raise RuntimeError("Got error running command `{0}` (exit code {1}): {2}"
                                .format(cmd, exit_code, stderr.strip()))
 
+    def get_process_table(self):
+        """
+        Return a snapshot of all processes running on the machine.
+
+        The snapshot is a dictionary mapping each PID (as a string) to
+        a `_ProcessInfo` tuple, so that the state and running time of
+        any number of processes can be looked up with a single
+        command.
+        """
+        ps_output = self._run_command(self._process_table_command())
+        table = {}
+        for line in ps_output.split('\n'):
+            fields = line.split()
+            if len(fields) < 4:
+                continue
+            pid, ppid, state, etime = fields[:4]
+            table[pid] = _ProcessInfo(ppid, state, _parse_time_duration(etime))
+        return table
+
+    @abstractmethod
+    def _process_table_command(self):
+        """
+        Command to list PID, PPID, state and elapsed time of all processes.
+        """
+        pass
+
     def get_total_cores(self):
         """Return total nr. of CPU cores."""
         cmd = self._get_total_cores_command()
@@ -359,6 +490,42 @@ class _LinuxMachine(_Machine):
     def _list_pids_and_ppids_command(self):
         return 'ps --no-header -o pid,ppid'
 
+    def _process_table_command(self):
+        return 'ps -e -o pid=,ppid=,state=,etimes='
+
+    def get_process_table(self):
+        """
+        Return a snapshot of all processes running on the machine.
+
+        When running on the local host, read the ``/proc`` filesystem
+        directly instead of spawning ``ps``.
+        """
+        if not isinstance(self.transport,
+                          gc3libs.backends.transport.LocalTransport):
+            return _Machine.get_process_table(self)
+        ticks = float(os.sysconf(str('SC_CLK_TCK')))
+        with open('/proc/uptime', 'r') as fd:
+            uptime = float(fd.read().split()[0])
+        table = {}
+        for pid in os.listdir('/proc'):
+            if not pid.isdigit():
+                continue
+            try:
+                with open('/proc/{0}/stat'.format(pid), 'r') as fd:
+                    stat = fd.read()
+            except EnvironmentError:
+                # process ended while we were scanning `/proc`
+                continue
+            # the command name (2nd field) is enclosed in parentheses
+            # and may contain spaces, so split after the last `)`;
+            # see proc(5) for the meaning of the remaining fields
+            fields = stat[stat.rindex(')') + 1:].split()
+            state, ppid, starttime = fields[0], fields[1], int(fields[19])
+            elapsed = max(0.0, uptime - starttime / ticks)
+            table[pid] = _ProcessInfo(
+                ppid, state, Duration(elapsed, unit=Duration.s))
+        return table
+
 
 class _MacOSXMachine(_Machine):
     """MacOSX-specific shell tools."""
@@ -376,6 +543,142 @@ class _MacOSXMachine(_Machine):
     def _list_pids_and_ppids_command(self):
         return 'ps -o pid=,ppid='
 
+    def _process_table_command(self):
+        # MacOSX' `ps` has no `etimes` format specifier
+        return 'ps -A -o pid=,ppid=,state=,etime='
+
+
+# Python code run by the wrapper script of local tasks in place of GNU
+# `time`: it runs the command given on its command line and writes
+# the command's own exit status and resource usage to the file named
+# by its first argument, in the same format `ShellcmdLrms.TIMEFMT`
+# makes GNU `time` use.  It must run with any Python version that
+# GC3Pie supports, and import nothing but builtin modules.
+_LOCAL_TIME_CMD = '''
+import os, sys, time
+start = time.time()
+pid = os.fork()
+if pid == 0:
+    try:
+        os.execvp(sys.argv[2], sys.argv[2:])
+    finally:
+        os._exit(127)
+while True:
+    try:
+        status, rusage = os.wait4(pid, 0)[1:]
+        break
+    except OSError as err:
+        if err.errno != 4:
+            raise
+wall = time.time() - start
+if os.WIFSIGNALED(status):
+    signum = os.WTERMSIG(status)
+    lines = ['Command terminated by signal %d' % signum]
+    exitcode = 0
+    rc = 128 + signum
+else:
+    lines = []
+    exitcode = rc = os.WEXITSTATUS(status)
+maxrss = rusage.ru_maxrss
+if sys.platform == 'darwin':
+    maxrss //= 1024
+lines += [
+    'WallTime=%.3fs' % wall,
+    'KernelTime=%.3fs' % rusage.ru_stime,
+    'UserTime=%.3fs' % rusage.ru_utime,
+    'MaxResidentMemory=%dkB' % maxrss,
+    'MajorPageFaults=%d' % rusage.ru_majflt,
+    'MinorPageFaults=%d' % rusage.ru_minflt,
+    'Swaps=%d' % rusage.ru_nswap,
+    'ForcedSwitches=%d' % rusage.ru_nivcsw,
+    'WaitSwitches=%d' % rusage.ru_nvcsw,
+    'Inputs=%d' % rusage.ru_inblock,
+    'Outputs=%d' % rusage.ru_oublock,
+    'SocketReceived=%d' % rusage.ru_msgrcv,
+    'SocketSent=%d' % rusage.ru_msgsnd,
+    'Signals=%d' % rusage.ru_nsignals,
+    'ReturnCode=%d' % exitcode,
+]
+with open(sys.argv[1], 'w') as out:
+    out.write(chr(10).join(lines) + chr(10))
+sys.exit(rc)
+'''
+
+
+class _LocalChild(object):
+    """
+    Wait for a wrapper process spawned by `ShellcmdLrms` on the local host.
+
+    A daemon thread blocks in `os.wait4` until the process ends, so
+    that it is reaped at once (instead of lingering as a zombie until
+    the next poll) and its end is noticed immediately.  The exit
+    status and resource usage of the wrapper (which include the
+    data staging steps) are only used if the wrapper did not record
+    those of the task's command.
+
+    If `on_exit` is given, it is called (from the waiting thread) with
+    the process' PID as a string, right after the process has been
+    reaped.
+    """
+
+    def __init__(self, proc, on_exit=None):
+        self.proc = proc
+        self.on_exit = on_exit
+        self.started = time.time()
+        self.ended = None
+        self.status = None
+        self.rusage = None
+        self.done = threading.Event()
+        thread = threading.Thread(
+            target=self._wait, name=('shellcmd child {0}'.format(proc.pid)))
+        thread.daemon = True
+        thread.start()
+
+    def _wait(self):
+        while True:
+            try:
+                _, self.status, self.rusage = os.wait4(self.proc.pid, 0)
+                break
+            except OSError as err:
+                if err.errno == errno.EINTR:
+                    continue
+                log.debug("Cannot wait for process %s: %s",
+                          self.proc.pid, err)
+                break
+        self.ended = time.time()
+        if self.status is not None:
+            # keep `subprocess` from trying to reap the process again
+            self.proc.returncode = self.status
+        self.done.set()
+        if self.on_exit is not None:
+            # pylint: disable=broad-except
+            try:
+                self.on_exit(str(self.proc.pid))
+            except Exception as err:
+                log.debug("Error notifying end of process %s: %s",
+                          self.proc.pid, err)
+
+    def outcome(self):
+        """
+        Return pair *(termstatus, acctinfo)* for the ended process.
+
+        The first item is a return code suitable for setting
+        `Run.returncode`, the second one a `Struct`:class: of resource
+        usage data; both are ``None`` if the process could not be
+        waited for.
+        """
+        if self.status is None:
+            return None, None
+        if os.WIFSIGNALED(self.status):
+            termstatus = (os.WTERMSIG(self.status), -1)
+        else:
+            termstatus = Run.shellexit_to_returncode(
+                os.WEXITSTATUS(self.status))
+        acctinfo = _parse_rusage(self.rusage)
+        acctinfo['duration'] = Duration(
+            self.ended - self.started, unit=Duration.s)
+        return termstatus, acctinfo
+
 
 ## the main LRMS class
 #
@@ -399,6 +702,11 @@ class ShellcmdLrms(LRMS):
       extended features of GNU ``time``, so the shell-builtins or the
       BSD ``time`` will not work.
 
+      GNU ``time`` is not used when `transport` is ``'local'``: tasks
+      are then spawned as child processes of GC3Pie, and their
+      resource usage is collected with `os.wait4` by a short Python
+      script run with the same interpreter as GC3Pie.
+
     :param str spooldir:
       Path to a filesystem location where to create
       temporary working directories for processes executed through
@@ -454,6 +762,23 @@ class ShellcmdLrms(LRMS):
       sequentially transferring chunks of this size.
       see `SshTransport.get`:meth: for more information.
       Only used if `transport` is ``'ssh'``.
+
+    :param int ssh_max_connections:
+    :param int ssh_max_channels_per_connection:
+    :param int ssh_keepalive:
+    :param int ssh_idle_timeout:
+      Size and behavior of the pool of SSH connections used to run
+      commands on the remote host; see `SshTransport`:class: for
+      details.  Only used if `transport` is ``'ssh'``.
+
+    :param gc3libs.quantity.Memory input_cache_quota:
+      If set, keep a cache of input files of at most this total size
+      on the resource, so that files shared by many tasks are only
+      transferred once; see `gc3libs.backends.inputcache.InputCache`:class:.
+
+    :param str input_cache_dir:
+      Path to the input cache directory; by default, a subdirectory
+      ``input_cache`` of `spooldir`.
     """
 
     TIMEFMT = '\n'.join([
@@ -562,6 +887,30 @@ class ShellcmdLrms(LRMS):
     Name of the data uploader/downloader script (within `PRIVATE_DIR`).
     """
 
+    JOB_LEDGER = 'jobs.ledger'
+    """
+    Name of the file (within the resource directory) where jobs
+    started on the resource are recorded.
+
+    Each line records one event: ``+PID CORES MEMORY EXECDIR`` when a
+    job is started (``MEMORY`` is in bytes, or ``-`` if not
+    specified), ``*PID`` when it terminates, and ``-PID`` when it is
+    no longer needed.  Lines are only ever appended, while holding a
+    lock, so that GC3Pie processes sharing the resource see each
+    other's jobs; the whole ledger is read in one transfer.
+    """
+
+    JOB_DONE_LOG = 'jobs.done'
+    """
+    Name of the file (within the resource directory) where wrapper
+    scripts started through a remote transport append their PID when
+    they end.
+
+    The file is followed over the transport, so that the end of a job
+    is noticed without waiting for the next poll; it is emptied
+    whenever the job ledger is compacted.
+    """
+
     RESOURCE_DIR = '$HOME/.gc3/shellcmd.d'
     """
     Path to the directory where bookkeeping files are stored.
@@ -590,6 +939,12 @@ class ShellcmdLrms(LRMS):
                  ssh_timeout=None,
                  large_file_threshold=None,
                  large_file_chunk_size=None,
+                 ssh_max_connections=None,
+                 ssh_max_channels_per_connection=None,
+                 ssh_keepalive=None,
+                 ssh_idle_timeout=None,
+                 input_cache_quota=None,
+                 input_cache_dir=None,
                  **extra_args):
 
         # init base class
@@ -622,11 +977,24 @@ class ShellcmdLrms(LRMS):
                 timeout=(ssh_timeout or auth.timeout),
                 large_file_threshold=large_file_threshold,
                 large_file_chunk_size=large_file_chunk_size,
+                max_connections=ssh_max_connections,
+                max_channels_per_connection=ssh_max_channels_per_connection,
+                keepalive=ssh_keepalive,
+                idle_timeout=ssh_idle_timeout,
             )
             self.frontend = frontend
         else:
             raise AssertionError("Unknown transport '{0}'" .format(transport))
 
+        if input_cache_quota:
+            self._input_cache = gc3libs.backends.inputcache.InputCache(
+                self.transport,
+                (input_cache_dir
+                 or posixpath.join(self.spooldir, 'input_cache')),
+                input_cache_quota)
+        else:
+            self._input_cache = None
+
         # Init bookkeeping
         self.updated = False  # data may not reflect actual state
         self.free_slots = self.max_cores
@@ -636,6 +1004,10 @@ class ShellcmdLrms(LRMS):
         self.total_memory = max_memory_per_core
         self.available_memory = self.total_memory
         self._job_infos = {}
+        # wrapper processes spawned directly by this backend, by PID
+        self._children = {}
+        # reader of the `JOB_DONE_LOG`, see `_follow_job_done_log`
+        self._job_done_follower = None
 
         # Some init parameters can only be discovered / checked when a
         # connection to the target resource is up.  We want to delay
@@ -858,56 +1230,125 @@ class ShellcmdLrms(LRMS):
 
     def _get_persisted_job_info(self):
         """
-        Get information on total resources from the files stored in
-        `self.resource_dir`. It then returns a dictionary {PID: {key:
-        values}} with informations for each job which is associated to
-        a running process.
+        Get information on total resources from the job ledger stored
+        in `self.resource_dir`. It then returns a dictionary {PID: {key:
+        values}} with informations for each job recorded there.
         """
         self.transport.connect()
-        job_infos = {}
-        pidfiles = self.transport.listdir(self.resource_dir)
-        if pidfiles:
-            log.debug("Checking status of the following PIDs: %s",
-                      ", ".join(pidfiles))
-            for pid in pidfiles:
-                job = self._read_job_info_file(pid)
-                if job:
-                    job_infos[str(pid)] = job
-                else:
-                    # Process not found, ignore it
-                    continue
+        path = posixpath.join(self.resource_dir, self.JOB_LEDGER)
+        if not self.transport.exists(path):
+            return self._import_job_info_files()
+        log.debug("Reading job ledger `%s` ...", path)
+        with self.transport.open(path, 'rb') as fp:
+            text = to_str(fp.read(), 'filesystem')
+        job_infos, size = _parse_job_ledger(text)
+        if size > max(gc3libs.defaults.SHELLCMD_LEDGER_MIN_SIZE,
+                      2 * len(job_infos)):
+            self._compact_job_ledger()
         return job_infos
 
-    def _read_job_info_file(self, pid):
+    def _import_job_info_files(self):
         """
-        Get resource information on job with pid `pid`, if it
-        exists. Returns None if it does not exist.
+        Move job information from per-PID files into the job ledger.
+
+        Older versions of `ShellcmdLrms` stored information about each
+        job into a separate file named after the job's PID.  Return
+        a dictionary {PID: {key: values}} with the imported data.
         """
-        self.transport.connect()
-        log.debug("Reading job info file for pid %r", pid)
-        jobinfo = None
-        path = posixpath.join(self.resource_dir, str(pid))
-        with self.transport.open(path, 'rb') as fp:
+        job_infos = {}
+        for pid in self.transport.listdir(self.resource_dir):
+            if not pid.isdigit():
+                continue
+            path = posixpath.join(self.resource_dir, pid)
             try:
-                jobinfo = pickle.load(fp)
-            except Exception as ex:
-                log.error("Unable to read remote job info file %s: %s",
-                          path, ex)
-                raise
-        return jobinfo
+                with self.transport.open(path, 'rb') as fp:
+                    job_infos[pid] = pickle.load(fp)
+            except Exception as err:
+                log.warning("Ignoring unreadable job info file `%s`: %s: %s",
+                            path, err.__class__.__name__, err)
+        records = []
+        for pid, info in job_infos.items():
+            records.append(_format_job_ledger_record(pid, info))
+            if info['terminated']:
+                records.append('*' + pid)
+        # the ledger is created even if there are no records, so
+        # that importing is only ever done once
+        self._append_to_job_ledger(*records)
+        for pid in job_infos:
+            self._delete_legacy_job_info_file(pid)
+        return job_infos
 
-    def _write_job_info_file(self, pid, resources):
+    def _append_to_job_ledger(self, *records):
         """
-        Update file in `self.resource_dir/PID` with `resources`.
+        Append `records` to the job ledger, while holding its lock.
         """
-        self.transport.connect()
-        # XXX: We should check for exceptions!
-        log.debug("Updating job info file for pid %s", pid)
-        with self.transport.open(
-                posixpath.join(self.resource_dir, str(pid)), 'wb') as fp:
-            pickle.dump(resources, fp, -1)
+        ledger = posixpath.join(self.resource_dir, self.JOB_LEDGER)
+        if records:
+            script = ("printf '%s\\n' {records} >> {ledger}"
+                      .format(records=' '.join(sh_quote_safe(record)
+                                               for record in records),
+                              ledger=sh_quote_safe(ledger)))
+        else:
+            script = ': >> {ledger}'.format(ledger=sh_quote_safe(ledger))
+        self._run_with_job_ledger_lock(script)
+
+    def _compact_job_ledger(self):
+        """
+        Rewrite the job ledger keeping only records of known jobs.
 
-    def _delete_job_info_file(self, pid):
+        The ledger is replayed on the target host (while holding its
+        lock) since other processes may have appended to it after it
+        was last read.
+        """
+        ledger = sh_quote_safe(
+            posixpath.join(self.resource_dir, self.JOB_LEDGER))
+        done_log = sh_quote_safe(
+            posixpath.join(self.resource_dir, self.JOB_DONE_LOG))
+        log.debug("Compacting job ledger of resource %s ...", self.name)
+        self._run_with_job_ledger_lock(
+            "awk '"
+            ' /^[+]/ { pid = substr($1, 2); rec[pid] = $0; delete done[pid];'
+            '          order[++n] = pid; next }'
+            ' /^[*]/ { pid = substr($1, 2); if (pid in rec) done[pid] = 1; next }'
+            ' /^-/   { pid = substr($1, 2); delete rec[pid]; delete done[pid] }'
+            ' END { for (i = 1; i <= n; i++) { pid = order[i];'
+            '         if ((pid in rec) && !(pid in seen)) { seen[pid] = 1;'
+            '           print rec[pid]; if (pid in done) print "*" pid } } }'
+            "' " + ("{ledger} > {ledger}.tmp && mv -f {ledger}.tmp {ledger}"
+                    " && if [ -s {done_log} ]; then : > {done_log}; fi"
+                    .format(ledger=ledger, done_log=done_log)))
+
+    def _run_with_job_ledger_lock(self, script):
+        """
+        Run shell `script` on the target while holding the job ledger lock.
+
+        The lock is a directory, since `mkdir` is atomic also on
+        network filesystems; a lock older than one minute is assumed
+        to have been left over by a process that died holding it.
+        """
+        lock = posixpath.join(self.resource_dir, self.JOB_LEDGER + '.lock')
+        cmd = '/bin/sh -c ' + sh_quote_safe(
+            'lock={lock}; n=0;'
+            ' if ! [ -d "${{lock%/*}}" ]; then'
+            '   echo "No such directory: ${{lock%/*}}" 1>&2; exit 1;'
+            ' fi;'
+            ' until mkdir "$lock" 2>/dev/null; do'
+            '   find "$lock" -maxdepth 0 -mmin +1 -exec rmdir {{}} \\; 2>/dev/null;'
+            '   n=$((n+1)); if [ $n -gt 300 ]; then exit 75; fi;'
+            '   sleep 0.1;'
+            ' done;'
+            ' ({script}); rc=$?; rmdir "$lock"; exit $rc'
+            .format(lock=sh_quote_safe(lock), script=script))
+        exit_code, stdout, stderr = self.transport.execute_command(cmd)
+        if exit_code != 0:
+            raise gc3libs.exceptions.LRMSError(
+                "Could not update job ledger in `{0}` on resource {1}"
+                " (exit code {2}): {3}"
+                .format(self.resource_dir, self.name, exit_code,
+                        (stderr.strip() if exit_code != 75
+                         else "timed out waiting for lock")))
+
+    def _delete_legacy_job_info_file(self, pid):
         """
         Delete `self.resource_dir/PID` file
         """
@@ -1021,8 +1462,9 @@ class ShellcmdLrms(LRMS):
                         log.warning(
                             "Process %s on resource %s is already dead"
                             " but process entry has not been cleared."
-                            " This might be a bug in GC3Pie or in `%s`.",
-                                 target, self.name, self.time_cmd)
+                            " This might be a bug in GC3Pie or in"
+                            " its wrapper script.",
+                            target, self.name)
                         pids_to_kill.remove(target)
                 if not pids_to_kill:
                     break
@@ -1058,8 +1500,10 @@ class ShellcmdLrms(LRMS):
 
     @same_docstring_as(LRMS.close)
     def close(self):
-        # XXX: free any resources in use?
-        pass
+        # XXX: free any other resources in use?
+        if self._job_done_follower is not None:
+            self._job_done_follower.stop()
+            self._job_done_follower = None
 
 
     def free(self, app):
@@ -1085,11 +1529,17 @@ class ShellcmdLrms(LRMS):
 
         try:
             pid = app.execution.lrms_jobid
-            self._delete_job_info_file(pid)
+            self._append_to_job_ledger('-' + str(pid))
         except AttributeError:
             # lrms_jobid not yet assigned; probably submit
             # failed -- ignore and continue
             pass
+        except Exception as err:
+            log.debug("Ignored error removing task `%s` from job ledger: %s: %s",
+                      app, err.__class__.__name__, err)
+
+        if self._input_cache:
+            self._input_cache.release(app)
 
 
     @same_docstring_as(LRMS.get_resource_status)
@@ -1098,6 +1548,7 @@ class ShellcmdLrms(LRMS):
         self._connect()
         self._update_resource_usage_info()
         self.updated = True
+        self.status_timestamp = time.time()
         return self
 
     def _update_resource_usage_info(self):
@@ -1127,10 +1578,9 @@ class ShellcmdLrms(LRMS):
                 " is not supported in the ShellCmd backend.")
 
         self._connect()
-        # Make list of files to copy, in the form of (remote_path,
-        # local_path) pairs.  This entails walking the
-        # `Application.outputs` list to expand wildcards and
-        # directory references.
+        # Make list of files and directories to copy, in the form of
+        # (remote_path, local_path) pairs; directories are expanded
+        # by `Transport.get_many`.
         stageout = list()
         for remote_relpath, local_url in app.outputs.items():
             if local_url.scheme in ['swift', 'swt', 'swifts', 'swts']:
@@ -1139,44 +1589,39 @@ class ShellcmdLrms(LRMS):
             if remote_relpath == gc3libs.ANY_OUTPUT:
                 remote_relpath = ''
                 local_relpath = ''
-            stageout += self._get_remote_and_local_path_pair(
-                app, remote_relpath, download_dir, local_relpath)
+            stageout.append(self._get_remote_and_local_path_pair(
+                app, remote_relpath, download_dir, local_relpath))
 
         # copy back all files, renaming them to adhere to the
         # ArcLRMS convention
         log.debug("Downloading job output into '%s' ...", download_dir)
-        for remote_path, local_path in stageout:
-            # ignore missing files (this is what ARC does too)
-            self.transport.get(remote_path, local_path,
-                               ignore_nonexisting=True,
-                               overwrite=overwrite,
-                               changed_only=changed_only)
+        start = time.time()
+        # ignore missing files (this is what ARC does too)
+        files, size = self.transport.get_many(
+            stageout, ignore_nonexisting=True,
+            overwrite=overwrite, changed_only=changed_only)
+        # record retrieval statistics
+        app.execution.download_files = files
+        app.execution.download_bytes = size * B
+        app.execution.download_duration = (time.time() - start) * seconds
         return
 
     def _get_remote_and_local_path_pair(self, app, remote_relpath,
                                          local_root_dir, local_relpath):
         """
-        Scan remote directory and return list of corresponding remote and local paths.
+        Return remote and local path corresponding to an output file.
 
-        The return value is a list of *(remote_path, local_path)* pairs: each
-        `remote_path` is an existing file on the remote end of the transport,
-        and *local_path* is the corresponding local path, constructed by
-        prepending `local_root_dir` to the relative remote path.
+        The return value is a *(remote_path, local_path)* pair: the
+        `remote_path` is constructed by prepending the task execution
+        directory to `remote_relpath`, and *local_path* by prepending
+        `local_root_dir` to `local_relpath`.
         """
         # see https://github.com/fabric/fabric/issues/306 about why it is
         # correct to use `posixpath.join` for remote paths (instead of
         # `os.path.join`)
         remote_path = posixpath.join(app.execution.lrms_execdir, remote_relpath)
         local_path = os.path.join(local_root_dir, local_relpath)
-        if self.transport.isdir(remote_path):
-            # recurse, accumulating results
-            result = list()
-            for entry in self.transport.listdir(remote_path):
-                result += self._get_remote_and_local_path_pair(
-                    app, posixpath.join(remote_relpath, entry), local_path, entry)
-            return result
-        else:
-            return [(remote_path, local_path)]
+        return (remote_path, local_path)
 
 
     def has_running_tasks(self):
@@ -1268,6 +1713,32 @@ class ShellcmdLrms(LRMS):
             wrapper_output_path = posixpath.join(wrapper_dir, self.WRAPPER_OUTPUT_FILENAME)
             wrapper_script_path = posixpath.join(wrapper_dir, self.WRAPPER_SCRIPT)
 
+            command = ' '.join(sh_quote_unsafe(arg) for arg in app.arguments)
+            spawn_locally = isinstance(
+                self.transport, gc3libs.backends.transport.LocalTransport)
+            if spawn_locally:
+                # the end of the wrapper is noticed by `_LocalChild`
+                done_command = ''
+                # no need for GNU time: the current Python interpreter
+                # can collect the same data with `os.wait4()`
+                run_command = (
+                    "'{python}' -S -c {time_cmd} '{wrapper_out}' {command}\nrc=$?"
+                    .format(python=sys.executable,
+                            time_cmd=sh_quote_safe(_LOCAL_TIME_CMD),
+                            wrapper_out=wrapper_output_path,
+                            command=command))
+            else:
+                done_command = (
+                    "echo $$ >>'{0}'"
+                    .format(posixpath.join(self.resource_dir,
+                                           self.JOB_DONE_LOG)))
+                run_command = (
+                    "'{time_cmd}' -o '{wrapper_out}' -f '{fmt}' {command}\nrc=$?"
+                    .format(time_cmd=self.time_cmd,
+                            wrapper_out=wrapper_output_path,
+                            fmt=ShellcmdLrms.TIMEFMT,
+                            command=command))
+
             # create the wrapper script
             with self.transport.open(wrapper_script_path, 'wt') as wrapper:
                 wrapper.write(
@@ -1277,28 +1748,30 @@ class ShellcmdLrms(LRMS):
                     {redirections}
                     {environment}
                     {download_cmds}
-                    '{time_cmd}' -o '{wrapper_out}' -f '{fmt}' {command}
-                    rc=$?
+                    {run_command}
                     {upload_cmds}
                     rc2=$?
+                    {done_command}
                     if [ $rc -ne 0 ]; then exit $rc; else exit $rc2; fi
                     """.format(
                         pidfilename=pidfilename,
                         execdir=app.execution.lrms_execdir,
-                        time_cmd=self.time_cmd,
-                        wrapper_out=wrapper_output_path,
-                        fmt=ShellcmdLrms.TIMEFMT,
                         redirections=redirection_command,
                         environment=('\n'.join(env_commands)),
                         download_cmds=('\n'.join(download_cmds)),
+                        run_command=run_command,
                         upload_cmds=('\n'.join(upload_cmds)),
-                       command=(' '.join(sh_quote_unsafe(arg) for arg in app.arguments)),
+                        done_command=done_command,
                 ))
             self.transport.chmod(wrapper_script_path, 0o755)
 
             # execute the script in background
-            self.transport.execute_command(wrapper_script_path, detach=True)
-            pid = self._read_app_process_id(pidfilename)
+            if spawn_locally:
+                pid = self._spawn_locally(wrapper_script_path)
+            else:
+                self._follow_job_done_log()
+                self.transport.execute_command(wrapper_script_path, detach=True)
+                pid = self._read_app_process_id(pidfilename)
             app.execution.lrms_jobid = pid
 
         except gc3libs.exceptions.LRMSSubmitError:
@@ -1323,7 +1796,8 @@ class ShellcmdLrms(LRMS):
             'execution_dir': app.execution.lrms_execdir,
             'terminated': False,
         }
-        self._write_job_info_file(pid, self._job_infos[pid])
+        self._append_to_job_ledger(
+            _format_job_ledger_record(pid, self._job_infos[pid]))
 
         return app
 
@@ -1331,8 +1805,13 @@ class ShellcmdLrms(LRMS):
 
     def _check_app_requirements(self, app, update=True):
         """Raise exception if application requirements cannot be satisfied."""
-        # update resource status to get latest data on free cores, memory, etc
-        if update:
+        # update resource status to get latest data on free cores,
+        # memory, etc. -- unless it was read less than `status_ttl`
+        # seconds ago: submissions made since then through this
+        # backend are already accounted for in memory
+        if update and not (
+                self.updated
+                and time.time() - self.status_timestamp < self.status_ttl):
             self.get_resource_status()
 
         if self.free_slots == 0:  # or free_slots == 0:
@@ -1383,7 +1862,11 @@ class ShellcmdLrms(LRMS):
 
     def _stage_app_input_files(self, app):
         destdir = app.execution.lrms_execdir
-        for local_path, remote_path in list(app.inputs.items()):
+        if self._input_cache:
+            inputs = self._input_cache.stage_into(app, destdir)
+        else:
+            inputs = list(app.inputs.items())
+        for local_path, remote_path in inputs:
             if local_path.scheme != 'file':
                 log.debug(
                     "Ignoring input URL `%s` for task %s:"
@@ -1504,6 +1987,61 @@ class ShellcmdLrms(LRMS):
                     dst.write(src.read())
         return download_cmds, upload_cmds
 
+    def _spawn_locally(self, wrapper_script_path):
+        """
+        Start the wrapper script as a child process and return its PID.
+
+        Used instead of running the script in background through the
+        transport when the resource is the local host: no intermediate
+        shell is spawned, and the PID is known without waiting for the
+        PID file to be written.  The child is placed in a new session
+        so that, like a background job of the shell, it does not get
+        signals sent to GC3Pie from the terminal.
+
+        As soon as the child ends, a `gc3libs.events.JobDone` event is
+        sent, so that an `Engine` can update the task's state without
+        waiting for the next poll.
+        """
+        if sys.version_info[0] >= 3:
+            detach = {'start_new_session': True}
+        else:
+            detach = {'preexec_fn': os.setsid}
+        with open(os.devnull, 'rb') as devnull:
+            proc = subprocess.Popen(
+                [wrapper_script_path], stdin=devnull, close_fds=True,
+                **detach)
+        pid = str(proc.pid)
+        self._children[pid] = _LocalChild(proc, self._notify_job_done)
+        return pid
+
+    def _notify_job_done(self, pid):
+        gc3libs.events.send(gc3libs.events.JobDone, self, jobid=pid)
+
+    def _follow_job_done_log(self):
+        """
+        Start reading `JOB_DONE_LOG`, unless already doing so.
+
+        Each PID appended to the log is reported with a
+        `gc3libs.events.JobDone` event.  Not needed when tasks are
+        spawned locally, as `_LocalChild` notices their end; if the
+        log cannot be followed, tasks are just polled as usual.
+        """
+        if isinstance(self.transport,
+                      gc3libs.backends.transport.LocalTransport):
+            return
+        if (self._job_done_follower is not None
+                and self._job_done_follower.is_alive()):
+            return
+        # pylint: disable=broad-except
+        try:
+            self._job_done_follower = self.transport.follow(
+                posixpath.join(self.resource_dir, self.JOB_DONE_LOG),
+                self._notify_job_done)
+        except Exception as err:
+            log.debug("Cannot follow completion log of resource %s: %s: %s",
+                      self.name, err.__class__.__name__, err)
+            self._job_done_follower = None
+
     def _read_app_process_id(self, pidfile_path):
         """
         Read and return the PID stored in `pidfile_path`.
@@ -1542,25 +2080,71 @@ class ShellcmdLrms(LRMS):
         process status to GC3Libs `Run.State`.
         """
         self._connect()
+        return self._update_job_state_from(
+            app, self._machine.get_process_table())
+
+    @same_docstring_as(LRMS.update_job_states)
+    def update_job_states(self, apps):
+        self._connect()
+        # (re)start following the completion log, e.g., after the
+        # connection was lost or when resuming a session
+        self._follow_job_done_log()
+        # one snapshot of the process table answers all queries
+        try:
+            processes = self._machine.get_process_table()
+        # pylint: disable=broad-except
+        except Exception as err:
+            log.debug("Could not list processes on resource %s: %s: %s",
+                      self.name, err.__class__.__name__, err)
+            return [err] * len(apps)
+        results = []
+        for app in apps:
+            try:
+                results.append(self._update_job_state_from(app, processes))
+            # pylint: disable=broad-except
+            except Exception as err:
+                log.debug(
+                    "Error updating state of task %s: %s: %s",
+                    app, err.__class__.__name__, err, exc_info=True)
+                results.append(err)
+        return results
+
+    def _update_job_state_from(self, app, processes):
+        """
+        Update state of `app` using the `processes` table.
+
+        Argument `processes` is a snapshot of the process table, as
+        returned by `_Machine.get_process_table`:meth:.
+        """
         pid = app.execution.lrms_jobid
+        child = self._children.get(str(pid))
+        # a child that is no longer listed has already been reaped,
+        # and its `_LocalChild` will be marked done in a moment
+        if (child is not None
+                and (child.done.is_set() or str(pid) not in processes)
+                and child.done.wait(1)):
+            waited = child.outcome()
+            if waited[0] is not None:
+                self._cleanup_terminating_task(app, pid, waited=waited)
+                return app.execution.state
         try:
-            pstat = self._machine.get_process_state(pid)
-            app.execution.state = _parse_process_status(pstat)
-            if app.execution.state == Run.State.TERMINATING:
-                self._cleanup_terminating_task(app, pid)
-            else:
-                self._kill_if_over_time_limits(app)
-        except LookupError:
+            proc = processes[str(pid)]
+        except KeyError:
             log.debug(
                 "Process with PID %s not found,"
                 " assuming task %s has finished running.",
                 pid, app)
             self._cleanup_terminating_task(app, pid)
+            return app.execution.state
+        app.execution.state = _parse_process_status(proc.state)
+        if app.execution.state == Run.State.TERMINATING:
+            self._cleanup_terminating_task(app, pid)
+        else:
+            self._kill_if_over_time_limits(app, proc.elapsed)
         return app.execution.state
 
-    def _kill_if_over_time_limits(self, app):
+    def _kill_if_over_time_limits(self, app, elapsed):
         pid = app.execution.lrms_jobid
-        elapsed = self._machine.get_process_running_time(pid)
         # determine whether to kill, depending on wall-clock time
         cancel = False
         if elapsed > self.max_walltime:
@@ -1577,14 +2161,24 @@ class ShellcmdLrms(LRMS):
             self._cleanup_terminating_task(app, pid, termstatus=(15, -1))
             return
 
-    def _cleanup_terminating_task(self, app, pid, termstatus=None):
+    def _cleanup_terminating_task(self, app, pid, termstatus=None,
+                                  waited=None):
+        """
+        Record that `app` has ended, and set its return code and resource usage.
+
+        These are read from the file written by the wrapper script;
+        if that does not exist, the pair *(termstatus, acctinfo)*
+        given as `waited` (as returned by `_LocalChild.outcome`:meth:)
+        is used instead, if any.
+        """
         app.execution.state = Run.State.TERMINATING
+        self._children.pop(str(pid), None)
         # if `self._job_infos` records this task as terminated, then
         # updates to resource utilization records has already been
         # done by `get_resource_status()`
         if (pid in self._job_infos and not self._job_infos[pid]['terminated']):
             self._job_infos[pid]['terminated'] = True
-            self._write_job_info_file(pid, self._job_infos[pid])
+            self._append_to_job_ledger('*' + str(pid))
             # do in-memory bookkeeping
             assert (self._job_infos[pid]['requested_memory'] == app.requested_memory)
             assert (self._job_infos[pid]['requested_cores'] == app.requested_cores)
@@ -1603,17 +2197,25 @@ class ShellcmdLrms(LRMS):
             with self.transport.open(wrapper_filename, 'r') as wrapper_file:
                 termstatus, outcome, valid = \
                     self._parse_wrapper_output(wrapper_file, termstatus)
-                if valid:
-                    app.execution.update(outcome)
-                if termstatus is not None:
-                    app.execution.returncode = termstatus
-                else:
-                    app.execution.returncode = (Run.Signals.RemoteError, -1)
         except EnvironmentError as err:
-            msg = ("Could not read wrapper file `{0}` for task `{1}`: {2}"
-                   .format(wrapper_filename, app, err))
-            log.warning("%s -- Termination status and resource utilization fields will not be set.", msg)
-            raise gc3libs.exceptions.InvalidValue(msg)
+            if waited is None:
+                msg = ("Could not read wrapper file `{0}` for task `{1}`: {2}"
+                       .format(wrapper_filename, app, err))
+                log.warning("%s -- Termination status and resource utilization fields will not be set.", msg)
+                raise gc3libs.exceptions.InvalidValue(msg)
+            # the wrapper ended without running the command (e.g., a
+            # download failed), so its own exit status is the task's
+            log.debug("Could not read wrapper file `%s` for task %s: %s;"
+                      " using exit status of the wrapper script instead.",
+                      wrapper_filename, app, err)
+            termstatus, outcome = waited
+            valid = True
+        if valid:
+            app.execution.update(outcome)
+        if termstatus is not None:
+            app.execution.returncode = termstatus
+        else:
+            app.execution.returncode = (Run.Signals.RemoteError, -1)
 
     def _parse_wrapper_output(self, wrapper_file, termstatus=None):
         """
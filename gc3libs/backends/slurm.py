@@ -23,6 +23,7 @@ from builtins import str
 __docformat__ = 'reStructuredText'
 
 
+from collections import defaultdict
 import datetime
 import os
 import re
@@ -95,6 +96,42 @@ def count_jobs(squeue_output, whoami):
     return (total_running, total_queued, own_running, own_queued)
 
 
+_RUNNING_STATES = ('RUNNING', 'COMPLETING')
+# XXX: State CONFIGURING is described in the squeue(1) man page as
+# "Job has been allocated resources, but are waiting for them to
+# become ready for use (e.g. booting).".  Should it be classified as
+# "running" instead?
+_QUEUED_STATES = ('PENDING', 'CONFIGURING')
+
+
+def count_jobs_by_state(lines):
+    """
+    Return a quadruple `(R, Q, r, q)`, like `count_jobs`:func:, from
+    per-state job counts.
+
+    Each item in `lines` must be a string ``STATE TOTAL OWN``, where
+    ``TOTAL`` is the number of jobs in state ``STATE`` (from any user)
+    and ``OWN`` the number of those belonging to the current user::
+
+      >>> count_jobs_by_state(['RUNNING 10 2', 'PENDING 5 1',
+      ...                      'COMPLETING 1 0', 'CONFIGURING 2 2'])
+      (11, 7, 2, 3)
+    """
+    total_running = 0
+    total_queued = 0
+    own_running = 0
+    own_queued = 0
+    for line in lines:
+        state, total, own = line.split()
+        if state in _RUNNING_STATES:
+            total_running += int(total)
+            own_running += int(own)
+        elif state in _QUEUED_STATES:
+            total_queued += int(total)
+            own_queued += int(own)
+    return (total_running, total_queued, own_running, own_queued)
+
+
 class SlurmLrms(batch.BatchSystem):
 
     """
@@ -185,6 +222,21 @@ class SlurmLrms(batch.BatchSystem):
         return ("{squeue} --noheader -o GC3Pie^%%i^%%T^%%r -j {jobid}"
                 .format(squeue=self._squeue, jobid=job.lrms_jobid))
 
+    def _stat_command_many(self, jobids):
+        return ("{squeue} --noheader -o GC3Pie^%%i^%%T^%%r -j {jobids}"
+                .format(squeue=self._squeue, jobids=','.join(jobids)))
+
+    def _split_stat_output(self, stdout):
+        # only consider the `GC3Pie^`-tagged lines, see
+        # `_parse_stat_output` below for why
+        chunks = {}
+        for line in stdout.split('\n'):
+            line = line.strip()
+            if line.startswith('GC3Pie^'):
+                jobid = line.split('^')[1]
+                chunks[jobid] = line
+        return chunks
+
     def _parse_stat_output(self, stdout, stderr):
         """
         Parse output of ``squeue --noheader -o %i:%T:%r``.
@@ -298,6 +350,25 @@ class SlurmLrms(batch.BatchSystem):
                 'submit,start,end,maxrss,maxvmsize -j %s' %
                 (self._sacct, job.lrms_jobid))
 
+    def _acct_command_many(self, jobids):
+        return ('env SLURM_TIME_FORMAT=standard %s --noheader --parsable'
+                ' --format jobid,exitcode,state,ncpus,elapsed,totalcpu,'
+                'submit,start,end,maxrss,maxvmsize -j %s' %
+                (self._sacct, ','.join(jobids)))
+
+    def _split_acct_output(self, stdout):
+        # group the master job record with its steps' records: SLURM
+        # job IDs have the form `jobID[.step]`
+        lines = defaultdict(list)
+        for line in stdout.split('\n'):
+            line = line.strip()
+            if line == '':
+                continue
+            jobid = line.split('|', 1)[0].split('.', 1)[0]
+            lines[jobid].append(line)
+        return dict((jobid, '\n'.join(chunk))
+                    for jobid, chunk in lines.items())
+
     def _parse_acct_output(self, stdout, stderr):
         acct = {
             'cores':            0,
@@ -488,20 +559,21 @@ class SlurmLrms(batch.BatchSystem):
         try:
             self.transport.connect()
 
-            _command = ("%s --noheader -o '%%i^%%T^%%u^%%U^%%r^%%R'" %
-                        self._squeue)
-            log.debug("Running `%s`...", _command)
-            exitcode, stdout, stderr = self.transport.execute_command(_command)
-            if exitcode != 0:
-                # cannot continue
-                raise gc3libs.exceptions.LRMSError(
-                    "SLURM backend failed executing '%s':"
-                    " exit code: %d; stdout: '%s', stderr: '%s'"
-                    % (_command, exitcode, stdout, stderr))
+            # only list jobs in the states we count, and count them
+            # on the front-end: a few lines are transferred back,
+            # regardless of the number of jobs in the cluster
+            _command = ("%s --noheader --states=%s --format='%%T^%%u'"
+                        % (self._squeue,
+                           ','.join(_RUNNING_STATES + _QUEUED_STATES)))
+            lines = self._run_aggregated(
+                _command,
+                '{ n[$1]++; if ($2 == me) m[$1]++ }'
+                ' END { for (s in n) print s, n[s], m[s] + 0 }',
+                FS='^', me=self._username)
 
             log.debug("Computing updated values for total/available slots ...")
             (total_running, self.queued, self.user_run, self.user_queued) \
-                = count_jobs(stdout, self._username)
+                = count_jobs_by_state(lines)
             self.total_run = total_running
             self.free_slots = -1
             self.used_quota = -1
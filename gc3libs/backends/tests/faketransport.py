@@ -76,7 +76,7 @@ class FakeTransport(LocalTransport):
         " (?P<cmd>[a-z0-9_+-]+)",
         re.VERBOSE | re.IGNORECASE)
 
-    def execute_command(self, cmdline):
+    def execute_command(self, cmdline, detach=False, stdin=None):
         """
         Scan the given command-line and return a predefined result if
         *any* word in command position matches one of the keys in the
@@ -100,7 +100,7 @@ class FakeTransport(LocalTransport):
                 return reply
 
         # if everything else failed, do run the command-line ...
-        return LocalTransport.execute_command(self, cmdline)
+        return LocalTransport.execute_command(self, cmdline, detach, stdin)
 
 
 # main: run tests
@@ -0,0 +1,125 @@
+#! /usr/bin/env python
+#
+"""
+Test the content-addressed input cache.
+"""
+# Copyright (C) 2009-2019  University of Zurich. All rights reserved.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+from __future__ import absolute_import, print_function, unicode_literals
+__docformat__ = 'reStructuredText'
+
+import os
+import shutil
+import tempfile
+
+import pytest
+
+import gc3libs
+from gc3libs.backends.inputcache import InputCache
+from gc3libs.backends.transport import LocalTransport
+
+
+class TestInputCache(object):
+
+    @pytest.fixture(autouse=True)
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.transport = LocalTransport()
+        self.transport.connect()
+        self.cache = InputCache(
+            self.transport, os.path.join(self.tmpdir, 'cache'),
+            quota=100, min_size=10)
+
+        yield
+
+        shutil.rmtree(self.tmpdir)
+
+    def _make_file(self, name, data):
+        path = os.path.join(self.tmpdir, name)
+        with open(path, 'w') as stream:
+            stream.write(data)
+        return path
+
+    def _make_app(self, inputs):
+        return gc3libs.Application(
+            arguments=['/bin/true'],
+            inputs=inputs,
+            outputs=[],
+            output_dir=os.path.join(self.tmpdir, 'output'))
+
+    def _make_sandbox(self, name):
+        path = os.path.join(self.tmpdir, name)
+        os.mkdir(path)
+        return path
+
+    def test_same_contents_stored_once(self):
+        path1 = self._make_file('a.dat', 'x' * 20)
+        path2 = self._make_file('b.dat', 'x' * 20)
+        name1 = self.cache.add(path1)
+        name2 = self.cache.add(path2)
+        assert name1 == name2
+        assert os.listdir(self.cache.root) == [name1]
+
+    def test_stage_into(self):
+        big = self._make_file('big.dat', 'y' * 20)
+        small = self._make_file('small.dat', 'z')
+        app = self._make_app({big: 'data/big.dat', small: 'small.dat'})
+        sandbox = self._make_sandbox('job1')
+        inputs = self.cache.stage_into(app, sandbox)
+        # small files are not cached and must be copied as usual
+        assert [remote for _, remote in inputs] == ['small.dat']
+        with open(os.path.join(sandbox, 'data', 'big.dat')) as stream:
+            assert stream.read() == 'y' * 20
+        assert len(app.execution.cached_inputs) == 1
+
+    def test_staged_inputs_are_private(self):
+        big = self._make_file('big.dat', 'y' * 20)
+        app = self._make_app({big: 'big.dat'})
+        sandbox = self._make_sandbox('job1')
+        self.cache.stage_into(app, sandbox)
+        path = os.path.join(sandbox, 'big.dat')
+        assert not os.path.islink(path)
+        # modifying the staged file must not alter the cache entry
+        with open(path, 'w') as stream:
+            stream.write('w' * 20)
+        entry = os.path.join(self.cache.root, app.execution.cached_inputs[0])
+        with open(entry) as stream:
+            assert stream.read() == 'y' * 20
+
+    def test_evict_unreferenced_entries(self):
+        app1 = self._make_app({self._make_file('1.dat', '1' * 60): '1.dat'})
+        app2 = self._make_app({self._make_file('2.dat', '2' * 60): '2.dat'})
+        self.cache.stage_into(app1, self._make_sandbox('job1'))
+        self.cache.stage_into(app2, self._make_sandbox('job2'))
+        # both entries are referenced, so quota is exceeded
+        assert len(os.listdir(self.cache.root)) == 2
+        self.cache.release(app1)
+        assert os.listdir(self.cache.root) == app2.execution.cached_inputs
+        # job sandbox is unaffected
+        with open(os.path.join(self.tmpdir, 'job1', '1.dat')) as stream:
+            assert stream.read() == '1' * 60
+
+    def test_reload_existing_entries(self):
+        name = self.cache.add(self._make_file('a.dat', 'a' * 30))
+        cache = InputCache(
+            self.transport, os.path.join(self.tmpdir, 'cache'), quota=100)
+        assert cache.root == self.cache.root
+        assert cache._entries[name] == [30, 0]
+        assert cache._size == 30
+
+
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
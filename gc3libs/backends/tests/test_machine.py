@@ -29,6 +29,8 @@ from mock import Mock
 import pytest
 
 from gc3libs.backends.shellcmd import _LinuxMachine
+from gc3libs.backends.transport import LocalTransport
+from gc3libs.quantity import Duration
 
 
 @pytest.fixture(autouse=True)
@@ -99,5 +101,42 @@ def test_list_process_tree_full(transport):
     ]
 
 
+def test_get_process_table(transport):
+    mach = _LinuxMachine(transport)
+
+    transport.execute_command.return_value = (
+        # exit code
+        0,
+        # stdout
+        '''\
+    1     0 S 86400
+ 2361  1466 R    42
+ 2431  2361 Z     0
+        ''',
+        # stderr
+        '',
+    )
+
+    table = mach.get_process_table()
+    assert sorted(table.keys()) == ["1", "2361", "2431"]
+    assert table["2361"].ppid == "1466"
+    assert table["2361"].state == "R"
+    assert table["2361"].elapsed == Duration(42, unit=Duration.s)
+    assert table["1"].elapsed == Duration('1d')
+    # only one command is needed for the whole table
+    assert transport.execute_command.call_count == 1
+
+
+@pytest.mark.skipif(not os.path.isdir('/proc/self'),
+                    reason="No `/proc` filesystem on this host")
+def test_get_process_table_from_proc():
+    mach = _LinuxMachine(LocalTransport())
+    table = mach.get_process_table()
+    me = table[str(os.getpid())]
+    assert me.ppid == str(os.getppid())
+    assert me.state == 'R'
+    assert me.elapsed >= Duration(0, unit=Duration.s)
+
+
 if __name__ == "__main__":
     pytest.main(["-v", __file__])
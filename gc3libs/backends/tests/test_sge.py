@@ -29,6 +29,7 @@ import tempfile
 import pytest
 
 import gc3libs
+import gc3libs.backends.sge
 import gc3libs.core
 import gc3libs.config
 from gc3libs.quantity import MB, seconds
@@ -308,6 +309,41 @@ username=NONEXISTENT
                                        second=10))
         assert job.sge_failed == 0
 
+    def test_get_resource_status(self, tmpdir):
+        qstat_f = """\
+queuename                      qtype resv/used/tot. load_avg arch          states
+---------------------------------------------------------------------------------
+all.q@node1                    BIP   0/2/8          0.01     lx-amd64
+      1 0.50000 job1       first_user   r     10/10/2019 10:00:00     1
+      2 0.50000 job2       other_user   r     10/10/2019 10:00:00     1
+---------------------------------------------------------------------------------
+all.q@node2                    BIP   0/0/4          0.01     lx-amd64
+"""
+        qstat_u = """\
+job-ID  prior   name       user         state submit/start at     queue                          slots ja-task-ID
+-----------------------------------------------------------------------------------------------------------------
+      1 0.50000 job1       first_user   r     10/10/2019 10:00:00 all.q@node1                        1
+      2 0.50000 job2       other_user   r     10/10/2019 10:00:00 all.q@node1                        1
+      3 0.50000 job3       first_user   qw    10/10/2019 10:00:00                                    1
+      4 0.50000 job4       first_user   hqw   10/10/2019 10:00:00                                    1
+"""
+        qstat = str(tmpdir.join('qstat'))
+        with open(qstat, 'w') as script:
+            script.write("#!/bin/sh\n"
+                         "if [ \"$1\" = '-f' ]; then cat <<EOF\n%sEOF\n"
+                         "else cat <<EOF\n%sEOF\nfi\n" % (qstat_f, qstat_u))
+        os.chmod(qstat, 0o755)
+        del self.transport.expected_answer['qstat']
+        self.backend._qstat = qstat
+        self.backend._username = 'first_user'
+        self.backend.get_resource_status()
+        assert self.backend.queued == 1
+        assert self.backend.user_run == 1
+        assert self.backend.user_queued == 1
+        # job lines are filtered out before parsing, with no effect on slots
+        slots = gc3libs.backends.sge.compute_nr_of_slots(qstat_f)
+        assert self.backend.free_slots == slots['global']['available']
+
     def test_delete_job(self):
         app = FakeApp()
         self.transport.expected_answer['qsub'] = correct_submit()
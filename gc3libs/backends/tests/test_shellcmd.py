@@ -27,16 +27,22 @@ __docformat__ = 'reStructuredText'
 
 from io import StringIO
 import os
+import pickle
 import shutil
+import subprocess
 import tempfile
+import threading
 import time
 
+import mock
 import pytest
 
 import gc3libs
 from gc3libs.backends.shellcmd import ShellcmdLrms
 import gc3libs.config
 import gc3libs.core
+import gc3libs.defaults
+import gc3libs.events
 from gc3libs.quantity import Duration, Memory, s, kB
 from gc3libs.testing.helpers import (
     SuccessfulApp,
@@ -164,6 +170,113 @@ type=none
             self.core.free(app)
             raise
 
+    def test_local_child_is_reaped(self):
+        """Check that exit status and resource usage of local tasks come from `wait4()`"""
+        tmpdir = tempfile.mkdtemp(prefix=__name__, suffix='.d')
+        self.cleanup_file(tmpdir)
+
+        app = gc3libs.Application(
+            arguments=['/bin/sh', '-c', 'exit 3'],
+            inputs=[],
+            outputs=[],
+            output_dir=tmpdir,
+            requested_cores=1, )
+        self.core.submit(app)
+        self.apps_to_kill.append(app)
+        self.cleanup_file(app.execution.lrms_execdir)
+        pid = app.execution.lrms_jobid
+        assert pid in self.backend._children
+
+        self.run_until_terminating(app)
+        assert app.execution.state == gc3libs.Run.State.TERMINATING
+        assert app.execution.exitcode == 3
+        assert app.execution.duration > Duration(0, unit=s)
+        assert app.execution.used_cpu_time >= Duration(0, unit=s)
+        assert pid not in self.backend._children
+        # the child has been reaped, so it does not linger as a zombie
+        with pytest.raises(OSError):
+            os.waitpid(int(pid), os.WNOHANG)
+
+    def test_failed_upload_does_not_change_returncode(self):
+        """Check that the return code of local tasks is that of the command"""
+        tmpdir = tempfile.mkdtemp(prefix=__name__, suffix='.d')
+        self.cleanup_file(tmpdir)
+
+        app = gc3libs.Application(
+            arguments=['/bin/true'],
+            inputs=[],
+            outputs=[],
+            output_dir=tmpdir,
+            requested_cores=1, )
+        # make the wrapper run a failing upload command
+        with mock.patch.object(self.backend, '_setup_data_movers',
+                               return_value=([], ['(exit 5)'])):
+            self.core.submit(app)
+        self.apps_to_kill.append(app)
+        self.cleanup_file(app.execution.lrms_execdir)
+        pid = app.execution.lrms_jobid
+        child = self.backend._children[pid]
+        assert child.done.wait(30)
+        # the wrapper script exits with the upload's status ...
+        assert os.WEXITSTATUS(child.status) == 5
+
+        self.run_until_terminating(app)
+        # ... but that is not the task's
+        assert app.execution.exitcode == 0
+
+    def test_local_child_end_is_notified(self):
+        """Check that the end of local tasks is signaled without polling"""
+        tmpdir = tempfile.mkdtemp(prefix=__name__, suffix='.d')
+        self.cleanup_file(tmpdir)
+
+        done = []
+        notified = threading.Event()
+
+        def on_job_done(sender, jobid):
+            done.append((sender, jobid))
+            notified.set()
+
+        gc3libs.events.JobDone.connect(on_job_done)
+        try:
+            app = gc3libs.Application(
+                arguments=['/bin/true'],
+                inputs=[],
+                outputs=[],
+                output_dir=tmpdir,
+                requested_cores=1, )
+            self.core.submit(app)
+            self.apps_to_kill.append(app)
+            self.cleanup_file(app.execution.lrms_execdir)
+            assert notified.wait(10)
+        finally:
+            gc3libs.events.JobDone.disconnect(on_job_done)
+        assert done == [(self.backend, app.execution.lrms_jobid)]
+
+    def test_remote_job_done_log_is_followed(self):
+        """Check that PIDs in the completion log are signaled"""
+        resource_dir = self.backend.resource_dir
+        done = []
+
+        def on_job_done(sender, jobid):
+            done.append((sender, jobid))
+
+        transport = mock.MagicMock()
+        with mock.patch.object(self.backend, 'transport', transport):
+            self.backend._follow_job_done_log()
+            self.backend._follow_job_done_log()
+            self.backend.close()
+        assert transport.follow.call_count == 1
+        path, callback = transport.follow.call_args[0]
+        assert path == os.path.join(resource_dir, ShellcmdLrms.JOB_DONE_LOG)
+        assert transport.follow.return_value.stop.called
+
+        gc3libs.events.JobDone.connect(on_job_done)
+        try:
+            callback('12345')
+        finally:
+            gc3libs.events.JobDone.disconnect(on_job_done)
+        assert done == [(self.backend, '12345')]
+
     def test_check_app_after_reloading_session(self):
         """Check that the job status is still available the end of the starter script"""
 
@@ -236,6 +349,100 @@ type=none
         assert self.backend.free_slots == cores_before
         assert self.backend.available_memory == mem_before
 
+    def test_update_job_states_takes_one_snapshot(self):
+        """Check that the state of many tasks is updated with one process listing"""
+        procs = [subprocess.Popen(['sleep', '30']) for _ in range(3)]
+        try:
+            apps = []
+            for proc in procs:
+                app = gc3libs.Application(
+                    arguments=['sleep', '30'],
+                    inputs=[],
+                    outputs=[],
+                    output_dir=None)
+                app.execution.lrms_jobid = str(proc.pid)
+                app.execution.state = gc3libs.Run.State.RUNNING
+                apps.append(app)
+
+            machine = self.backend._machine
+            get_process_table = machine.get_process_table
+            calls = []
+
+            def counting_get_process_table():
+                calls.append(1)
+                return get_process_table()
+            machine.get_process_table = counting_get_process_table
+
+            states = self.backend.update_job_states(apps)
+            assert len(calls) == 1
+            assert states == [gc3libs.Run.State.RUNNING] * 3
+        finally:
+            for proc in procs:
+                proc.kill()
+                proc.wait()
+
+    def test_job_ledger(self):
+        """Check that jobs recorded in the ledger are accounted for"""
+        cores_before = self.backend.free_slots
+        mem_before = self.backend.available_memory
+        self.backend._append_to_job_ledger(
+            '+12345 2 10000000 /tmp/job1',
+            '+12346 1 - /tmp/job2')
+        self.backend.get_resource_status()
+        assert self.backend.free_slots == cores_before - 3
+        assert self.backend.available_memory == mem_before - 10*Memory.MB
+        assert self.backend.user_run == 2
+
+        self.backend._append_to_job_ledger('*12345', '-12346')
+        self.backend.get_resource_status()
+        assert self.backend.free_slots == cores_before
+        assert self.backend.available_memory == mem_before
+        assert self.backend._job_infos['12345']['terminated']
+        assert '12346' not in self.backend._job_infos
+
+    def test_job_ledger_compaction(self, monkeypatch):
+        """Check that the job ledger is compacted when it grows too large"""
+        monkeypatch.setattr(
+            gc3libs.defaults, 'SHELLCMD_LEDGER_MIN_SIZE', 10)
+        records = []
+        for pid in range(100, 120):
+            records += ['+%d 1 - /tmp/job%d' % (pid, pid), '-%d' % pid]
+        records += ['+200 1 - /tmp/job200', '*200', '+201 4 - /tmp/job201']
+        self.backend._append_to_job_ledger(*records)
+        done_log = os.path.join(
+            self.backend.resource_dir, ShellcmdLrms.JOB_DONE_LOG)
+        with open(done_log, 'w') as fp:
+            fp.write('200\n')
+        self.backend.get_resource_status()
+        ledger = os.path.join(
+            self.backend.resource_dir, ShellcmdLrms.JOB_LEDGER)
+        with open(ledger, 'r') as fp:
+            lines = fp.read().split('\n')
+        assert sorted(lines) == [
+            '', '*200', '+200 1 - /tmp/job200', '+201 4 - /tmp/job201']
+        # the completion log is emptied at the same time
+        assert os.path.getsize(done_log) == 0
+        self.backend.get_resource_status()
+        assert sorted(self.backend._job_infos.keys()) == ['200', '201']
+        assert self.backend.user_run == 1
+
+    def test_import_job_info_files(self):
+        """Check that per-PID job info files are moved into the job ledger"""
+        resource_dir = self.backend.resource_dir
+        os.remove(os.path.join(resource_dir, ShellcmdLrms.JOB_LEDGER))
+        with open(os.path.join(resource_dir, '4242'), 'wb') as fp:
+            pickle.dump({
+                'requested_cores': 3,
+                'requested_memory': None,
+                'execution_dir': '/tmp/job',
+                'terminated': False,
+            }, fp, -1)
+        self.backend.get_resource_status()
+        assert self.backend._job_infos['4242']['requested_cores'] == 3
+        assert not os.path.exists(os.path.join(resource_dir, '4242'))
+        assert os.path.exists(
+            os.path.join(resource_dir, ShellcmdLrms.JOB_LEDGER))
+
     def test_env_vars_definition(self):
         """Check that `Application.environment` settings are correctly propagated"""
         tmpdir = tempfile.mkdtemp(prefix=__name__, suffix='.d')
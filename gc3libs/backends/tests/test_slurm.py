@@ -24,6 +24,7 @@ __docformat__ = 'reStructuredText'
 
 import datetime
 import os
+import tarfile
 import tempfile
 
 import mock
@@ -417,6 +418,43 @@ username=NONEXISTENT
             self.core.submit(app)
         #assert_equal(app.execution.state, State.NEW)
 
+    def test_sbatch_submit_tar_staging(self):
+        """Test that `staging=tar` submits with a single remote command."""
+        (fd, infile) = tempfile.mkstemp()
+        os.write(fd, b'some input data')
+        os.close(fd)
+        app = gc3libs.Application(
+            arguments=['/bin/hostname'],
+            inputs={infile: 'data/input.txt'},
+            outputs=[],
+            output_dir="./fakedir",
+            stdout="stdout.txt",
+            stderr="logs/stderr.txt",
+            requested_cores=1)
+        commands = []
+
+        def execute_command(cmdline, detach=False, stdin=None):
+            commands.append(cmdline)
+            with tarfile.open(fileobj=stdin, mode='r') as tar:
+                names = tar.getnames()
+                assert tar.extractfile('data/input.txt').read() \
+                    == b'some input data'
+            assert 'logs' in names
+            assert any(name.startswith('script.') for name in names)
+            return (0, '/tmp/batch_job.XYZ\n' + sbatch_submit_ok()[1], '')
+
+        self.backend.staging = 'tar'
+        self.transport.execute_command = execute_command
+        try:
+            self.core.submit(app)
+        finally:
+            os.remove(infile)
+        assert len(commands) == 1
+        assert 'tar -x -f -' in commands[0]
+        assert app.execution.state == State.SUBMITTED
+        assert app.execution.lrms_jobid == '123'
+        assert app.execution.ssh_remote_folder == '/tmp/batch_job.XYZ'
+
     def test_parse_squeue_output_pending(self):
         """Test `squeue` output parsing with a job in PENDING state."""
         app = FakeApp()
@@ -863,6 +901,75 @@ username=NONEXISTENT
         self.core.kill(app)
         assert app.execution.state == State.TERMINATED
 
+    def test_update_many_jobs_at_once(self):
+        """Test that the state of many jobs is updated with one `squeue` and one `sacct` call."""
+        apps = []
+        for jobid in 123, 456, 789:
+            app = FakeApp()
+            self.transport.expected_answer['sbatch'] = sbatch_submit_ok(jobid)
+            self.core.submit(app)
+            apps.append(app)
+
+        # job 123 is pending, job 456 is running, job 789 has
+        # dropped out of the queue and is only known to `sacct`
+        self.transport.expected_answer['squeue'] = (
+            0,
+            squeue_pending(123)[1] + '\n' + squeue_running(456)[1],
+            '')
+        self.transport.expected_answer['env'] = sacct_done_ok(789)
+        with mock.patch.object(
+                self.transport, 'execute_command',
+                wraps=self.transport.execute_command) as execute_command:
+            self.core.update_job_state(*apps)
+            assert execute_command.call_count == 2
+        assert apps[0].execution.state == State.SUBMITTED
+        assert apps[1].execution.state == State.RUNNING
+        assert apps[2].execution.state == State.TERMINATING
+        self._check_parse_sacct_done_ok(apps[2].execution)
+
+    def _make_fake_squeue(self, tmpdir, output, exitcode=0):
+        path = str(tmpdir.join('squeue'))
+        with open(path, 'w') as script:
+            script.write("#!/bin/sh\ncat <<EOF\n%sEOF\nexit %d\n"
+                         % (output, exitcode))
+        os.chmod(path, 0o755)
+        del self.transport.expected_answer['squeue']
+        self.backend._squeue = path
+
+    def test_get_resource_status(self, tmpdir):
+        self._make_fake_squeue(
+            tmpdir,
+            "RUNNING^first_user\n"
+            "RUNNING^second_user\n"
+            "COMPLETING^second_user\n"
+            "PENDING^first_user\n"
+            "PENDING^first_user\n"
+            "CONFIGURING^second_user\n")
+        self.backend._username = 'first_user'
+        self.backend.get_resource_status()
+        assert self.backend.total_run == 3
+        assert self.backend.queued == 3
+        assert self.backend.user_run == 1
+        assert self.backend.user_queued == 2
+
+    def test_get_resource_status_failed(self, tmpdir):
+        self._make_fake_squeue(tmpdir, '', exitcode=3)
+        with pytest.raises(gc3libs.exceptions.LRMSError):
+            self.backend.get_resource_status()
+
+    def test_resource_status_is_cached(self, tmpdir):
+        self._make_fake_squeue(tmpdir, "RUNNING^first_user\n")
+        with mock.patch.object(
+                self.transport, 'execute_command',
+                wraps=self.transport.execute_command) as execute_command:
+            self.core.update_resources()
+            self.core.update_resources()
+            assert execute_command.call_count == 1
+            assert self.backend.updated
+            # `force` bypasses the cached status
+            self.core.update_resources(force=True)
+            assert execute_command.call_count == 2
+
     def test_get_command(self):
         assert self.backend.sbatch == ['sbatch']
         assert self.backend._sacct == 'sacct'
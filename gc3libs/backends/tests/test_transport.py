@@ -24,7 +24,14 @@ __docformat__ = 'reStructuredText'
 # System imports
 import os
 import getpass
-from tempfile import NamedTemporaryFile
+import shutil
+import signal
+import subprocess
+from tempfile import NamedTemporaryFile, mkdtemp
+import threading
+import time
+
+import mock
 
 # Nose imports
 import pytest
@@ -125,6 +132,50 @@ class StubForTestTransport(object):
                 except:
                     pass
 
+    def _make_remote_tree(self):
+        with NamedTemporaryFile(mode='wt') as tmpfile:
+            tmpfile.write("Test file")
+            tmpfile.flush()
+            for relpath in ['a/b/c.txt', 'a/d.txt', 'x.txt']:
+                destfile = os.path.join(self.tmpdir, relpath)
+                self.transport.makedirs(os.path.dirname(destfile))
+                self.transport.put(tmpfile.name, destfile)
+        return [
+            (os.path.join(self.tmpdir, 'a'), 'a'),
+            (os.path.join(self.tmpdir, 'x.txt'), 'x.txt'),
+            (os.path.join(self.tmpdir, 'missing'), 'missing'),
+        ]
+
+    def _check_get_many(self, remote_and_relpaths):
+        localdir = mkdtemp(prefix='gc3libs.test.')
+        try:
+            pairs = [(remote, os.path.join(localdir, relpath))
+                     for remote, relpath in remote_and_relpaths]
+            files, size = self.transport.get_many(
+                pairs, ignore_nonexisting=True)
+            assert files == 3
+            assert size == 3 * len("Test file")
+            for relpath in ['a/b/c.txt', 'a/d.txt', 'x.txt']:
+                with open(os.path.join(localdir, relpath)) as stream:
+                    assert stream.read() == "Test file"
+            # nothing changed, so nothing should be copied again
+            assert (0, 0) == self.transport.get_many(
+                pairs, ignore_nonexisting=True,
+                overwrite=True, changed_only=True)
+            with pytest.raises(TransportError):
+                self.transport.get_many(pairs)
+        finally:
+            shutil.rmtree(localdir)
+
+    def test_get_many(self):
+        self._check_get_many(self._make_remote_tree())
+
+    def test_get_many_without_gnu_find(self):
+        pairs = self._make_remote_tree()
+        with mock.patch.object(self.transport, '_list_trees',
+                               side_effect=TransportError("no find")):
+            self._check_get_many(pairs)
+
     def test_open_failure_nonexistent_file(self):
         with pytest.raises(TransportError):
             # pylint: disable=invalid-name,unused-variable
@@ -185,6 +236,190 @@ class TestSshTransport(StubForTestTransport):
         self.transport.connect()
         self.extra_setup()
 
+class _FakeSshClient(object):
+    """
+    Minimal stand-in for `paramiko.SSHClient`, counting concurrent commands.
+    """
+
+    instances = []
+    lock = threading.Lock()
+    running = 0
+    max_running = 0
+
+    def __init__(self):
+        self._transport = None
+        _FakeSshClient.instances.append(self)
+
+    def load_system_host_keys(self):
+        pass
+
+    def set_missing_host_key_policy(self, policy):
+        pass
+
+    def connect(self, *args, **kwargs):
+        self._transport = mock.MagicMock()
+        self._transport.is_active.return_value = True
+
+    def get_transport(self):
+        return self._transport
+
+    def open_sftp(self):
+        return mock.MagicMock()
+
+    def exec_command(self, command):
+        cls = _FakeSshClient
+        with cls.lock:
+            cls.running += 1
+            cls.max_running = max(cls.max_running, cls.running)
+        time.sleep(0.05)
+        with cls.lock:
+            cls.running -= 1
+        stdout = mock.MagicMock()
+        stdout.read.return_value = b'ok'
+        stdout.channel.recv_exit_status.return_value = 0
+        stderr = mock.MagicMock()
+        stderr.read.return_value = b''
+        return (None, stdout, stderr)
+
+    def close(self):
+        self._transport = None
+
+
+def test_ssh_transport_connection_pool():
+    with mock.patch.object(transport.paramiko, 'SSHClient', _FakeSshClient):
+        _FakeSshClient.instances = []
+        ssh = transport.SshTransport(
+            'localhost', ignore_ssh_host_keys=True,
+            max_connections=2, max_channels_per_connection=2)
+
+        results = []
+        def run():
+            results.append(ssh.execute_command('true'))
+        threads = [threading.Thread(target=run) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert results == [(0, 'ok', '')] * 10
+        assert len(_FakeSshClient.instances) == 2
+        assert 1 < _FakeSshClient.max_running <= 4
+        metrics = ssh.metrics
+        assert metrics['open_connections'] == 2
+        assert metrics['active_leases'] == 0
+        assert metrics['queued_leases'] == 0
+        assert metrics['commands'] == 10
+        assert metrics['mean_rtt'] > 0
+
+        ssh.close()
+        assert ssh.metrics['open_connections'] == 0
+
+
+class _TarSshClient(_FakeSshClient):
+    """
+    Run commands locally, with pipes as small as those of an SSH channel.
+    """
+
+    class _Channel(object):
+        def __init__(self, proc):
+            self.proc = proc
+
+        def sendall(self, data):
+            self.proc.stdin.write(data)
+            self.proc.stdin.flush()
+
+        def shutdown_write(self):
+            self.proc.stdin.close()
+
+        def recv_exit_status(self):
+            return self.proc.wait()
+
+        def close(self):
+            # like closing an SSH channel, end the whole command
+            if self.proc.poll() is None:
+                os.killpg(self.proc.pid, signal.SIGKILL)
+                self.proc.wait()
+
+    class _Stream(object):
+        def __init__(self, fileobj, channel):
+            self.fileobj = fileobj
+            self.channel = channel
+
+        def read(self, size=-1):
+            return self.fileobj.read(size)
+
+        def readline(self):
+            return self.fileobj.readline()
+
+    def exec_command(self, command):
+        proc = subprocess.Popen(command, shell=True, stdin=subprocess.PIPE,
+                                stdout=subprocess.PIPE, preexec_fn=os.setsid)
+        channel = self._Channel(proc)
+        return (self._Stream(proc.stdin, channel),
+                self._Stream(proc.stdout, channel),
+                None)
+
+
+def test_ssh_transport_get_many_tar_long_file_list():
+    # the file list and the TAR stream both exceed the pipe buffers,
+    # so sending the whole list before reading would deadlock
+    srcdir = mkdtemp()
+    dstdir = mkdtemp()
+    try:
+        transfers = []
+        for n in range(2000):
+            name = 'file-with-a-rather-long-name-{0:05d}.txt'.format(n)
+            src = os.path.join(srcdir, name)
+            with open(src, 'w') as fp:
+                fp.write('x' * 100)
+            transfers.append((src, os.path.join(dstdir, name), 100, 0o644))
+        with mock.patch.object(transport.paramiko, 'SSHClient', _TarSshClient):
+            ssh = transport.SshTransport('localhost', ignore_ssh_host_keys=True)
+            assert ssh._get_many_tar(transfers) == []
+            ssh.close()
+        assert len(os.listdir(dstdir)) == 2000
+    finally:
+        shutil.rmtree(srcdir)
+        shutil.rmtree(dstdir)
+
+
+def test_ssh_transport_follow():
+    tmpdir = mkdtemp()
+    path = os.path.join(tmpdir, 'jobs.done')
+    lines = []
+    seen = threading.Event()
+
+    def callback(line):
+        lines.append(line)
+        seen.set()
+
+    try:
+        with mock.patch.object(transport.paramiko, 'SSHClient', _TarSshClient):
+            ssh = transport.SshTransport('localhost', ignore_ssh_host_keys=True)
+            follower = ssh.follow(path, callback)
+            # lines written before `tail` has opened the file are
+            # skipped, so keep writing until one gets through
+            for _ in range(50):
+                with open(path, 'a') as fp:
+                    fp.write('1\n')
+                if seen.wait(0.1):
+                    break
+            with open(path, 'a') as fp:
+                fp.write('\n2\n')
+            for _ in range(50):
+                if lines[-1] == '2':
+                    break
+                time.sleep(0.1)
+            assert set(lines) == set(['1', '2'])
+            assert follower.is_alive()
+            follower.stop()
+            follower.join(10)
+            assert not follower.is_alive()
+            ssh.close()
+    finally:
+        shutil.rmtree(tmpdir)
+
+
 # main: run tests
 
 if __name__ == "__main__":
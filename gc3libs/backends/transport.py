@@ -37,6 +37,10 @@ import errno
 import shutil
 import getpass
 import shutil
+import tarfile
+import threading
+import time
+from contextlib import contextmanager
 from warnings import warn
 
 try:
@@ -49,7 +53,7 @@ except ImportError:
 
 import gc3libs.defaults
 from gc3libs.quantity import Memory, MiB
-from gc3libs.utils import same_docstring_as, samefile, to_str
+from gc3libs.utils import same_docstring_as, samefile, sh_quote_safe, to_str
 import gc3libs.exceptions
 
 
@@ -78,7 +82,7 @@ class Transport(object):
             "Abstract method `Transport.chmod()` called - "
             "this should have been defined in a derived class.")
 
-    def execute_command(self, command, detach=False):
+    def execute_command(self, command, detach=False, stdin=None):
         """
         Execute a command using the available tranport media.
 
@@ -92,6 +96,10 @@ class Transport(object):
         command, but instead, returns as soon as possible. Default is
         False.
 
+        :param stdin: if not ``None``, a binary file-like object,
+        whose contents (from the current position to the end) are
+        fed into the command's standard input.
+
         :return: the exit_status (int), stdout (ChannelFile), and
         stderr (ChannelFile) of the executing command
 
@@ -110,6 +118,23 @@ class Transport(object):
             "Abstract method `Transport.exists()` called - "
             "this should have been defined in a derived class.")
 
+    def follow(self, path, callback):
+        """
+        Call `callback(line)` for each line appended to file `path`.
+
+        Lines are read in a background thread, so `callback` must be
+        thread-safe; lines already in the file are skipped.  It does
+        not matter if the file does not exist yet, or is truncated.
+
+        Return an object with methods `is_alive()`, which tells
+        whether lines are still being read, and `stop()`.
+
+        :raise TransportError: if reading the file cannot be started
+        """
+        raise NotImplementedError(
+            "Abstract method `Transport.follow()` called - "
+            "this should have been defined in a derived class.")
+
     def get(self, source, destination, ignore_nonexisting=False,
             overwrite=False, changed_only=True):
         """Copy remote `source` to local `destination`.
@@ -220,6 +245,148 @@ class Transport(object):
             "Abstract method `Transport._get_impl()` called - "
             "this should have been defined in a derived class.")
 
+    def get_many(self, pairs, ignore_nonexisting=False,
+                 overwrite=False, changed_only=True):
+        """
+        Copy many remote files or directories to local destinations.
+
+        Argument `pairs` is a sequence of *(source, destination)*
+        pairs; each of them is copied as if by `get`:meth: (which see
+        for the meaning of the other arguments), but remote directory
+        trees are listed all at once, files that need not be copied
+        are selected locally, and transfers are done in bulk (see
+        `_get_many_impl`:meth:).
+
+        Return a pair *(files, bytes)* with the count of files
+        copied and their total size.
+        """
+        pairs = list(pairs)
+        try:
+            listing = self._list_trees([source for source, _ in pairs])
+        except Exception as err:
+            gc3libs.log.debug(
+                "Could not list remote files in one go (%s: %s);"
+                " walking remote directory trees instead.",
+                err.__class__.__name__, err)
+            listing = self._walk_trees([source for source, _ in pairs])
+        transfers = []
+        for source, destination in pairs:
+            entries = listing.get(source)
+            if entries is None:
+                if ignore_nonexisting:
+                    continue
+                raise gc3libs.exceptions.TransportError(
+                    "Could not download '%s' on host '%s' to '%s':"
+                    " no such file or directory"
+                    % (source, self.remote_frontend, destination))
+            for relpath, size, mtime, mode in entries:
+                if relpath:
+                    src = source + '/' + relpath
+                    dst = os.path.join(destination, *relpath.split('/'))
+                else:
+                    src, dst = source, destination
+                if os.path.exists(dst):
+                    if not overwrite:
+                        continue
+                    elif changed_only:
+                        dst_st = os.stat(dst)
+                        if (size == dst_st.st_size
+                                and mtime <= dst_st.st_mtime):
+                            continue
+                parent = os.path.dirname(dst)
+                if parent and not os.path.exists(parent):
+                    os.makedirs(parent)
+                transfers.append((src, dst, size, mode))
+        if transfers:
+            gc3libs.log.debug(
+                "Downloading %d files from host '%s' ...",
+                len(transfers), self.remote_frontend)
+            try:
+                self._get_many_impl(transfers)
+            except Exception as ex:
+                raise gc3libs.exceptions.TransportError(
+                    "Could not download files from host '%s': %s: %s"
+                    % (self.remote_frontend, ex.__class__.__name__, str(ex)))
+        return len(transfers), sum(size for _, _, size, _ in transfers)
+
+    def _list_trees(self, paths):
+        """
+        List all files in remote directory trees `paths` with one command.
+
+        Return a dictionary mapping each path that exists to a list
+        of *(relpath, size, mtime, mode)* tuples, one per regular file
+        found in the tree; *relpath* is the path relative to the tree
+        root (empty if the path is itself a file).  This uses the
+        GNU-specific ``-printf`` option to ``find``; if that does not
+        work, an exception is raised.
+        """
+        cmd = ("find -L %s -type f -printf '%%s %%T@ %%m %%p\\0'"
+               % ' '.join(sh_quote_safe(path) for path in paths))
+        exit_code, stdout, stderr = self.execute_command(cmd)
+        if exit_code != 0 and not stdout:
+            raise gc3libs.exceptions.TransportError(
+                "Command '%s' exited with code %d and stderr: '%s'"
+                % (cmd, exit_code, stderr))
+        roots = sorted(set(paths), key=len, reverse=True)
+        result = {}
+        for record in stdout.split('\0'):
+            if not record:
+                continue
+            size, mtime, mode, path = record.split(' ', 3)
+            for root in roots:
+                if path == root:
+                    relpath = ''
+                elif path.startswith(root.rstrip('/') + '/'):
+                    relpath = path[len(root.rstrip('/'))+1:]
+                else:
+                    continue
+                result.setdefault(root, []).append(
+                    (relpath, int(size), float(mtime), int(mode, 8)))
+        # empty directories have no files but still exist
+        if exit_code != 0:
+            for path in paths:
+                if path not in result and self.isdir(path):
+                    result[path] = []
+        else:
+            for path in paths:
+                result.setdefault(path, [])
+        return result
+
+    def _walk_trees(self, paths):
+        """
+        Same as `_list_trees`:meth: but walk trees one entry at a time.
+        """
+        result = {}
+        for path in paths:
+            if self.exists(path):
+                result[path] = list(self._walk_tree(path, ''))
+        return result
+
+    def _walk_tree(self, root, relpath):
+        path = (root + '/' + relpath) if relpath else root
+        if self.isdir(path):
+            for name in self.listdir(path):
+                for entry in self._walk_tree(
+                        root, (relpath + '/' + name) if relpath else name):
+                    yield entry
+        else:
+            st = self.stat(path)
+            yield (relpath, st.st_size, st.st_mtime, st.st_mode & 0o7777)
+
+    def _get_many_impl(self, transfers):
+        """
+        Copy files from the remote host.
+
+        Argument `transfers` is a list of *(source, destination, size,
+        mode)* tuples; destination parent directories already exist.
+        Derived classes can override this to provide faster bulk
+        transfers; the default implementation calls `_get_impl` on
+        each file in turn.
+        """
+        for source, destination, size, mode in transfers:
+            self._get_impl(source, destination)
+            os.chmod(destination, mode)
+
     def get_remote_username(self):
         """
         Return the user name (as a `str` object) used on the other end
@@ -431,6 +598,10 @@ class SshTransport(Transport):
                  timeout=None,
                  large_file_threshold=None,
                  large_file_chunk_size=None,
+                 max_connections=None,
+                 max_channels_per_connection=None,
+                 keepalive=None,
+                 idle_timeout=None,
                  **extra_args):
         """
         Initialize an `SshTransport` object for operating on host `remote_frontend`.
@@ -503,6 +674,18 @@ class SshTransport(Transport):
         `large_file_chunk_size` bytes at a time; else, the entire file
         will be requested at once, using many parallel block
         transfers.  See `SshTransport.get()`:meth: for details.
+
+        Remote commands are run over a pool of SSH connections, so
+        that several threads can use the same `SshTransport` object
+        at the same time: at most `max_connections` connections are
+        opened to the remote host, each one running at most
+        `max_channels_per_connection` commands concurrently.  Extra
+        connections are closed after being unused for `idle_timeout`
+        seconds.  If `keepalive` is a positive number, a keepalive
+        packet is sent over each connection after that many seconds
+        of inactivity.  Connections found broken are re-established
+        automatically.  See the `metrics`:attr: attribute for usage
+        statistics about the pool.
         """
         self.ssh = paramiko.SSHClient()
         self.ignore_ssh_host_keys = ignore_ssh_host_keys
@@ -510,6 +693,25 @@ class SshTransport(Transport):
         self._is_open = False
         self.transport_channel = None
 
+        # connection pool; the first element is always the "main"
+        # connection `self.ssh`, which is also used for SFTP
+        self.max_connections = int(
+            max_connections or gc3libs.defaults.SSH_MAX_CONNECTIONS)
+        self.max_channels_per_connection = int(
+            max_channels_per_connection
+            or gc3libs.defaults.SSH_MAX_CHANNELS_PER_CONNECTION)
+        self.keepalive = int(
+            keepalive or gc3libs.defaults.SSH_KEEPALIVE)
+        self.idle_timeout = float(
+            idle_timeout or gc3libs.defaults.SSH_IDLE_TIMEOUT)
+        self._pool = [_PooledConnection(self.ssh)]
+        self._pool_lock = threading.Condition()
+        self._connect_lock = threading.RLock()
+        self._opening = 0
+        self._queued = 0
+        self._commands = 0
+        self._total_rtt = 0.0
+
         # init connection params
         self.username = None
         self.keyfile = None
@@ -617,6 +819,10 @@ class SshTransport(Transport):
 
     @same_docstring_as(Transport.connect)
     def connect(self):
+        with self._connect_lock:
+            self._connect()
+
+    def _connect(self):
         if not self.remote_frontend:
             self._is_open = False
             raise gc3libs.exceptions.TransportError(
@@ -628,64 +834,7 @@ class SshTransport(Transport):
             if not self._is_open or self.transport_channel is None or \
                     not self.transport_channel.is_active():
                 gc3libs.log.debug("Opening SshTransport... ")
-                if not self.ignore_ssh_host_keys:
-                    # Disabling check of the server key against "known
-                    # hosts" database file. This is needed for EC2
-                    # backends in order to fix issue 389, but
-                    # introduces a security risk in normal situations,
-                    # thus the check is enabled by default. However,
-                    # Paramiko can fail to parse `~/.ssh/known_hosts`
-                    # (seen on MacOSX) and then raise an
-                    # `SSHException` which causes the whole block to
-                    # fail.  So, ignore any errors raised by this line
-                    # and hope for the best.
-                    try:
-                        self.ssh.load_system_host_keys()
-                    except paramiko.SSHException as err:
-                        gc3libs.log.warning(
-                            "Could not read 'known hosts' SSH keys (%s: %s)."
-                            " I'm ignoring the error and continuing anyway,"
-                            " but this could mean trouble later on.",
-                            err.__class__.__name__, err)
-                        pass
-                else:
-                    gc3libs.log.info("Ignoring ssh host key file.")
-
-                self.ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-
-                if self.proxy_command:
-                    proxy = paramiko.ProxyCommand(self.proxy_command)
-                    gc3libs.log.debug("Using ProxyCommand for SSH connections: %s", self.proxy_command)
-                else:
-                    proxy = None
-                    gc3libs.log.debug("Using no ProxyCommand for SSH connections.")
-
-                gc3libs.log.debug(
-                    "Connecting to host '%s' (port %s) as user '%s' via SSH "
-                    "(timeout %ds)...", self.remote_frontend, self.port,
-                    self.username, self.timeout)
-                try:
-                    self.ssh.connect(self.remote_frontend,
-                                     timeout=self.timeout,
-                                     username=self.username,
-                                     port=self.port,
-                                     pkey=self.pkey,
-                                     allow_agent=True,
-                                     key_filename=self.keyfile,
-                                     sock=proxy)
-                except ValueError as err:
-                    msg = str(err)
-                    if msg.startswith("q must be exactly") or msg.startswith("p must be exactly"):
-                        # warn and continue, this is just Paramiko mistakenly using an RSA
-                        # key as DSA one, see: https://github.com/paramiko/paramiko/pull/1606
-                        warn(
-                            "The configured SSH private RSA key file `{0}`"
-                            " can also be mistakenly read as a DSA key file."
-                            " If you run into SSH connection problems, use"
-                            " a different key."
-                            .format(self.keyfile))
-                    else:
-                        raise
+                self._open_client(self.ssh)
                 self.sftp = self.ssh.open_sftp()
                 self._is_open = True
         except Exception as ex:
@@ -765,6 +914,175 @@ class SshTransport(Transport):
                 "Failed connecting to remote host '{hostname}': {msg}"
                 .format(hostname=self.remote_frontend, msg=ex))
 
+    def _open_client(self, client):
+        """
+        Establish a connection to the remote host using `paramiko.SSHClient` object `client`.
+        """
+        if not self.ignore_ssh_host_keys:
+            # Disabling check of the server key against "known
+            # hosts" database file. This is needed for EC2
+            # backends in order to fix issue 389, but
+            # introduces a security risk in normal situations,
+            # thus the check is enabled by default. However,
+            # Paramiko can fail to parse `~/.ssh/known_hosts`
+            # (seen on MacOSX) and then raise an
+            # `SSHException` which causes the whole block to
+            # fail.  So, ignore any errors raised by this line
+            # and hope for the best.
+            try:
+                client.load_system_host_keys()
+            except paramiko.SSHException as err:
+                gc3libs.log.warning(
+                    "Could not read 'known hosts' SSH keys (%s: %s)."
+                    " I'm ignoring the error and continuing anyway,"
+                    " but this could mean trouble later on.",
+                    err.__class__.__name__, err)
+                pass
+        else:
+            gc3libs.log.info("Ignoring ssh host key file.")
+
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+
+        if self.proxy_command:
+            proxy = paramiko.ProxyCommand(self.proxy_command)
+            gc3libs.log.debug("Using ProxyCommand for SSH connections: %s", self.proxy_command)
+        else:
+            proxy = None
+            gc3libs.log.debug("Using no ProxyCommand for SSH connections.")
+
+        gc3libs.log.debug(
+            "Connecting to host '%s' (port %s) as user '%s' via SSH "
+            "(timeout %ds)...", self.remote_frontend, self.port,
+            self.username, self.timeout)
+        try:
+            client.connect(self.remote_frontend,
+                           timeout=self.timeout,
+                           username=self.username,
+                           port=self.port,
+                           pkey=self.pkey,
+                           allow_agent=True,
+                           key_filename=self.keyfile,
+                           sock=proxy)
+        except ValueError as err:
+            msg = str(err)
+            if msg.startswith("q must be exactly") or msg.startswith("p must be exactly"):
+                # warn and continue, this is just Paramiko mistakenly using an RSA
+                # key as DSA one, see: https://github.com/paramiko/paramiko/pull/1606
+                warn(
+                    "The configured SSH private RSA key file `{0}`"
+                    " can also be mistakenly read as a DSA key file."
+                    " If you run into SSH connection problems, use"
+                    " a different key."
+                    .format(self.keyfile))
+            else:
+                raise
+        transport = client.get_transport()
+        if self.keepalive > 0 and transport is not None:
+            transport.set_keepalive(self.keepalive)
+
+    _STDIN_CHUNK_SIZE = 32768
+
+    @contextmanager
+    def _lease(self):
+        """
+        Reserve a connection from the pool for running one command.
+
+        Return a context manager yielding a connected
+        `paramiko.SSHClient` object; the connection is given back to
+        the pool when the ``with`` block ends.
+        """
+        conn = self._acquire()
+        try:
+            yield conn.client
+        finally:
+            with self._pool_lock:
+                conn.leases -= 1
+                conn.last_used = time.time()
+                self._pool_lock.notify()
+
+    def _acquire(self):
+        # ensure the main connection is up (reconnect if needed)
+        self.connect()
+        with self._pool_lock:
+            self._queued += 1
+            try:
+                while True:
+                    self._evict_idle_connections()
+                    available = [
+                        conn for conn in self._pool
+                        if conn.leases < self.max_channels_per_connection]
+                    if available:
+                        conn = min(available, key=(lambda c: c.leases))
+                        conn.leases += 1
+                        return conn
+                    if len(self._pool) + self._opening < self.max_connections:
+                        break
+                    self._pool_lock.wait(self.timeout)
+                self._opening += 1
+            finally:
+                self._queued -= 1
+        # open a new connection outside of the lock, as it may take time
+        try:
+            gc3libs.log.debug(
+                "Opening additional SSH connection to host '%s' ...",
+                self.remote_frontend)
+            client = paramiko.SSHClient()
+            self._open_client(client)
+            conn = _PooledConnection(client)
+            conn.leases = 1
+        except Exception as err:
+            raise gc3libs.exceptions.TransportError(
+                "Failed connecting to remote host '{hostname}': {msg}"
+                .format(hostname=self.remote_frontend, msg=err))
+        finally:
+            with self._pool_lock:
+                self._opening -= 1
+        with self._pool_lock:
+            self._pool.append(conn)
+        return conn
+
+    def _evict_idle_connections(self):
+        # caller must hold `self._pool_lock`
+        now = time.time()
+        keep = [self._pool[0]]
+        for conn in self._pool[1:]:
+            if conn.leases == 0 and (
+                    not conn.is_active()
+                    or now - conn.last_used > self.idle_timeout):
+                gc3libs.log.debug(
+                    "Closing idle or broken SSH connection to host '%s'",
+                    self.remote_frontend)
+                conn.client.close()
+            else:
+                keep.append(conn)
+        self._pool = keep
+
+    @property
+    def metrics(self):
+        """
+        Dictionary of usage statistics for the SSH connection pool.
+
+        Keys are:
+
+        * ``open_connections``: number of established SSH connections;
+        * ``active_leases``: number of commands currently running;
+        * ``queued_leases``: number of commands waiting for a
+          connection to become available;
+        * ``commands``: total number of commands run so far;
+        * ``mean_rtt``: average time (in seconds) taken to run a command
+          and get its output back.
+        """
+        with self._pool_lock:
+            return {
+                'open_connections': sum(
+                    1 for conn in self._pool if conn.is_active()),
+                'active_leases': sum(conn.leases for conn in self._pool),
+                'queued_leases': self._queued,
+                'commands': self._commands,
+                'mean_rtt': (self._total_rtt / self._commands
+                             if self._commands else 0.0),
+            }
+
     @same_docstring_as(Transport.chmod)
     def chmod(self, path, mode):
         try:
@@ -777,22 +1095,35 @@ class SshTransport(Transport):
                 % (path, mode, ex.__class__.__name__, str(ex)))
 
     @same_docstring_as(Transport.execute_command)
-    def execute_command(self, command, detach=False):
+    def execute_command(self, command, detach=False, stdin=None):
         try:
-            # check connection first
-            self.connect()
             if detach:
                 command = command + ' &'
             gc3libs.log.debug("SshTransport running `%s`... ", command)
-            stdin_stream, stdout_stream, stderr_stream = \
-                self.ssh.exec_command(command)
-            if detach:
-                stdout = ''
-                stderr = ''
-            else:
-                stdout = to_str(stdout_stream.read(), 'filesystem')
-                stderr = to_str(stderr_stream.read(), 'filesystem')
-            exitcode = stdout_stream.channel.recv_exit_status()
+            # get a connection from the pool (this also checks that
+            # the main connection is up)
+            with self._lease() as client:
+                start = time.time()
+                stdin_stream, stdout_stream, stderr_stream = \
+                    client.exec_command(command)
+                if stdin is not None:
+                    while True:
+                        data = stdin.read(self._STDIN_CHUNK_SIZE)
+                        if not data:
+                            break
+                        stdin_stream.channel.sendall(data)
+                    stdin_stream.channel.shutdown_write()
+                if detach:
+                    stdout = ''
+                    stderr = ''
+                else:
+                    stdout = to_str(stdout_stream.read(), 'filesystem')
+                    stderr = to_str(stderr_stream.read(), 'filesystem')
+                exitcode = stdout_stream.channel.recv_exit_status()
+                elapsed = time.time() - start
+            with self._pool_lock:
+                self._commands += 1
+                self._total_rtt += elapsed
             gc3libs.log.debug(
                 "Executed command '%s' on host '%s'; exit code: %d"
                 % (command, self.remote_frontend, exitcode))
@@ -937,6 +1268,135 @@ class SshTransport(Transport):
         Transport.get(self, source, destination,
                       ignore_nonexisting, overwrite, changed_only)
 
+    _GET_MANY_TAR_THRESHOLD = 16
+    """
+    Minimum number of files for which `get_many` uses a TAR stream.
+    """
+
+    _GET_MANY_PREFETCH_FILES = 16
+    """
+    Maximum number of files whose download is pipelined over SFTP.
+    """
+
+    def _get_many_impl(self, transfers):
+        """
+        Copy files from the remote host in bulk.
+
+        If there are many files to copy, request a TAR archive of them
+        all on the standard output of a single remote ``tar`` command
+        and unpack it on the fly; otherwise (or if the ``tar`` command
+        fails) download them over SFTP, issuing read requests for
+        several small files at once to avoid waiting one round-trip
+        time per file.
+        """
+        if (len(transfers) >= self._GET_MANY_TAR_THRESHOLD
+                and all(src.startswith('/') for src, _, _, _ in transfers)):
+            try:
+                transfers = self._get_many_tar(transfers)
+            except Exception as err:
+                gc3libs.log.debug(
+                    "Could not download files from host '%s' as a TAR"
+                    " stream (%s: %s); using SFTP instead.",
+                    self.remote_frontend, err.__class__.__name__, err)
+        self._get_many_sftp(transfers)
+
+    def _get_many_tar(self, transfers):
+        """
+        Download `transfers` through a TAR stream.
+
+        Return the list of transfers that could not be completed
+        this way.
+        """
+        wanted = dict((src.lstrip('/'), (src, dst, size, mode))
+                      for src, dst, size, mode in transfers)
+        names = ''.join((name + '\n') for name in wanted)
+        with self._lease() as client:
+            stdin_stream, stdout_stream, stderr_stream = \
+                client.exec_command('tar -c -f - -C / -T -')
+            # feed the file list from another thread: with a long
+            # list, `tar` starts writing to stdout before it has read
+            # all of it, and would block if we did not read its
+            # output while sending
+            writer = threading.Thread(
+                target=self._send_names,
+                args=(stdin_stream.channel, names.encode('utf-8')),
+                name='tar file list writer')
+            writer.daemon = True
+            writer.start()
+            tar = tarfile.open(fileobj=stdout_stream, mode='r|')
+            try:
+                for member in tar:
+                    if not member.isfile() or member.name not in wanted:
+                        continue
+                    src, dst, size, mode = wanted.pop(member.name)
+                    with open(dst, 'wb') as fdst:
+                        shutil.copyfileobj(tar.extractfile(member), fdst,
+                                           self.large_file_chunk_size)
+                    os.chmod(dst, mode)
+            finally:
+                tar.close()
+            stdout_stream.channel.recv_exit_status()
+            writer.join()
+        return list(wanted.values())
+
+    @staticmethod
+    def _send_names(channel, names):
+        # pylint: disable=broad-except
+        try:
+            channel.sendall(names)
+            channel.shutdown_write()
+        except Exception as err:
+            # `tar` then sees a truncated list; files it does not send
+            # are left to the caller to download in some other way
+            gc3libs.log.debug(
+                "Could not send file list to `tar`: %s: %s",
+                err.__class__.__name__, err)
+
+    @same_docstring_as(Transport.follow)
+    def follow(self, path, callback):
+        command = ('tail -n 0 -F %s 2>/dev/null' % sh_quote_safe(path))
+        try:
+            # use the main connection, so that no channel in the
+            # pool is taken for as long as the file is followed
+            self.connect()
+            gc3libs.log.debug("SshTransport running `%s`... ", command)
+            _, stdout_stream, _ = self.ssh.exec_command(command)
+        except Exception as ex:
+            raise gc3libs.exceptions.TransportError(
+                "Failed executing remote command '%s': %s: %s"
+                % (command, ex.__class__.__name__, str(ex)))
+        follower = _Follower(
+            stdout_stream, callback,
+            name=('follow {0}:{1}'.format(self.remote_frontend, path)))
+        follower.start()
+        return follower
+
+    def _get_many_sftp(self, transfers):
+        small = []
+        for transfer in transfers:
+            if transfer[2] < self.large_file_threshold:
+                small.append(transfer)
+            else:
+                src, dst, size, mode = transfer
+                self._get_impl(src, dst)
+                os.chmod(dst, mode)
+        batch = self._GET_MANY_PREFETCH_FILES
+        for start in range(0, len(small), batch):
+            handles = []
+            try:
+                for src, dst, size, mode in small[start:start+batch]:
+                    fsrc = self.sftp.open(src, 'rb')
+                    handles.append((fsrc, dst, mode))
+                    fsrc.prefetch(size)
+                for fsrc, dst, mode in handles:
+                    with open(dst, 'wb') as fdst:
+                        shutil.copyfileobj(fsrc, fdst,
+                                           self.large_file_chunk_size)
+                    os.chmod(dst, mode)
+            finally:
+                for fsrc, _, _ in handles:
+                    fsrc.close()
+
     def _get_impl(self, source, destination):
         if self.stat(source).st_size < self.large_file_threshold:
             self.sftp.get(source, destination)
@@ -1018,11 +1478,72 @@ class SshTransport(Transport):
             self.ssh.close()
             gc3libs.log.info("... ssh connection to '%s' closed",
                              self.remote_frontend)
+        with self._pool_lock:
+            for conn in self._pool[1:]:
+                conn.client.close()
+            del self._pool[1:]
         self._is_open = False
         # gc3libs.log.debug("Closed SshTransport to host '%s'"
         # % self.remote_frontend)
 
 
+class _PooledConnection(object):
+    """
+    An SSH connection in the `SshTransport` pool, with its usage count.
+    """
+    __slots__ = ['client', 'leases', 'last_used']
+
+    def __init__(self, client):
+        self.client = client
+        self.leases = 0
+        self.last_used = time.time()
+
+    def is_active(self):
+        transport = self.client.get_transport()
+        return transport is not None and transport.is_active()
+
+
+class _Follower(threading.Thread):
+    """
+    Pass each line of a remote command's output to a callback.
+
+    Reading stops when the command ends, e.g., because `stop`:meth:
+    was called or the SSH connection was closed.
+    """
+
+    def __init__(self, stream, callback, name=None):
+        threading.Thread.__init__(self, name=name)
+        self.daemon = True
+        self._stream = stream
+        self._callback = callback
+
+    def run(self):
+        # pylint: disable=broad-except
+        try:
+            while True:
+                line = self._stream.readline()
+                if not line:
+                    break
+                line = to_str(line, 'filesystem').strip()
+                if not line:
+                    continue
+                try:
+                    self._callback(line)
+                except Exception as err:
+                    gc3libs.log.debug(
+                        "Ignoring error in processing line '%s' of %s: %s: %s",
+                        line, self.name, err.__class__.__name__, err)
+        except Exception as err:
+            gc3libs.log.debug(
+                "Stopped %s: %s: %s", self.name, err.__class__.__name__, err)
+
+    def stop(self):
+        """
+        Stop reading, and end the remote command.
+        """
+        self._stream.channel.close()
+
+
 # -----------------------------------------------------------------------------
 # Local Transport class
 #
@@ -1121,26 +1642,37 @@ class LocalTransport(Transport):
             return -1
 
     @same_docstring_as(Transport.execute_command)
-    def execute_command(self, command, detach=False):
+    def execute_command(self, command, detach=False, stdin=None):
         assert self._is_open is True, \
             "`Transport.execute_command()` called" \
             " on closed (or not yet opened) `Transport` instance."
         if detach:
             command = command + ' &'
         try:
+            # feed real files directly to the child process, read
+            # other file-like objects in memory
+            try:
+                stdin.fileno()
+                input_data = None
+            except (AttributeError, IOError, ValueError):
+                input_data = (stdin.read() if stdin is not None else None)
+                stdin = subprocess.PIPE if stdin is not None else None
             process = subprocess.Popen(
                 command,
+                stdin=stdin,
                 stdout=(None if detach else subprocess.PIPE),
                 stderr=(None if detach else subprocess.PIPE),
                 close_fds=True, shell=True)
             if detach:
+                if input_data is not None:
+                    process.communicate(input_data)
                 process.wait()
                 exitcode = process.returncode
                 stdout = ''
                 stderr = ''
             else:
                 self._process = process
-                stdout, stderr = self._process.communicate()
+                stdout, stderr = self._process.communicate(input_data)
                 exitcode = self._process.returncode
             gc3libs.log.debug(
                 "Executed local command '%s', got exit status: %d",
@@ -891,6 +891,7 @@ class _SessionBasedCommand(_Script):
 
         # add new jobs to the session
         existing_job_names = self.session.list_names()
+        tasks = []
         for n, item in enumerate(new_jobs):
             if isinstance(item, tuple):
                 # create a new `Task` object
@@ -932,8 +933,11 @@ class _SessionBasedCommand(_Script):
                 # user did not change the `output_dir` default, expand it now
                 self.__fix_output_dir(task, task.jobname)
 
-            # all done, append to session
-            self.session.add(task, flush=False)
+            tasks.append(task)
+
+        # all done, append to session
+        self.session.add_many(tasks, flush=False)
+        for task in tasks:
             self.log.debug("Added task '%s' to session.", task.jobname)
 
     def __make_task_from_old_style_args(self, item):
@@ -1357,8 +1361,8 @@ class _SessionBasedCommand(_Script):
                         err.__class__.__name__,
                         str(err))
                 task.detach()
-                self.session.remove(task_id)
-                self.log.debug("Removed task '%s' from session.", task)
+            self.session.remove_many(old_task_ids)
+            self.log.debug("Removed %d tasks from session.", len(old_task_ids))
             self.log.info(
                 "Done cleaning up old session tasks, starting with new one"
                 " afresh...")
@@ -1367,18 +1371,25 @@ class _SessionBasedCommand(_Script):
         """
         Pause execution for `lapse` seconds.
 
-        The default implementation just calls ``time.sleep(lapse)``.
+        The default implementation just calls ``time.sleep(lapse)``,
+        but returns early if the task controller reports that a job
+        has ended (see `gc3libs.core.Engine.wait`:meth:), so that
+        finished tasks are processed at once.
 
         This is provided as an overrideable method so that one can use
         a different system call to comply with other threading models
         (e.g., gevent).
         """
+        wait = getattr(self._controller, 'wait', None)
         # Python scripts become unresponsive during
         # `time.sleep()`, so we just do the wait in small
         # steps, to allow the interpreter to process
         # interrupts in the breaks.  Ugly, but works...
         for x in range(self.params.wait):
-            time.sleep(1)
+            if wait is None:
+                time.sleep(1)
+            elif wait(1):
+                break
 
 
 
@@ -692,9 +692,14 @@ class Configuration(gc3libs.utils.Struct):
         'max_walltime'        : _legacy_parse_duration,
         'override'            : gc3libs.utils.string_to_boolean,
         'port'                : int,
+        'ssh_max_connections' : int,
+        'ssh_max_channels_per_connection': int,
+        'ssh_keepalive'       : int,
+        'ssh_idle_timeout'    : int,
         'vm_os_overhead'      : _legacy_parse_os_overhead,
         'large_file_threshold': (lambda val: _legacy_parse_memory(val, 'large_file_threshold', MB, 'MB')),
         'large_file_chunk_size':(lambda val: _legacy_parse_memory(val, 'large_file_chunk_size', MB, 'MB')),
+        'input_cache_quota'   : (lambda val: _legacy_parse_memory(val, 'input_cache_quota', MB, 'MB')),
         # LSF-specific
         'lsf_continuation_line_prefix_length': int,
     }
@@ -21,27 +21,37 @@ Top-level classes for task execution and control.
 
 
 from __future__ import absolute_import, print_function, unicode_literals
+from future import standard_library
+standard_library.install_aliases()
 from builtins import next
 from builtins import filter
 from builtins import str
 from builtins import range
 from builtins import object
 from collections import defaultdict, deque
+from datetime import datetime
 from fnmatch import fnmatch
 import functools
+import heapq
 import itertools
+from multiprocessing.pool import ThreadPool
 import os
 import posix
+from queue import Queue
 import sys
+import threading
 import time
 import tempfile
 from warnings import warn
+import weakref
 
 from dictproxyhack import dictproxy
 
 import gc3libs
 from gc3libs import Application, Run, Task
-from gc3libs.events import TaskStateChange, TermStatusChange
+import gc3libs.defaults
+import gc3libs.events
+from gc3libs.events import JobDone, TaskStateChange, TermStatusChange
 import gc3libs.exceptions
 from gc3libs.quantity import Duration
 import gc3libs.utils as utils
@@ -75,8 +85,36 @@ class MatchMaker(object):
     - *rank phase:* sort resources according to the task's
       `rank_resources` method, or retain the given order if task does
       not define such method.
+
+    Tasks can provide a `requirements_signature` method (as instances
+    of `Application`:class: do): during a scheduling cycle, the
+    results of `filter` and `rank` are then computed only once for
+    all tasks with the same signature; see `signature`:meth:.
     """
 
+    def signature(self, task):
+        """
+        Return the key under which results of matching `task` can be cached.
+
+        Tasks with equal signatures must get the same result from
+        `filter`:meth: and `rank`:meth:; a return value of ``None``
+        means that results for `task` should not be cached.
+
+        The default implementation returns the value of the task's
+        `requirements_signature` method, or ``None`` if the task
+        does not provide such a method, or if a derived class
+        overrides `filter` or `rank` without overriding this method.
+        """
+        cls = type(self)
+        if (cls.signature is MatchMaker.signature
+                and (cls.filter is not MatchMaker.filter
+                     or cls.rank is not MatchMaker.rank)):
+            return None
+        requirements_signature = getattr(task, 'requirements_signature', None)
+        if requirements_signature is None:
+            return None
+        return requirements_signature()
+
     # pylint: disable=no-self-use
     def filter(self, task, resources):
         """
@@ -124,6 +162,58 @@ class MatchMaker(object):
         return targets
 
 
+class _MatchCache(object):
+    """
+    Cache results of a `MatchMaker` for the duration of a scheduling cycle.
+
+    Results of `filter` and `rank` are cached by task signature (see
+    `MatchMaker.signature`:meth:).  Ranked lists are dropped whenever
+    a task is submitted, since submission changes the load figures
+    that resources are ranked by; everything is dropped whenever the
+    list of available resources changes.
+    """
+
+    def __init__(self, matchmaker):
+        self.matchmaker = matchmaker
+        self._filtered = {}
+        self._ranked = {}
+
+    def filter(self, task, resources):
+        """
+        Same as `MatchMaker.filter`:meth:, but cached by task signature.
+        """
+        key = self.matchmaker.signature(task)
+        if key is None:
+            return self.matchmaker.filter(task, resources)
+        if key not in self._filtered:
+            self._filtered[key] = self.matchmaker.filter(task, resources)
+        return list(self._filtered[key])
+
+    def rank(self, task, resources):
+        """
+        Same as `MatchMaker.rank`:meth:, but cached by task signature.
+        """
+        key = self.matchmaker.signature(task)
+        if key is None:
+            return self.matchmaker.rank(task, resources)
+        if key not in self._ranked:
+            self._ranked[key] = self.matchmaker.rank(task, resources)
+        return list(self._ranked[key])
+
+    def submitted(self):
+        """
+        Drop cached rankings after a successful submission.
+        """
+        self._ranked.clear()
+
+    def invalidate(self):
+        """
+        Drop all cached results.
+        """
+        self._filtered.clear()
+        self._ranked.clear()
+
+
 class Core(object):
     """
     Core operations: submit, update state, retrieve (a snapshot of) output,
@@ -144,6 +234,11 @@ class Core(object):
     variable ``GC3PIE_RESOURCE_INIT_ERRORS_ARE_FATAL`` to ``yes`` or ``1``.
     """
 
+    UPDATE_RESOURCES_THREADS = 8
+    """
+    Maximum number of resources that `update_resources` queries concurrently.
+    """
+
     def __init__(self, cfg, matchmaker=MatchMaker(),
                  resource_errors_are_fatal=None):
         # propagate resource init errors?
@@ -440,76 +535,75 @@ class Core(object):
         # auto_enable_auth = extra_args.get(
         #     'auto_enable_auth', self.auto_enable_auth)
 
+        # group applications by resource, so that each backend can
+        # query the state of all its jobs in one go
+        by_resource = defaultdict(list)
         for app in apps:
             state = app.execution.state
-            old_state = state
             gc3libs.log.debug(
                 "About to update state of application: %s (currently: %s)",
                 app,
                 state)
+            if state not in [
+                    Run.State.NEW,
+                    Run.State.TERMINATING,
+                    Run.State.TERMINATED,
+            ]:
+                by_resource[app.execution.resource_name].append(app)
+
+        for group in by_resource.values():
+            self._update_job_states(
+                group, self._query_job_states(group), update_on_error)
+
+    # The operations on `Application` objects that involve talking to
+    # a backend are split in two halves: the first one only runs the
+    # backend methods and returns their outcome, the second one
+    # updates the application state (possibly triggering state
+    # transition handlers) according to that outcome.  This allows
+    # the `Engine` to run the first half in a worker thread, and the
+    # second one in its own thread.
+
+    def _query_job_states(self, apps):
+        """
+        Query the state of `apps`; first half of `update_job_state`.
+
+        Return a list with one item per task in `apps`, in the same
+        order: each item is what `LRMS.update_job_states`:meth:
+        returned for that task, i.e., either its new state or the
+        exception raised while trying to determine it.
+        """
+        by_resource = defaultdict(list)
+        for n, app in enumerate(apps):
+            by_resource[app.execution.resource_name].append(n)
+        results = [None] * len(apps)
+        for resource_name, indices in by_resource.items():
+            group = [apps[n] for n in indices]
+            # pylint: disable=broad-except
             try:
-                if state not in [
-                        Run.State.NEW,
-                        Run.State.TERMINATING,
-                        Run.State.TERMINATED,
-                ]:
-                    lrms = self.get_backend(app.execution.resource_name)
-                    try:
-                        state = lrms.update_job_state(app)
-                    # pylint: disable=broad-except
-                    except Exception as ex:
-                        gc3libs.log.debug(
-                            "Error getting status of application '%s': %s: %s",
-                            app, ex.__class__.__name__, ex, exc_info=True)
-                        state = Run.State.UNKNOWN
-                        # run error handler if defined
-                        ex = app.update_job_state_error(ex)
-                        if isinstance(ex, Exception):
-                            raise ex
-                    if state != old_state:
-                        app.changed = True
-                        # set log information accordingly
-                        if (app.execution.state == Run.State.TERMINATING
-                                and app.execution.returncode is not None
-                                and app.execution.returncode != 0):
-                            # there was some error, try to explain
-                            app.execution.info = (
-                                "Execution failed on resource: %s" %
-                                app.execution.resource_name)
-                            signal = app.execution.signal
-                            if signal in Run.Signals:
-                                app.execution.info = (
-                                    "Abnormal termination: %s" % signal)
-                            else:
-                                if os.WIFSIGNALED(app.execution.returncode):
-                                    app.execution.info = (
-                                        "Remote job terminated by signal %d" %
-                                        signal)
-                                else:
-                                    app.execution.info = (
-                                        "Remote job exited with code %d" %
-                                        app.execution.exitcode)
-
-                    if state != Run.State.UNKNOWN or update_on_error:
-                        app.execution.state = state
-
-            except (gc3libs.exceptions.InvalidArgument,
-                    gc3libs.exceptions.ConfigurationError,
-                    gc3libs.exceptions.UnrecoverableAuthError,
-                    gc3libs.exceptions.FatalError):
-                # Unrecoverable; no sense in continuing --
-                # pass immediately on to client code and let
-                # it handle this...
-                raise
+                lrms = self.get_backend(resource_name)
+                outcome = lrms.update_job_states(group)
+            except gc3libs.exceptions.InvalidResourceName as err:
+                outcome = [err] * len(group)
+            except Exception as err:
+                # do not let one faulty resource block updates on the
+                # others: treat the error as the outcome of each query
+                gc3libs.log.debug(
+                    "Error updating state of %d tasks on resource '%s':"
+                    " %s: %s", len(group), resource_name,
+                    err.__class__.__name__, err)
+                outcome = [err] * len(group)
+            for n, result in zip(indices, outcome):
+                results[n] = result
+        return results
 
-            except gc3libs.exceptions.UnknownJob:
-                # information about the job is lost, mark it as failed
-                app.execution.returncode = (Run.Signals.Lost, -1)
-                app.execution.state = Run.State.TERMINATED
-                app.changed = True
-                continue
+    def _update_job_states(self, apps, results, update_on_error=False):
+        """
+        Update `apps` from `results`; second half of `update_job_state`.
 
-            except gc3libs.exceptions.InvalidResourceName:
+        Argument `results` is the list returned by `_query_job_states`.
+        """
+        for app, result in zip(apps, results):
+            if isinstance(result, gc3libs.exceptions.InvalidResourceName):
                 # could be the corresponding LRMS has been removed
                 # because of an unrecoverable error mark application
                 # as state UNKNOWN
@@ -520,34 +614,98 @@ class Core(object):
                 app.execution.state = Run.State.TERMINATED
                 app.changed = True
                 continue
+            self.__update_application_from(app, result, update_on_error)
 
-            # This catch-all clause is needed otherwise the loop stops
-            # at the first erroneous iteration
-            #
-            # pylint: disable=broad-except
-            except Exception as ex:
-                if gc3libs.error_ignored(
-                        # context:
-                        # - module
-                        'core',
-                        # - class
-                        'Core',
-                        # - method
-                        'update_job_state',
-                        # - actual error class
-                        ex.__class__.__name__,
-                        # - additional keywords
-                        'update',
-                ):
-                    gc3libs.log.warning(
-                        "Ignored error in Core.update_job_state(): %s", ex)
-                    # print again with traceback at a higher log level
-                    gc3libs.log.debug(
-                        "(Original traceback follows.)", exc_info=True)
-                    continue
-                else:
-                    # propagate generic exceptions for debugging purposes
-                    raise
+    def __update_application_from(self, app, result, update_on_error):
+        """
+        Update `app` with the `result` of querying its backend.
+
+        Argument `result` is one item of the list returned by
+        `LRMS.update_job_states`:meth:, i.e., either the new state of
+        `app` or the exception raised while trying to determine it.
+        """
+        old_state = app.execution.state
+        try:
+            if isinstance(result, Exception):
+                ex = result
+                gc3libs.log.debug(
+                    "Error getting status of application '%s': %s: %s",
+                    app, ex.__class__.__name__, ex)
+                state = Run.State.UNKNOWN
+                # run error handler if defined
+                ex = app.update_job_state_error(ex)
+                if isinstance(ex, Exception):
+                    raise ex
+            else:
+                state = result
+            if state != old_state:
+                app.changed = True
+                # set log information accordingly
+                if (app.execution.state == Run.State.TERMINATING
+                        and app.execution.returncode is not None
+                        and app.execution.returncode != 0):
+                    # there was some error, try to explain
+                    app.execution.info = (
+                        "Execution failed on resource: %s" %
+                        app.execution.resource_name)
+                    signal = app.execution.signal
+                    if signal in Run.Signals:
+                        app.execution.info = (
+                            "Abnormal termination: %s" % signal)
+                    else:
+                        if os.WIFSIGNALED(app.execution.returncode):
+                            app.execution.info = (
+                                "Remote job terminated by signal %d" %
+                                signal)
+                        else:
+                            app.execution.info = (
+                                "Remote job exited with code %d" %
+                                app.execution.exitcode)
+
+            if state != Run.State.UNKNOWN or update_on_error:
+                app.execution.state = state
+
+        except (gc3libs.exceptions.InvalidArgument,
+                gc3libs.exceptions.ConfigurationError,
+                gc3libs.exceptions.UnrecoverableAuthError,
+                gc3libs.exceptions.FatalError):
+            # Unrecoverable; no sense in continuing --
+            # pass immediately on to client code and let
+            # it handle this...
+            raise
+
+        except gc3libs.exceptions.UnknownJob:
+            # information about the job is lost, mark it as failed
+            app.execution.returncode = (Run.Signals.Lost, -1)
+            app.execution.state = Run.State.TERMINATED
+            app.changed = True
+
+        # This catch-all clause is needed otherwise the loop stops
+        # at the first erroneous iteration
+        #
+        # pylint: disable=broad-except
+        except Exception as ex:
+            if gc3libs.error_ignored(
+                    # context:
+                    # - module
+                    'core',
+                    # - class
+                    'Core',
+                    # - method
+                    'update_job_state',
+                    # - actual error class
+                    ex.__class__.__name__,
+                    # - additional keywords
+                    'update',
+            ):
+                gc3libs.log.warning(
+                    "Ignored error in Core.update_job_state(): %s", ex)
+                # print again with traceback at a higher log level
+                gc3libs.log.debug(
+                    "(Original traceback follows.)", exc_info=True)
+            else:
+                # propagate generic exceptions for debugging purposes
+                raise
 
     # pylint: disable=no-self-use
     def __update_task(self, tasks, **extra_args):
@@ -619,64 +777,93 @@ class Core(object):
     def __fetch_output_application(
             self, app, download_dir, overwrite, changed_only, **extra_args):
         """Implementation of `fetch_output` on `Application` objects."""
+        # auto_enable_auth = extra_args.get(
+        #     'auto_enable_auth', self.auto_enable_auth)
+        return self._got_results(
+            app, self._get_results(app, download_dir, overwrite, changed_only))
+
+    def _get_results(self, app, download_dir, overwrite, changed_only):
+        """
+        Download output files of `app`; first half of `fetch_output`.
+
+        Return a pair *(download_dir, err)*: the actual download
+        directory (or ``None`` if `app` has no output to download),
+        and the exception raised by the backend, or ``None`` if the
+        download succeeded.
+        """
         job = app.execution
         if job.state in [Run.State.NEW, Run.State.SUBMITTED]:
             raise gc3libs.exceptions.OutputNotAvailableError(
                 "Output not available: '%s' currently in state '%s'"
                 % (app, app.execution.state))
 
-        # auto_enable_auth = extra_args.get(
-        #     'auto_enable_auth', self.auto_enable_auth)
-
         # determine download directory
         #
         # pylint: disable=protected-access
         download_dir = app._get_download_dir(download_dir)
+        if download_dir is None:
+            return None, None
 
-        if download_dir is not None:
-            # Prepare/Clean download dir
-            try:
-                if overwrite:
-                    if not os.path.exists(download_dir):
-                        os.makedirs(download_dir)
-                else:
-                    utils.mkdir_with_backup(download_dir)
-            except Exception as ex:
-                gc3libs.log.error(
-                    "Failed creating download directory '%s': %s: %s",
-                    download_dir,
-                    ex.__class__.__name__,
-                    str(ex))
-                raise
+        # Prepare/Clean download dir
+        try:
+            if overwrite:
+                if not os.path.exists(download_dir):
+                    os.makedirs(download_dir)
+            else:
+                utils.mkdir_with_backup(download_dir)
+        except Exception as ex:
+            gc3libs.log.error(
+                "Failed creating download directory '%s': %s: %s",
+                download_dir,
+                ex.__class__.__name__,
+                str(ex))
+            raise
 
-            # download job output
-            try:
-                lrms = self.get_backend(job.resource_name)
-                lrms.get_results(app, download_dir, overwrite, changed_only)
+        # download job output
+        #
+        # pylint: disable=broad-except
+        try:
+            lrms = self.get_backend(job.resource_name)
+            lrms.get_results(app, download_dir, overwrite, changed_only)
+        except Exception as err:
+            return download_dir, err
+        return download_dir, None
+
+    def _got_results(self, app, outcome):
+        """
+        Update `app` after fetching its output; second half of `fetch_output`.
+
+        Argument `outcome` is the pair returned by `_get_results`.
+        """
+        job = app.execution
+        download_dir, err = outcome
+        if download_dir is not None:
+            if err is None:
                 # clear previous data staging errors
                 if job.signal == Run.Signals.DataStagingFailure:
                     job.signal = 0
-            except gc3libs.exceptions.InvalidResourceName as err:
+            elif isinstance(err, gc3libs.exceptions.InvalidResourceName):
                 ex = app.fetch_output_error(err)
                 if isinstance(ex, Exception):
                     job.info = ("No output could be retrieved: %s" % (ex,))
                     raise ex
                 else:
                     return
-            except gc3libs.exceptions.RecoverableDataStagingError as rex:
+            elif isinstance(
+                    err, gc3libs.exceptions.RecoverableDataStagingError):
                 job.info = ("Temporary failure when retrieving results: %s."
-                            " Ignoring error, try again." % str(rex))
+                            " Ignoring error, try again." % str(err))
                 return
-            except gc3libs.exceptions.UnrecoverableDataStagingError as ex:
+            elif isinstance(
+                    err, gc3libs.exceptions.UnrecoverableDataStagingError):
                 # pylint: disable=redefined-variable-type
                 job.signal = Run.Signals.DataStagingFailure
-                ex = app.fetch_output_error(ex)
+                ex = app.fetch_output_error(err)
                 if isinstance(ex, Exception):
                     job.info = ("No output could be retrieved: %s" % str(ex))
                     raise ex
-            # pylint: disable=broad-except
-            except Exception as ex:
-                ex = app.fetch_output_error(ex)
+            else:
+                ex = app.fetch_output_error(err)
                 if isinstance(ex, Exception):
                     raise ex
 
@@ -723,9 +910,16 @@ class Core(object):
 
     def __kill_application(self, app, **extra_args):
         """Implementation of `kill` on `Application` objects."""
-        job = app.execution
         # auto_enable_auth = extra_args.get(
         #     'auto_enable_auth', self.auto_enable_auth)
+        self._cancel_job(app)
+        self._mark_cancelled(app)
+
+    def _cancel_job(self, app):
+        """
+        Cancel the remote job running `app`; first half of `kill`.
+        """
+        job = app.execution
         try:
             lrms = self.get_backend(job.resource_name)
             lrms.cancel_job(app)
@@ -739,6 +933,12 @@ class Core(object):
                 "Cannot access computational resource '%s',"
                 " but marking task '%s' as TERMINATED anyway.",
                 app.execution.resource_name, app)
+
+    def _mark_cancelled(self, app):
+        """
+        Mark `app` as cancelled and TERMINATED; second half of `kill`.
+        """
+        job = app.execution
         gc3libs.log.debug(
             "Setting task '%s' status to TERMINATED"
             " and returncode to SIGCANCEL", app)
@@ -846,46 +1046,76 @@ class Core(object):
         resources configured in this `Core` instance (the actual
         `Lrms`:class: objects, not the resource names).  By default,
         all configured resources are updated.
+
+        A resource that was successfully updated less than
+        `status_ttl` seconds ago (a per-resource configuration value,
+        defaulting to `gc3libs.defaults.RESOURCE_STATUS_TTL`) is not
+        queried again, unless optional argument `force` is ``True``.
+        Resources that need to be queried are updated concurrently,
+        by up to `UPDATE_RESOURCES_THREADS` threads.
         """
         if resources is all:
             resources = list(self.resources.values())
-        for lrms in self.resources.values():
-            try:
-                if not lrms.enabled:
-                    continue
-                # auto_enable_auth = extra_args.get(
-                #     'auto_enable_auth', self.auto_enable_auth)
-                lrms.get_resource_status()
-                lrms.updated = True
-            except gc3libs.exceptions.UnrecoverableError as err:
-                # disable resource -- there's no point in
-                # trying it again at a later stage
-                lrms.enabled = False
-                lrms.updated = False
-                gc3libs.log.error(
-                    "Unrecoverable error updating status"
-                    " of resource '%s': %s."
-                    " Disabling resource.",
-                    lrms.name, err)
-                gc3libs.log.warning(
-                    "Resource %s will be ignored from now on.",
-                    lrms.name)
-                gc3libs.log.debug(
-                    "Got error '%s' in updating resource '%s';"
-                    " printing full traceback.",
-                    err.__class__.__name__, lrms.name,
-                    exc_info=True)
-            # pylint: disable=broad-except
-            except Exception as err:
-                gc3libs.log.error(
-                    "Ignoring error updating resource '%s': %s.",
-                    lrms.name, err)
-                gc3libs.log.debug(
-                    "Got error '%s' in updating resource '%s';"
-                    " printing full traceback.",
-                    err.__class__.__name__, lrms.name,
-                    exc_info=True)
-                lrms.updated = False
+        force = extra_args.get('force', False)
+        now = time.time()
+        stale = [
+            lrms for lrms in resources
+            if lrms.enabled and (
+                force or not lrms.updated
+                or (now - getattr(lrms, 'status_timestamp', 0)
+                    >= getattr(lrms, 'status_ttl', 0)))
+        ]
+        if len(stale) < 2:
+            for lrms in stale:
+                self.__update_resource(lrms)
+            return
+        pool = ThreadPool(min(self.UPDATE_RESOURCES_THREADS, len(stale)))
+        try:
+            pool.map(self.__update_resource, stale)
+        finally:
+            pool.close()
+            pool.join()
+
+    @staticmethod
+    def __update_resource(lrms):
+        """
+        Query resource `lrms` for its status; auxiliary to `update_resources`.
+        """
+        try:
+            # auto_enable_auth = extra_args.get(
+            #     'auto_enable_auth', self.auto_enable_auth)
+            lrms.get_resource_status()
+            lrms.updated = True
+            lrms.status_timestamp = time.time()
+        except gc3libs.exceptions.UnrecoverableError as err:
+            # disable resource -- there's no point in
+            # trying it again at a later stage
+            lrms.enabled = False
+            lrms.updated = False
+            gc3libs.log.error(
+                "Unrecoverable error updating status"
+                " of resource '%s': %s."
+                " Disabling resource.",
+                lrms.name, err)
+            gc3libs.log.warning(
+                "Resource %s will be ignored from now on.",
+                lrms.name)
+            gc3libs.log.debug(
+                "Got error '%s' in updating resource '%s';"
+                " printing full traceback.",
+                err.__class__.__name__, lrms.name,
+                exc_info=True)
+        # pylint: disable=broad-except
+        except Exception as err:
+            lrms.updated = False
+            gc3libs.log.error(
+                "Ignoring error updating resource '%s': %s.",
+                lrms.name, err)
+            gc3libs.log.debug(
+                "Got error '%s' in updating resource '%s';"
+                " printing full traceback.",
+                err.__class__.__name__, lrms.name,
+                exc_info=True)
 
     def close(self):
         """
@@ -1077,17 +1307,21 @@ def first_come_first_serve(task_queue, resources, matchmaker=MatchMaker()):
     the order they are sorted by `Application.rank_resources` (if that
     method exists).
 
+    Tasks with the same requirements are matched to resources only
+    once per scheduling cycle; see `MatchMaker.signature`:meth:.
+
     This is the default scheduling policy in GC3Pie's `Engine`:class.
     """
     assert resources, "No execution resources available!"
     # make a copy of the `resources` argument, so we can modify it
     # when e.g. disabling resources that are full
     resources = list(resources)
+    matches = _MatchCache(matchmaker)
     total = len(task_queue)
     for done in range(total):
         task = task_queue.get()
         # keep only compatible resources
-        compatible_resources = matchmaker.filter(task, resources)
+        compatible_resources = matches.filter(task, resources)
         if not compatible_resources:
             gc3libs.log.warning(
                 "No compatible resources for task '%s'"
@@ -1095,12 +1329,13 @@ def first_come_first_serve(task_queue, resources, matchmaker=MatchMaker()):
             task_queue.put(task)
             continue
         # sort them according to the Task's preference
-        targets = matchmaker.rank(task, compatible_resources)
+        targets = matches.rank(task, compatible_resources)
         # now try submission of the task to each resource until one succeeds
         for target in targets:
             try:
                 yield (task, target.name)
                 # submission successful, continue with next task
+                matches.submitted()
                 break
             except (gc3libs.exceptions.ResourceNotReady,
                     gc3libs.exceptions.MaximumCapacityReached) as exc:
@@ -1111,6 +1346,7 @@ def first_come_first_serve(task_queue, resources, matchmaker=MatchMaker()):
                     "Disabling resource `%s` for this scheduling cycle: %s",
                     target.name, exc)
                 resources.remove(target)
+                matches.invalidate()
                 continue
             # pylint: disable=broad-except
             except Exception as err:
@@ -1197,6 +1433,59 @@ class Engine(object):  # pylint: disable=too-many-instance-attributes
         ``False`` but this can (and should!) be changed in future
         releases.
 
+    `max_concurrent`
+      If >0, run the backend calls made by the kill, state update,
+      output retrieval and cleanup operations of `progress`:meth: on
+      a pool of this many worker threads, so that a slow resource does
+      not delay operations on the others.  Task state changes and
+      persistence still happen in the thread that calls
+      `progress`:meth:.  The default value 0
+      runs all operations sequentially.
+
+    `max_concurrent_per_resource`
+      Maximum number of operations running concurrently on any single
+      resource when `max_concurrent` is >0.  Default is 1; for
+      SSH-based resources, there is little point in setting this
+      higher than the resource's SSH connection pool size (see
+      `gc3libs.backends.transport.SshTransport`:class:).
+
+    `adaptive_polling`
+      If ``True``, `progress`:meth: does not update the state of all
+      in-flight tasks at every invocation, but only of those whose
+      next-poll deadline has passed.  Deadlines are computed from the
+      time elapsed since the last state change, the requested
+      walltime, the average queue wait observed on each resource,
+      and an exponential backoff for tasks whose state does not
+      change; see `Engine._PollingQueue`:class: for details.  The
+      default value ``False`` updates all in-flight tasks at every
+      invocation of `progress`:meth:.
+
+    `min_poll_interval`
+      Minimum interval (in seconds) between two state updates of
+      the same task, when `adaptive_polling` is ``True``.
+
+    `max_poll_interval`
+      Maximum interval (in seconds) between two state updates of
+      the same task, when `adaptive_polling` is ``True``.  This is
+      also the longest delay in noticing that a task has finished,
+      unless its backend reports the end of the job as soon as it
+      happens (see `wait`:meth:), as the ``shellcmd`` backend does
+      for processes running on the local host.
+
+    `max_in_memory`
+      If >0 and a `store` is given, keep at most this many task
+      objects in memory at the end of each `progress`:meth: cycle.
+      Tasks that need no action in the next cycle -- `TERMINATED`
+      ones, least recently finished first, and (with
+      `adaptive_polling`) in-flight tasks whose next-poll deadline is
+      farthest away -- are saved to the store and replaced by a
+      lightweight proxy recording their persistent ID, class, state
+      and next-poll deadline; they are loaded back when their
+      deadline comes, or when they are looked up with
+      `find_task_by_id`:meth:.  Counts of tasks by state
+      (`counts`:meth:) always include spilled tasks.  The default
+      value 0 keeps all tasks in memory.
+
     Any of the above can also be set by passing a keyword argument to
     the constructor (assume ``g`` is a `Core`:class: instance)::
 
@@ -1213,7 +1502,13 @@ class Engine(object):  # pylint: disable=too-many-instance-attributes
                  retrieve_running=False,
                  retrieve_overwrites=False,
                  retrieve_changed_only=True,
-                 forget_terminated=False):
+                 forget_terminated=False,
+                 max_concurrent=0,
+                 max_concurrent_per_resource=1,
+                 adaptive_polling=False,
+                 min_poll_interval=gc3libs.defaults.POLL_MIN_INTERVAL,
+                 max_poll_interval=gc3libs.defaults.POLL_MAX_INTERVAL,
+                 max_in_memory=0):
         """
         Create a new `Engine` instance.  Arguments are as follows:
 
@@ -1241,6 +1536,12 @@ class Engine(object):  # pylint: disable=too-many-instance-attributes
         :param bool retrieve_running:
         :param bool retrieve_overwrites:
         :param bool retrieve_changed_only:
+        :param int max_concurrent:
+        :param int max_concurrent_per_resource:
+        :param bool adaptive_polling:
+        :param min_poll_interval:
+        :param max_poll_interval:
+        :param int max_in_memory:
           Optional keyword arguments; see `Engine`:class: for a description.
 
         """
@@ -1249,6 +1550,18 @@ class Engine(object):  # pylint: disable=too-many-instance-attributes
         self._core = controller
         self._store = store
         self._tasks_by_id = {}
+        # proxies of tasks spilled to the store, by persistent ID
+        self._spilled = {}
+        # heap of `(deadline, seqno, persistent_id)` for spilled
+        # in-flight tasks; stale entries are skipped when popped
+        self._spilled_deadlines = []
+        self._spilled_seqno = itertools.count()
+        # `(resource name, job ID)` pairs of jobs reported done by
+        # backends since the last `progress` cycle; filled in by
+        # `_on_job_done` from any thread
+        self._jobs_done = set()
+        self._jobs_done_lock = threading.Lock()
+        self._wakeup = threading.Event()
 
         # public attributes
         self.can_submit = can_submit
@@ -1261,6 +1574,13 @@ class Engine(object):  # pylint: disable=too-many-instance-attributes
         self.retrieve_overwrites = retrieve_overwrites
         self.retrieve_changed_only = retrieve_changed_only
         self.forget_terminated = forget_terminated
+        self.max_concurrent = max_concurrent
+        self.max_concurrent_per_resource = max_concurrent_per_resource
+        self._dispatcher = None
+        self.adaptive_polling = adaptive_polling
+        self.min_poll_interval = min_poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.max_in_memory = max_in_memory
 
         # init counters/statistics
         self._counts = self._Counters(self)
@@ -1273,61 +1593,428 @@ class Engine(object):  # pylint: disable=too-many-instance-attributes
         # `TaskCollection` should not)
         self._counts.init_for(Application)
         TaskStateChange.connect(self._on_state_change)
+        JobDone.connect(self._on_job_done)
 
         # Engine fully initialized, add all tasks
         for task in tasks:
             self.add(task)
 
     def _on_state_change(self, task, from_state, to_state):
+        self.__resident(task)
         if task in self._managed:
             #gc3libs.log.debug("Task %s transitioned from %s to %s ...", task, from_state, to_state)
             self._counts.transitioned(task, from_state, to_state)
 
+    def _on_job_done(self, lrms, jobid):
+        with self._jobs_done_lock:
+            self._jobs_done.add((lrms.name, str(jobid)))
+        self._wakeup.set()
+
+    def wait(self, timeout=None):
+        """
+        Block until a backend reports a job as done, or `timeout` expires.
+
+        Return ``True`` if a job has been reported done since the
+        start of the last `progress`:meth: cycle (in which case the
+        next call to `progress`:meth: will update its task's state at
+        once, even if `adaptive_polling` would not otherwise poll it
+        yet), ``False`` if the timeout expired.  Only backends that
+        can detect the end of a job without being polled send such
+        reports; see `gc3libs.events.JobDone`.
+        """
+        done = self._wakeup.wait(timeout)
+        # Python 2.6 `Event.wait` always returns `None`
+        return bool(done or self._wakeup.is_set())
+
     class TaskQueue(object):
+        """
+        FIFO queue of tasks, with constant-time removal of any task.
+
+        Tasks are kept in a circular doubly-linked list, indexed by
+        the tasks' `id()`; therefore each task can be in the queue at
+        most once, and can be removed or moved to either end of the
+        queue in constant time.
+        """
+
         def __init__(self):
-            # the actual data structure used for keeping tasks
-            self._queue = deque()
+            # sentinel node of the circular list; each node is a
+            # list `[prev, next, task]`
+            self._root = root = []
+            root[:] = [root, root, None]
+            # map `id(task)` to the node holding `task`
+            self._nodes = {}
 
         def __iter__(self):
-            return iter(self._queue)
+            root = self._root
+            node = root[1]
+            while node is not root:
+                # read link first, in case the task is removed
+                # while the caller processes it
+                nxt = node[1]
+                yield node[2]
+                node = nxt
 
         def __len__(self):
-            return len(self._queue)
+            return len(self._nodes)
+
+        def __contains__(self, task):
+            return id(task) in self._nodes
+
+        def _link(self, task, front):
+            # unlink `task` if already in the queue, then insert it
+            # at the front or back of the queue
+            node = self._nodes.pop(id(task), None)
+            if node is not None:
+                self._unlink(node)
+            prev = (self._root if front else self._root[0])
+            nxt = prev[1]
+            node = [prev, nxt, task]
+            prev[1] = nxt[0] = node
+            self._nodes[id(task)] = node
+
+        @staticmethod
+        def _unlink(node):
+            prev, nxt, _ = node
+            prev[1] = nxt
+            nxt[0] = prev
 
         def add(self, task):
             """
             Add task in front of queue.
 
-            Does *not* check if already present.
+            If the task is already in the queue, it is moved to the front.
             """
-            self._queue.appendleft(task)
+            self._link(task, front=True)
 
         def get(self):
             """
             Pop the first task from the front of queue.
+
+            Raise `IndexError` if the queue is empty.
             """
-            task = self._queue.popleft()
+            node = self._root[1]
+            if node is self._root:
+                raise IndexError("get from an empty queue")
+            self._unlink(node)
+            task = node[2]
+            del self._nodes[id(task)]
             return task
 
         def put(self, task):
             """
             Add task to back of queue.
 
+            If the task is already in the queue, it is moved to the back.
+            """
+            self._link(task, front=False)
+
+        def remove(self, task):
+            """
+            Remove the given task from the queue.
+
+            Raise `ValueError` if the task is not in the queue.
+            """
+            try:
+                node = self._nodes.pop(id(task))
+            except KeyError:
+                raise ValueError("Task %s is not in the queue" % (task,))
+            self._unlink(node)
+
+        def evict(self, task):
+            """
+            Remove `task` from the queue, to be later put back with `restore`.
+
+            Return pair *(deadline, polls)* of values to pass to
+            `restore`:meth:; for a `TaskQueue` they are always ``None``.
+            """
+            self.remove(task)
+            return None, None
+
+        def restore(self, task, deadline, polls):
+            """
+            Put back a task removed with `evict`:meth:, at the back of queue.
+            """
+            # pylint: disable=unused-argument
+            self.put(task)
+
+        def due(self):
+            """
+            Return list of the tasks in the queue that should be processed now.
+
+            All tasks in a `TaskQueue` are always due; other queue
+            classes may select only some of them.  The caller should
+            then `get`:meth: as many tasks as the length of the list.
+            """
+            return list(self)
+
+
+    class _PollingQueue(TaskQueue):
+        """
+        Priority queue of in-flight tasks, keyed on their next-poll deadline.
+
+        When a task is `put`:meth: into the queue, a deadline for its
+        next state update is computed as follows:
+
+        * the polling interval starts at `min_interval` whenever the
+          task's state changes, and doubles each time the task is put
+          back into the queue with its state unchanged;
+
+        * the interval is never shorter than a fraction
+          (`AGE_FACTOR`) of the time elapsed since the last state
+          change, so that, e.g., tasks that have been queued for
+          hours are not polled every few seconds after a restart;
+
+        * if the end of the current state can be predicted -- from
+          the average queue wait of jobs observed on the same
+          resource for `SUBMITTED` tasks, and from the requested
+          walltime for `RUNNING` ones -- then the interval is
+          stretched to half the remaining time, but shortened so that
+          the task is polled no later than the predicted time;
+
+        * in any case, the interval is clamped between `min_interval`
+          and `max_interval`.
+
+        Tasks that are not `Application` instances (e.g., task
+        collections) do not cause any remote operation to be
+        updated, so they are always due.
+
+        Method `get`:meth: returns the task with the earliest
+        deadline; method `due`:meth: lists the tasks whose deadline
+        has passed.
+        """
+
+        AGE_FACTOR = 0.1
+        """
+        Minimum polling interval, as a fraction of the time since the
+        last state change.
+        """
+
+        WAIT_SMOOTHING = 0.25
+        """
+        Weight of a new observation in the moving average of queue
+        wait times on each resource.
+        """
+
+        def __init__(self, min_interval=gc3libs.defaults.POLL_MIN_INTERVAL,
+                     max_interval=gc3libs.defaults.POLL_MAX_INTERVAL):
+            # pylint: disable=super-init-not-called
+            self.min_interval = min_interval
+            self.max_interval = max_interval
+            # heap of `[deadline, seqno, task, job]` entries; removed
+            # tasks are marked by setting the entry's task to `None`
+            self._heap = []
+            self._seqno = itertools.count()
+            # map `id(task)` to heap entry, for all tasks in the queue
+            self._entries = {}
+            # map *(resource name, job ID)* to task, for all
+            # submitted `Application` tasks in the queue
+            self._jobs = {}
+            # map `id(task)` to the pair *(state, nr. of polls in
+            # that state)* for tasks in the queue or taken off it by
+            # `get` during the current `progress` cycle
+            self._polls = {}
+            # IDs of tasks taken off the queue by `get`
+            self._taken = set()
+            # moving average of queue wait time, by resource name
+            self.queue_wait = {}
+
+        def __iter__(self):
+            return iter([entry[2] for entry in self._entries.values()])
+
+        def __len__(self):
+            return len(self._entries)
+
+        def __contains__(self, task):
+            return id(task) in self._entries
+
+        def _push(self, task, deadline):
+            job = None
+            if isinstance(task, Application):
+                jobid = task.execution.get('lrms_jobid', None)
+                if jobid is not None:
+                    job = (task.execution.get('resource_name', None),
+                           str(jobid))
+                    self._jobs[job] = task
+            entry = [deadline, next(self._seqno), task, job]
+            self._entries[id(task)] = entry
+            heapq.heappush(self._heap, entry)
+
+        def _pop(self, task):
+            # remove `task` from the index and mark its heap entry
+            # as removed; return the entry or `None`
+            entry = self._entries.pop(id(task), None)
+            if entry is not None:
+                entry[2] = None
+                if self._jobs.get(entry[3], None) is task:
+                    del self._jobs[entry[3]]
+            return entry
+
+        def find_job(self, resource_name, jobid):
+            """
+            Return the task in the queue running job `jobid` on the
+            named resource, or ``None`` if there is no such task.
+            """
+            return self._jobs.get((resource_name, str(jobid)), None)
+
+        def add(self, task):
+            """
+            Add task to the queue, to be polled immediately.
+
             Does *not* check if already present.
             """
-            self._queue.append(task)
+            self._polls.pop(id(task), None)
+            self._push(task, 0)
+
+        def get(self):
+            """
+            Pop the task with the earliest deadline from the queue.
+            """
+            while True:
+                task = heapq.heappop(self._heap)[2]
+                if task is not None:
+                    self._pop(task)
+                    self._taken.add(id(task))
+                    return task
+
+        def put(self, task):
+            """
+            Add task to the queue, with a deadline depending on its state.
+
+            Does *not* check if already present.
+            """
+            now = time.time()
+            self._push(task, now + self.interval(task, now))
 
         def remove(self, task):
             """
             Remove the given task from the queue.
+
+            Raise `ValueError` if the task is not in the queue.
+            """
+            self._polls.pop(id(task), None)
+            if self._pop(task) is None:
+                raise ValueError("Task %s is not in the queue" % (task,))
+
+        def evict(self, task):
+            """
+            Remove `task` from the queue, to be later put back with `restore`.
+
+            Return pair *(deadline, polls)*: the task's next-poll
+            deadline and its polling history, for `restore`:meth:.
+            """
+            entry = self._pop(task)
+            if entry is None:
+                raise ValueError("Task %s is not in the queue" % (task,))
+            return entry[0], self._polls.pop(id(task), None)
+
+        def restore(self, task, deadline, polls):
+            """
+            Put back a task removed with `evict`:meth:, keeping its deadline.
+
+            If `deadline` is ``None``, the task is polled immediately.
+            """
+            if deadline is None:
+                self.add(task)
+                return
+            if polls is not None:
+                self._polls[id(task)] = polls
+            self._push(task, deadline)
+
+        def latest(self, count):
+            """
+            Return up to `count` tasks that are not due, latest deadline first.
+            """
+            now = time.time()
+            return [entry[2]
+                    for entry in heapq.nlargest(count, self._entries.values())
+                    if entry[0] > now]
+
+        def due(self):
+            """
+            Return list of the tasks whose polling deadline has passed.
+
+            This is called once per `progress` cycle, so it also
+            forgets about tasks taken off the queue in the previous
+            cycle and not put back.
+            """
+            for key in self._taken:
+                if key not in self._entries:
+                    self._polls.pop(key, None)
+            self._taken.clear()
+            now = time.time()
+            heap = self._heap
+            result = []
+            # heap invariant: children are never due before parents
+            pending = [0]
+            while pending:
+                n = pending.pop()
+                if n < len(heap) and heap[n][0] <= now:
+                    if heap[n][2] is not None:
+                        result.append(heap[n][2])
+                    pending.extend([2*n + 1, 2*n + 2])
+            return result
+
+        def interval(self, task, now):
             """
-            # FIXME: this relies on `collections.deque` which supports
-            # removal of an element by value; Python's `queue.Queue`
-            # only provides put/get operations and would make this
-            # difficult to do.  We would need to find a different
-            # solution or data structure before we can generalize the
-            # Engine to span multiple processes...
-            self._queue.remove(task)
+            Return number of seconds to wait before polling `task` again.
+
+            Also record that `task` is being polled in its current state.
+            """
+            if not isinstance(task, Application):
+                return 0
+            state = task.execution.state
+            timestamp = task.execution.get('timestamp', {})
+            last_state, nr_polls = self._polls.get(id(task), (None, 0))
+            if state == last_state:
+                nr_polls += 1
+            else:
+                nr_polls = 0
+                if (last_state == Run.State.SUBMITTED
+                        and state == Run.State.RUNNING):
+                    self._record_queue_wait(task, timestamp)
+            self._polls[id(task)] = (state, nr_polls)
+
+            interval = self.min_interval * 2**min(nr_polls, 32)
+            since = timestamp.get(state)
+            if since is not None:
+                interval = max(interval, self.AGE_FACTOR * (now - since))
+            interval = min(interval, self.max_interval)
+
+            expected = self._expected_end(task, state, since)
+            if expected is not None and expected > now:
+                remaining = expected - now
+                interval = min(max(interval, remaining / 2),
+                               max(remaining, self.min_interval),
+                               self.max_interval)
+            return max(interval, self.min_interval)
+
+        def _expected_end(self, task, state, since):
+            if since is None:
+                return None
+            if state == Run.State.SUBMITTED:
+                wait = self.queue_wait.get(
+                    task.execution.get('resource_name', None))
+                if wait is not None:
+                    return since + wait
+            elif state == Run.State.RUNNING:
+                walltime = getattr(task, 'requested_walltime', None)
+                if walltime:
+                    return since + walltime.amount(Duration.s)
+            return None
+
+        def _record_queue_wait(self, task, timestamp):
+            submitted = timestamp.get(Run.State.SUBMITTED)
+            running = timestamp.get(Run.State.RUNNING)
+            if submitted is None or running is None or running < submitted:
+                return
+            wait = running - submitted
+            resource_name = task.execution.get('resource_name', None)
+            average = self.queue_wait.get(resource_name)
+            if average is None:
+                self.queue_wait[resource_name] = wait
+            else:
+                self.queue_wait[resource_name] = (
+                    average + self.WAIT_SMOOTHING * (wait - average))
 
 
     class _TaskQueueManager(object):
@@ -1411,6 +2098,41 @@ class Engine(object):  # pylint: disable=too-many-instance-attributes
                 pass
             self.add(task, action)
 
+        def __len__(self):
+            return len(self._index)
+
+        def evict(self, task, action):
+            """
+            Remove `task` from queue `action`, to be later `restore`-d.
+
+            Return pair *(deadline, polls)*; see `TaskQueue.evict`:meth:.
+            """
+            deadline, polls = self._actions[action].evict(task)
+            del self._index[id(task)]
+            return deadline, polls
+
+        def restore(self, task, action, deadline, polls):
+            """
+            Put back a task removed with `evict`:meth:.
+            """
+            queue = self._actions[action]
+            queue.restore(task, deadline, polls)
+            self._index[id(task)] = queue
+
+        def replace_update_queue(self, queue):
+            """
+            Use `queue` for tasks that need a state update.
+
+            Any task in the current update queue is moved to `queue`.
+            """
+            old = self.to_update
+            for task in list(old):
+                old.remove(task)
+                queue.put(task)
+                self._index[id(task)] = queue
+            self.to_update = queue
+            self._actions['update'] = queue
+
 
     class _Counters(object):
         """
@@ -1432,17 +2154,25 @@ class Engine(object):  # pylint: disable=too-many-instance-attributes
             # FIXME: rewrite using `collections.Counter` when we drop
             # support for Py 2.6?
             counter = self.totals[cls] = defaultdict(int)
-            for task in self._engine.iter_tasks(cls):
-                counter['total'] += 1
-                state = task.execution.state
-                counter[state] += 1
-                if state == Run.State.TERMINATED:
-                    if task.execution.returncode == 0:
-                        counter['ok'] += 1
-                    else:
-                        counter['failed'] += 1
+            for task in self._engine.iter_tasks(cls, resident_only=True):
+                self._count(counter, task.execution.state,
+                            task.execution.returncode)
+            # spilled tasks are counted from their proxies
+            for proxy in self._engine._spilled.values():
+                if issubclass(proxy.cls, cls):
+                    self._count(counter, proxy.state, proxy.returncode)
             return counter
 
+        @staticmethod
+        def _count(counter, state, returncode):
+            counter['total'] += 1
+            counter[state] += 1
+            if state == Run.State.TERMINATED:
+                if returncode == 0:
+                    counter['ok'] += 1
+                else:
+                    counter['failed'] += 1
+
         def _update(self, task, increment):
             """
             Update the counts relative to `task`'s state by `increment`.
@@ -1517,12 +2247,318 @@ class Engine(object):  # pylint: disable=too-many-instance-attributes
                     self.totals[cls][target] += 1
 
 
+    class _Dispatcher(object):
+        """
+        Run operations on a bounded pool of worker threads.
+
+        Operations are partitioned by a key (the resource name, in
+        `Engine`'s usage); at most `per_key` operations with the same
+        key can run at the same time.  Operations with different keys
+        are started in round-robin order, so that a slow resource
+        cannot monopolize the worker threads.
+        """
+
+        def __init__(self, max_workers, per_key=1):
+            self.max_workers = max_workers
+            self.per_key = per_key
+            self._lock = threading.Condition()
+            # map each key to the queue of its pending operations
+            self._pending = {}
+            self._keys = deque()
+            self._busy = defaultdict(int)
+            self._workers = []
+            self._closed = False
+
+        def map(self, func, items, key, drain=None):
+            """
+            Call `func(item)` for each of `items` in the worker threads.
+
+            Return an iterator over tuples *(item, result, err,
+            signals)*, yielded in the calling thread in order of
+            completion: *result* is the value returned by `func(item)`,
+            *err* is the exception it raised or ``None``, and
+            *signals* is the list of events sent by `func` during
+            execution, for delivery through `gc3libs.events.replay`.
+
+            If the iterator is not consumed to the end (e.g., because
+            the caller raised an exception), it waits for the
+            operations still running when it is closed and passes
+            each of their tuples to function `drain` (by default, their
+            events are just delivered), so that they are not lost and
+            no operation spills over into a later call.
+            """
+            items = list(items)
+            if not items:
+                return
+            # each call gets its own queue of results, so that they
+            # cannot be mixed up with another call's
+            results = Queue()
+            with self._lock:
+                for item in items:
+                    k = key(item)
+                    if k not in self._pending:
+                        self._pending[k] = deque()
+                        self._keys.append(k)
+                    self._pending[k].append((item, func, results))
+                self._lock.notify_all()
+            while len(self._workers) < min(self.max_workers, len(items)):
+                worker = threading.Thread(
+                    target=self._work,
+                    name=('Engine worker %d' % len(self._workers)))
+                worker.daemon = True
+                worker.start()
+                self._workers.append(worker)
+            remaining = len(items)
+            try:
+                while remaining > 0:
+                    result = results.get()
+                    remaining -= 1
+                    yield result
+            finally:
+                while remaining > 0:
+                    result = results.get()
+                    remaining -= 1
+                    if drain is None:
+                        gc3libs.events.replay(result[3])
+                    else:
+                        drain(result)
+
+        def _next(self):
+            # caller must hold `self._lock`
+            for _ in range(len(self._keys)):
+                k = self._keys.popleft()
+                if self._busy[k] < self.per_key:
+                    pending = self._pending[k]
+                    item, func, results = pending.popleft()
+                    if pending:
+                        self._keys.append(k)
+                    else:
+                        del self._pending[k]
+                    self._busy[k] += 1
+                    return k, item, func, results
+                self._keys.append(k)
+            return None
+
+        def _work(self):
+            while True:
+                with self._lock:
+                    job = self._next()
+                    while job is None and not self._closed:
+                        self._lock.wait()
+                        job = self._next()
+                if job is None:
+                    # dispatcher closed
+                    return
+                k, item, func, results = job
+                result = error = None
+                with gc3libs.events.deferred() as signals:
+                    try:
+                        result = func(item)
+                    # pylint: disable=broad-except
+                    except Exception as err:
+                        error = err
+                with self._lock:
+                    self._busy[k] -= 1
+                    self._lock.notify_all()
+                results.put((item, result, error, signals))
+
+        def close(self):
+            """
+            Stop all worker threads once they are done with pending operations.
+            """
+            with self._lock:
+                self._closed = True
+                self._lock.notify_all()
+
+
+    class _DetachedRun(Run):
+        """
+        Copy of the `Run` of a task, for a backend to update in a worker thread.
+
+        Assigning to `state` or `returncode` changes this copy but
+        sends no events and records no history; assignments are
+        recorded instead, and replayed on the original `Run` when
+        changes are merged back by `Engine.__merge`, in the
+        `Engine`'s own thread.  The `history` of the copy only holds
+        the messages appended to it.
+        """
+
+        __slots__ = ('_changes',)
+
+        def __init__(self, run):
+            Run.__init__(self, run)
+            self._ref = None
+            self._changes = []
+            self.history = utils.History()
+
+        def _set_state(self, value):
+            assert value in Run.State, \
+                ("Value '{0}' is not a legal `gc3libs.Run.State` value."
+                 .format(value))
+            self._state = value
+            self._changes.append(('state', value))
+
+        state = property(Run.state.fget, _set_state, doc=Run.state.__doc__)
+
+        def _set_returncode(self, value):
+            Run.returncode.fset(self, value)
+            self._changes.append(('returncode', value))
+
+        returncode = property(Run.returncode.fget, _set_returncode,
+                              doc=Run.returncode.__doc__)
+
+
+    class _TaskProxy(object):
+        """
+        Placeholder for a task that has been spilled to the `Engine`'s store.
+
+        Records what the `Engine` needs to know about a task without
+        loading it: its persistent ID, class, state and return code
+        (for `counts`), the queue it was taken from, and the data
+        needed to put it back there at the right time (e.g., its
+        next-poll deadline).  A weak reference to the task object is
+        kept, so that the same object is used if it is still alive
+        (e.g., because a task collection holds it) when it is loaded
+        back.
+        """
+
+        __slots__ = ('persistent_id', 'cls', 'state', 'returncode',
+                     'action', 'deadline', 'polls', 'ref')
+
+        def __init__(self, task, action, deadline, polls):
+            self.persistent_id = task.persistent_id
+            self.cls = task.__class__
+            self.state = task.execution.state
+            self.returncode = task.execution.returncode
+            self.action = action
+            self.deadline = deadline
+            self.polls = polls
+            self.ref = weakref.ref(task)
+
+
+    def __spill(self):
+        """
+        Save tasks in excess of `max_in_memory` to the store and drop them.
+
+        `TERMINATED` tasks are spilled first, least recently finished
+        first; then in-flight tasks whose next-poll deadline is
+        farthest away (only if `adaptive_polling` is on).  Tasks in
+        other states need action in the next cycle and are never
+        spilled.
+        """
+        excess = len(self._managed) - self.max_in_memory
+        if excess <= 0:
+            return
+        candidates = [(task, 'done') for task
+                      in itertools.islice(self._managed.done, excess)]
+        queue = self._managed.to_update
+        if len(candidates) < excess and isinstance(queue, self._PollingQueue):
+            candidates.extend((task, 'update') for task
+                              in queue.latest(excess - len(candidates)))
+        for task, action in candidates:
+            try:
+                if task.changed or not hasattr(task, 'persistent_id'):
+                    self._store.save(task)
+            # pylint: disable=broad-except
+            except Exception as err:
+                gc3libs.log.warning(
+                    "Engine %s: cannot save task %s, keeping it in memory:"
+                    " %s: %s", self, task, err.__class__.__name__, err)
+                continue
+            deadline, polls = self._managed.evict(task, action)
+            proxy = self._TaskProxy(task, action, deadline, polls)
+            self._spilled[proxy.persistent_id] = proxy
+            self._tasks_by_id.pop(proxy.persistent_id, None)
+            if action == 'update':
+                heapq.heappush(
+                    self._spilled_deadlines,
+                    (deadline or 0, next(self._spilled_seqno),
+                     proxy.persistent_id))
+        gc3libs.log.debug(
+            "Engine %s: %d tasks in memory, %d spilled to store.",
+            self, len(self._managed), len(self._spilled))
+
+    def __unspill(self, task_id, task=None):
+        """
+        Put a spilled task back into the queue it was taken from.
+
+        If `task` is ``None``, the task object is loaded from the
+        store, unless it is still alive.  Return the task object.
+        """
+        proxy = self._spilled[task_id]
+        if task is None:
+            task = proxy.ref()
+        if task is None:
+            task = self._store.load(task_id)
+        self.__restore(proxy, task)
+        return task
+
+    def __restore(self, proxy, task):
+        del self._spilled[proxy.persistent_id]
+        self._managed.restore(task, proxy.action, proxy.deadline, proxy.polls)
+        self._tasks_by_id[proxy.persistent_id] = task
+        if proxy.state == Run.State.TERMINATED:
+            # a freshly-loaded object has no handlers connected
+            TermStatusChange.connect(
+                self._counts._on_termstatus_change, sender=task)
+        task.attach(self)
+
+    def __resident(self, task):
+        """
+        Ensure `task` is in the queues, if it has been spilled to the store.
+        """
+        if self._spilled and task not in self._managed:
+            task_id = getattr(task, 'persistent_id', None)
+            if task_id in self._spilled:
+                self.__unspill(task_id, task)
+
+    def __reload_due(self):
+        """
+        Load back spilled in-flight tasks whose next-poll deadline has come.
+        """
+        heap = self._spilled_deadlines
+        now = time.time()
+        proxies = []
+        while heap and (heap[0][0] <= now or not self.adaptive_polling):
+            deadline, _, task_id = heapq.heappop(heap)
+            proxy = self._spilled.get(task_id)
+            if (proxy is not None and proxy.action == 'update'
+                    and (proxy.deadline or 0) == deadline):
+                proxies.append(proxy)
+        if not proxies:
+            return
+        gc3libs.log.debug(
+            "Engine %s: loading %d spilled tasks back from store ...",
+            self, len(proxies))
+        missing = [proxy for proxy in proxies if proxy.ref() is None]
+        loaded = dict(zip(
+            [proxy.persistent_id for proxy in missing],
+            self._store.load_many(proxy.persistent_id for proxy in missing)))
+        for proxy in proxies:
+            task = proxy.ref()
+            if task is None:
+                task = loaded[proxy.persistent_id]
+            if isinstance(task, Exception):
+                gc3libs.log.error(
+                    "Engine %s: cannot load task %s from store,"
+                    " will retry in %s seconds: %s: %s",
+                    self, proxy.persistent_id, self.max_poll_interval,
+                    task.__class__.__name__, task)
+                proxy.deadline = now + self.max_poll_interval
+                heapq.heappush(
+                    heap, (proxy.deadline, next(self._spilled_seqno),
+                           proxy.persistent_id))
+                continue
+            self.__restore(proxy, task)
+
+
     def add(self, task):
         """
         Add `task` to the list of tasks managed by this Engine.
         Adding a task that has already been added to this `Engine`
         instance results in a no-op.
         """
+        self.__resident(task)
         if task not in self._managed:
             self._managed.add(task)
             self._counts.add(task)
@@ -1543,6 +2579,7 @@ class Engine(object):  # pylint: disable=too-many-instance-attributes
         Removing a task that is not managed (i.e., already removed or
         never added) is a no-op.
         """
+        self.__resident(task)
         if task not in self._managed:
             return
         self._managed.remove(task)
@@ -1564,23 +2601,36 @@ class Engine(object):  # pylint: disable=too-many-instance-attributes
         """
         Return the task with the given persistent ID added to this
         `Engine` instance.  If no task has that ID, raise a `KeyError`.
+
+        A task that has been spilled to the store (see
+        `max_in_memory`) is loaded back and kept in memory.
         """
-        return self._tasks_by_id[task_id]
+        try:
+            return self._tasks_by_id[task_id]
+        except KeyError:
+            if task_id in self._spilled:
+                return self.__unspill(task_id)
+            raise
 
 
-    def iter_tasks(self, only_cls=None):
+    def iter_tasks(self, only_cls=None, resident_only=False):
         """
         Iterate over tasks managed by the Engine.
 
         If argument `only_cls` is ``None`` (default), then iterate over
         *all* tasks managed by this Engine.  Otherwise, only return
         tasks which are instances of a (sub)class `only_cls`.
+
+        Tasks that have been spilled to the store (see
+        `max_in_memory`) are loaded one at a time, but not kept in
+        memory by the Engine; if `resident_only` is ``True``, they
+        are skipped instead.
         """
         if only_cls is None:
             select = self.__iter_all
         else:
             select = self.__iter_only
-        return itertools.chain(
+        resident = itertools.chain(
             select(self._managed.to_submit, only_cls),
             select(self._managed.to_update, only_cls),
             select(self._managed.to_kill, only_cls),
@@ -1588,6 +2638,22 @@ class Engine(object):  # pylint: disable=too-many-instance-attributes
             select(self._managed.to_cleanup, only_cls),
             select(self._managed.done, only_cls),
         )
+        if resident_only or not self._spilled:
+            return resident
+        return itertools.chain(resident, self.__iter_spilled(only_cls))
+
+    def __iter_spilled(self, cls):
+        for task_id, proxy in list(self._spilled.items()):
+            if cls is not None and not issubclass(proxy.cls, cls):
+                continue
+            task = proxy.ref()
+            if task is None:
+                if self._spilled.get(task_id) is not proxy:
+                    # loaded back in the meantime
+                    continue
+                task = self._store.load(task_id)
+                proxy.ref = weakref.ref(task)
+            yield task
 
     # helper methods for `iter_tasks`; they are created as
     # "staticmethod"s instead of `lambda`-functions to save creating a
@@ -1642,8 +2708,26 @@ class Engine(object):  # pylint: disable=too-many-instance-attributes
 
         The `max_in_flight` and `max_submitted` limits (if >0) are
         taken into account when attempting submission of tasks.
+
+        If `max_concurrent` is >0, all operations except submission
+        run in parallel across resources; submission is still done
+        one task at a time as the scheduler needs to know the outcome
+        of each attempt before selecting the next task.
+
+        Changed tasks are saved within a `Store.batch`:meth: block,
+        so stores that support it write them all at once at the end
+        of the cycle.
         """
+        batch = getattr(self._store, 'batch', None)
+        if batch is None:
+            return self.__progress()
+        with batch():
+            return self.__progress()
+
+    def __progress(self):
         gc3libs.log.debug("Engine.progress(): starting.")
+        # jobs reported done from now on will be handled in the next cycle
+        self._wakeup.clear()
 
         # pylint: disable=redefined-variable-type
         if self.max_in_flight > 0:
@@ -1667,56 +2751,106 @@ class Engine(object):  # pylint: disable=too-many-instance-attributes
         queue = self._managed.to_kill
         if queue:
             gc3libs.log.debug("Engine %s about to kill jobs ...", self)
-        for _ in range(len(queue)):
-            task = queue.get()
-            old_state = task.execution.state
-
-            try:
-                self._core.kill(task)
-                if self._store and task.changed:
-                    self._store.save(task)
-            # pylint: disable=broad-except
-            except Exception as err:
-                self.__ignore_or_raise(
-                    err, "killing", task,
-                    # context:
-                    # - module
-                    'core',
-                    # - class
-                    'Engine',
-                    # - method
-                    'progress',
-                    # - actual error class
-                    err.__class__.__name__,
-                    # - additional keywords
-                    'kill'
-                )
+        # killing a task collection schedules its children for
+        # killing too: process them in this same pass
+        while queue:
+            for task, err in self.__perform(
+                    self._core.kill, queue, self._core._cancel_job,
+                    (lambda app, _: self._core._mark_cancelled(app))):
+                try:
+                    if err is not None:
+                        raise err
+                    if self._store and task.changed:
+                        self._store.save(task)
+                # pylint: disable=broad-except
+                except Exception as err:
+                    self.__ignore_or_raise(
+                        err, "killing", task,
+                        # context:
+                        # - module
+                        'core',
+                        # - class
+                        'Engine',
+                        # - method
+                        'progress',
+                        # - actual error class
+                        err.__class__.__name__,
+                        # - additional keywords
+                        'kill'
+                    )
 
-            self._managed.requeue(task)
+                self._managed.requeue(task)
 
         # update status of tasks before launching new ones
-        queue = self._managed.to_update
-        if queue:
+        queue = self.__update_queue()
+        if self._spilled_deadlines:
+            self.__reload_due()
+        self.__expedite_done(queue)
+        due = queue.due()
+        if due:
             gc3libs.log.debug(
-                "Engine %s about to update status of in-flight tasks ...",
-                self)
-        for _ in range(len(queue)):
+                "Engine %s about to update status of %d in-flight tasks ...",
+                self, len(due))
+        # query the state of all in-flight applications at once, so
+        # that backends can group them into as few remote commands as
+        # possible
+        apps = [task for task in due
+                if (isinstance(task, Application)
+                    and task.execution.state in [
+                        Run.State.RUNNING,
+                        Run.State.STOPPED,
+                        Run.State.SUBMITTED,
+                        Run.State.UNKNOWN,
+                    ])]
+        if self._dispatcher:
+            # one bulk update per resource, all resources in parallel
+            by_resource = defaultdict(list)
+            for app in apps:
+                by_resource[app.execution.resource_name].append(app)
+            groups = list(by_resource.values())
+        else:
+            groups = [apps] if apps else []
+        updated = set()
+        for group, err in self.__perform(
+                (lambda group: self._core.update_job_state(*group)),
+                groups, self._core._query_job_states,
+                self._core._update_job_states):
+            if err is None:
+                updated.update(id(app) for app in group)
+            elif isinstance(err, gc3libs.exceptions.ConfigurationError):
+                # Unrecoverable; no sense in continuing -- pass
+                # immediately on to client code and let it handle
+                # this...
+                raise err
+            else:
+                # fall back to updating tasks one by one below, so
+                # that errors are handled (and possibly ignored) on a
+                # per-task basis and one faulty task cannot block all
+                # the others
+                gc3libs.log.debug(
+                    "Engine %s: error updating state of %d tasks at once:"
+                    " %s: %s; retrying one task at a time ...",
+                    self, len(group), err.__class__.__name__, err)
+
+        for _ in range(len(due)):
             task = queue.get()
 
-            # ensure pre-condition on state is met
-            old_state = task.execution.state
-            if old_state not in [
-                    Run.State.RUNNING,
-                    Run.State.STOPPED,
-                    Run.State.SUBMITTED,
-                    Run.State.UNKNOWN,
-            ]:
-                # task changed state outside of the Engine, requeue
-                self._managed.requeue(task)
-                continue
+            if id(task) not in updated:
+                # ensure pre-condition on state is met
+                old_state = task.execution.state
+                if old_state not in [
+                        Run.State.RUNNING,
+                        Run.State.STOPPED,
+                        Run.State.SUBMITTED,
+                        Run.State.UNKNOWN,
+                ]:
+                    # task changed state outside of the Engine, requeue
+                    self._managed.requeue(task)
+                    continue
 
             try:
-                self._core.update_job_state(task)
+                if id(task) not in updated:
+                    self._core.update_job_state(task)
                 if self._store and task.changed:
                     self._store.save(task)
             except gc3libs.exceptions.ConfigurationError:
@@ -1828,7 +2962,7 @@ class Engine(object):  # pylint: disable=too-many-instance-attributes
                         # either SUBMITTED or RUNNING
                         if self._store and task.changed:
                             self._store.save(task)
-                        self._managed.to_update.put(task)
+                        self._managed.requeue(task, 'update')
                         if isinstance(task, Application):
                             submit_allowance -= 1
                         # notify scheduler
@@ -1871,14 +3005,22 @@ class Engine(object):  # pylint: disable=too-many-instance-attributes
                 gc3libs.log.debug(
                     "Engine %s about to retrieve output of TERMINATING tasks ...",
                     self)
-            for _ in range(len(queue)):
-                task = queue.get()
+            fetch_output = functools.partial(
+                self._core.fetch_output,
+                overwrite=self.retrieve_overwrites,
+                changed_only=self.retrieve_changed_only)
+            get_results = functools.partial(
+                self._core._get_results,
+                download_dir=None,
+                overwrite=self.retrieve_overwrites,
+                changed_only=self.retrieve_changed_only)
+            for task, err in self.__perform(
+                    fetch_output, queue,
+                    get_results, self._core._got_results):
                 # try to get output
                 try:
-                    self._core.fetch_output(
-                        task,
-                        overwrite=self.retrieve_overwrites,
-                        changed_only=self.retrieve_changed_only)
+                    if err is not None:
+                        raise err
                 except gc3libs.exceptions.UnrecoverableDataStagingError as err:
                     gc3libs.log.error(
                         "Error in fetching output of task '%s',"
@@ -1919,10 +3061,11 @@ class Engine(object):  # pylint: disable=too-many-instance-attributes
         if queue:
             gc3libs.log.debug(
                 "Engine %s about to clean up TERMINATED tasks ...", self)
-        for _ in range(len(queue)):
-            task = queue.get()
+        for task, err in self.__perform(
+                self._core.free, queue, self._core.free):
             try:
-                self._core.free(task)
+                if err is not None:
+                    raise err
                 self._managed.requeue(task, 'done')
             # pylint: disable=broad-except
             except Exception as err:
@@ -1957,9 +3100,201 @@ class Engine(object):  # pylint: disable=too-many-instance-attributes
                         "Could not forget TERMINATED task '%s': %s: %s",
                         task, err.__class__.__name__, err)
 
+        # keep memory usage within budget
+        if self.max_in_memory > 0 and self._store:
+            self.__spill()
+
         gc3libs.log.debug("Engine.progress(): done.")
 
 
+    def __expedite_done(self, queue):
+        """
+        Make tasks whose job has been reported done due for update now.
+
+        Only needed with `adaptive_polling`, as otherwise all
+        in-flight tasks are updated at every cycle anyway.
+        """
+        with self._jobs_done_lock:
+            jobs_done = self._jobs_done
+            self._jobs_done = set()
+        if not jobs_done or not isinstance(queue, self._PollingQueue):
+            return
+        for resource_name, jobid in jobs_done:
+            task = queue.find_job(resource_name, jobid)
+            if task is not None:
+                queue.evict(task)
+                queue.add(task)
+
+    def __update_queue(self):
+        """
+        Return the queue of tasks to update, according to `adaptive_polling`.
+        """
+        queue = self._managed.to_update
+        if self.adaptive_polling:
+            if not isinstance(queue, self._PollingQueue):
+                queue = self._PollingQueue()
+                self._managed.replace_update_queue(queue)
+            queue.min_interval = self.min_poll_interval
+            queue.max_interval = self.max_poll_interval
+        elif isinstance(queue, self._PollingQueue):
+            queue = self.TaskQueue()
+            self._managed.replace_update_queue(queue)
+        return queue
+
+    def __perform(self, func, items, remote=None, local=None):
+        """
+        Call `func(item)` on each of `items`; yield pairs *(item, err)*.
+
+        Argument `items` is either a sequence or a `TaskQueue`; in
+        the latter case, tasks are removed from the queue and the
+        caller is responsible for putting them back where appropriate.
+
+        The value *err* is the exception raised by `func(item)`, or
+        ``None`` if no exception was raised.
+
+        If `max_concurrent` is >0 and function `remote` is given,
+        then items that are `Application` instances (or lists
+        thereof) are processed in two steps instead: `remote` is
+        called in one of the `Engine`'s worker threads on a detached
+        copy of the item (see `_DetachedRun`), and should only run
+        backend operations and return their outcome; then, in the
+        calling thread, changes made to the copy are merged back
+        into the item, all events sent by the worker are delivered,
+        and `local(item, outcome)` is called (if `local` is given)
+        to update the item.  So task state only ever changes in the
+        calling thread, and pairs are always yielded there.
+        """
+        if self.max_concurrent > 0:
+            if (self._dispatcher is None
+                    or self._dispatcher.max_workers != self.max_concurrent
+                    or (self._dispatcher.per_key
+                        != self.max_concurrent_per_resource)):
+                if self._dispatcher is not None:
+                    self._dispatcher.close()
+                self._dispatcher = self._Dispatcher(
+                    self.max_concurrent, self.max_concurrent_per_resource)
+        elif self._dispatcher is not None:
+            self._dispatcher.close()
+            self._dispatcher = None
+        dispatcher = (self._dispatcher if remote is not None else None)
+
+        if isinstance(items, self.TaskQueue):
+            if dispatcher is None:
+                # preserve the traditional behavior of taking tasks
+                # off the queue only when they are about to be processed
+                queue = items
+                items = (queue.get() for _ in range(len(queue)))
+            else:
+                items = [items.get() for _ in range(len(items))]
+
+        if dispatcher is None:
+            for item in items:
+                yield item, self.__call(func, item)
+            return
+
+        detached = []
+        for item in items:
+            if isinstance(item, Application):
+                detached.append((item, self.__detach(item)))
+            elif (isinstance(item, list)
+                  and all(isinstance(app, Application) for app in item)):
+                detached.append((item, [self.__detach(app) for app in item]))
+            else:
+                yield item, self.__call(func, item)
+        results = dispatcher.map(
+            (lambda pair: remote(pair[1])), detached,
+            (lambda pair: self.__resource_name_of(pair[1])),
+            self.__drain)
+        for (item, copy), outcome, err, signals in results:
+            # pylint: disable=broad-except
+            try:
+                self.__merge(item, copy)
+                gc3libs.events.replay(signals)
+                if err is None and local is not None:
+                    local(item, outcome)
+            except Exception as ex:
+                err = ex
+            yield item, err
+
+    @staticmethod
+    def __detach(app):
+        """
+        Return a copy of `app` for backends to update in a worker thread.
+
+        The copy shares all attributes with `app`, except for
+        `execution` which is a `_DetachedRun`; use `__merge` to
+        apply the changes made to the copy to `app`.
+        """
+        copy = app.__class__.__new__(app.__class__)
+        copy.__dict__.update(app.__dict__)
+        copy.execution = Engine._DetachedRun(app.execution)
+        return copy
+
+    @staticmethod
+    def __merge(task, copy):
+        """
+        Apply to `task` the changes made to its detached `copy`.
+
+        Argument `copy` can also be a list of copies, one for each of
+        the tasks in the list `task`.
+        """
+        if isinstance(task, list):
+            for task_, copy_ in zip(task, copy):
+                Engine.__merge(task_, copy_)
+            return
+        run, detached = task.execution, copy.execution
+        for name, value in list(copy.__dict__.items()):
+            if name != 'execution' and (name not in task.__dict__
+                                        or task.__dict__[name] is not value):
+                setattr(task, name, value)
+        for name, value in list(detached.__dict__.items()):
+            if name != 'history' and (name not in run.__dict__
+                                      or run.__dict__[name] is not value):
+                run[name] = value
+        for name in list(run.__dict__):
+            if name not in detached.__dict__:
+                del run[name]
+        run.history.extend(detached.history.records())
+        # replay state and return code changes so that transitions
+        # are recorded and their events are sent from this thread
+        # pylint: disable=protected-access
+        for name, value in detached._changes:
+            setattr(run, name, value)
+        run.signal = detached.signal
+        run.exitcode = detached.exitcode
+
+    def __drain(self, result):
+        """
+        Merge back the result of an operation that `__perform` abandoned.
+        """
+        (task, copy), _, _, signals = result
+        # pylint: disable=broad-except
+        try:
+            self.__merge(task, copy)
+            gc3libs.events.replay(signals)
+        except Exception as err:
+            gc3libs.log.debug(
+                "Ignored error updating task '%s' after an interrupted"
+                " operation: %s: %s", task, err.__class__.__name__, err)
+
+    @staticmethod
+    def __call(func, item):
+        """
+        Call `func(item)` and return the exception it raised, if any.
+        """
+        try:
+            func(item)
+        # pylint: disable=broad-except
+        except Exception as err:
+            return err
+        return None
+
+    @staticmethod
+    def __resource_name_of(item):
+        if isinstance(item, list):
+            item = item[0]
+        return getattr(item.execution, 'resource_name', None)
+
     def __ignore_or_raise(self, err, action, task, *ctx):
         if gc3libs.error_ignored(*ctx):
             gc3libs.log.debug(
@@ -2066,6 +3401,7 @@ class Engine(object):  # pylint: disable=too-many-instance-attributes
         if resubmit:
             # since we are going to change the task's state, we need
             # to expunge it from the queues ...
+            self.__resident(task)
             if task in self._managed:
                 self.remove(task)
             task.redo()
@@ -2097,6 +3433,7 @@ class Engine(object):  # pylint: disable=too-many-instance-attributes
         """
         Schedule a task for killing on the next `progress` run.
         """
+        self.__resident(task)
         self._managed.requeue(task, 'kill')
 
     def peek(self, task, what='stdout', offset=0, size=None, **extra_args):
@@ -2110,6 +3447,9 @@ class Engine(object):  # pylint: disable=too-many-instance-attributes
         Call explicilty finalize methods on relevant objects
         e.g. LRMS
         """
+        if self._dispatcher is not None:
+            self._dispatcher.close()
+            self._dispatcher = None
         self._core.close()
 
     # Wrapper methods around `Core` to access the backends directly
@@ -2187,6 +3527,9 @@ class BgEngine(object):
         # no result caching until an update is really performed
         self._progress_last_run = 0
 
+        # scheduler job running `_perform`, set by `start`
+        self._job = None
+
 
     #
     # control main loop scheduling
@@ -2196,13 +3539,19 @@ class BgEngine(object):
         """
         Start triggering the main loop at the given `interval` frequency.
 
+        The main loop is also triggered as soon as a backend reports
+        that a job has ended (see `gc3libs.events.JobDone`), so that
+        finished tasks are processed without waiting for the rest of
+        the `interval`.
+
         :param gc3libs.quantity.Duration interval:
           Time span between successive calls of `_perform`:meth:
         """
         self.running = True
-        self._scheduler.add_job(
+        self._job = self._scheduler.add_job(
             self._perform,
             'interval', seconds=(interval.amount(Duration.s)))
+        JobDone.connect(self._on_job_done)
         self._scheduler.start()
         gc3libs.log.info(
             "Started background execution of Engine %s every %s",
@@ -2222,8 +3571,23 @@ class BgEngine(object):
         gc3libs.log.info(
             "Stopping background execution of Engine %s ...", self._engine)
         self.running = False
+        JobDone.disconnect(self._on_job_done)
         self._scheduler.shutdown(wait)
 
+    def _on_job_done(self, lrms, jobid):
+        """
+        Run the main loop now, instead of at the next scheduled time.
+        """
+        if not self.running:
+            return
+        # pylint: disable=broad-except
+        try:
+            self._job.modify(next_run_time=datetime.now())
+        except Exception as err:
+            gc3libs.log.debug(
+                "%s: Could not reschedule main loop: %s: %s",
+                self, err.__class__.__name__, err)
+
 
     def _perform(self):
         """
@@ -2235,12 +3599,23 @@ class BgEngine(object):
         - Execute any queued engine commands.
 
         - Run `Engine.progress()` to ensure that GC3Pie tasks are updated.
+
+        The loop is repeated at once if any job has been reported done
+        while it was running, since the scheduler does not start
+        `_perform` again while it is still running.
         """
         gc3libs.log.debug("%s: _perform() started", self)
-        self.__run_delayed_operations()
-        self.__run_before_triggers()
-        self.__run_engine_progress()
-        self.__run_after_triggers()
+        while True:
+            # `Engine.progress` also clears this, but might fail
+            # before doing so: then `wait` below would report the
+            # same jobs again, and the loop would never end
+            self._engine._wakeup.clear()
+            self.__run_delayed_operations()
+            self.__run_before_triggers()
+            self.__run_engine_progress()
+            self.__run_after_triggers()
+            if not (self.running and self._engine.wait(0)):
+                break
 
     def __run_delayed_operations(self):
         # quickly grab a local copy of the command queue, and
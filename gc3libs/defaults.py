@@ -74,6 +74,10 @@ OPENSTACK_LRMS = 'openstack'
 SSH_CONFIG_FILE = '~/.ssh/config'
 SSH_PORT = 22
 SSH_CONNECT_TIMEOUT = 30
+SSH_MAX_CONNECTIONS = 1
+SSH_MAX_CHANNELS_PER_CONNECTION = 8
+SSH_KEEPALIVE = 0
+SSH_IDLE_TIMEOUT = 300
 
 
 PEEK_FILE_SIZE = 120  # expressed in bytes
@@ -97,3 +101,67 @@ Top-level path for the working directory of jobs.
 On batch systems, this should be visible from both
 the frontend and the compute nodes.
 """
+
+SQL_FLUSH_SIZE = 1000
+"""
+Maximum number of objects that `SqlStore` keeps waiting to be written
+when saving in write-behind mode.
+"""
+
+STORE_MAX_DELTAS = 32
+"""
+Number of delta records that a store in incremental mode appends to
+the log of an object before saving it again in full.
+"""
+
+HISTORY_MAX_LENGTH = 0
+"""
+Maximum number of messages kept in memory in the history of each
+task; older messages are dropped.  If 0, there is no limit.
+"""
+
+STORE_COMPRESS_THRESHOLD = 512
+"""
+Minimum size (in bytes) of the serialized data of an object that a
+store configured to compress data actually compresses.
+"""
+
+POLL_MIN_INTERVAL = 10
+"""
+Minimum time (in seconds) between two state updates of the same task,
+when the `Engine` polls tasks adaptively.
+"""
+
+POLL_MAX_INTERVAL = 300
+"""
+Maximum time (in seconds) between two state updates of the same task,
+when the `Engine` polls tasks adaptively.
+"""
+
+INPUT_CACHE_MIN_SIZE = 1 * MiB
+"""
+Input files smaller than this are never stored in the input cache
+of a resource, but always copied into the job working directory.
+"""
+
+SESSION_JOURNAL_MIN_SIZE = 1000
+"""
+Minimum number of records in the journal of a session index before
+it is merged back into the index files.  (Merging also waits until
+the journal holds more records than the index itself.)
+"""
+
+RESOURCE_STATUS_TTL = 30
+"""
+Time (in seconds) during which the status of a resource, as queried
+by `Core.update_resources`, is considered current: the resource is
+not queried again until it has elapsed.  Can be overridden per
+resource with the ``status_ttl`` configuration key.
+"""
+
+SHELLCMD_LEDGER_MIN_SIZE = 1000
+"""
+Minimum number of records in the job ledger of a ``shellcmd``
+resource before it is compacted.  (Compaction also waits until the
+ledger holds more than twice as many records as there are known jobs.)
+"""
@@ -31,6 +31,9 @@ from __future__ import absolute_import, print_function, unicode_literals
 __docformat__ = 'reStructuredText'
 
 
+from contextlib import contextmanager
+import threading
+
 # do not make symbols imported from `blinker` public: use of `blinker`
 # here is an implementation detail
 from blinker import signal as _signal
@@ -39,3 +42,57 @@ from blinker import signal as _signal
 TaskStateChange = _signal('task_state_change')
 
 TermStatusChange = _signal('task_termstatus_change')
+
+# sent by a `Store` (the sender) each time object `obj` has been
+# saved with ID `id_`
+ObjectSaved = _signal('object_saved')
+
+# sent by a backend (the sender) as soon as it learns that the job
+# with ID `jobid` has ended, possibly from a thread other than the
+# one running the `Engine`; the job's state is *not* updated yet
+JobDone = _signal('job_done')
+
+
+# per-thread list of signals whose delivery has been postponed
+_deferred = threading.local()
+
+
+def send(signal, sender, **kwargs):
+    """
+    Notify subscribers of `signal` that an event originated at `sender`.
+
+    If the current thread is within a `deferred`:func: block, the
+    notification is just recorded for later delivery.
+    """
+    pending = getattr(_deferred, 'signals', None)
+    if pending is None:
+        signal.send(sender, **kwargs)
+    else:
+        pending.append((signal, sender, kwargs))
+
+
+@contextmanager
+def deferred():
+    """
+    Postpone delivery of events sent (with `send`:func:) by the current thread.
+
+    The context manager returns a list, which will be filled with
+    triples *(signal, sender, kwargs)*, one per event sent while in
+    the ``with`` block; pass the list to `replay`:func: to actually
+    deliver the events (possibly in a different thread).
+    """
+    signals = []
+    outer = getattr(_deferred, 'signals', None)
+    _deferred.signals = signals
+    try:
+        yield signals
+    finally:
+        _deferred.signals = outer
+
+
+def replay(signals):
+    """
+    Deliver events recorded within a `deferred`:func: block.
+    """
+    for signal, sender, kwargs in signals:
+        signal.send(sender, **kwargs)
@@ -0,0 +1,423 @@
+#! /usr/bin/env python
+#
+"""
+Incremental saving of objects as a base snapshot plus a log of changes.
+
+When a `Store` is opened in "incremental" mode, an object is written
+in full (the *base snapshot*) only the first time it is saved, and
+then again every few saves to compact the log; in between, each save
+only appends a *delta record* with the attributes whose value has
+changed since the last save, and the messages that have been
+appended to the object's ``execution.history`` in the meantime.
+
+Changed attributes are detected by comparing digests of the
+serialized attribute values with the ones recorded at the time of the
+previous save; a save thus never re-serializes the (ever-growing)
+history of a task, and only writes out attributes that changed.
+Attributes holding immutable values (numbers, strings, or tuples
+thereof) are not even serialized again unless they have been
+given a different value since the previous save; only attributes
+holding objects that can change in place (e.g., lists and
+dictionaries) need their digest computed at every save.
+"""
+# Copyright (C) 2019  University of Zurich. All rights reserved.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+from __future__ import absolute_import, print_function, unicode_literals
+from future import standard_library
+standard_library.install_aliases()
+from builtins import object
+__docformat__ = 'reStructuredText'
+
+
+# stdlib imports
+from contextlib import closing
+import hashlib
+from io import BytesIO
+import numbers
+import pickle
+import types
+import weakref
+
+# GC3Pie imports
+import gc3libs
+import gc3libs.defaults
+
+from gc3libs.persistence.serialization import (
+    DEFAULT_PROTOCOL,
+    _PicklerWithPersistentID,
+    _UnpicklerWithPersistentID,
+)
+
+
+SELF = ('gc3libs.persistence.delta', 'self')
+"""
+Persistent ID standing for the object that a delta record applies to.
+"""
+
+
+def digest(data):
+    """
+    Return a digest of byte string `data`.
+    """
+    return hashlib.sha1(data).hexdigest()
+
+
+def read_records(stream):
+    """
+    Iterate over the delta records stored one after the other in `stream`.
+    """
+    while True:
+        try:
+            yield pickle.load(stream)
+        except EOFError:
+            return
+
+
+class _DeltaPickler(_PicklerWithPersistentID):
+    """
+    Serialize attributes of `root`, saving references to `root` as `SELF`.
+    """
+
+    def persistent_id(self, obj):
+        if obj is self._root:
+            return SELF
+        return _PicklerWithPersistentID.persistent_id(self, obj)
+
+
+class _DeltaUnpickler(_UnpicklerWithPersistentID):
+    """
+    Deserialize attributes of `root`, resolving `SELF` to `root`.
+    """
+
+    def __init__(self, driver, root, stream):
+        self._root = root
+        _UnpicklerWithPersistentID.__init__(self, driver, stream)
+
+    def persistent_load(self, id_):
+        if id_ == SELF:
+            return self._root
+        return _UnpicklerWithPersistentID.persistent_load(self, id_)
+
+
+class _Shadow(object):
+    """
+    What is known about an object as of the last time it was saved.
+    """
+
+    __slots__ = ('ref', 'base', 'digests', 'values', 'run', 'history',
+                 'length', 'count')
+
+    def __init__(self, obj, base, digests, length, count, values=None):
+        self.ref = weakref.ref(obj)
+        self.base = base
+        self.digests = digests
+        self.values = (values if values is not None else {})
+        run, history = _history(obj)
+        self.run = (weakref.ref(run) if run is not None else None)
+        self.history = (weakref.ref(history) if history is not None else None)
+        self.length = length
+        self.count = count
+
+    def matches(self, obj):
+        if self.ref() is not obj:
+            return False
+        run, history = _history(obj)
+        if run is None:
+            return self.run is None
+        return (self.run is not None and self.run() is run
+                and self.history is not None and self.history() is history
+                and history.total >= self.length)
+
+
+def _history(obj):
+    """
+    Return pair *(run, history)* for object `obj`.
+
+    Either item is ``None`` if `obj` has no `Run` in its ``execution``
+    attribute, or if that has no `History` instance as ``history``.
+    """
+    run = getattr(obj, '__dict__', {}).get('execution')
+    if not isinstance(run, gc3libs.Run):
+        return None, None
+    history = run.__dict__.get('history')
+    if not isinstance(history, gc3libs.utils.History):
+        return run, None
+    return run, history
+
+
+def _is_slot(obj, name):
+    """
+    Return ``True`` if attribute `name` of `obj` is stored in a slot.
+    """
+    return isinstance(getattr(type(obj), name, None),
+                      types.MemberDescriptorType)
+
+
+_IMMUTABLE = (bytes, gc3libs.string_types, numbers.Number, type(None))
+
+
+def _freeze(obj, value):
+    """
+    Return a token that compares equal only to tokens for the same `value`.
+
+    Return ``None`` if `value` (an attribute of `obj`) could be changed
+    without assigning a new object to the attribute, e.g., it is a list;
+    such values must be serialized at every save to detect changes.
+    """
+    if value is obj:
+        return (SELF,)
+    if isinstance(value, _IMMUTABLE):
+        return (type(value), value)
+    if isinstance(value, tuple):
+        items = tuple(_freeze(obj, item) for item in value)
+        if None in items:
+            return None
+        return (type(value), items)
+    return None
+
+
+def _fields(obj):
+    """
+    Return dictionary mapping attribute paths of `obj` to values.
+
+    Attribute paths are tuples: ``(name,)`` for attributes of `obj`
+    itself, and ``('execution', name)`` for attributes of its `Run`
+    object, except for ``history`` which is handled separately.
+
+    Return ``None`` if the state of `obj` cannot be decomposed this way,
+    e.g., because it is a container or it has custom pickling code.
+    """
+    cls = type(obj)
+    if (isinstance(obj, (dict, list, set, tuple))
+            or getattr(cls, '__slots__', None)
+            or cls.__reduce_ex__ is not object.__reduce_ex__
+            or cls.__reduce__ is not object.__reduce__):
+        return None
+    getstate = getattr(obj, '__getstate__', None)
+    state = (getstate() if getstate is not None
+             else getattr(obj, '__dict__', None))
+    if not isinstance(state, dict):
+        return None
+    fields = {}
+    run, history = _history(obj)
+    for name, value in state.items():
+        if name == 'changed':
+            continue
+        if name == 'execution' and run is not None:
+            for key, item in run.__getstate__().items():
+                if item is not history:
+                    fields[('execution', key)] = item
+        else:
+            fields[(name,)] = value
+    return fields
+
+
+class Change(object):
+    """
+    What needs to be written out to save an object.
+
+    If `reset` is true, the object is being saved in full and any
+    previous delta records must be removed; `record` is then either
+    ``None`` or the serialized header record of the new delta log.
+    Otherwise, `record` is the serialized delta record to append to the
+    log, as entry number `seq`, or ``None`` if nothing changed.
+    """
+
+    __slots__ = ('reset', 'record', 'seq', 'shadow')
+
+    def __init__(self, reset, record, seq, shadow):
+        self.reset = reset
+        self.record = record
+        self.seq = seq
+        self.shadow = shadow
+
+
+class DeltaLog(object):
+    """
+    Compute and apply delta records for the objects saved in a `Store`.
+
+    For each object saved or loaded through the `driver` store, a
+    "shadow" with digests of its attribute values is kept in memory;
+    when the object is saved again, only the attributes whose digest
+    has changed, and any new history messages, are serialized.  The
+    shadow also keeps the immutable attribute values, so that the
+    digest of an attribute is only computed again if it may have
+    changed.
+
+    After `max_deltas` delta records have been written for an object,
+    method `delta` returns ``None``, signaling that the object should
+    be saved in full to compact its log.
+    """
+
+    def __init__(self, driver, max_deltas=gc3libs.defaults.STORE_MAX_DELTAS):
+        self._driver = driver
+        self.max_deltas = int(max_deltas)
+        self._shadows = {}
+
+    def _dumps(self, obj, value):
+        with closing(BytesIO()) as stream:
+            _DeltaPickler(self._driver, obj, stream,
+                          protocol=DEFAULT_PROTOCOL).dump(value)
+            return stream.getvalue()
+
+    def _loads(self, obj, data):
+        return _DeltaUnpickler(self._driver, obj, BytesIO(data)).load()
+
+    def delta(self, id_, obj):
+        """
+        Return the `Change` needed to save `obj` as a delta record.
+
+        Return ``None`` if `obj` needs to be saved in full instead.
+        """
+        shadow = self._shadows.get(str(id_))
+        if (shadow is None or shadow.count >= self.max_deltas
+                or not shadow.matches(obj)):
+            return None
+        fields = _fields(obj)
+        if fields is None:
+            return None
+        changed = {}
+        digests = dict(shadow.digests)
+        values = {}
+        for path, value in fields.items():
+            token = _freeze(obj, value)
+            if token is not None:
+                values[path] = token
+                if path in digests and shadow.values.get(path) == token:
+                    continue
+            data = self._dumps(obj, value)
+            key = digest(data)
+            if digests.get(path) != key:
+                changed[path] = data
+                digests[path] = key
+        removed = [path for path in shadow.digests if path not in fields]
+        for path in removed:
+            del digests[path]
+        _, history = _history(obj)
+        if history is not None:
+            messages = history.records(shadow.length)
+            length = history.total
+        else:
+            messages = []
+            length = 0
+        if not (changed or removed or messages):
+            shadow.values = values
+            return Change(False, None, None, shadow)
+        seq = shadow.count + 1
+        record = pickle.dumps(
+            ('delta', shadow.base, changed, removed,
+             (self._dumps(obj, messages) if messages else None)),
+            DEFAULT_PROTOCOL)
+        return Change(False, record, seq,
+                      _Shadow(obj, shadow.base, digests, length, seq,
+                              values))
+
+    def snapshot(self, id_, obj, data):
+        """
+        Return the `Change` for saving `obj` in full as `data`.
+        """
+        fields = _fields(obj)
+        if fields is None:
+            return Change(True, None, 0, None)
+        base = digest(data)
+        digests = {}
+        values = {}
+        for path, value in fields.items():
+            digests[path] = digest(self._dumps(obj, value))
+            token = _freeze(obj, value)
+            if token is not None:
+                values[path] = token
+        _, history = _history(obj)
+        length = (history.total if history is not None else 0)
+        record = pickle.dumps(('base', base, digests, length),
+                              DEFAULT_PROTOCOL)
+        return Change(True, record, 0,
+                      _Shadow(obj, base, digests, length, 0, values))
+
+    def commit(self, id_, change):
+        """
+        Record that `change` has been successfully written.
+        """
+        if change.shadow is None:
+            self._shadows.pop(str(id_), None)
+        else:
+            self._shadows[str(id_)] = change.shadow
+
+    def forget(self, id_):
+        """
+        Drop the shadow for object `id_`; it will be saved in full next time.
+        """
+        self._shadows.pop(str(id_), None)
+
+    def replay(self, id_, obj, data, records):
+        """
+        Apply the delta `records` to `obj`, freshly loaded from `data`.
+
+        Records referring to a base snapshot other than `data` are
+        ignored: they are leftovers from a save that was interrupted
+        before the log could be reset.  If a record cannot be read or
+        applied, the remaining ones are ignored and `obj` will be
+        saved in full the next time.
+        """
+        base = digest(data)
+        shadow = None
+        try:
+            for record in records:
+                if record[1] != base:
+                    continue
+                if record[0] == 'base':
+                    shadow = _Shadow(obj, base, record[2], record[3], 0)
+                elif shadow is not None:
+                    self._apply(obj, shadow, record)
+        except Exception as err:
+            gc3libs.log.warning(
+                "Could not apply log of changes to object %s;"
+                " it will be saved in full next time: %s: %s",
+                id_, err.__class__.__name__, err)
+            shadow = None
+        if shadow is None:
+            self.forget(id_)
+        else:
+            # `_Shadow` looks up the run and history when created
+            self._shadows[str(id_)] = _Shadow(
+                obj, base, shadow.digests, shadow.length, shadow.count)
+
+    def _apply(self, obj, shadow, record):
+        _, _, changed, removed, messages = record
+        for path, data in changed.items():
+            value = self._loads(obj, data)
+            target = self._target(obj, path)
+            if _is_slot(target, path[-1]):
+                setattr(target, path[-1], value)
+            else:
+                target.__dict__[path[-1]] = value
+            shadow.digests[path] = digest(data)
+        for path in removed:
+            target = self._target(obj, path)
+            if not _is_slot(target, path[-1]):
+                target.__dict__.pop(path[-1], None)
+            shadow.digests.pop(path, None)
+        if messages is not None:
+            _, history = _history(obj)
+            history.extend(self._loads(obj, messages))
+            shadow.length = history.total
+        shadow.count += 1
+
+    @staticmethod
+    def _target(obj, path):
+        if len(path) == 1:
+            return obj
+        return obj.__dict__[path[0]]
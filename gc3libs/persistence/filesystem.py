@@ -18,26 +18,129 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 from __future__ import absolute_import, print_function, unicode_literals
+from future import standard_library
+standard_library.install_aliases()
 from builtins import str
 __docformat__ = 'reStructuredText'
 
 # stdlib imports
+from contextlib import closing
+import errno
+import hashlib
+from io import BytesIO
+from multiprocessing.pool import ThreadPool
 import os
+import re
 import sys
+from urllib.parse import parse_qs
 from weakref import WeakValueDictionary
 
 # GC3Pie imports
 import gc3libs
+from gc3libs.compat._collections import OrderedDict
+import gc3libs.events
 import gc3libs.exceptions
-from gc3libs.utils import same_docstring_as
+from gc3libs.utils import same_docstring_as, string_to_boolean
 from gc3libs.url import Url
 
+from gc3libs.persistence.delta import DeltaLog, read_records
 from gc3libs.persistence.idfactory import IdFactory
-from gc3libs.persistence.serialization import (DEFAULT_PROTOCOL, make_pickler,
-                                               make_unpickler)
+from gc3libs.persistence.serialization import (DEFAULT_PROTOCOL, make_codec,
+                                               make_pickler, make_unpickler)
 from gc3libs.persistence.store import Store
 
 
+# atomically replace a file, where the OS allows it
+_replace = getattr(os, 'replace', os.rename)
+
+
+INDEX_FILENAME = '.index'
+"""
+Name of the file listing object IDs in a ``sharded`` jobs directory.
+"""
+
+SHARD_DEPTH = 2
+"""
+Number of subdirectory levels in a ``sharded`` jobs directory.
+"""
+
+_SHARD_DIR_RE = re.compile(r'^[0-9a-f]{2}$')
+
+
+def _object_path(directory, layout, id_):
+    """
+    Return path of the file holding object `id_` in a jobs directory.
+
+    With the ``flat`` layout, this is just `id_` in `directory`; with
+    the ``sharded`` layout, `id_` is placed in `SHARD_DEPTH` nested
+    subdirectories, named after successive hex digit pairs of a hash
+    of `id_`.
+
+      >>> print(_object_path('/jobs', 'flat', 'Application.1'))
+      /jobs/Application.1
+      >>> print(_object_path('/jobs', 'sharded', 'Application.1'))
+      /jobs/af/3d/Application.1
+    """
+    id_ = str(id_)
+    if layout == 'flat':
+        return os.path.join(directory, id_)
+    key = hashlib.md5(id_.encode('utf-8')).hexdigest()
+    parts = [key[2*n:2*n+2] for n in range(SHARD_DEPTH)]
+    return os.path.join(directory, *(parts + [id_]))
+
+
+def _read_index(directory):
+    """
+    Return ordered dictionary of the object IDs listed in `directory`.
+
+    The index file is a sequence of lines ``+ID`` (object saved for the
+    first time) and ``-ID`` (object removed); an incomplete last line
+    (e.g., from an interrupted write) is ignored.
+    """
+    ids = OrderedDict()
+    try:
+        with open(os.path.join(directory, INDEX_FILENAME), 'rb') as src:
+            for line in src:
+                if not line.endswith(b'\n'):
+                    break
+                line = line[:-1].decode('utf-8')
+                if line.startswith('+'):
+                    ids[line[1:]] = True
+                elif line.startswith('-'):
+                    ids.pop(line[1:], None)
+    except (IOError, OSError) as err:
+        if err.errno != errno.ENOENT:
+            raise
+    return ids
+
+
+def _write_index(directory, ids):
+    """
+    Atomically replace the index file in `directory` with one listing `ids`.
+    """
+    path = os.path.join(directory, INDEX_FILENAME)
+    tmpname = '%s.%d.tmp' % (path, os.getpid())
+    with open(tmpname, 'wb') as tgt:
+        for id_ in ids:
+            tgt.write(('+%s\n' % id_).encode('utf-8'))
+    _replace(tmpname, path)
+
+
+def _makedirs(path):
+    """
+    Create directory `path` and any missing parent; ignore if existing.
+    """
+    try:
+        os.makedirs(path)
+    except OSError as err:
+        if err.errno == errno.EEXIST:
+            return
+        # raise same exception but add context message
+        gc3libs.log.error("Could not create jobs directory '%s': %s",
+                          path, err)
+        raise
+
+
 # persist objects in a filesystem directory
 
 class FilesystemStore(Store):
@@ -48,6 +151,20 @@ class FilesystemStore(Store):
 
     All objects are saved as files in the given directory (default:
     `gc3libs.defaults.JOBS_DIR`).  The file name is the object ID.
+    Files are written to a temporary file first, which is then renamed
+    to the object ID, so a file is never left half-written.
+
+    The `layout` argument selects how files are placed in the
+    directory: with ``flat`` (default) all files are in the directory
+    itself; with ``sharded`` they are spread over nested subdirectories
+    named after a hash of the object ID (see `_object_path`:func:), and
+    an append-only index file (`INDEX_FILENAME`) records the IDs of the
+    stored objects, so that method `list` need not scan directories.
+    If `layout` is ``None``, a directory with an index file is opened
+    as ``sharded``, any other as ``flat``.  The layout can also be given
+    in the store URL fragment as ``#layout=sharded``; use function
+    `migrate_filesystemstore`:func: (or ``gsession migrate``) to
+    convert an existing directory.
 
     If an object contains references to other `Persistable` objects,
     these are saved in the file they would have been saved if the
@@ -64,14 +181,52 @@ class FilesystemStore(Store):
     The `protocol` argument specifies the serialization protocol to use,
     if different from `gc3libs.persistence.serialization.DEFAULT_PROTOCOL`.
 
+    The `codec` argument selects how pickled objects are encoded in
+    the files, e.g., to compress them; it is either a
+    `gc3libs.persistence.serialization.Codec`:class: instance or a
+    specification string like ``pickle4+zlib`` (which overrides
+    `protocol`); data smaller than `compress_min` bytes is never
+    compressed.  Both can also be given in the fragment of the store
+    URL, e.g., ``file:///path#codec=zlib&compress_min=1024``, when
+    using `gc3libs.persistence.make_store`:func:.  Files written with
+    any codec can be read back with any other one.
+
+    If `incremental` is ``True``, an object that was already saved or
+    loaded through this store is not saved in full again; instead,
+    the attributes that changed and any new history messages are
+    appended to a log file next to the object file (same name, with
+    suffix ``.delta``).  After `max_deltas` such records, the object is
+    saved in full again and the log is reset.  See module
+    `gc3libs.persistence.delta`:mod: for details.
+
     Any extra keyword arguments are ignored for compatibility with
     `SqlStore`.
     """
 
+    LAYOUTS = ('flat', 'sharded')
+    """
+    Valid values for the `layout` argument of the constructor.
+    """
+
+    LOAD_MANY_THREADS = 8
+    """
+    Number of threads used by `load_many` to read files concurrently.
+    """
+
+    LOAD_MANY_CHUNK_SIZE = 500
+    """
+    Maximum number of files that `load_many` keeps in memory at once.
+    """
+
     def __init__(self,
                  directory=gc3libs.defaults.JOBS_DIR,
                  idfactory=IdFactory(),
                  protocol=DEFAULT_PROTOCOL,
+                 incremental=False,
+                 max_deltas=gc3libs.defaults.STORE_MAX_DELTAS,
+                 codec=None,
+                 compress_min=None,
+                 layout=None,
                  **extra_args):
         if isinstance(directory, Url):
             super(FilesystemStore, self).__init__(directory)
@@ -80,10 +235,28 @@ class FilesystemStore(Store):
             super(FilesystemStore, self).__init__(
                 Url(scheme='file', path=os.path.abspath(directory)))
         self._directory = directory
+        if layout is None:
+            layout = ('sharded' if os.path.exists(
+                os.path.join(directory, INDEX_FILENAME)) else 'flat')
+        if layout not in self.LAYOUTS:
+            raise gc3libs.exceptions.InvalidArgument(
+                "Invalid layout '%s' for `FilesystemStore`:"
+                " must be one of %s" % (layout, ', '.join(self.LAYOUTS)))
+        self.layout = layout
+        # IDs listed in the index file (``sharded`` layout only)
+        self._ids = None
 
         self.idfactory = idfactory
         self._loaded = WeakValueDictionary()
-        self._protocol = protocol
+        self._codec = make_codec(codec, self.url, compress_min,
+                                 protocol=protocol)
+        self._protocol = self._codec.protocol
+        # file contents read by `load_many` but not yet unpickled
+        self._prefetched = {}
+        if string_to_boolean(str(incremental)):
+            self._deltas = DeltaLog(self, max_deltas)
+        else:
+            self._deltas = None
 
     @same_docstring_as(Store.invalidate_cache)
     def invalidate_cache(self):
@@ -91,18 +264,93 @@ class FilesystemStore(Store):
 
     @same_docstring_as(Store.list)
     def list(self):
+        if self.layout == 'sharded':
+            # re-read the index to see objects saved by other processes
+            self._ids = _read_index(self._directory)
+            return list(self._ids)
         if not os.path.exists(self._directory):
             return []
         return [id_ for id_ in os.listdir(self._directory)
-                if not id_.endswith('.OLD')]
+                if not (id_.startswith('.')
+                        or id_.endswith('.OLD') or id_.endswith('.delta'))]
+
+    def _path(self, id_):
+        """Return path of the file where object `id_` is saved."""
+        return _object_path(self._directory, self.layout, id_)
+
+    def _add_to_index(self, id_):
+        """Append `id_` to the index file, unless already listed."""
+        if self._ids is None:
+            self._ids = _read_index(self._directory)
+        if id_ in self._ids:
+            return
+        with open(os.path.join(self._directory, INDEX_FILENAME), 'ab') as tgt:
+            tgt.write(('+%s\n' % id_).encode('utf-8'))
+        self._ids[id_] = True
+
+    def _remove_from_index(self, id_):
+        """Record in the index file that object `id_` has been removed."""
+        with open(os.path.join(self._directory, INDEX_FILENAME), 'ab') as tgt:
+            tgt.write(('-%s\n' % id_).encode('utf-8'))
+        if self._ids is not None:
+            self._ids.pop(id_, None)
 
     def _load_from_file(self, path):
         """Auxiliary method for `load`."""
         # gc3libs.log.debug("Loading object from file '%s' ...", path)
-        with open(path, 'rb') as src:
-            unpickler = make_unpickler(self, src)
-            obj = unpickler.load()
-            return obj
+        data = self._prefetched.pop(path, None)
+        if data is None:
+            with open(path, 'rb') as src:
+                data = src.read()
+        data = self._codec.decode(data)
+        obj = make_unpickler(self, BytesIO(data)).load()
+        if self._deltas is not None and hasattr(obj, 'persistent_id'):
+            self._replay_deltas(path, obj, data)
+        return obj
+
+    def _replay_deltas(self, path, obj, data):
+        """Apply changes logged in file `path`.delta to `obj`."""
+        id_ = obj.persistent_id
+        if not os.path.exists(path + '.delta'):
+            self._deltas.forget(id_)
+            return
+        with open(path + '.delta', 'rb') as src:
+            self._deltas.replay(id_, obj, data, read_records(src))
+
+    @staticmethod
+    def _read_file(path):
+        try:
+            with open(path, 'rb') as src:
+                return path, src.read()
+        except (IOError, OSError):
+            return path, None
+
+    @same_docstring_as(Store.load_many)
+    def load_many(self, ids):
+        ids = list(ids)
+        if len(ids) < 2:
+            return super(FilesystemStore, self).load_many(ids)
+        result = []
+        pool = ThreadPool(min(self.LOAD_MANY_THREADS, len(ids)))
+        try:
+            for start in range(0, len(ids), self.LOAD_MANY_CHUNK_SIZE):
+                chunk = ids[start:start+self.LOAD_MANY_CHUNK_SIZE]
+                # read files of objects not yet loaded in parallel
+                # threads; objects are then unpickled sequentially
+                paths = [self._path(id_)
+                         for id_ in chunk if str(id_) not in self._loaded]
+                for path, data in pool.imap_unordered(self._read_file, paths):
+                    if data is not None:
+                        self._prefetched[path] = data
+                try:
+                    result.extend(
+                        super(FilesystemStore, self).load_many(chunk))
+                finally:
+                    self._prefetched.clear()
+        finally:
+            pool.close()
+            pool.join()
+        return result
 
     @same_docstring_as(Store.load)
     def load(self, id_):
@@ -112,8 +360,10 @@ class FilesystemStore(Store):
         except KeyError:
             pass
 
-        # no cached copy, load from disk
-        filename = os.path.join(self._directory, id_)
+        # no cached copy, load from disk; files ending in `.OLD` are
+        # left over by versions of GC3Pie that did not use atomic
+        # renames and were interrupted while saving
+        filename = self._path(id_)
 
         sources = [filename, filename + '.OLD']
         for source in sources:
@@ -161,8 +411,16 @@ class FilesystemStore(Store):
 
     @same_docstring_as(Store.remove)
     def remove(self, id_):
-        filename = os.path.join(self._directory, id_)
+        filename = self._path(id_)
         os.remove(filename)
+        if self.layout == 'sharded':
+            self._remove_from_index(str(id_))
+        if self._deltas is not None:
+            self._deltas.forget(id_)
+        try:
+            os.remove(filename + '.delta')
+        except OSError:
+            pass
         try:
             del self._loaded[str(id_)]
         except KeyError:
@@ -185,50 +443,74 @@ class FilesystemStore(Store):
         destination file exists, create it.  Ensure that the
         destination file is kept intact in case dumping `obj` fails.
         """
-        filename = os.path.join(self._directory, id_)
+        filename = self._path(id_)
         # gc3libs.log.debug("Storing job '%s' into file '%s'", obj, filename)
 
-        if not os.path.exists(self._directory):
-            try:
-                os.makedirs(self._directory)
-            except Exception as ex:
-                # raise same exception but add context message
-                gc3libs.log.error("Could not create jobs directory '%s': %s"
-                                  % (self._directory, str(ex)))
-                raise
-
-        backup = None
-        if os.path.exists(filename):
-            backup = filename + '.OLD'
-            os.rename(filename, backup)
-
-        with open(filename, 'w+b') as tgt:
-            try:
-                pickler = make_pickler(self, tgt, obj)
-                pickler.dump(obj)
-            except Exception as err:
-                gc3libs.log.error(
-                    "Error saving task '%s' to file '%s': %s: %s",
-                    obj, filename, err.__class__.__name__, err)
-                # move backup file back in place
-                if backup is not None:
-                    try:
-                        os.rename(backup, filename)
-                    except:
-                        pass  # ignore errors
+        if self._deltas is not None:
+            change = self._deltas.delta(id_, obj)
+            if change is not None:
+                if change.record is not None:
+                    with open(filename + '.delta', 'ab') as tgt:
+                        tgt.write(change.record)
+                self._deltas.commit(id_, change)
+                self._saved(id_, obj)
+                return
+
+        # write to a temporary file in the same directory, then
+        # atomically rename it over the destination file
+        dirname, basename = os.path.split(filename)
+        tmpname = os.path.join(
+            dirname, '.%s.%d.tmp' % (basename, os.getpid()))
+        try:
+            tgt = open(tmpname, 'wb')
+        except (IOError, OSError) as err:
+            if err.errno != errno.ENOENT:
                 raise
-            if hasattr(obj, 'changed'):
-                obj.changed = False
-            # remove backup file, if exists
+            _makedirs(dirname)
+            tgt = open(tmpname, 'wb')
+        try:
+            with tgt:
+                if self._deltas is not None or self._codec.compression:
+                    with closing(BytesIO()) as buf:
+                        make_pickler(self, buf, obj, self._protocol).dump(obj)
+                        data = buf.getvalue()
+                    tgt.write(self._codec.encode(data))
+                else:
+                    pickler = make_pickler(self, tgt, obj, self._protocol)
+                    pickler.dump(obj)
+            _replace(tmpname, filename)
+        except Exception as err:
+            gc3libs.log.error(
+                "Error saving task '%s' to file '%s': %s: %s",
+                obj, filename, err.__class__.__name__, err)
             try:
-                os.remove(backup)
-            except:
+                os.remove(tmpname)
+            except OSError:
                 pass  # ignore errors
-            # update cache
-            if id_ in self._loaded:
-                old = self._loaded[str(id_)]
-                if old is not obj:
-                    self._loaded[str(id_)] = obj
+            raise
+        if self.layout == 'sharded':
+            self._add_to_index(str(id_))
+        if self._deltas is not None:
+            # start a new log of changes, based on the data just written
+            change = self._deltas.snapshot(id_, obj, data)
+            if change.record is not None:
+                with open(filename + '.delta', 'wb') as tgt:
+                    tgt.write(change.record)
+            elif os.path.exists(filename + '.delta'):
+                os.remove(filename + '.delta')
+            self._deltas.commit(id_, change)
+        self._saved(id_, obj)
+
+    def _saved(self, id_, obj):
+        """Update `obj` and the cache of loaded objects after saving `obj`."""
+        if hasattr(obj, 'changed'):
+            obj.changed = False
+        # update cache
+        if id_ in self._loaded:
+            old = self._loaded[str(id_)]
+            if old is not obj:
+                self._loaded[str(id_)] = obj
+        gc3libs.events.send(gc3libs.events.ObjectSaved, self, id_=id_, obj=obj)
 
 
 def make_filesystemstore(url, *args, **extra_args):
@@ -248,9 +530,88 @@ def make_filesystemstore(url, *args, **extra_args):
       'FilesystemStore'
     """
     assert isinstance(url, Url)
+    if url.fragment and extra_args.get('codec') is None:
+        extra_args['codec'] = make_codec(
+            url=url, compress_min=extra_args.get('compress_min'),
+            protocol=extra_args.get('protocol', DEFAULT_PROTOCOL))
+    if url.fragment and extra_args.get('layout') is None:
+        layout = parse_qs(url.fragment).get('layout')
+        if layout:
+            extra_args['layout'] = layout[-1]  # last wins
     return FilesystemStore(url.path, *args, **extra_args)
 
 
+def _split_name(name):
+    """
+    Return pair *(id, is_object)* for a file named `name` in a jobs directory.
+    """
+    for suffix in ('.OLD', '.delta'):
+        if name.endswith(suffix):
+            return name[:-len(suffix)], False
+    return name, True
+
+
+def migrate_filesystemstore(directory, layout='sharded'):
+    """
+    Move the files in jobs directory `directory` to the given `layout`.
+
+    Return the number of objects found.  The index file of a
+    ``sharded`` directory is rewritten from scratch, dropping the
+    records of removed objects; this can also be used to compact the
+    index of a directory that is already ``sharded``.
+
+    No process must be using the directory while it is migrated.  If
+    migration is interrupted, it can safely be run again.
+    """
+    if layout not in FilesystemStore.LAYOUTS:
+        raise gc3libs.exceptions.InvalidArgument(
+            "Invalid layout '%s' for `FilesystemStore`:"
+            " must be one of %s"
+            % (layout, ', '.join(FilesystemStore.LAYOUTS)))
+    index = os.path.join(directory, INDEX_FILENAME)
+    if layout == 'sharded' and not os.path.exists(index):
+        # mark directory as sharded before moving any file, so that
+        # an interrupted migration is detected and can be resumed
+        _write_index(directory, [])
+    files = []
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if os.path.isdir(path):
+            if _SHARD_DIR_RE.match(name):
+                for dirpath, _, filenames in os.walk(path):
+                    files.extend((os.path.join(dirpath, n), n)
+                                 for n in filenames)
+        elif not name.startswith('.'):
+            files.append((path, name))
+    ids = []
+    for path, name in files:
+        if name.startswith('.'):
+            # temporary file left over by an interrupted save
+            continue
+        id_, is_object = _split_name(name)
+        dest = os.path.join(
+            os.path.dirname(_object_path(directory, layout, id_)), name)
+        if dest != path:
+            _makedirs(os.path.dirname(dest))
+            _replace(path, dest)
+        if is_object:
+            ids.append(id_)
+    if layout == 'sharded':
+        _write_index(directory, ids)
+    else:
+        if os.path.exists(index):
+            os.remove(index)
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if _SHARD_DIR_RE.match(name) and os.path.isdir(path):
+                for dirpath, _, _ in os.walk(path, topdown=False):
+                    try:
+                        os.rmdir(dirpath)
+                    except OSError:
+                        pass  # not empty
+    return len(ids)
+
+
 # main: run tests
 
 if "__main__" == __name__:
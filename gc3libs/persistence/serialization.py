@@ -31,10 +31,14 @@ standard_library.install_aliases()
 from builtins import object
 
 import pickle
+from urllib.parse import parse_qs
+import zlib
 
 import sys
 PY2 = (sys.version_info[0] == 2)
 
+import gc3libs.defaults
+
 
 DEFAULT_PROTOCOL = pickle.HIGHEST_PROTOCOL
 
@@ -196,3 +200,226 @@ if PY2:
 
     # register the modified `load_build` as handler for `pickle.BUILD`
     _UnpicklerWithPersistentID.dispatch[pickle.BUILD] = _UnpicklerWithPersistentID.load_build
+
+
+## encoding of serialized data
+
+MAGIC = b'\x00GC3'
+"""
+Leading bytes of data written by a `Codec`:class: with a header.
+
+No pickle stream can start with a NUL byte, so data without this
+prefix is taken to be a plain pickle, as written by older versions of
+GC3Pie.
+"""
+
+CODEC_VERSION = 1
+"""
+Version of the header format written by `Codec.encode`:meth:.
+"""
+
+# compression methods, by the ID used in the header
+_COMPRESSIONS = {
+    0: None,
+    1: 'zlib',
+    2: 'lzma',
+}
+
+# Preset dictionaries for `zlib` compression, by the ID used in the
+# header: names of classes, modules and attributes that occur in
+# almost every pickled task.  Never change a dictionary once data
+# has been written with it: add a new one instead.
+_ZDICTS = {
+    1: b' '.join([
+        b'Transition from state', b'to state', b'(returncode:',
+        b'NEW', b'SUBMITTED', b'RUNNING', b'STOPPED', b'UNKNOWN',
+        b'TERMINATING', b'TERMINATED',
+        b'collections', b'OrderedDict', b'gc3libs.quantity', b'Memory',
+        b'Duration', b'_amount', b'_unit', b'_name', b'_base',
+        b'gc3libs.url', b'Url', b'UrlKeyDict', b'UrlValueDict',
+        b'_force_abs', b'file', b'gc3libs.utils', b'History', b'_texts',
+        b'_times', b'_tags', b'gc3libs.workflow', b'TaskCollection',
+        b'SequentialTaskCollection', b'ParallelTaskCollection',
+        b'DependentTaskCollection', b'RetryableTask', b'tasks',
+        b'_current_task', b'gc3libs', b'Task', b'Application', b'Run',
+        b'_ref', b'_state', b'_exitcode', b'_signal', b'_execution_targets',
+        b'state_last_changed', b'timestamp', b'history', b'lrms_jobid',
+        b'resource_name', b'returncode', b'_attached', b'_controller',
+        b'changed', b'persistent_id', b'jobname', b'arguments',
+        b'inputs', b'outputs', b'output_dir', b'output_base_url',
+        b'environment', b'join', b'stdin', b'stdout', b'stderr', b'tags',
+        b'would_output', b'requested_architecture', b'requested_cores',
+        b'requested_memory', b'requested_walltime', b'execution',
+    ]),
+}
+
+try:
+    import lzma
+except ImportError:
+    # not available on Python 2
+    lzma = None
+
+# Python 2's `zlib` cannot use preset dictionaries
+_HAVE_ZDICT = (sys.version_info >= (3, 3))
+
+
+class Codec(object):
+    """
+    Turn pickled data into the bytes written by a store, and back.
+
+    Argument `protocol` is the pickle protocol used by the store
+    (default: `DEFAULT_PROTOCOL`).  If `compression` is ``'zlib'``
+    or ``'lzma'``, pickled data of at least `threshold` bytes is
+    compressed with that method; `zlib` compression uses a preset
+    dictionary of names that are common in GC3Pie task pickles.
+
+    Compressed data is prefixed by a header recording the header
+    version, the compression method and the dictionary used, so that
+    data written with any codec can be decoded by any other one::
+
+      >>> plain = Codec()
+      >>> packed = Codec(compression='zlib', threshold=10)
+      >>> data = 100 * b'Application '
+      >>> blob = packed.encode(data)
+      >>> len(blob) < len(data)
+      True
+      >>> plain.decode(blob) == data
+      True
+
+    Uncompressed data is written with no header, i.e., exactly as
+    older versions of GC3Pie did::
+
+      >>> plain.encode(data) == data
+      True
+    """
+
+    def __init__(self, protocol=DEFAULT_PROTOCOL, compression=None,
+                 threshold=gc3libs.defaults.STORE_COMPRESS_THRESHOLD):
+        if protocol > pickle.HIGHEST_PROTOCOL:
+            raise ValueError(
+                "Pickle protocol %d is not supported by this Python"
+                " (highest supported protocol is %d)"
+                % (protocol, pickle.HIGHEST_PROTOCOL))
+        if compression not in _COMPRESSIONS.values():
+            raise ValueError(
+                "Unknown compression method '%s'" % (compression,))
+        if compression == 'lzma' and lzma is None:
+            raise ValueError(
+                "Compression method 'lzma' is not available"
+                " in this Python interpreter")
+        self.protocol = protocol
+        self.compression = compression
+        self.threshold = int(threshold)
+
+    @classmethod
+    def from_spec(cls, spec, **extra_args):
+        """
+        Return a `Codec` instance given a specification string.
+
+        The specification is a list of ``+``-separated words: either
+        ``pickle`` or ``pickleN`` to select the pickle protocol *N*,
+        and optionally ``zlib``, ``lzma`` or ``none`` for the
+        compression method::
+
+          >>> codec = Codec.from_spec('pickle2+zlib')
+          >>> codec.protocol, codec.compression
+          (2, 'zlib')
+
+        Words may also be separated by blanks, which is what a ``+``
+        in a URL fragment decodes to.  Any keyword arguments are
+        passed to the constructor.
+        """
+        for word in spec.replace('+', ' ').split():
+            word = word.lower()
+            if word.startswith('pickle'):
+                if word != 'pickle':
+                    extra_args['protocol'] = int(word[len('pickle'):])
+            elif word == 'none':
+                extra_args['compression'] = None
+            elif word in _COMPRESSIONS.values():
+                extra_args['compression'] = word
+            else:
+                raise ValueError(
+                    "Invalid word '%s' in codec specification '%s'"
+                    % (word, spec))
+        return cls(**extra_args)
+
+    def encode(self, data):
+        """
+        Return bytes to write to persistent storage, given pickled `data`.
+        """
+        if self.compression is None or len(data) < self.threshold:
+            return data
+        if self.compression == 'zlib':
+            if _HAVE_ZDICT:
+                zdict_id = max(_ZDICTS)
+                compressor = zlib.compressobj(
+                    zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, zlib.MAX_WBITS,
+                    zdict=_ZDICTS[zdict_id])
+            else:
+                zdict_id = 0
+                compressor = zlib.compressobj()
+            payload = compressor.compress(data) + compressor.flush()
+            method = 1
+        else:
+            zdict_id = 0
+            payload = lzma.compress(data)
+            method = 2
+        return bytes(MAGIC + bytearray([CODEC_VERSION, method, zdict_id])
+                     + payload)
+
+    @staticmethod
+    def decode(blob):
+        """
+        Return pickled data, given `blob` as written by `encode`:meth:.
+        """
+        blob = bytes(blob)
+        if not blob.startswith(MAGIC):
+            # plain pickle
+            return blob
+        version, method, zdict_id = bytearray(blob[4:7])
+        if version != CODEC_VERSION:
+            raise ValueError(
+                "Unsupported version %d of serialized data header" % version)
+        payload = blob[7:]
+        compression = _COMPRESSIONS[method]
+        if compression == 'zlib':
+            if zdict_id:
+                decompressor = zlib.decompressobj(
+                    zlib.MAX_WBITS, zdict=_ZDICTS[zdict_id])
+            else:
+                decompressor = zlib.decompressobj()
+            return decompressor.decompress(payload) + decompressor.flush()
+        elif compression == 'lzma':
+            return lzma.decompress(payload)
+        else:
+            return payload
+
+
+def make_codec(spec=None, url=None, compress_min=None, **extra_args):
+    """
+    Return a `Codec`:class: instance, for use by a store.
+
+    If `spec` is a `Codec` instance, return it unchanged.  If it is a
+    string, it is parsed by `Codec.from_spec`:meth:.  If it is
+    ``None``, the ``codec`` parameter in the fragment of `url` is
+    used, if present; otherwise a codec that writes plain pickles is
+    returned.
+
+    Argument `compress_min` is the codec's compression threshold; if
+    ``None``, the ``compress_min`` parameter in the fragment of `url`
+    is used, if present, or else the `Codec` default.
+
+    Any other keyword arguments are passed to the `Codec` constructor.
+    """
+    if isinstance(spec, Codec):
+        return spec
+    if url is not None and url.fragment:
+        kv = parse_qs(url.fragment)
+        if spec is None and kv.get('codec'):
+            spec = kv['codec'][-1]  # last wins
+        if compress_min is None and kv.get('compress_min'):
+            compress_min = kv['compress_min'][-1]  # last wins
+    if compress_min is not None:
+        extra_args['threshold'] = compress_min
+    return Codec.from_spec(spec or 'pickle', **extra_args)
@@ -27,9 +27,10 @@ __docformat__ = 'reStructuredText'
 
 
 # stdlib imports
-from contextlib import closing
+from contextlib import closing, contextmanager
 from io import BytesIO
 import os
+import pickle
 from urllib.parse import parse_qs
 from warnings import warn
 from weakref import WeakValueDictionary
@@ -39,14 +40,20 @@ import sqlalchemy.sql as sql
 
 # GC3Pie interface
 from gc3libs import Run
+import gc3libs.defaults
+from gc3libs.compat._collections import OrderedDict
+import gc3libs.events
 import gc3libs.exceptions
 from gc3libs.url import Url
 import gc3libs.utils
 from gc3libs.utils import same_docstring_as
 
+from gc3libs.persistence.delta import DeltaLog
 from gc3libs.persistence.idfactory import IdFactory
-from gc3libs.persistence.serialization import make_pickler, make_unpickler
-from gc3libs.persistence.store import Store
+from gc3libs.persistence.serialization import (make_codec, make_pickler,
+                                               make_unpickler)
+from gc3libs.persistence.serialization import Persistable
+from gc3libs.persistence.store import INDEX_FIELDS, Store
 
 
 # uncomment lines containing `_lvl` to show nested save/loads in logs
@@ -106,6 +113,21 @@ class SqlStore(Store):
     - `state`: if the object is a `Task`:class: instance, this will be
       its current execution state.
 
+    New tables also get the following indexed columns, which allow
+    answering `query`:meth: and `count`:meth: calls without loading
+    any object; tables created by older versions of GC3Pie may lack
+    them, in which case queries involving them fall back to loading
+    objects:
+
+    - `returncode`, `jobname`, `resource_name`: the corresponding
+      attributes of a `Task`:class: or of its `execution`.
+
+    - `submitted`, `terminated`: time when the task was submitted
+      (or started running, if it was never in state ``SUBMITTED``),
+      and when it reached state ``TERMINATED``.
+
+    - `parent`: ID of the task collection the object belongs to.
+
     The `extra_fields` constructor argument is used to extend the
     database. It must contain a mapping `*column*: *function*`
     where:
@@ -123,12 +145,66 @@ class SqlStore(Store):
     corresponding *function* in order to get the correct value to
     store into the DB.
 
+    Rows are written with a single "upsert" statement where the DB
+    supports it (``INSERT OR REPLACE`` on SQLite, ``INSERT ... ON
+    CONFLICT`` on PostgreSQL, ``INSERT ... ON DUPLICATE KEY UPDATE``
+    on MySQL), or with an ``INSERT`` or ``UPDATE`` statement after
+    checking for the object ID otherwise.
+
+    If `write_behind` is ``True``, or within a `batch`:meth: block,
+    saved objects are not written immediately; they are written
+    together, in a single DB transaction, when `flush`:meth: is
+    called, when a `batch`:meth: block ends, or when `flush_size`
+    objects are waiting to be written.  The flush size can also be
+    given in the DB URL fragment, as ``#flush_size=...``; the
+    constructor argument takes precedence.
+
+    If `incremental` is ``True``, an object that was already saved or
+    loaded through this store is not saved in full again; instead,
+    the attributes that changed and any new history messages are
+    stored as a new row of table `table_name`\ ``_delta`` (created if
+    missing), and only the `state` and extra columns of the main table
+    are updated.  After `max_deltas` such records, the object is saved
+    in full again and its delta rows are deleted.  See module
+    `gc3libs.persistence.delta`:mod: for details.  Both parameters can
+    also be given in the DB URL fragment, e.g.,
+    ``#incremental=yes&max_deltas=16``.
+
+    The `codec` argument selects how pickled objects are encoded in
+    the ``data`` column, e.g., to compress them; it is either a
+    `gc3libs.persistence.serialization.Codec`:class: instance or a
+    specification string like ``pickle4+zlib``; data smaller than
+    `compress_min` bytes is never compressed.  Both can also be given
+    in the DB URL fragment, e.g., ``#codec=zlib&compress_min=1024``;
+    constructor arguments take precedence.
+    Data written with any codec can be read back with any other one.
+
     Any extra keyword arguments are ignored for compatibility with
     `FilesystemStore`:class:.
     """
 
+    LOAD_CHUNK_SIZE = 500
+    """
+    Maximum number of IDs to look up in a single query in `load_many`.
+    """
+
+    INDEX_COLUMNS = [
+        sqla.Column('returncode', sqla.Integer(), index=True),
+        sqla.Column('jobname', sqla.String(length=255), index=True),
+        sqla.Column('resource_name', sqla.String(length=255), index=True),
+        sqla.Column('parent', sqla.Integer(), index=True),
+        sqla.Column('submitted', sqla.Float(), index=True),
+        sqla.Column('terminated', sqla.Float(), index=True),
+    ]
+    """
+    Indexed columns added to newly-created tables.
+    """
+
     def __init__(self, url, table_name=None, idfactory=None,
-                 extra_fields=None, create=True, **extra_args):
+                 extra_fields=None, create=True,
+                 write_behind=False, flush_size=None,
+                 incremental=None, max_deltas=None,
+                 codec=None, compress_min=None, **extra_args):
         """
         Open a connection to the storage database identified by `url`.
 
@@ -158,6 +234,38 @@ class SqlStore(Store):
                     " but overriden by `table` argument to SqlStore()")
             self.table_name = table_name
 
+        if flush_size is None:
+            url_flush_sizes = kv.get('flush_size')
+            if url_flush_sizes:
+                flush_size = url_flush_sizes[-1]  # last wins
+            else:
+                flush_size = gc3libs.defaults.SQL_FLUSH_SIZE
+        self.flush_size = int(flush_size)
+
+        if incremental is None:
+            url_incrementals = kv.get('incremental')
+            if url_incrementals:
+                incremental = url_incrementals[-1]  # last wins
+            else:
+                incremental = False
+        if max_deltas is None:
+            url_max_deltas = kv.get('max_deltas')
+            if url_max_deltas:
+                max_deltas = url_max_deltas[-1]  # last wins
+            else:
+                max_deltas = gc3libs.defaults.STORE_MAX_DELTAS
+        if gc3libs.utils.string_to_boolean(str(incremental)):
+            self._deltas = DeltaLog(self, max_deltas)
+        else:
+            self._deltas = None
+        self._codec = make_codec(codec, self.url, compress_min)
+
+        # objects waiting to be written, keyed by (string) ID
+        self._pending = OrderedDict()
+        # write-behind is active while this is > 0
+        self._write_behind = (1 if write_behind else 0)
+        self._flushing = False
+
         # save ctor args for lazy-initialization
         self._init_extra_fields = (extra_fields if extra_fields is not None else {})
         self._init_create = create
@@ -166,8 +274,16 @@ class SqlStore(Store):
         self._real_engine = None
         self._real_extra_fields = None
         self._real_tables = None
+        self._real_delta_table = None
+        self._real_index_fields = None
 
         self._loaded = WeakValueDictionary()
+        # map (string) object ID to the ID of its parent collection,
+        # for objects whose `parent` column has not been written yet
+        self._parents = {}
+        # raw data fetched by `load_many` but not yet unpickled
+        self._prefetched = {}
+        self._prefetched_deltas = {}
 
     @staticmethod
     def _to_sqlalchemy_url(url):
@@ -209,7 +325,8 @@ class SqlStore(Store):
             sqla.Column('data',
                         sqla.LargeBinary()),
             sqla.Column('state',
-                        sqla.String(length=128)))
+                        sqla.String(length=128),
+                        index=True))
 
         # create internal rep of table
         self._real_extra_fields = {}
@@ -217,15 +334,44 @@ class SqlStore(Store):
             assert isinstance(col, sqla.Column)
             table.append_column(col.copy())
             self._real_extra_fields[col.name] = func
+        for col in self.INDEX_COLUMNS:
+            # extra fields take precedence
+            if col.name not in self._real_extra_fields:
+                table.append_column(col.copy())
 
         # check if the db exists and already has a 'store' table
         current_meta = sqla.MetaData(bind=self._real_engine)
         current_meta.reflect()
         if self._init_create and self.table_name not in current_meta.tables:
             meta.create_all()
+            existing = set(table.c.keys())
+        elif self.table_name in current_meta.tables:
+            existing = set(current_meta.tables[self.table_name].c.keys())
+        else:
+            existing = set()
 
         self._real_tables = meta.tables[self.table_name]
-
+        # only fill index columns that actually exist in the DB
+        self._real_index_fields = [
+            col.name for col in self.INDEX_COLUMNS
+            if col.name in existing
+            and col.name not in self._real_extra_fields]
+
+        if self._deltas is not None:
+            delta_table = sqla.Table(
+                self.table_name + '_delta',
+                meta,
+                sqla.Column('id',
+                            sqla.Integer(),
+                            primary_key=True, nullable=False),
+                sqla.Column('seq',
+                            sqla.Integer(),
+                            primary_key=True, nullable=False),
+                sqla.Column('data',
+                            sqla.LargeBinary()))
+            if delta_table.name not in current_meta.tables:
+                delta_table.create()
+            self._real_delta_table = delta_table
 
     def pre_fork(self):
         """
@@ -239,11 +385,14 @@ class SqlStore(Store):
         SQLAlchemy "OperationalError: (...) could not receive data
         from server: Transport endpoint is not connected"
         """
+        self.flush()
         if self._real_engine:
             self._real_engine.dispose()
         self._real_engine = None
         self._real_extra_fields = None
         self._real_tables = None
+        self._real_delta_table = None
+        self._real_index_fields = None
 
 
     @property
@@ -258,6 +407,18 @@ class SqlStore(Store):
             self._delayed_init()
         return self._real_tables
 
+    @property
+    def _index_fields(self):
+        if self._real_index_fields is None:
+            self._delayed_init()
+        return self._real_index_fields
+
+    @property
+    def _delta_table(self):
+        if self._real_tables is None:
+            self._delayed_init()
+        return self._real_delta_table
+
     # FIXME: Remove once the TissueMAPS code is updated not to use this any more!
     @property
     def t_store(self):
@@ -277,16 +438,144 @@ class SqlStore(Store):
 
     @same_docstring_as(Store.invalidate_cache)
     def invalidate_cache(self):
+        self.flush()
         self._loaded.clear()
 
+    @same_docstring_as(Store.flush)
+    def flush(self):
+        if not self._pending:
+            return
+        # serializing an object can save (and thus enqueue) other
+        # objects, so loop until there is nothing left to do; ensure
+        # those objects are written in the same transaction
+        done = OrderedDict()
+        rows = []
+        changes = []
+        self._write_behind += 1
+        self._flushing = True
+        try:
+            while self._pending:
+                key, (id_, obj) = self._pending.popitem(last=False)
+                if key in done:
+                    continue
+                fields, change = self._make_row(id_, obj)
+                done[key] = (id_, obj, change)
+                rows.append(fields)
+                if change is not None:
+                    changes.append((id_, change))
+        finally:
+            self._write_behind -= 1
+            self._flushing = False
+        gc3libs.log.debug(
+            "Writing %d objects to DB table '%s' ...",
+            len(rows), self.table_name)
+        try:
+            with self._engine.begin() as conn:
+                self._write_rows(conn, rows)
+                self._write_deltas(conn, changes)
+        except:
+            # keep objects around so a later flush can retry
+            for key, (id_, obj, _) in done.items():
+                self._pending.setdefault(key, (id_, obj))
+            raise
+        for id_, obj, change in done.values():
+            self._written(id_, obj, change)
+
+    @contextmanager
+    def batch(self):
+        """
+        Defer writing saved objects until the end of the ``with`` block.
+
+        See `Store.batch`:meth: for details.
+        """
+        self._write_behind += 1
+        try:
+            yield self
+        finally:
+            self._write_behind -= 1
+            self.flush()
+
     @same_docstring_as(Store.list)
     def list(self):
+        self.flush()
         q = sql.select([self._tables.c.id])
         with self._engine.begin() as conn:
             rows = conn.execute(q)
             ids = [i[0] for i in rows.fetchall()]
         return ids
 
+    @same_docstring_as(Store.query)
+    def query(self, *columns, **criteria):
+        if not columns:
+            columns = ('id',)
+        clause = self._make_clause(columns, criteria)
+        if clause is None:
+            return super(SqlStore, self).query(*columns, **criteria)
+        self.flush()
+        table = self._tables
+        q = sql.select([table.c[name] for name in columns]).where(clause)
+        with self._engine.begin() as conn:
+            return [tuple(row) for row in conn.execute(q)]
+
+    @same_docstring_as(Store.count)
+    def count(self, *columns, **criteria):
+        clause = self._make_clause(columns, criteria)
+        if clause is None:
+            return super(SqlStore, self).count(*columns, **criteria)
+        self.flush()
+        table = self._tables
+        cols = [table.c[name] for name in columns]
+        q = (sql.select(cols + [sql.func.count(table.c.id)])
+             .where(clause).group_by(*cols))
+        with self._engine.begin() as conn:
+            return dict((tuple(row[:-1]), row[-1])
+                        for row in conn.execute(q) if row[-1])
+
+    def _make_clause(self, columns, criteria):
+        """
+        Return SQL ``WHERE`` clause corresponding to query `criteria`.
+
+        Return ``None`` if the DB table lacks any column needed to
+        answer a query for `columns` with `criteria`.
+        """
+        table = self._tables
+        available = set(['id', 'state'] + self._index_fields)
+        needed = set(columns)
+        for name in criteria:
+            if name in ('since', 'until'):
+                needed.add('submitted')
+            elif name == 'ok':
+                needed.add('returncode')
+            else:
+                needed.add(name)
+        if not needed.issubset(available):
+            return None
+        clauses = []
+        for name, wanted in criteria.items():
+            if name == 'since':
+                # never-submitted tasks count as submitted at time 0
+                if wanted > 0:
+                    clauses.append(table.c.submitted >= wanted)
+            elif name == 'until':
+                if wanted >= 0:
+                    clauses.append(sql.or_(table.c.submitted <= wanted,
+                                           table.c.submitted.is_(None)))
+                else:
+                    clauses.append(table.c.submitted <= wanted)
+            elif name == 'ok':
+                if wanted:
+                    clauses.append(table.c.returncode == 0)
+                else:
+                    clauses.append(sql.and_(table.c.returncode.isnot(None),
+                                            table.c.returncode != 0))
+            elif isinstance(wanted, (list, tuple, set, frozenset)):
+                clauses.append(table.c[name].in_(list(wanted)))
+            elif wanted is None:
+                clauses.append(table.c[name].is_(None))
+            else:
+                clauses.append(table.c[name] == wanted)
+        return sql.and_(sql.true(), *clauses)
+
     @same_docstring_as(Store.replace)
     def replace(self, id_, obj):
         self._save_or_replace(id_, obj)
@@ -299,17 +588,65 @@ class SqlStore(Store):
         return self._save_or_replace(obj.persistent_id, obj)
 
     def _save_or_replace(self, id_, obj):
+        if self._write_behind:
+            key = str(id_)
+            # re-insert to move `key` at the end of the queue
+            self._pending.pop(key, None)
+            self._pending[key] = (id_, obj)
+            obj.persistent_id = id_
+            if (len(self._pending) >= self.flush_size
+                    and not self._flushing):
+                self.flush()
+            return id_
+
         # if __debug__:
         #     global _lvl
         #     _lvl += '>'
         #     gc3libs.log.debug("%s Saving %r@%x as %s ...", _lvl, obj, id(obj), id_)
 
+        fields, change = self._make_row(id_, obj)
+        with self._engine.begin() as conn:
+            self._write_rows(conn, [fields])
+            if change is not None:
+                self._write_deltas(conn, [(id_, change)])
+        self._written(id_, obj, change)
+
+        # if __debug__:
+        #     gc3libs.log.debug("%s Done saving %r@%x as %s ...", _lvl, obj, id(obj), id_)
+        #     if _lvl:
+        #         _lvl = _lvl[:-1]
+
+        # return id
+        return id_
+
+    def _make_row(self, id_, obj):
+        """
+        Return DB column values and delta log changes for saving `obj`.
+
+        Return a pair *(fields, change)*: the first item is a
+        dictionary mapping column names to values; if `obj` is saved
+        as a delta record, there is no ``data`` column in it.  The
+        second item is a `gc3libs.persistence.delta.Change` instance,
+        or ``None`` if this store is not in incremental mode.
+        """
         # build row to insert/update
         fields = {'id': id_}
 
-        with closing(BytesIO()) as dstdata:
-            make_pickler(self, dstdata, obj).dump(obj)
-            fields['data'] = dstdata.getvalue()
+        index_fields = self._index_fields
+        if 'parent' in index_fields:
+            self._record_parent(id_, obj)
+
+        change = None
+        if self._deltas is not None:
+            change = self._deltas.delta(id_, obj)
+        if change is None:
+            with closing(BytesIO()) as dstdata:
+                make_pickler(self, dstdata, obj,
+                             self._codec.protocol).dump(obj)
+                data = dstdata.getvalue()
+            fields['data'] = self._codec.encode(data)
+            if self._deltas is not None:
+                change = self._deltas.snapshot(id_, obj, data)
 
         try:
             fields['state'] = obj.execution.state
@@ -317,6 +654,21 @@ class SqlStore(Store):
             # If we cannot determine the state of a task, consider it UNKNOWN.
             fields['state'] = Run.State.UNKNOWN
 
+        for column in index_fields:
+            if column == 'parent':
+                # only known when saving the parent collection: in any
+                # other case, leave the value in the DB untouched
+                parent = self._parents.get(str(id_))
+                if parent is not None:
+                    fields[column] = parent
+                continue
+            try:
+                fields[column] = INDEX_FIELDS[column](obj)
+            except Exception as ex:
+                gc3libs.log.warning(
+                    "Error saving DB column '%s' of object '%s': %s: %s",
+                    column, obj, ex.__class__.__name__, str(ex))
+
         # insert into db
         for column in self.extra_fields:
             try:
@@ -334,17 +686,122 @@ class SqlStore(Store):
                     "Writing value '%s' in column '%s' for object '%s'",
                     fields[column], column, obj)
 
-        q = sql.select([self._tables.c.id]).where(self._tables.c.id == id_)
-        with self._engine.begin() as conn:
-            r = conn.execute(q)
-            if not r.fetchone():
-                # It's an insert
-                q = self._tables.insert().values(**fields)
+        return fields, change
+
+    def _record_parent(self, id_, obj):
+        """
+        Remember that `id_` is the parent of the tasks in `obj.tasks`
+        that are saved while serializing `obj`.
+
+        Tasks that have no ID yet get one now, so that their parent is
+        known when they are saved.  Unchanged tasks are not saved
+        again, so nothing is recorded for them.
+        """
+        tasks = getattr(obj, 'tasks', None)
+        if not isinstance(tasks, (list, tuple)):
+            return
+        for task in tasks:
+            if not isinstance(task, Persistable):
+                continue
+            if not hasattr(task, 'persistent_id'):
+                task.persistent_id = self.idfactory.new(task)
+            elif not getattr(task, 'changed', True):
+                continue
+            self._parents[str(task.persistent_id)] = id_
+
+    def _write_rows(self, conn, rows):
+        """
+        Insert or update `rows` in the DB table, using connection `conn`.
+        """
+        # all rows in an `executemany()` call must have the same
+        # columns, but some extra fields may be missing
+        groups = OrderedDict()
+        for row in rows:
+            groups.setdefault(tuple(sorted(row)), []).append(row)
+        table = self._tables
+        for columns, group in groups.items():
+            if 'data' not in columns:
+                # objects saved as delta records: rows already exist,
+                # and column `data` must be left untouched
+                existing = set(row['id'] for row in group)
             else:
-                # it's an update
-                q = self._tables.update().where(
-                        self._tables.c.id == id_).values(**fields)
-            conn.execute(q)
+                stmt = self._make_upsert(columns)
+                if stmt is not None:
+                    conn.execute(stmt, group)
+                    continue
+                # no native upsert available, look for existing IDs
+                ids = [row['id'] for row in group]
+                existing = set()
+                for start in range(0, len(ids), 500):
+                    q = sql.select([table.c.id]).where(
+                        table.c.id.in_(ids[start:start+500]))
+                    existing.update(r[0] for r in conn.execute(q))
+            inserts = [row for row in group if row['id'] not in existing]
+            updates = [dict(row, _id=row['id'])
+                       for row in group if row['id'] in existing]
+            if inserts:
+                conn.execute(table.insert(), inserts)
+            if updates:
+                conn.execute(
+                    table.update().where(table.c.id == sql.bindparam('_id')),
+                    updates)
+
+    def _write_deltas(self, conn, changes):
+        """
+        Store delta log `changes` in the DB, using connection `conn`.
+
+        Argument `changes` is a list of pairs *(id, change)*, where
+        *change* is a `gc3libs.persistence.delta.Change` instance.
+        """
+        table = self._delta_table
+        resets = [id_ for id_, change in changes if change.reset]
+        for start in range(0, len(resets), 500):
+            conn.execute(table.delete().where(
+                table.c.id.in_(resets[start:start+500])))
+        records = [dict(id=id_, seq=change.seq, data=change.record)
+                   for id_, change in changes if change.record is not None]
+        if records:
+            conn.execute(table.insert(), records)
+
+    def _make_upsert(self, columns):
+        """
+        Return a DB-specific statement for inserting or replacing rows.
+
+        Return ``None`` if the DB has no such statement (or it is not
+        supported by the SQLAlchemy version in use).
+        """
+        table = self._tables
+        dialect = self._engine.dialect.name
+        try:
+            if dialect == 'sqlite':
+                # `INSERT OR REPLACE` resets any column not given
+                if set(columns) != set(col.name for col in table.columns):
+                    return None
+                return table.insert().prefix_with('OR REPLACE')
+            elif dialect == 'postgresql':
+                from sqlalchemy.dialects.postgresql import insert
+                stmt = insert(table)
+                return stmt.on_conflict_do_update(
+                    index_elements=[table.c.id],
+                    set_=dict((col, stmt.excluded[col])
+                              for col in columns if col != 'id'))
+            elif dialect == 'mysql':
+                from sqlalchemy.dialects.mysql import insert
+                stmt = insert(table)
+                return stmt.on_duplicate_key_update(
+                    dict((col, stmt.inserted[col])
+                         for col in columns if col != 'id'))
+        except (ImportError, AttributeError):
+            pass
+        return None
+
+    def _written(self, id_, obj, change=None):
+        """
+        Update `obj` and the cache of loaded objects after saving `obj`.
+        """
+        if change is not None:
+            self._deltas.commit(id_, change)
+        self._parents.pop(str(id_), None)
         obj.persistent_id = id_
         if hasattr(obj, 'changed'):
             obj.changed = False
@@ -360,14 +817,7 @@ class SqlStore(Store):
                 #         _lvl, id_, old, id(old), obj, id(obj))
                 #     from traceback import format_stack
                 #     gc3libs.log.debug("Traceback:\n%s", ''.join(format_stack()))
-
-        # if __debug__:
-        #     gc3libs.log.debug("%s Done saving %r@%x as %s ...", _lvl, obj, id(obj), id_)
-        #     if _lvl:
-        #         _lvl = _lvl[:-1]
-
-        # return id
-        return id_
+        gc3libs.events.send(gc3libs.events.ObjectSaved, self, id_=id_, obj=obj)
 
     @same_docstring_as(Store.load)
     def load(self, id_):
@@ -377,6 +827,10 @@ class SqlStore(Store):
         #     gc3libs.log.debug("%s Store %s: Loading task %s %r ...", _lvl, self, id_, type(id_))
 
         # return cached copy, if any
+        try:
+            return self._pending[str(id_)][1]
+        except KeyError:
+            pass
         try:
             obj = self._loaded[str(id_)]
             # if __debug__:
@@ -387,14 +841,21 @@ class SqlStore(Store):
         except KeyError:
             pass
 
-        # no cached copy, load from disk
-        q = sql.select([self._tables.c.data]).where(self._tables.c.id == id_)
-        with self._engine.begin() as conn:
-            rawdata = conn.execute(q).fetchone()
+        # no cached copy, load from DB
+        try:
+            rawdata = self._prefetched.pop(str(id_))
+        except KeyError:
+            q = sql.select([self._tables.c.data]).where(
+                self._tables.c.id == id_)
+            with self._engine.begin() as conn:
+                rawdata = conn.execute(q).fetchone()
         if not rawdata:
             raise gc3libs.exceptions.LoadError(
                 "Unable to find any object with ID '%s'" % id_)
-        obj = make_unpickler(self, BytesIO(rawdata[0])).load()
+        data = self._codec.decode(rawdata[0])
+        obj = make_unpickler(self, BytesIO(data)).load()
+        if self._deltas is not None:
+            self._replay_deltas(id_, obj, data)
         super(SqlStore, self)._update_to_latest_schema()
         assert str(id_) not in self._loaded
         self._loaded[str(id_)] = obj
@@ -404,11 +865,67 @@ class SqlStore(Store):
         #     gc3libs.log.debug("%s Store %s: Done loading task %s as %r@%x.", _lvl, self, id_, obj, id(obj))
         return obj
 
+    def _replay_deltas(self, id_, obj, data):
+        """Apply changes logged in the DB to `obj`, loaded from `data`."""
+        try:
+            records = self._prefetched_deltas.pop(str(id_))
+        except KeyError:
+            table = self._delta_table
+            q = (sql.select([table.c.data])
+                 .where(table.c.id == id_)
+                 .order_by(table.c.seq))
+            with self._engine.begin() as conn:
+                records = [row[0] for row in conn.execute(q)]
+        self._deltas.replay(
+            id_, obj, data, (pickle.loads(record) for record in records))
+
+    @same_docstring_as(Store.load_many)
+    def load_many(self, ids):
+        ids = list(ids)
+        table = self._tables
+        result = []
+        for start in range(0, len(ids), self.LOAD_CHUNK_SIZE):
+            chunk = ids[start:start+self.LOAD_CHUNK_SIZE]
+            # fetch data of all objects not yet loaded with one query
+            missing = [id_ for id_ in chunk
+                       if str(id_) not in self._pending
+                       and str(id_) not in self._loaded]
+            if missing:
+                q = sql.select([table.c.id, table.c.data]).where(
+                    table.c.id.in_(missing))
+                with self._engine.begin() as conn:
+                    for row in conn.execute(q):
+                        self._prefetched[str(row[0])] = tuple(row[1:])
+                    if self._deltas is not None:
+                        for id_ in missing:
+                            self._prefetched_deltas[str(id_)] = []
+                        deltas = self._delta_table
+                        q = (sql.select([deltas.c.id, deltas.c.data])
+                             .where(deltas.c.id.in_(missing))
+                             .order_by(deltas.c.id, deltas.c.seq))
+                        for row in conn.execute(q):
+                            self._prefetched_deltas[str(row[0])].append(row[1])
+            # unpickle objects; references to other objects in the
+            # chunk are resolved using the data just fetched
+            try:
+                result.extend(super(SqlStore, self).load_many(chunk))
+            finally:
+                self._prefetched.clear()
+                self._prefetched_deltas.clear()
+        return result
+
     @same_docstring_as(Store.remove)
     def remove(self, id_):
+        self._pending.pop(str(id_), None)
         with self._engine.begin() as conn:
             conn.execute(
                 self._tables.delete().where(self._tables.c.id == id_))
+            if self._deltas is not None:
+                conn.execute(self._delta_table.delete().where(
+                    self._delta_table.c.id == id_))
+        if self._deltas is not None:
+            self._deltas.forget(id_)
+        self._parents.pop(str(id_), None)
         try:
             del self._loaded[str(id_)]
         except KeyError:
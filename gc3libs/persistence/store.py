@@ -23,16 +23,60 @@ from __future__ import absolute_import, print_function, unicode_literals
 from builtins import str
 from builtins import object
 from abc import ABCMeta, abstractmethod
+from collections import defaultdict
+from contextlib import contextmanager
 
 # GC3Pie imports
 import gc3libs
+from gc3libs.compat._collections import OrderedDict
 from gc3libs.url import Url
 from future.utils import with_metaclass
 
+from gc3libs.persistence.accessors import GetValue
+
 
 __docformat__ = 'reStructuredText'
 
 
+class _GetTimestamp(object):
+    """
+    Return the time a task first entered any one of the given states.
+    """
+
+    __slots__ = ('states',)
+
+    def __init__(self, *states):
+        self.states = states
+
+    def __call__(self, obj):
+        try:
+            timestamps = obj.execution.timestamp
+        except AttributeError:
+            return None
+        for state in self.states:
+            if state in timestamps:
+                return timestamps[state]
+        return None
+
+
+INDEX_FIELDS = OrderedDict([
+    ('state', GetValue(default='UNKNOWN').execution.state),
+    ('returncode', GetValue(default=None).execution.returncode),
+    ('jobname', GetValue(default=None).jobname),
+    ('resource_name', GetValue(default=None).execution.resource_name),
+    # tasks run by the shellcmd backend go straight into RUNNING state
+    ('submitted', _GetTimestamp('SUBMITTED', 'RUNNING')),
+    ('terminated', _GetTimestamp('TERMINATED')),
+])
+"""
+Accessor functions for the task attributes that `Store.query` can look up.
+
+Besides these, `Store.query`:meth: also knows about ``id`` (the object
+ID) and ``parent`` (the ID of the task collection an object belongs
+to, if any).
+"""
+
+
 class Store(with_metaclass(ABCMeta, object)):
     """
     Interface for storing and retrieving objects on permanent storage.
@@ -94,6 +138,42 @@ class Store(with_metaclass(ABCMeta, object)):
         # a `Store` subclass may not keep a cache of loaded objects.
         pass
 
+    def flush(self):
+        """
+        Write any pending changes to persistent storage.
+
+        Stores that can defer `save`:meth: operations (see
+        `batch`:meth:) must ensure that all objects saved so far are
+        on permanent storage when this method returns.
+
+        The default implementation of this method does nothing, since
+        a `Store` subclass need not buffer writes.
+        """
+        pass
+
+    @contextmanager
+    def batch(self):
+        """
+        Context manager for grouping many `save`:meth: operations.
+
+        Within the ``with`` block, stores may defer writing saved
+        objects and then write them all at once; in any case, all
+        objects saved within the block are on permanent storage when
+        the block is exited, even if it is exited because of an
+        exception.  Nested blocks are allowed; example::
+
+          | >>> with store.batch():
+          | ...     for task in tasks:
+          | ...         store.save(task)
+
+        The default implementation just calls `flush`:meth: at the
+        end of the block.
+        """
+        try:
+            yield self
+        finally:
+            self.flush()
+
     def list(self, **extra_args):
         """
         Return list of IDs of saved `Job` objects.
@@ -111,6 +191,102 @@ class Store(with_metaclass(ABCMeta, object)):
         """
         pass
 
+    def load_many(self, ids):
+        """
+        Load many objects given their IDs.
+
+        Return a list with one item for each ID in `ids` (in the same
+        order): the loaded object, or the exception that was raised
+        trying to load it.
+
+        The default implementation just calls `load`:meth: on each
+        ID; derived classes can provide more efficient ways of
+        retrieving many objects at once.
+        """
+        result = []
+        for id_ in ids:
+            try:
+                result.append(self.load(id_))
+            except Exception as err:  # pylint: disable=broad-except
+                result.append(err)
+        return result
+
+    def query(self, *columns, **criteria):
+        """
+        Return values of `columns` for the stored objects that match `criteria`.
+
+        Return a list of tuples, one per matching object, each
+        holding the values of the named `columns` (default: ``'id'``
+        only) in the same order.  Column names are ``id``, ``parent``,
+        and the keys of `INDEX_FIELDS`:data:.
+
+        Each keyword argument in `criteria` restricts the selection to
+        objects where the column with that name has the given value;
+        a list, tuple or set of values matches any of them.
+        In addition, the following keywords are recognized:
+
+        - ``since``, ``until``: select objects submitted within this
+          time range (inclusive, in seconds since the UNIX epoch);
+          objects that were never submitted count as submitted at
+          time 0.
+        - ``ok``: if ``True``, select objects with a zero return
+          code; if ``False``, select objects with a non-zero one.
+
+        Example::
+
+          | >>> store.query('id', 'jobname', state=['NEW', 'SUBMITTED'])
+
+        The default implementation loads every stored object;
+        derived classes should answer queries from an index instead.
+        """
+        if not columns:
+            columns = ('id',)
+        return [tuple(values[name] for name in columns)
+                for values in self._index()
+                if matches(values, criteria)]
+
+    def count(self, *columns, **criteria):
+        """
+        Count stored objects that match `criteria`, grouped by `columns`.
+
+        Return a dictionary mapping each tuple of values of `columns`
+        to the number of matching objects that have those values.
+        Column names and criteria are the same as in `query`:meth:;
+        for instance, the number of objects in each state is::
+
+          | >>> store.count('state')
+          | {('NEW',): 3, ('TERMINATED',): 7}
+        """
+        counts = defaultdict(int)
+        for values in self.query(*(columns or ('id',)), **criteria):
+            counts[values[:len(columns)]] += 1
+        return dict(counts)
+
+    def _index(self):
+        """
+        Return list of column values of all stored objects.
+
+        Each item is a dictionary mapping column names to values.
+        """
+        ids = self.list()
+        parents = {}
+        rows = []
+        for id_, obj in zip(ids, self.load_many(ids)):
+            if isinstance(obj, Exception):
+                continue
+            values = dict((name, accessor(obj))
+                          for name, accessor in INDEX_FIELDS.items())
+            values['id'] = id_
+            rows.append(values)
+            for child in (getattr(obj, 'tasks', None) or []):
+                try:
+                    parents[str(child.persistent_id)] = id_
+                except AttributeError:
+                    pass
+        for values in rows:
+            values['parent'] = parents.get(str(values['id']))
+        return rows
+
     def _update_to_latest_schema(self):
         """
         Modify an object in-place to reflect changes in the schema.
@@ -143,6 +319,39 @@ class Store(with_metaclass(ABCMeta, object)):
         pass
 
 
+def matches(values, criteria):
+    """
+    Return ``True`` if column `values` satisfy `criteria`.
+
+    Argument `values` is a dictionary mapping column names to values;
+    see `Store.query`:meth: for the meaning of `criteria`::
+
+      >>> matches({'state': 'NEW', 'returncode': None}, {'state': 'NEW'})
+      True
+      >>> matches({'state': 'NEW', 'returncode': None}, {'ok': False})
+      False
+    """
+    for name, wanted in criteria.items():
+        if name == 'since':
+            if (values['submitted'] or 0.0) < wanted:
+                return False
+        elif name == 'until':
+            if (values['submitted'] or 0.0) > wanted:
+                return False
+        elif name == 'ok':
+            returncode = values['returncode']
+            if wanted and returncode != 0:
+                return False
+            if not wanted and returncode in (None, 0):
+                return False
+        elif isinstance(wanted, (list, tuple, set, frozenset)):
+            if values[name] not in wanted:
+                return False
+        elif values[name] != wanted:
+            return False
+    return True
+
+
 # registration mechanism
 
 _registered_store_ctors = {}
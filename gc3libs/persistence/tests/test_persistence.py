@@ -31,6 +31,7 @@ import shutil
 from tempfile import NamedTemporaryFile, mkdtemp
 
 # 3rd party imports
+import mock
 import pytest
 
 sqlalchemy = pytest.importorskip("sqlalchemy")
@@ -45,9 +46,11 @@ import gc3libs.workflow
 import gc3libs.exceptions
 from gc3libs.persistence import make_store, Persistable
 from gc3libs.persistence.accessors import GET
-from gc3libs.persistence.serialization import DEFAULT_PROTOCOL
+from gc3libs.persistence.serialization import (
+    DEFAULT_PROTOCOL, MAGIC, make_codec)
 from gc3libs.persistence.idfactory import IdFactory
-from gc3libs.persistence.filesystem import FilesystemStore
+from gc3libs.persistence.filesystem import (
+    FilesystemStore, INDEX_FILENAME, migrate_filesystemstore)
 from gc3libs.persistence.sql import SqlStore
 from gc3libs.url import Url, UrlKeyDict
 
@@ -249,6 +252,70 @@ class GenericStoreChecks(object):
         obj2 = self.store.load(id_)
         assert obj2.x == "Updated"
 
+    def test_load_many(self):
+        """Test loading many objects at once, including a missing one."""
+        container = SimplePersistableList(
+            [SimplePersistableObject('Object %d' % i) for i in range(3)])
+        ids = [self.store.save(container)]
+        ids += [obj.persistent_id for obj in container]
+        self.store.remove(ids[-1])
+        self.store.invalidate_cache()
+        objs = self.store.load_many(ids[1:] + ids[:1])
+        assert [obj.value for obj in objs[:2]] == ['Object 0', 'Object 1']
+        assert isinstance(objs[2], gc3libs.exceptions.LoadError)
+        assert isinstance(objs[3], Exception)
+
+    def test_batch(self):
+        """Test that objects saved in a `batch` block can be loaded back."""
+        with self.store.batch():
+            objs = [SimplePersistableObject('Object %d' % i)
+                    for i in range(5)]
+            ids = [self.store.save(obj) for obj in objs]
+            # saving the same object again must not create a new entry
+            objs[0].value = 'Changed'
+            self.store.save(objs[0])
+        assert len(self.store.list()) == 5
+        self.store.invalidate_cache()
+        assert self.store.load(ids[0]).value == 'Changed'
+        assert self.store.load(ids[4]).value == 'Object 4'
+
+    def _make_workflow(self):
+        apps = [gc3libs.Application(['/bin/true'], [], [], '/tmp',
+                                    jobname='app%d' % n)
+                for n in range(3)]
+        apps[0].execution.state = Run.State.SUBMITTED
+        apps[1].execution.state = Run.State.TERMINATED
+        apps[1].execution.returncode = 0
+        apps[2].execution.state = Run.State.TERMINATED
+        apps[2].execution.returncode = 1
+        coll = gc3libs.workflow.ParallelTaskCollection(apps, jobname='coll')
+        coll_id = self.store.save(coll)
+        return coll_id, [app.persistent_id for app in apps]
+
+    def test_query(self):
+        """Test the `query` and `count` methods."""
+        coll_id, app_ids = self._make_workflow()
+        rows = self.store.query('id', 'parent', 'jobname', 'state')
+        assert sorted(rows, key=lambda row: row[2]) == [
+            (app_ids[0], coll_id, 'app0', Run.State.SUBMITTED),
+            (app_ids[1], coll_id, 'app1', Run.State.TERMINATED),
+            (app_ids[2], coll_id, 'app2', Run.State.TERMINATED),
+            (coll_id, None, 'coll', Run.State.NEW),
+        ]
+        assert self.store.query('jobname', ok=True) == [('app1',)]
+        assert self.store.query('jobname', ok=False) == [('app2',)]
+        assert (sorted(self.store.query(state=[Run.State.NEW,
+                                               Run.State.SUBMITTED]))
+                == sorted([(coll_id,), (app_ids[0],)]))
+        assert self.store.query('jobname', since=1) == [('app0',)]
+        assert len(self.store.query(until=1)) == 3
+        assert self.store.count('state') == {
+            (Run.State.NEW,): 1,
+            (Run.State.SUBMITTED,): 1,
+            (Run.State.TERMINATED,): 2,
+        }
+        assert self.store.count(parent=coll_id) == {(): 3}
+
     @pytest.mark.skip(reason="FIXME: Test code needs to be checked!")
     def test_persist_classes_with_slots(self):
 
@@ -393,6 +460,216 @@ class TestFilesystemStore(GenericStoreChecks):
         obj_file = os.path.join(self.store._directory, str(obj_id))
         assert os.path.exists(obj_file)
 
+    def test_failed_save_keeps_old_file(self):
+        task = SimpleTask(jobname='good')
+        id_ = self.store.save(task)
+        # functions defined in a test cannot be pickled
+        task.bad = (lambda: None)
+        with pytest.raises(Exception):
+            self.store.save(task)
+        # no temporary file is left around
+        assert os.listdir(self.tmpdir) == [id_]
+        assert FilesystemStore(self.tmpdir).load(id_).jobname == 'good'
+
+
+class TestShardedFilesystemStore(GenericStoreChecks):
+
+    @pytest.fixture(autouse=True)
+    def setUp(self):
+        self.tmpdir = mkdtemp(prefix='gc3libs.', suffix='.tmp.d')
+        self.store = FilesystemStore(self.tmpdir, layout='sharded')
+
+        yield
+
+        shutil.rmtree(self.tmpdir)
+
+    def test_files_are_sharded(self):
+        id_ = self.store.save(SimpleTask())
+        assert os.path.exists(self.store._path(id_))
+        assert os.path.dirname(self.store._path(id_)) != self.tmpdir
+        assert INDEX_FILENAME in os.listdir(self.tmpdir)
+        # `list()` only reads the index
+        with mock.patch('os.listdir') as listdir:
+            assert self.store.list() == [id_]
+            assert not listdir.called
+        self.store.remove(id_)
+        assert self.store.list() == []
+        assert FilesystemStore(self.tmpdir).list() == []
+
+    def test_layout_is_detected(self):
+        id_ = self.store.save(SimpleTask(jobname='sharded'))
+        store = make_store(Url('file://%s' % self.tmpdir))
+        assert store.layout == 'sharded'
+        assert store.load(id_).jobname == 'sharded'
+
+    def test_layout_in_url(self):
+        tmpdir = os.path.join(self.tmpdir, 'other')
+        store = make_store(Url('file://%s#layout=sharded' % tmpdir))
+        assert store.layout == 'sharded'
+
+    def test_migrate(self):
+        tmpdir = os.path.join(self.tmpdir, 'jobs')
+        store = FilesystemStore(tmpdir, incremental=True)
+        ids = []
+        for n in range(5):
+            task = SimpleTask(jobname=('task%d' % n))
+            ids.append(store.save(task))
+            task.execution.history.append('changed')
+            store.save(task)
+        store.remove(ids.pop())
+        assert migrate_filesystemstore(tmpdir, 'sharded') == len(ids)
+        store = FilesystemStore(tmpdir, incremental=True)
+        assert store.layout == 'sharded'
+        assert sorted(store.list()) == sorted(ids)
+        for n, id_ in enumerate(ids):
+            task = store.load(id_)
+            assert task.jobname == ('task%d' % n)
+            assert task.execution.history.last().startswith('changed')
+        # running migration again is harmless
+        assert migrate_filesystemstore(tmpdir, 'sharded') == len(ids)
+        # and back
+        assert migrate_filesystemstore(tmpdir, 'flat') == len(ids)
+        assert sorted(os.listdir(tmpdir)) == sorted(
+            ids + [id_ + '.delta' for id_ in ids])
+        store = FilesystemStore(tmpdir)
+        assert store.layout == 'flat'
+        assert store.load(ids[0]).jobname == 'task0'
+
+
+class TestCompressedFilesystemStore(GenericStoreChecks):
+
+    @pytest.fixture(autouse=True)
+    def setUp(self):
+        self.tmpdir = mkdtemp(prefix='gc3libs.', suffix='.tmp.d')
+        self.store = make_store(
+            Url('file://%s#codec=zlib&compress_min=0' % self.tmpdir))
+
+        yield
+
+        shutil.rmtree(self.tmpdir)
+
+    def test_files_are_compressed(self):
+        task = SimpleTask(jobname='compressed')
+        id_ = self.store.save(task)
+        with open(os.path.join(self.tmpdir, id_), 'rb') as stream:
+            assert stream.read().startswith(MAGIC)
+
+    def test_load_files_written_with_other_codecs(self):
+        task = SimpleTask(jobname='plain')
+        id_ = FilesystemStore(self.tmpdir).save(task)
+        with open(os.path.join(self.tmpdir, id_), 'rb') as stream:
+            assert not stream.read().startswith(MAGIC)
+        assert self.store.load(id_).jobname == 'plain'
+        id_ = self.store.save(SimpleTask(jobname='compressed'))
+        assert FilesystemStore(self.tmpdir).load(id_).jobname == 'compressed'
+
+    def test_codec_spec_in_url(self):
+        # `+` in a URL fragment is decoded as a blank
+        codec = make_codec(
+            url=Url('file:///tmp/store#codec=pickle2+zlib&compress_min=10'))
+        assert codec.protocol == 2
+        assert codec.compression == 'zlib'
+        assert codec.threshold == 10
+
+
+class IncrementalStoreChecks(GenericStoreChecks):
+
+    """
+    Additional tests for stores in incremental mode.
+
+    Subclasses must provide a `_make_store` method, taking the same
+    keyword arguments as the store constructor, and a `_base_data`
+    method returning the full-save data of an object.
+    """
+
+    def test_incremental_save_and_load(self):
+        task = SimpleTask(jobname='incremental')
+        id_ = self.store.save(task)
+        base = self._base_data(id_)
+        for n in range(5):
+            task.execution.history.append('message %d' % n)
+            task.execution.state = (
+                Run.State.RUNNING if n % 2 else Run.State.SUBMITTED)
+            task.foo = n
+            self.store.save(task)
+        del task.foo
+        self.store.save(task)
+        # saving changes must not rewrite the object in full
+        assert self._base_data(id_) == base
+        # load in a store which has never seen the object before
+        task2 = self._make_store(incremental=True).load(id_)
+        assert task2.execution.state == Run.State.SUBMITTED
+        assert not hasattr(task2, 'foo')
+        assert (list(task2.execution.history._messages)
+                == list(task.execution.history._messages))
+        assert task2.execution._ref is task2
+
+    def test_incremental_compaction(self):
+        store = self._make_store(incremental=True, max_deltas=3)
+        task = SimpleTask(jobname='compact')
+        id_ = store.save(task)
+        base = self._base_data(id_)
+        for n in range(4):
+            task.execution.history.append('message %d' % n)
+            store.save(task)
+        # the 4th change triggers a full save, including all messages
+        assert self._base_data(id_) != base
+        store.invalidate_cache()
+        task2 = self._make_store().load(id_)
+        assert (task2.execution.history._messages
+                == task.execution.history._messages)
+
+    def test_incremental_save_skips_unchanged_values(self):
+        task = SimpleTask(jobname='skip')
+        task.items = []
+        id_ = self.store.save(task)
+        dumped = []
+        dumps = self.store._deltas._dumps
+
+        def counting_dumps(obj, value):
+            dumped.append(value)
+            return dumps(obj, value)
+        self.store._deltas._dumps = counting_dumps
+        task.items.append('changed in place')
+        self.store.save(task)
+        # immutable values that were not reassigned are not serialized
+        assert 'skip' not in dumped
+        task.jobname = 'renamed'
+        self.store.save(task)
+        assert 'renamed' in dumped
+        task2 = self._make_store(incremental=True).load(id_)
+        assert task2.items == ['changed in place']
+        assert task2.jobname == 'renamed'
+
+
+class TestIncrementalFilesystemStore(IncrementalStoreChecks):
+
+    @pytest.fixture(autouse=True)
+    def setUp(self):
+        self.tmpdir = mkdtemp(prefix='gc3libs.', suffix='.tmp.d')
+        self.store = self._make_store(incremental=True)
+
+        yield
+
+        shutil.rmtree(self.tmpdir)
+
+    def _make_store(self, **kwargs):
+        return FilesystemStore(self.tmpdir, **kwargs)
+
+    def _base_data(self, id_):
+        with open(os.path.join(self.tmpdir, id_), 'rb') as stream:
+            return stream.read()
+
+    def test_list_ignores_delta_files(self):
+        task = SimpleTask()
+        id_ = self.store.save(task)
+        task.execution.history.append('changed')
+        self.store.save(task)
+        assert os.path.exists(os.path.join(self.tmpdir, id_ + '.delta'))
+        assert self.store.list() == [id_]
+        self.store.remove(id_)
+        assert os.listdir(self.tmpdir) == []
+
 
 class SqlStoreChecks(GenericStoreChecks):
 
@@ -446,6 +723,82 @@ class SqlStoreChecks(GenericStoreChecks):
         row = result.fetchone()
         assert row[0] == app.execution.state
 
+    def _count_rows(self):
+        q = sql.select([self.store._tables.c.id])
+        return len(self.conn.execute(q).fetchall())
+
+    def test_query_uses_index(self):
+        """Test that `query` does not load any object from the DB."""
+        coll_id, app_ids = self._make_workflow()
+        store = self._make_store()
+        with mock.patch.object(store, 'load') as load:
+            assert store.count('state', ok=True) == {
+                (Run.State.TERMINATED,): 1}
+            assert sorted(store.query(parent=coll_id)) == [
+                (id_,) for id_ in sorted(app_ids)]
+        assert not load.called
+
+    def test_parent_is_kept(self):
+        """Test that saving a task does not clear its parent column."""
+        coll_id, app_ids = self._make_workflow()
+        assert self.store._parents == {}
+        # a process that does not know the task's parent
+        store = self._make_store()
+        app = store.load(app_ids[0])
+        app.execution.state = Run.State.RUNNING
+        store.save(app)
+        assert store._parents == {}
+        assert sorted(store.query(parent=coll_id)) == [
+            (id_,) for id_ in sorted(app_ids)]
+
+    def test_query_without_index_columns(self):
+        """Test that `query` works on tables created by older versions."""
+        table = sqlalchemy.Table(
+            'old_store', sqlalchemy.MetaData(),
+            sqlalchemy.Column('id', sqlalchemy.Integer(), primary_key=True),
+            sqlalchemy.Column('data', sqlalchemy.LargeBinary()),
+            sqlalchemy.Column('state', sqlalchemy.String(length=128)))
+        table.create(sqlalchemy.create_engine(
+            SqlStore._to_sqlalchemy_url(self.db_url)))
+        store = make_store(self.db_url, table_name='old_store')
+        assert store._index_fields == []
+        app = gc3libs.Application(['/bin/true'], [], [], '/tmp',
+                                  jobname='old')
+        id_ = store.save(app)
+        assert store.query('id', 'jobname') == [(id_, 'old')]
+        assert store.count('state') == {(Run.State.NEW,): 1}
+
+    def test_write_behind(self):
+        """Test that writes are deferred until the end of a `batch` block."""
+        with self.store.batch():
+            obj = SimplePersistableObject('GC3')
+            id_ = self.store.save(obj)
+            assert self._count_rows() == 0
+            # pending objects can be loaded back
+            assert self.store.load(id_) is obj
+        assert self._count_rows() == 1
+
+    def test_write_behind_flush_size(self):
+        self.store.flush_size = 3
+        with self.store.batch():
+            for i in range(4):
+                self.store.save(SimplePersistableObject(str(i)))
+            assert self._count_rows() == 3
+        assert self._count_rows() == 4
+
+    def test_write_behind_without_upsert(self):
+        """Test saving many objects when the DB has no upsert statement."""
+        obj = SimplePersistableObject('Original')
+        id_ = self.store.save(obj)
+        with mock.patch.object(self.store, '_make_upsert', return_value=None):
+            with self.store.batch():
+                obj.value = 'Updated'
+                self.store.save(obj)
+                self.store.save(SimplePersistableObject('New'))
+        assert self._count_rows() == 2
+        self.store.invalidate_cache()
+        assert self.store.load(id_).value == 'Updated'
+
     def test_sql_injection(self):
         """Test if the `SqlStore` class is vulnerable to SQL injection."""
 
@@ -599,6 +952,64 @@ class TestSqliteStore(SqlStoreChecks):
         return make_store(self.db_url, **kwargs)
 
 
+class TestIncrementalSqliteStore(IncrementalStoreChecks):
+
+    """Test SQLite backend in incremental mode."""
+
+    @classmethod
+    def setup_class(cls):
+        # skip SQLite tests if no SQLite module present (Py 2.4)
+        sqlite3 = pytest.importorskip("sqlite3")
+
+    @pytest.fixture(autouse=True)
+    def setUp(self):
+        with NamedTemporaryFile(prefix='gc3libs.', suffix='.tmp') as tmp:
+            self.db_url = Url('sqlite://%s' % tmp.name)
+            self.store = self._make_store(incremental=True)
+            yield
+
+    def _make_store(self, **kwargs):
+        return make_store(self.db_url, **kwargs)
+
+    def _base_data(self, id_):
+        table = self.store._tables
+        with self.store._engine.begin() as conn:
+            return conn.execute(
+                sql.select([table.c.data]).where(table.c.id == id_)
+            ).fetchone()[0]
+
+    def test_delta_rows(self):
+        task = SimpleTask()
+        id_ = self.store.save(task)
+        task.execution.state = Run.State.RUNNING
+        self.store.save(task)
+        table = self.store._delta_table
+        with self.store._engine.begin() as conn:
+            seqs = [row[0] for row in conn.execute(
+                sql.select([table.c.seq]).where(table.c.id == id_))]
+            state = conn.execute(
+                sql.select([self.store._tables.c.state])
+                .where(self.store._tables.c.id == id_)).fetchone()[0]
+        # header record plus one delta record
+        assert sorted(seqs) == [0, 1]
+        assert state == Run.State.RUNNING
+
+
+class TestCompressedIncrementalSqliteStore(TestIncrementalSqliteStore):
+
+    """Test SQLite backend in incremental mode, with compressed data."""
+
+    def _make_store(self, **kwargs):
+        return make_store(self.db_url, codec='lzma', compress_min=0, **kwargs)
+
+    def test_data_is_compressed(self):
+        id_ = self.store.save(SimpleTask(jobname='compressed'))
+        assert bytes(self._base_data(id_)).startswith(MAGIC)
+        # data can be read back by a store with the default codec
+        store = make_store(self.db_url)
+        assert store.load(id_).jobname == 'compressed'
+
+
 class TestSqliteStoreWithAlternateTable(TestSqliteStore):
 
     """Test SQLite backend with a different table name."""
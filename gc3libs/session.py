@@ -35,6 +35,9 @@ import tempfile
 
 # GC3Pie imports
 import gc3libs
+from gc3libs.compat._collections import OrderedDict
+import gc3libs.defaults
+import gc3libs.events
 import gc3libs.exceptions
 import gc3libs.persistence
 import gc3libs.persistence.store
@@ -55,7 +58,7 @@ class Session(list):
     releated to that session. Specifically, two files are always
     created in the session directory andused internally by this class:
 
-    * `index.txt`: contains a list of all job IDs
+    * `session_ids.txt`: contains a list of all job IDs
       associated with this session;
     * `store.url`:  its contents are the URL of the store to create
       (as would be passed to the `gc3libs.persistence.make_store` factory).
@@ -108,7 +111,17 @@ class Session(list):
     added or removed from the store and the in-memory task list, but
     the updated task list is not saved back to disk.  This is useful
     when making many changes in a row; call `Session.flush` to persist
-    the full set of changes.
+    the full set of changes.  Methods `add_many` and `remove_many` do
+    the same for a whole sequence of tasks at once.
+
+    Changes to the task list are appended to a journal file
+    ``session_ids.journal`` rather than rewriting the index; the
+    journal is merged back into the index once it has grown larger
+    than the index itself (and `gc3libs.defaults.SESSION_JOURNAL_MIN_SIZE`).
+    Along with the IDs of top-level tasks, the index records the IDs
+    of the children of every task collection in the session (in file
+    ``session_tree.txt``), so that removing a task does not need to
+    load it from the store just to find its children.
 
     The `Store`:class: object is anyway accessible in the
     `store`:attr: attribute of each `Session` instance::
@@ -134,6 +147,8 @@ class Session(list):
     """
 
     INDEX_FILENAME = 'session_ids.txt'
+    TREE_FILENAME = 'session_tree.txt'
+    JOURNAL_FILENAME = 'session_ids.journal'
     STORE_URL_FILENAME = 'store.url'
     TIMESTAMP_FILES = {
         'start': 'created',
@@ -180,9 +195,19 @@ class Session(list):
         self.path = os.path.abspath(to_str(path, 'filesystem'))
         self.name = os.path.basename(self.path)
         self.tasks = {}
+        # IDs of top-level tasks recorded in the index, children of
+        # task collections, and journal records not yet written out
+        self._indexed = OrderedDict()
+        self._children = {}
+        self._journal = []
+        self._journal_size = 0
+        self._store_url_saved = None
         # Session not yet created
         self.created = -1
         self.finished = -1
+        # task collections can gain children after having been added
+        # (e.g., when saved by an `Engine`), so watch all saves
+        gc3libs.events.ObjectSaved.connect(self._on_object_saved)
 
         # load or make session
         if os.path.isdir(self.path) and load:
@@ -257,6 +282,7 @@ class Session(list):
             try:
                 self.store_url = \
                     gc3libs.utils.read_contents(store_filename).strip()
+                self._store_url_saved = self.store_url
                 gc3libs.log.debug(
                     "Loading session from URL %s ...", self.store_url)
             except (OSError, IOError) as err:
@@ -267,16 +293,10 @@ class Session(list):
             self.store = gc3libs.persistence.make_store(
                 self.store_url, **extra_args)
 
+        self._indexed, self._children, self._journal_size = \
+            self._read_index_files()
         if task_ids is None:
-            idx_filename = os.path.join(self.path, self.INDEX_FILENAME)
-            try:
-                with open(idx_filename) as idx_file:
-                    task_ids = idx_file.read().split()
-            except (OSError, IOError) as err:
-                gc3libs.log.error(
-                    "Unable to load session index from file `%s`: %s",
-                    idx_filename, err)
-                raise
+            task_ids = list(self._indexed)
 
         try:
             start_file = os.path.join(
@@ -290,6 +310,81 @@ class Session(list):
 
         self.tasks = self.load_many(task_ids, flush=False)
 
+    def read_index(self):
+        """
+        Return list of IDs of top-level tasks recorded in the session index.
+
+        Tasks are not loaded; the index is read from disk, so it does
+        not reflect tasks added to this `Session` object since the
+        last `flush`:meth:.
+        """
+        return list(self._read_index_files()[0])
+
+    def _read_index_files(self):
+        """
+        Read the session index, task tree and journal from disk.
+
+        Return a triple *(ids, children, size)*: an ordered dictionary
+        whose keys are the IDs of top-level tasks, a dictionary mapping
+        the ID of each task collection to the IDs of its children, and
+        the number of records in the journal.
+
+        Each journal record is a line made of a one-character code and
+        a task ID: code ``+`` adds the task to the index, ``-``
+        removes it and its descendants, and ``=`` sets the children of
+        the task to the IDs following it on the same line.
+        """
+        idx_filename = os.path.join(self.path, self.INDEX_FILENAME)
+        try:
+            with open(idx_filename) as idx_file:
+                ids = OrderedDict((id_, True) for id_ in idx_file.read().split())
+        except (OSError, IOError) as err:
+            gc3libs.log.error(
+                "Unable to load session index from file `%s`: %s",
+                idx_filename, err)
+            raise
+        children = {}
+        try:
+            with open(os.path.join(self.path, self.TREE_FILENAME)) as tree:
+                for line in tree:
+                    fields = line.split()
+                    if fields:
+                        children[fields[0]] = tuple(fields[1:])
+        except (OSError, IOError) as err:
+            if err.errno != errno.ENOENT:
+                raise
+        size = 0
+        try:
+            with open(os.path.join(self.path, self.JOURNAL_FILENAME)) as journal:
+                for line in journal:
+                    if not line.endswith('\n'):
+                        # incomplete record from an interrupted write
+                        break
+                    fields = line[1:].split()
+                    if not fields:
+                        continue
+                    if line[0] == '+':
+                        ids[fields[0]] = True
+                    elif line[0] == '-':
+                        ids.pop(fields[0], None)
+                        self._drop_tree(fields[0], children)
+                    elif line[0] == '=':
+                        children[fields[0]] = tuple(fields[1:])
+                    size += 1
+        except (OSError, IOError) as err:
+            if err.errno != errno.ENOENT:
+                raise
+        return ids, children, size
+
+    @staticmethod
+    def _drop_tree(task_id, children):
+        """
+        Remove `task_id` and all its descendants from the `children` map.
+        """
+        queue = [task_id]
+        while queue:
+            queue.extend(children.pop(queue.pop(), ()))
+
     def destroy(self):
         """
         Remove the session directory and all the tasks it contains
@@ -303,6 +398,7 @@ class Session(list):
         """
         for task_id in self.tasks:
             self._recursive_remove_from_store(task_id)
+        self._children.clear()
         if os.path.exists(self.path):
             shutil.rmtree(self.path)
 
@@ -348,39 +444,125 @@ class Session(list):
         except AttributeError:
             task_id = self.store.save(task)
         self.tasks[task_id] = task
+        if str(task_id) not in self._indexed:
+            self._indexed[str(task_id)] = True
+            self._journal.append('+%s' % task_id)
+        if str(task_id) not in self._children:
+            self._record_tree(task)
         if flush:
             self.flush()
         return task_id
 
+    def add_many(self, tasks, flush=True):
+        """
+        Add all `tasks` to the current session and return list of their IDs.
+
+        This is equivalent to calling `add`:meth: on each task in turn,
+        but new tasks are saved as a single batch and session metadata
+        (if `flush` is true) is updated only once at the end.
+        """
+        with self.store.batch():
+            task_ids = [self.add(task, flush=False) for task in tasks]
+        if flush:
+            self.flush()
+        return task_ids
+
+    def _record_tree(self, task):
+        """
+        Record the IDs of the children of each task collection in `task`.
+
+        Only tasks that have already been saved (hence, have a
+        persistent ID) are recorded.
+        """
+        queue = [task]
+        while queue:
+            task = queue.pop()
+            try:
+                task_id = str(task.persistent_id)
+            except AttributeError:
+                continue
+            children = getattr(task, 'tasks', None)
+            if children is None and task.persistent_id not in self.tasks:
+                # no need to record leaf tasks, unless top-level
+                continue
+            children = list(children or [])
+            self._record_children(task_id, children)
+            queue.extend(children)
+
+    def _record_children(self, task_id, children):
+        child_ids = tuple(str(child.persistent_id) for child in children
+                          if hasattr(child, 'persistent_id'))
+        if self._children.get(task_id) != child_ids:
+            self._children[task_id] = child_ids
+            self._journal.append('=%s %s' % (task_id, ' '.join(child_ids)))
+
+    def _on_object_saved(self, store, id_, obj):
+        """
+        Update the recorded children of a task collection just saved.
+
+        Only collections already recorded in the session are
+        considered; child collections that are not recorded yet are
+        recorded together with their whole subtree.
+        """
+        if store is not getattr(self, 'store', None):
+            return
+        task_id = str(id_)
+        if task_id not in self._children:
+            return
+        children = getattr(obj, 'tasks', None)
+        if children is None:
+            return
+        children = list(children)
+        self._record_children(task_id, children)
+        for child in children:
+            if (hasattr(child, 'tasks') and hasattr(child, 'persistent_id')
+                    and str(child.persistent_id) not in self._children):
+                self._record_tree(child)
+
     def forget(self, task_id, flush=True):
         """
         Remove task identified by `task_id` from the current session
         *but not* from the associated storage.
         """
         obj = self.tasks.pop(task_id, None)
-        if flush and obj is not None:
+        indexed = self._indexed.pop(str(task_id), None)
+        if indexed is not None:
+            self._journal.append('-%s' % task_id)
+        self._drop_tree(str(task_id), self._children)
+        if flush and (obj is not None or indexed is not None):
             self.flush()
 
     def _recursive_remove_from_store(self, task_id):
         """
         Remove a task from the store and, if the object has a `tasks`
         attribute containing a list of other tasks, remove them from the store
+
+        Children of tasks recorded in the session index are found
+        there; only tasks that are not recorded (e.g., from sessions
+        created by older versions of GC3Pie) are loaded to find their
+        children.
         """
-        queue = [task_id]
+        # a task is "known" if reached through the recorded children
+        # of its parent: then, having no record means it has no children
+        queue = [(task_id, False)]
         while queue:
-            id_to_remove = queue.pop()
-            obj = self.store.load(id_to_remove)
-            try:
-                for child in obj.tasks:
-                    queue.append(child.persistent_id)
-            except AttributeError:
-                pass
+            id_to_remove, known = queue.pop()
+            children = self._children.pop(str(id_to_remove), None)
+            if children is not None:
+                queue.extend((child_id, True) for child_id in children)
+            elif not known:
+                obj = self.store.load(id_to_remove)
+                try:
+                    for child in obj.tasks:
+                        queue.append((child.persistent_id, False))
+                except AttributeError:
+                    pass
             try:
                 self.store.remove(id_to_remove)
             except Exception as err:
                 gc3libs.log.warning(
                     "Error removing task id `%s` from the store: %s",
-                    err)
+                    id_to_remove, err)
 
     def remove(self, task_id, flush=True):
         """
@@ -390,6 +572,18 @@ class Session(list):
         self._recursive_remove_from_store(task_id)
         self.forget(task_id, flush)
 
+    def remove_many(self, task_ids, flush=True):
+        """
+        Remove all tasks identified by `task_ids` from the current session
+        *and* from the associated storage.
+
+        Session metadata (if `flush` is true) is updated only once at the end.
+        """
+        for task_id in list(task_ids):
+            self.remove(task_id, flush=False)
+        if flush:
+            self.flush()
+
     def __len__(self):
         return len(self.tasks)
 
@@ -458,9 +652,24 @@ class Session(list):
         # create directory if it does not exists
         if not os.path.exists(self.path):
             os.mkdir(self.path)
-        # Update store.url and job_ids.db files
-        self._save_store_url_file()
-        self._save_index_file()
+            self._store_url_saved = None
+            self._save_index_file()
+        # Update store.url and session index files
+        if self._store_url_saved != str(self.store_url):
+            self._save_store_url_file()
+        if not self._journal:
+            return
+        if self._journal_size + len(self._journal) > max(
+                gc3libs.defaults.SESSION_JOURNAL_MIN_SIZE,
+                len(self._indexed) + len(self._children)):
+            self._save_index_file()
+        else:
+            with open(os.path.join(self.path, self.JOURNAL_FILENAME),
+                      'a') as journal:
+                journal.write(''.join(record + '\n'
+                                      for record in self._journal))
+            self._journal_size += len(self._journal)
+            del self._journal[:]
 
     def load(self, obj_id, add=True, flush=True):
         """
@@ -480,12 +689,20 @@ class Session(list):
 
         Return a dictionary mapping task ID to the actual
         retrieved `Task`:class: object.
+
+        Objects are retrieved with a single call to the store's
+        `load_many` method, and session metadata (if `flush` is
+        true) is updated only once at the end.
         """
+        obj_ids = list(obj_ids)
         tasks = {}
-        for task_id in obj_ids:
-            try:
-                tasks[task_id] = self.load(task_id, add, flush)
-            except Exception as err:
+        for task_id, obj in zip(obj_ids, self.store.load_many(obj_ids)):
+            if not isinstance(obj, Exception):
+                if add:
+                    self.add(obj, flush=False)
+                tasks[task_id] = obj
+            else:
+                err = obj
                 if gc3libs.error_ignored(
                         # context:
                         # - module
@@ -503,7 +720,9 @@ class Session(list):
                         "Ignoring error from loading '%s': %s", task_id, err)
                 else:
                     # propagate exception back to caller
-                    raise
+                    raise err
+        if add and flush:
+            self.flush()
         return tasks
 
     def save(self, obj):
@@ -542,21 +761,48 @@ class Session(list):
         """
         Save all modified tasks to persistent storage.
         """
-        for task in self.tasks.values():
-            if task.changed:
-                self.save(task)
+        with self.store.batch():
+            for task in self.tasks.values():
+                if task.changed:
+                    self.save(task)
+                    self._record_tree(task)
         if flush:
             self.flush()
 
     def _save_index_file(self):
         """
         Save job IDs to the default session index.
+
+        The index and task tree files are rewritten from scratch, and
+        the journal is emptied.
         """
-        idx_filename = os.path.join(self.path, self.INDEX_FILENAME)
-        with open(idx_filename, 'w') as idx_fd:
-            for task_id in self.tasks:
-                idx_fd.write(str(task_id))
-                idx_fd.write('\n')
+        for task_id in self.tasks:
+            self._indexed.setdefault(str(task_id), True)
+        self._write_atomically(
+            self.INDEX_FILENAME,
+            ''.join('%s\n' % task_id for task_id in self._indexed))
+        if self._children:
+            self._write_atomically(
+                self.TREE_FILENAME,
+                ''.join('%s %s\n' % (task_id, ' '.join(child_ids))
+                        for task_id, child_ids in self._children.items()))
+        elif os.path.exists(os.path.join(self.path, self.TREE_FILENAME)):
+            os.remove(os.path.join(self.path, self.TREE_FILENAME))
+        # since records in the journal are idempotent, it does no harm
+        # if we crash before the journal is removed
+        if os.path.exists(os.path.join(self.path, self.JOURNAL_FILENAME)):
+            os.remove(os.path.join(self.path, self.JOURNAL_FILENAME))
+        self._journal_size = 0
+        del self._journal[:]
+
+    def _write_atomically(self, filename, data):
+        """
+        Replace the contents of file `filename` in the session directory.
+        """
+        path = os.path.join(self.path, filename)
+        tmp_path = '%s.%d.tmp' % (path, os.getpid())
+        gc3libs.utils.write_contents(tmp_path, data)
+        os.rename(tmp_path, path)
 
     def _save_store_url_file(self):
         """
@@ -567,6 +813,7 @@ class Session(list):
         """
         store_url_filename = os.path.join(self.path, self.STORE_URL_FILENAME)
         gc3libs.utils.write_contents(store_url_filename, str(self.store_url))
+        self._store_url_saved = str(self.store_url)
 
     def _touch_file(self, filename, time=None):
         """
@@ -72,6 +72,64 @@ def test_empty_ParallelTaskCollection_progress():
         assert par.execution.returncode == 0
 
 
+def _scan_stats(coll):
+    result = {}
+    for task in coll.tasks:
+        state = task.execution.state
+        result[state] = result.get(state, 0) + 1
+        if state == Run.State.TERMINATED:
+            key = ('ok' if task.execution.returncode == 0 else 'failed')
+            result[key] = result.get(key, 0) + 1
+    result['total'] = len(coll.tasks)
+    return result
+
+
+def _nonzero(stats):
+    return dict((key, value) for key, value in stats.items() if value)
+
+
+def test_ParallelTaskCollection_stats_follow_state_changes():
+    apps = [SuccessfulApp('app%d' % n) for n in range(4)]
+    par = ParallelTaskCollection(apps)
+    assert _nonzero(par.stats()) == {Run.State.NEW: 4, 'total': 4}
+
+    apps[0].execution.state = Run.State.RUNNING
+    apps[1].execution.state = Run.State.TERMINATED
+    assert _nonzero(par.stats()) == _scan_stats(par)
+    assert par.stats()['ok'] == 1
+
+    # exit status changed after termination
+    apps[1].execution.returncode = (0, 1)
+    assert _nonzero(par.stats()) == _scan_stats(par)
+    assert par.stats()['failed'] == 1
+
+    # tasks added with `add` or directly to `.tasks`
+    par.add(UnsuccessfulApp())
+    par.tasks.append(SuccessfulApp())
+    assert _nonzero(par.stats()) == _scan_stats(par)
+    par.remove(apps[0])
+    assert _nonzero(par.stats()) == _scan_stats(par)
+    assert par._state() == Run.State.RUNNING
+
+    # removed tasks no longer count
+    apps[0].execution.state = Run.State.TERMINATED
+    assert _nonzero(par.stats()) == _scan_stats(par)
+
+
+def test_ParallelTaskCollection_stats_after_unpickling():
+    import pickle
+    apps = [SuccessfulApp('app%d' % n) for n in range(3)]
+    par = ParallelTaskCollection(apps)
+    apps[0].execution.state = Run.State.RUNNING
+    par.stats()
+    par2 = pickle.loads(pickle.dumps(par))
+    assert '_counters' not in par2.__dict__ or par2._counters is None
+    assert _nonzero(par2.stats()) == _scan_stats(par2)
+    par2.tasks[1].execution.state = Run.State.SUBMITTED
+    assert _nonzero(par2.stats()) == _scan_stats(par2)
+    assert par2._state() == Run.State.RUNNING
+
+
 # main: run tests
 
 if "__main__" == __name__:
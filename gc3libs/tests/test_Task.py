@@ -124,6 +124,34 @@ def test_task_redo3():
         task.redo()
 
 
+def test_run_pickle():
+    import pickle
+    task = SuccessfulApp()
+    task.execution.state = Run.State.SUBMITTED
+    task.execution.lrms_jobid = '1234'
+    task2 = pickle.loads(pickle.dumps(task))
+    assert task2.execution.state == Run.State.SUBMITTED
+    assert task2.execution._ref is task2
+    assert task2.execution.lrms_jobid == '1234'
+    assert list(task2.execution.history) == list(task.execution.history)
+    # state transitions are saved as integer codes
+    assert isinstance(task.execution.history.__getstate__()['_texts'][-1], int)
+    # fixed fields are not part of the mapping
+    assert '_state' not in task2.execution
+
+
+def test_run_unpickle_old_format():
+    run = Run.__new__(Run)
+    run.__setstate__({
+        '_ref': None, '_state': Run.State.RUNNING, '_exitcode': None,
+        '_signal': None, '_execution_targets': [], 'lrms_jobid': '1234',
+    })
+    assert run.state == Run.State.RUNNING
+    assert run.lrms_jobid == '1234'
+    # clones keep the state
+    assert Run(run).state == Run.State.RUNNING
+
+
 # main: run tests
 
 if "__main__" == __name__:
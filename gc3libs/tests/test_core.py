@@ -23,6 +23,7 @@ from __future__ import absolute_import, print_function, unicode_literals
 from builtins import object
 import os
 
+import mock
 import pytest
 
 # GC3Pie imports
@@ -32,7 +33,7 @@ from gc3libs.core import Core, MatchMaker
 from gc3libs.quantity import GB, GiB, hours
 from gc3libs.utils import string_to_boolean
 
-from gc3libs.testing.helpers import example_cfg_dict, temporary_config_file, temporary_core
+from gc3libs.testing.helpers import example_cfg_dict, SuccessfulApp, temporary_config_file, temporary_core
 
 
 def test_core_resources():
@@ -188,3 +189,51 @@ def test_create_core_no_auto_enable_auth():
         # std factory params
         core = create_core(cfgfile.name, auto_enable_auth=False)
         assert core.auto_enable_auth == False
+
+
+def test_core_update_job_state_error_on_one_resource():
+    """Test that a failing resource does not block updates on the others."""
+    cfg = gc3libs.config.Configuration()
+    cfg.TYPE_CONSTRUCTOR_MAP['noop'] = ('gc3libs.backends.noop', 'NoOpLrms')
+    try:
+        for name in ['test1', 'test2']:
+            cfg.resources[name].update(
+                name=name,
+                type='noop',
+                auth='none',
+                transport='local',
+                max_cores_per_job=1,
+                max_memory_per_core=1*GB,
+                max_walltime=8*hours,
+                max_cores=10,
+                architecture=Run.Arch.X86_64,
+            )
+        core = Core(cfg)
+        apps = []
+        for name in ['test1', 'test2']:
+            lrms = core.get_backend(name)
+            lrms.transition_graph = {
+                Run.State.SUBMITTED: {1.0: Run.State.RUNNING},
+            }
+            app = SuccessfulApp(name)
+            core.submit(app, targets=[lrms])
+            assert app.execution.state == Run.State.SUBMITTED
+            apps.append(app)
+
+        errors = []
+
+        def update_job_state_error(err):
+            errors.append(err)
+            return err
+
+        apps[0].update_job_state_error = update_job_state_error
+        with mock.patch.object(core.get_backend('test1'), 'update_job_states',
+                               side_effect=RuntimeError("broken")):
+            core.update_job_state(*apps)
+        # the error is handled on a per-task basis ...
+        assert len(errors) == 1 and isinstance(errors[0], RuntimeError)
+        assert apps[0].execution.state == Run.State.SUBMITTED
+        # ... and tasks on the other resource are updated anyway
+        assert apps[1].execution.state == Run.State.RUNNING
+    finally:
+        del cfg.TYPE_CONSTRUCTOR_MAP['noop']
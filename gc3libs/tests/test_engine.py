@@ -35,9 +35,11 @@ import pytest
 # GC3Pie imports
 from gc3libs import Run, Application, create_engine
 import gc3libs.config
-from gc3libs.core import Core, Engine, MatchMaker
+import gc3libs.events
+import gc3libs.exceptions
+from gc3libs.core import Core, Engine, MatchMaker, first_come_first_serve
 from gc3libs.persistence.filesystem import FilesystemStore
-from gc3libs.quantity import GB, GiB, hours
+from gc3libs.quantity import GB, GiB, hours, seconds
 
 from gc3libs.testing.helpers import example_cfg_dict, SimpleParallelTaskCollection, SimpleSequentialTaskCollection, SuccessfulApp, temporary_config, temporary_config_file, temporary_core, temporary_directory, temporary_engine
 
@@ -108,6 +110,408 @@ def test_engine_forget_terminated(num_jobs=3, transition_graph=None, max_iter=10
             assert not task._attached
 
 
+def test_engine_progress_concurrent(num_jobs=20, max_iter=100):
+    with temporary_engine() as engine:
+        engine.max_concurrent = 4
+
+        # generate some no-op tasks
+        tasks = []
+        for n in range(num_jobs):
+            name = 'app{nr}'.format(nr=n+1)
+            app = SuccessfulApp(name)
+            engine.add(app)
+            tasks.append(app)
+
+        # run them all
+        current_iter = 0
+        done = engine.counts()[Run.State.TERMINATED]
+        while done < num_jobs and current_iter < max_iter:
+            engine.progress()
+            done = engine.counts()[Run.State.TERMINATED]
+            current_iter += 1
+        engine.close()
+
+        # check state and counters
+        for task in tasks:
+            assert task.execution.state == 'TERMINATED'
+        assert engine.counts()['ok'] == num_jobs
+        assert len(engine._managed.done) == num_jobs
+
+
+def test_engine_concurrent_state_changes_in_engine_thread(monkeypatch):
+    """Test that worker threads do not change the state of managed tasks."""
+    import threading
+    threads = set()
+    set_state = Run.state.fset
+
+    def recording_set_state(run, value):
+        threads.add(threading.current_thread())
+        set_state(run, value)
+    monkeypatch.setattr(Run, 'state',
+                        property(Run.state.fget, recording_set_state))
+
+    with temporary_engine() as engine:
+        engine.max_concurrent = 4
+        apps = [SuccessfulApp('app{nr}'.format(nr=n)) for n in range(8)]
+        for app in apps:
+            engine.add(app)
+        for _ in range(100):
+            engine.progress()
+            if engine.counts()[Run.State.TERMINATED] == len(apps):
+                break
+        engine.close()
+
+    assert threads == set([threading.current_thread()])
+    for app in apps:
+        assert app.execution.state == Run.State.TERMINATED
+        transitions = [msg for msg, _, _ in app.execution.history._messages
+                       if msg.startswith('Transition from')]
+        # each transition is recorded once
+        assert len(transitions) == len(set(transitions))
+
+
+def test_task_queue():
+    queue = Engine.TaskQueue()
+    apps = [SuccessfulApp('app{nr}'.format(nr=n)) for n in range(5)]
+    for app in apps:
+        queue.put(app)
+    assert list(queue) == apps
+    # FIFO order
+    assert queue.get() is apps[0]
+    # removal from the middle
+    queue.remove(apps[2])
+    assert list(queue) == [apps[1], apps[3], apps[4]]
+    assert apps[2] not in queue
+    with pytest.raises(ValueError):
+        queue.remove(apps[2])
+    # re-insertion moves a task, does not duplicate it
+    queue.put(apps[1])
+    queue.add(apps[4])
+    assert list(queue) == [apps[4], apps[3], apps[1]]
+    assert len(queue) == 3
+    # removal while iterating
+    for app in queue:
+        queue.remove(app)
+    assert len(queue) == 0
+    with pytest.raises(IndexError):
+        queue.get()
+
+
+def test_engine_remove_many(num_jobs=1000):
+    with temporary_engine() as engine:
+        apps = [SuccessfulApp('app{nr}'.format(nr=n)) for n in range(num_jobs)]
+        for app in apps:
+            engine.add(app)
+        for app in apps[::2]:
+            engine.remove(app)
+        assert list(engine._managed.to_submit) == apps[1::2]
+        assert engine.counts()['total'] == num_jobs // 2
+
+
+def test_engine_remove_submitted():
+    """Test that tasks can be removed after they have been submitted."""
+    with temporary_engine() as engine:
+        apps = [SuccessfulApp('app{nr}'.format(nr=n)) for n in range(3)]
+        for app in apps:
+            engine.add(app)
+        engine.progress()
+        for app in apps:
+            assert app.execution.state != Run.State.NEW
+            engine.remove(app)
+        assert engine.counts()['total'] == 0
+
+
+def test_engine_dispatcher_per_resource_limit():
+    """Test that the per-resource limit on concurrent operations is enforced."""
+    import threading
+    import time
+    lock = threading.Lock()
+    running = defaultdict(int)
+    max_running = defaultdict(int)
+
+    def op(item):
+        with lock:
+            running[item[0]] += 1
+            max_running[item[0]] = max(max_running[item[0]], running[item[0]])
+        time.sleep(0.01)
+        with lock:
+            running[item[0]] -= 1
+
+    dispatcher = Engine._Dispatcher(max_workers=6, per_key=2)
+    items = [(rsc, n) for n in range(10) for rsc in 'abc']
+    results = list(dispatcher.map(op, items, key=(lambda item: item[0])))
+    dispatcher.close()
+
+    assert sorted(item for item, _, _, _ in results) == sorted(items)
+    assert all(err is None for _, _, err, _ in results)
+    assert max(max_running.values()) <= 2
+
+
+def test_engine_dispatcher_abandoned_map():
+    """Test that results of an abandoned `map` do not leak into the next one."""
+    import time
+
+    def op(item):
+        time.sleep(0.01)
+        if item == 0:
+            raise RuntimeError("stop here")
+
+    dispatcher = Engine._Dispatcher(max_workers=4)
+    results = dispatcher.map(op, list(range(8)), key=(lambda item: item % 4))
+    for item, _, err, _ in results:
+        if err is not None:
+            break
+    results.close()
+    later = list(dispatcher.map(op, ['a', 'b'], key=(lambda item: item)))
+    dispatcher.close()
+    assert sorted(item for item, _, _, _ in later) == ['a', 'b']
+
+
+def test_engine_adaptive_polling(num_jobs=5, max_iter=100):
+    with temporary_engine() as engine:
+        engine.adaptive_polling = True
+        engine.min_poll_interval = 0
+
+        tasks = []
+        for n in range(num_jobs):
+            app = SuccessfulApp('app{nr}'.format(nr=n+1))
+            engine.add(app)
+            tasks.append(app)
+
+        current_iter = 0
+        done = engine.counts()[Run.State.TERMINATED]
+        while done < num_jobs and current_iter < max_iter:
+            engine.progress()
+            done = engine.counts()[Run.State.TERMINATED]
+            current_iter += 1
+
+        assert isinstance(engine._managed.to_update, Engine._PollingQueue)
+        for task in tasks:
+            assert task.execution.state == 'TERMINATED'
+        # book-keeping of terminated tasks is dropped at the next cycle
+        engine.progress()
+        assert len(engine._managed.to_update._polls) == 0
+
+
+def test_polling_queue_deadlines():
+    queue = Engine._PollingQueue(min_interval=10, max_interval=300)
+    app = SuccessfulApp()
+    app.execution.state = Run.State.SUBMITTED
+    now = app.execution.timestamp[Run.State.SUBMITTED]
+
+    # exponential backoff while the state does not change
+    assert queue.interval(app, now) == 10
+    assert queue.interval(app, now) == 20
+    assert queue.interval(app, now) == 40
+    for _ in range(10):
+        queue.interval(app, now)
+    assert queue.interval(app, now) == 300
+
+    # interval grows with the time spent in the same state
+    queue._polls.clear()
+    assert queue.interval(app, now + 1000) == 100
+
+    # queue wait observed on the resource is taken into account
+    app.execution.resource_name = 'test'
+    app.execution.state = Run.State.RUNNING
+    app.execution.timestamp[Run.State.RUNNING] = now + 60
+    assert queue.interval(app, now + 60) == 10
+    assert queue.queue_wait == {'test': 60}
+    other = SuccessfulApp()
+    other.execution.resource_name = 'test'
+    other.execution.state = Run.State.SUBMITTED
+    then = other.execution.timestamp[Run.State.SUBMITTED]
+    assert queue.interval(other, then) == 30
+    assert queue.interval(other, then + 50) == 10
+
+    # the requested walltime caps the interval
+    job = SuccessfulApp(requested_walltime=100*seconds)
+    job.execution.state = Run.State.RUNNING
+    started = job.execution.timestamp[Run.State.RUNNING]
+    for _ in range(5):
+        queue.interval(job, started)
+    assert queue.interval(job, started + 80) == 20
+
+
+def test_polling_queue_due():
+    queue = Engine._PollingQueue(min_interval=100, max_interval=300)
+    apps = [SuccessfulApp('app{nr}'.format(nr=n)) for n in range(5)]
+    for app in apps:
+        app.execution.state = Run.State.SUBMITTED
+        queue.put(app)
+    assert queue.due() == []
+    assert len(queue) == 5
+    queue.remove(apps[2])
+    queue.add(apps[2])
+    queue.remove(apps[0])
+    assert queue.due() == [apps[2]]
+    assert queue.get() is apps[2]
+    assert len(queue) == 3
+    assert set(queue) == set([apps[1], apps[3], apps[4]])
+    with pytest.raises(ValueError):
+        queue.remove(apps[0])
+
+
+def test_polling_queue_find_job():
+    queue = Engine._PollingQueue(min_interval=100, max_interval=300)
+    apps = [SuccessfulApp('app{nr}'.format(nr=n)) for n in range(3)]
+    for n, app in enumerate(apps):
+        app.execution.state = Run.State.SUBMITTED
+        app.execution.resource_name = 'test'
+        app.execution.lrms_jobid = n
+        queue.put(app)
+    assert queue.find_job('test', '1') is apps[1]
+    assert queue.find_job('other', '1') is None
+    deadline, polls = queue.evict(apps[1])
+    assert queue.find_job('test', 1) is None
+    queue.restore(apps[1], deadline, polls)
+    assert queue.find_job('test', 1) is apps[1]
+    queue.remove(apps[0])
+    assert queue.find_job('test', 0) is None
+    queue.add(apps[2])
+    assert queue.get() is apps[2]
+    assert queue.find_job('test', 2) is None
+
+
+def test_engine_adaptive_polling_skips_tasks_not_due():
+    with temporary_engine() as engine:
+        engine.adaptive_polling = True
+        engine.min_poll_interval = 1000
+        app = SuccessfulApp()
+        engine.add(app)
+        engine.progress()
+        assert app.execution.state == Run.State.SUBMITTED
+        for _ in range(3):
+            engine.progress()
+        # not updated, as the next poll is due only in 1000s
+        assert app.execution.state == Run.State.SUBMITTED
+        assert engine._managed.to_update.due() == []
+
+        # switching back to polling at every cycle keeps all tasks
+        engine.adaptive_polling = False
+        engine.progress()
+        assert app in engine._managed
+        assert app.execution.state != Run.State.SUBMITTED
+
+
+def test_engine_updates_jobs_reported_done():
+    with temporary_engine() as engine:
+        engine.adaptive_polling = True
+        engine.min_poll_interval = 1000
+        apps = [SuccessfulApp('app{0}'.format(n)) for n in range(2)]
+        for app in apps:
+            engine.add(app)
+        engine.progress()
+        assert [app.execution.state for app in apps] == [Run.State.SUBMITTED]*2
+        assert not engine.wait(0)
+
+        lrms = engine._core.get_backend(apps[0].execution.resource_name)
+        gc3libs.events.send(gc3libs.events.JobDone, lrms,
+                            jobid=apps[0].execution.lrms_jobid)
+        assert engine.wait(0)
+        engine.progress()
+        # only the task whose job was reported done is updated
+        assert apps[0].execution.state != Run.State.SUBMITTED
+        assert apps[1].execution.state == Run.State.SUBMITTED
+        assert not engine.wait(0)
+
+
+class _FakeResource(object):
+    def __init__(self, name):
+        self.name = name
+        self.enabled = True
+        self.architecture = set([Run.Arch.X86_64])
+        self.max_cores_per_job = 4
+        self.max_memory_per_core = 2*GB
+        self.max_walltime = 8*hours
+        self.user_queued = 0
+        self.free_slots = 4
+        self.queued = 0
+        self.user_run = 0
+
+    def validate_data(self, urls):
+        return True
+
+
+class _CountingMatchMaker(MatchMaker):
+    def __init__(self):
+        self.nr_filter = 0
+        self.nr_rank = 0
+
+    def filter(self, task, resources):
+        self.nr_filter += 1
+        return MatchMaker.filter(self, task, resources)
+
+    def rank(self, task, resources):
+        self.nr_rank += 1
+        return MatchMaker.rank(self, task, resources)
+
+    def signature(self, task):
+        return task.requirements_signature()
+
+
+def test_requirements_signature():
+    app1 = SuccessfulApp('app1')
+    app2 = SuccessfulApp('app2')
+    assert app1.requirements_signature() == app2.requirements_signature()
+    app3 = SuccessfulApp('app3', requested_memory=1*GB)
+    assert app1.requirements_signature() != app3.requirements_signature()
+
+    class PickyApp(SuccessfulApp):
+        def compatible_resources(self, resources):
+            return resources[:1]
+    assert PickyApp().requirements_signature() is None
+    # matchmakers overriding `filter` must opt in to caching
+    assert MatchMaker().signature(app1) == app1.requirements_signature()
+
+    class PickyMatchMaker(MatchMaker):
+        def filter(self, task, resources):
+            return resources[:1]
+    assert PickyMatchMaker().signature(app1) is None
+
+
+def test_first_come_first_serve_matches_once_per_signature(num_jobs=10):
+    matchmaker = _CountingMatchMaker()
+    queue = Engine.TaskQueue()
+    for n in range(num_jobs):
+        queue.put(SuccessfulApp('app{nr}'.format(nr=n)))
+    # no resource can accomodate this one
+    queue.put(SuccessfulApp('big', requested_memory=4*GB))
+    resources = [_FakeResource('a'), _FakeResource('b')]
+    sched = first_come_first_serve(queue, resources, matchmaker)
+    # refuse to submit anything, so rankings are reused
+    targets = []
+    result = next(sched)
+    try:
+        while True:
+            targets.append(result[1])
+            result = sched.throw(RuntimeError('not submitted'))
+    except StopIteration:
+        pass
+    assert len(targets) == 2 * num_jobs
+    assert matchmaker.nr_filter == 2
+    assert matchmaker.nr_rank == 1
+    assert len(queue) == num_jobs + 1
+
+
+def test_first_come_first_serve_invalidates_matches_on_full_resource():
+    matchmaker = _CountingMatchMaker()
+    queue = Engine.TaskQueue()
+    for n in range(3):
+        queue.put(SuccessfulApp('app{nr}'.format(nr=n)))
+    resources = [_FakeResource('a'), _FakeResource('b')]
+    sched = first_come_first_serve(queue, resources, matchmaker)
+    task, target = next(sched)
+    assert target == 'a'
+    task, target = sched.throw(
+        gc3libs.exceptions.MaximumCapacityReached('full'))
+    assert target == 'b'
+    # cached results have been dropped: resource 'a' is never proposed again
+    task, target = sched.send(None)
+    assert target == 'b'
+    assert matchmaker.nr_filter == 2
+
+
 def test_engine_progress_collection():
     with temporary_engine() as engine:
         seq = SimpleSequentialTaskCollection(3)
@@ -533,6 +937,111 @@ def test_engine_cannot_find_task_by_id_if_no_store():
                 engine.find_task_by_id(task_id)
 
 
+def test_engine_spills_terminated_tasks(num_jobs=6, max_iter=100):
+    """
+    Test that TERMINATED tasks in excess of `max_in_memory` are dropped from memory.
+    """
+    with temporary_core() as core:
+        with temporary_directory() as tmpdir:
+            store = FilesystemStore(tmpdir)
+            engine = Engine(core, store=store, max_in_memory=2)
+            ids = []
+            for n in range(num_jobs):
+                app = SuccessfulApp('app{nr}'.format(nr=n+1))
+                store.save(app)
+                engine.add(app)
+                ids.append(app.persistent_id)
+            del app
+
+            current_iter = 0
+            while (engine.counts()[Run.State.TERMINATED] < num_jobs
+                   and current_iter < max_iter):
+                engine.progress()
+                current_iter += 1
+
+            assert len(engine._managed) == 2
+            assert len(engine._spilled) == num_jobs - 2
+            counts = engine.counts()
+            assert counts['total'] == num_jobs
+            assert counts['ok'] == num_jobs
+            assert len(list(engine.iter_tasks())) == num_jobs
+            # counters initialized later include spilled tasks
+            assert engine._counts.init_for(SuccessfulApp)['ok'] == num_jobs
+
+            # spilled tasks are loaded back on demand
+            for task_id in ids:
+                task = engine.find_task_by_id(task_id)
+                assert task.persistent_id == task_id
+                assert task.execution.state == Run.State.TERMINATED
+                assert task in engine._managed
+            assert not engine._spilled
+            assert engine.counts()['total'] == num_jobs
+
+
+def test_engine_spills_tasks_not_due():
+    """
+    Test that in-flight tasks are spilled and loaded back when their poll is due.
+    """
+    with temporary_core() as core:
+        with temporary_directory() as tmpdir:
+            store = FilesystemStore(tmpdir)
+            engine = Engine(core, store=store, max_in_memory=1,
+                            adaptive_polling=True, min_poll_interval=1000)
+            for n in range(3):
+                engine.add(SuccessfulApp('app{nr}'.format(nr=n+1)))
+            engine.progress()
+            assert engine.counts()[Run.State.SUBMITTED] == 3
+            assert len(engine._managed) == 1
+            assert len(engine._spilled) == 2
+            for proxy in engine._spilled.values():
+                assert proxy.state == Run.State.SUBMITTED
+                assert proxy.action == 'update'
+                assert proxy.deadline > 0
+
+            # no task is due yet: nothing is loaded back
+            engine.progress()
+            assert len(engine._spilled) == 2
+
+            # all tasks are due when polling at every cycle
+            engine.adaptive_polling = False
+            engine.progress()
+            assert engine.counts()[Run.State.SUBMITTED] == 0
+            assert engine.counts()['total'] == 3
+            assert len(engine._managed) + len(engine._spilled) == 3
+
+
+def test_engine_spilled_task_still_referenced():
+    """
+    Test that a spilled task that is still alive is used when loading it back.
+    """
+    with temporary_core() as core:
+        with temporary_directory() as tmpdir:
+            store = FilesystemStore(tmpdir)
+            engine = Engine(core, store=store, max_in_memory=1)
+            app1 = SuccessfulApp('app1')
+            app2 = SuccessfulApp('app2')
+            for app in app1, app2:
+                app.execution.state = Run.State.TERMINATED
+                app.execution.returncode = 0
+                engine.add(app)
+            engine.progress()
+            assert app1 not in engine._managed
+            assert engine.find_task_by_id(app1.persistent_id) is app1
+
+            # least recently used task is spilled
+            engine.progress()
+            assert app1 in engine._managed
+            assert app2 not in engine._managed
+            # managing a spilled task is a no-op
+            engine.add(app2)
+            assert engine.counts()['total'] == 2
+            # removing a spilled task forgets about it
+            engine.progress()
+            engine.remove(app1)
+            assert engine.counts()['total'] == 1
+            assert not engine._spilled
+
+
 @pytest.mark.parametrize("limit_submitted,limit_in_flight", [
     (2, 10),
     (10, 5),
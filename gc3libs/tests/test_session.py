@@ -31,6 +31,7 @@ import os
 import shutil
 import tempfile
 
+import mock
 import pytest
 
 import sqlalchemy
@@ -43,7 +44,8 @@ import gc3libs.persistence.sql
 from gc3libs.session import Session
 from gc3libs.utils import Struct
 from gc3libs import Task
-from gc3libs.workflow import TaskCollection
+from gc3libs.testing.helpers import SuccessfulApp
+from gc3libs.workflow import ParallelTaskCollection, TaskCollection
 
 
 class _PStruct(Struct, Persistable):
@@ -124,9 +126,8 @@ class TestSession(object):
     def test_add_updates_metadata(self):
         """Check that on-disk metadata is changed on add(..., flush=True)."""
         self.sess.add(_PStruct(a=1, b='foo'), flush=True)
-        fd_job_ids = open(os.path.join(self.sess.path,
-                                       self.sess.INDEX_FILENAME), 'r')
-        ids = fd_job_ids.read().split()
+        # index is read back from disk, including the journal
+        ids = self.sess.read_index()
         assert len(ids) == 1
         assert ids == [str(i) for i in self.sess.tasks]
 
@@ -182,6 +183,60 @@ class TestSession(object):
 
         assert len(self.sess.store.list()) == 0
 
+    def test_remove_children_without_loading(self):
+        obj = _PStruct(name='parent')
+        obj.tasks = [_PStruct(name='child1'), _PStruct(name='child2')]
+        obj.tasks[0].tasks = [_PStruct(name='grandchild')]
+        id = self.sess.add(obj)
+        assert len(self.sess.store.list()) == 4
+        sess2 = Session(self.sess.path, **self.extra_args)
+        with mock.patch.object(sess2.store, 'load') as load:
+            sess2.remove(str(id))
+            assert not load.called
+        assert len(sess2.store.list()) == 0
+        assert sess2.read_index() == []
+
+    def test_remove_children_added_after_add(self):
+        coll = ParallelTaskCollection([SuccessfulApp()])
+        id = self.sess.add(coll)
+        # grow the collection, and save it the way an `Engine` does
+        inner = ParallelTaskCollection([SuccessfulApp()])
+        coll.add(SuccessfulApp())
+        coll.add(inner)
+        self.sess.store.save(coll)
+        inner.add(SuccessfulApp())
+        self.sess.store.save(inner)
+        assert len(self.sess.store.list()) == 6
+        self.sess.flush()
+        sess2 = Session(self.sess.path, load=True, task_ids=[],
+                        **self.extra_args)
+        with mock.patch.object(sess2.store, 'load') as load:
+            sess2.remove(str(id))
+            assert not load.called
+        assert len(sess2.store.list()) == 0
+
+    def test_add_many_and_remove_many(self):
+        tids = self.sess.add_many([_PStruct(a=n) for n in range(4)])
+        assert self.sess.read_index() == [str(tid) for tid in tids]
+        self.sess.remove_many(tids[1:3])
+        assert self.sess.read_index() == [str(tids[0]), str(tids[3])]
+        assert len(Session(self.sess.path, **self.extra_args)) == 2
+
+    def test_index_journal_is_compacted(self):
+        journal = os.path.join(self.sess.path, Session.JOURNAL_FILENAME)
+        with mock.patch('gc3libs.defaults.SESSION_JOURNAL_MIN_SIZE', 2):
+            tids = [self.sess.add(_PStruct(a=n)) for n in range(10)]
+            assert os.path.exists(journal)
+            for tid in tids[:-1]:
+                self.sess.remove(tid)
+                # journal never grows larger than the index
+                if os.path.exists(journal):
+                    with open(journal) as stream:
+                        assert len(stream.readlines()) <= 2 * len(self.sess)
+        assert self.sess.read_index() == [str(tids[-1])]
+        sess2 = Session(self.sess.path, **self.extra_args)
+        assert list(sess2.tasks) == [str(tids[-1])]
+
     def test_reload_session(self):
         self.sess.add(_PStruct(a=1, b='foo'))
         self.sess.add(_PStruct(a=2, b='bar'))
@@ -196,6 +251,14 @@ class TestSession(object):
             assert (self.sess.tasks[task1_id] ==
                          sess2.tasks[task2_id])
 
+    def test_read_index_without_loading(self):
+        self.sess.add(_PStruct(a=1, b='foo'))
+        self.sess.add(_PStruct(a=2, b='bar'))
+        sess2 = Session(self.sess.path, task_ids=[], **self.extra_args)
+        assert len(sess2) == 0
+        assert (sorted(sess2.read_index())
+                == sorted(str(id_) for id_ in self.sess.tasks))
+
     def test_incomplete_session_dir(self):
         tmpdir = tempfile.mktemp(
             prefix=(os.path.basename(__file__) + '.'),
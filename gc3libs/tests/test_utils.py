@@ -141,6 +141,108 @@ Max realtime timeout      unlimited            unlimited            us
     assert hard['max_cpu_time'] == None
 
 
+def test_history_output_format():
+    history = gc3libs.utils.History()
+    history.append('first message')
+    history.append('second one', 'tag')
+    messages = history._messages
+    assert [record[0] for record in messages] == ['first message', 'second one']
+    assert messages[1][2] == ('tag',)
+    assert list(history) == [history.format_message(record)
+                             for record in messages]
+    assert str(history) == '- ' + '\n- '.join(history) + '\n'
+    assert history.last() == list(history)[-1]
+
+
+def test_history_unpickle_old_format():
+    import pickle
+    history = gc3libs.utils.History.__new__(gc3libs.utils.History)
+    history.__setstate__({'_messages': [('one', 1.0, ()), ('two', 2.0, ('x',))]})
+    assert history._messages == [('one', 1.0, ()), ('two', 2.0, ('x',))]
+    history.append('three')
+    history2 = pickle.loads(pickle.dumps(history))
+    assert history2._messages == history._messages
+    assert str(history2) == str(history)
+
+
+def test_history_max_length():
+    history = gc3libs.utils.History(max_length=3)
+    dropped = []
+    history.overflow = dropped.extend
+    for n in range(5):
+        history.append('message {0}'.format(n))
+    assert [record[0] for record in history._messages] == [
+        'message 2', 'message 3', 'message 4']
+    assert [record[0] for record in dropped] == ['message 0', 'message 1']
+    assert history.total == 5
+    assert [record[0] for record in history.records(3)] == [
+        'message 3', 'message 4']
+
+
+def test_history_max_length_many_messages():
+    import pickle
+    history = gc3libs.utils.History(max_length=10)
+    dropped = []
+    history.overflow = dropped.extend
+    for n in range(1000):
+        history.append('message {0}'.format(n))
+        # dropped messages are deleted in chunks, not one by one
+        assert len(history._texts) < 20
+    assert history.total == 1000
+    assert [record[0] for record in dropped] == [
+        'message {0}'.format(n) for n in range(990)]
+    assert [record[0] for record in history.records(995)] == [
+        'message {0}'.format(n) for n in range(995, 1000)]
+    assert history.last().startswith('message 999 at')
+    assert len(list(history)) == 10
+    history2 = pickle.loads(pickle.dumps(history))
+    assert history2._messages == history._messages
+    assert history2.total == 1000
+
+
+def test_history_register():
+    History = gc3libs.utils.History
+    text = History._codebook[0]
+    # registering again with the same code is harmless ...
+    assert History.register(text, 0) == text
+    # ... but codes cannot be reassigned
+    with pytest.raises(ValueError):
+        History.register(text, len(History._codebook))
+    with pytest.raises(ValueError):
+        History.register('some other text', 0)
+
+
+def test_history_unknown_code():
+    import pickle
+    History = gc3libs.utils.History
+    history = History()
+    history.append(History._codebook[0])
+    history.append('some text')
+    state = history.__getstate__()
+    assert state['_texts'][0] == 0
+    # as if saved by a program knowing more codes than this one
+    state['_texts'][0] = len(History._codebook) + 10
+    history2 = History.__new__(History)
+    history2.__setstate__(state)
+    assert history2._texts == [
+        '(unknown history message code {0})'.format(
+            len(History._codebook) + 10),
+        'some text']
+    history3 = pickle.loads(pickle.dumps(history2))
+    assert history3._texts == history2._texts
+
+
+def test_history_intern():
+    text = gc3libs.utils.History.intern('Transition from state A to state B')
+    history1 = gc3libs.utils.History()
+    history2 = gc3libs.utils.History()
+    # build an equal but distinct string
+    history1.append(''.join(['Transition from state A', ' to state B']))
+    history2.append(''.join(['Transition from state A', ' to state B']))
+    assert history1._texts[0] is text
+    assert history2._texts[0] is text
+
+
 class TestYieldAtNext(object):
 
     def test_YieldAtNext_yield(self):
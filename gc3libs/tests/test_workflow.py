@@ -30,9 +30,10 @@ import re
 
 # GC3Pie imports
 from gc3libs import Run
-from gc3libs.workflow import SequentialTaskCollection, StagedTaskCollection, StopOnError
+from gc3libs.persistence.filesystem import FilesystemStore
+from gc3libs.workflow import DependentTaskCollection, SequentialTaskCollection, StagedTaskCollection, StopOnError
 
-from gc3libs.testing.helpers import SuccessfulApp, UnsuccessfulApp, temporary_core
+from gc3libs.testing.helpers import SuccessfulApp, UnsuccessfulApp, temporary_core, temporary_engine
 
 
 def test_staged_task_collection_progress():
@@ -90,3 +91,163 @@ def test_staged_task_collection_stage():
         stage = coll.stage()
         assert isinstance(stage, UnsuccessfulApp)
         assert stage.jobname == 'stage1'
+
+
+class _FakeController(object):
+    """
+    Record tasks added and submitted, without running them.
+    """
+
+    def __init__(self):
+        self.added = []
+        self.submitted = []
+        self.killed = []
+
+    def add(self, task):
+        self.added.append(task)
+
+    def remove(self, task):
+        pass
+
+    def submit(self, task, resubmit=False, targets=None, **extra_args):
+        self.submitted.append(task)
+        task.execution.state = Run.State.SUBMITTED
+
+    def update_job_state(self, *tasks, **extra_args):
+        pass
+
+    def kill(self, task, **extra_args):
+        self.killed.append(task)
+
+
+def _finish(task, returncode=0):
+    task.execution.state = Run.State.TERMINATED
+    # override exit code set by `SuccessfulApp.terminated()`
+    task.execution.returncode = (0, returncode)
+
+
+def _make_dag():
+    # a -> c,  b -> d,  c & d -> e
+    apps = dict((name, SuccessfulApp(name)) for name in 'abcde')
+    dag = DependentTaskCollection()
+    dag.add(apps['a'])
+    dag.add(apps['b'])
+    dag.add(apps['c'], after=[apps['a']])
+    dag.add(apps['d'], after=[apps['b']])
+    dag.add(apps['e'], after=[apps['c'], apps['d']])
+    return dag, apps
+
+
+def test_dependent_task_collection_starts_tasks_when_ready():
+    dag, apps = _make_dag()
+    controller = _FakeController()
+    dag.attach(controller)
+    dag.submit()
+    assert controller.submitted == [apps['a'], apps['b']]
+    assert dag.execution.state == Run.State.SUBMITTED
+
+    # `c` starts while `b` (a straggler) is still running
+    apps['b'].execution.state = Run.State.RUNNING
+    _finish(apps['a'])
+    dag.update_state()
+    assert controller.submitted[2:] == [apps['c']]
+    assert apps['d'].execution.state == Run.State.NEW
+
+    _finish(apps['c'])
+    dag.update_state()
+    assert apps['e'].execution.state == Run.State.NEW
+    _finish(apps['b'])
+    dag.update_state()
+    assert controller.submitted[3:] == [apps['d']]
+    _finish(apps['d'])
+    dag.update_state()
+    assert controller.submitted[4:] == [apps['e']]
+    _finish(apps['e'])
+    dag.update_state()
+    assert dag.execution.state == Run.State.TERMINATED
+    # tasks are only attached when started
+    assert controller.added[1:] == controller.submitted
+
+
+def test_dependent_task_collection_cancels_dependents_of_failed_task():
+    dag, apps = _make_dag()
+    controller = _FakeController()
+    dag.attach(controller)
+    dag.submit()
+    _finish(apps['b'], returncode=1)
+    dag.update_state()
+    for name in 'de':
+        assert apps[name].execution.state == Run.State.TERMINATED
+        assert apps[name].execution.signal == int(Run.Signals.Cancelled)
+    assert apps['d'] not in controller.submitted
+    _finish(apps['a'])
+    dag.update_state()
+    _finish(apps['c'])
+    dag.update_state()
+    assert apps['e'] not in controller.submitted
+    assert dag.execution.state == Run.State.TERMINATED
+
+
+def test_dependent_task_collection_kill():
+    dag, apps = _make_dag()
+    controller = _FakeController()
+    dag.attach(controller)
+    dag.submit()
+    dag.kill()
+    assert controller.killed == [apps['a'], apps['b']]
+    for name in 'cde':
+        assert apps[name].execution.state == Run.State.TERMINATED
+        assert apps[name].execution.signal == int(Run.Signals.Cancelled)
+    # started tasks have only been asked to stop
+    assert dag.execution.state == Run.State.SUBMITTED
+
+    _finish(apps['a'], returncode=1)
+    dag.update_state()
+    assert dag.execution.state == Run.State.SUBMITTED
+    _finish(apps['b'], returncode=1)
+    dag.update_state()
+    assert dag.execution.state == Run.State.TERMINATED
+    assert dag.execution.returncode != 0
+    assert controller.submitted == [apps['a'], apps['b']]
+
+
+def test_dependent_task_collection_persistence():
+    tmpdir = tempfile.mkdtemp(prefix=__name__)
+    try:
+        store = FilesystemStore(tmpdir)
+        dag, apps = _make_dag()
+        dag.attach(_FakeController())
+        dag.submit()
+        _finish(apps['a'])
+        dag.update_state()
+        id_ = store.save(dag)
+
+        store = FilesystemStore(tmpdir)
+        dag2 = store.load(id_)
+        names = dict((task.jobname, task) for task in dag2.tasks)
+        controller = _FakeController()
+        dag2.attach(controller)
+        # only tasks started before saving are attached
+        assert (set(task.jobname for task in controller.added[:-1])
+                == set(['b', 'c']))
+        _finish(names['b'])
+        dag2.update_state()
+        assert [task.jobname for task in controller.submitted] == ['d']
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+def test_dependent_task_collection_in_engine(max_iter=100):
+    with temporary_engine() as engine:
+        dag, apps = _make_dag()
+        engine.add(dag)
+        current_iter = 0
+        while (dag.execution.state != Run.State.TERMINATED
+               and current_iter < max_iter):
+            engine.progress()
+            current_iter += 1
+        assert dag.execution.state == Run.State.TERMINATED
+        assert dag.execution.returncode == 0
+        for app in apps.values():
+            assert app.execution.state == Run.State.TERMINATED
+            assert app.execution.returncode == 0
@@ -34,6 +34,7 @@ from builtins import object
 __docformat__ = 'reStructuredText'
 
 
+from array import array
 from codecs import decode
 from collections import defaultdict, deque
 try:
@@ -988,10 +989,115 @@ class History(object):
       >>> for msg in L: print(msg) # doctest: +ELLIPSIS
       first message ...
 
+    If `max_length` is given, only the most recent `max_length`
+    messages are kept in memory; when older messages are dropped,
+    the list of their records *(message, time, tags)* is passed to
+    the `overflow` callable, if one has been set::
+
+      >>> L = History(max_length=2)
+      >>> dropped = []
+      >>> L.overflow = dropped.extend
+      >>> for n in range(3): L.append('message %d' % n)
+      >>> [record[0] for record in dropped]
+      ['message 0']
+      >>> L.total
+      3
+
+    Messages are stored compactly: texts, timestamps and tags are
+    kept in separate sequences (timestamps in an `array`), and texts
+    that have been passed to `History.intern`:meth: are shared among
+    all `History` instances.  Texts registered with
+    `History.register`:meth: are also saved as small integer codes.
+    """
+
+    MAX_INTERNED = 4096
     """
+    Maximum number of distinct texts that `intern`:meth: shares.
+    """
+
+    # texts shared by all `History` instances
+    _interned = {}
+
+    # texts saved as their index in `_codebook`; this list must only
+    # be appended to, or histories saved earlier will be garbled
+    _codebook = []
+    _codes = {}
+
+    def __init__(self, max_length=None):
+        self._texts = []
+        # Py2's `array` wants a native string as typecode
+        self._times = array(str('d'))
+        self._tags = []
+        # number of messages dropped from the front to honor `max_length`
+        self._dropped = 0
+        # index of the first message kept in the above sequences
+        self._head = 0
+        self.max_length = max_length
+        self.overflow = None
+
+    @classmethod
+    def intern(cls, message):
+        """
+        Return a copy of `message` that is shared by all `History` instances.
+
+        This is meant for texts that are appended over and over again
+        to the histories of many tasks, e.g., state transitions.  At
+        most `MAX_INTERNED` distinct texts are shared.
+        """
+        try:
+            return cls._interned[message]
+        except KeyError:
+            if len(cls._interned) < cls.MAX_INTERNED:
+                cls._interned[message] = message
+            return message
+
+    @classmethod
+    def register(cls, message, code):
+        """
+        Share `message` like `intern`:meth:, and save it as integer `code`.
 
-    def __init__(self):
-        self._messages = []
+        Codes are persisted, so a code must always stand for the same
+        text, in all programs reading and writing histories.
+
+        :raise ValueError:
+          If `code` already stands for a different text, or `message`
+          has already been registered with a different code.
+        """
+        code = int(code)
+        if cls._codes.get(message, code) != code:
+            raise ValueError(
+                "History message {0!r} already registered with code {1}"
+                .format(message, cls._codes[message]))
+        if code < len(cls._codebook):
+            if cls._codebook[code] not in (None, message):
+                raise ValueError(
+                    "History message code {0} already stands for {1!r}"
+                    .format(code, cls._codebook[code]))
+        else:
+            cls._codebook.extend([None] * (code + 1 - len(cls._codebook)))
+        cls._codebook[code] = message
+        cls._codes[message] = code
+        cls._interned[message] = message
+        return message
+
+    @classmethod
+    def _decode(cls, code):
+        # the history may have been saved by a program that registered
+        # codes unknown to this one, e.g., a newer release of GC3Pie:
+        # show a placeholder rather than making the task unloadable
+        message = (cls._codebook[code]
+                   if 0 <= code < len(cls._codebook) else None)
+        if message is None:
+            message = cls.intern(
+                "(unknown history message code {0})".format(code))
+        return message
+
+    def _shared(self, message):
+        try:
+            return self._interned.get(message, message)
+        except TypeError:
+            # unhashable
+            return message
 
     def append(self, message, *tags):
         """
@@ -1006,17 +1112,75 @@ class History(object):
         not yet implemented.)*
 
         """
-        self._messages.append((message, time.time(), tags))
+        self._texts.append(self._shared(message))
+        self._times.append(time.time())
+        self._tags.append(tags)
+        if self.max_length and len(self._texts) - self._head > self.max_length:
+            self._trim()
+
+    def extend(self, records):
+        """
+        Append the given records *(message, time, tags)* to this `History`.
+        """
+        for message, timestamp, tags in records:
+            self._texts.append(self._shared(message))
+            self._times.append(timestamp)
+            self._tags.append(tuple(tags))
+        if self.max_length and len(self._texts) - self._head > self.max_length:
+            self._trim()
+
+    def _trim(self):
+        # messages are dropped by moving `_head` forward; they are
+        # actually deleted from the sequences only when they are at
+        # least as many as the ones kept, so that on average each
+        # message is moved in memory at most once
+        start = self._head
+        end = len(self._texts) - self.max_length
+        if self.overflow is not None:
+            self.overflow(list(zip(self._texts[start:end],
+                                   self._times[start:end],
+                                   self._tags[start:end])))
+        self._dropped += end - start
+        self._head = end
+        if end >= self.max_length:
+            del self._texts[:end]
+            del self._times[:end]
+            del self._tags[:end]
+            self._head = 0
+
+    @property
+    def total(self):
+        """
+        Number of messages ever appended, including those dropped from memory.
+        """
+        return self._dropped + len(self._texts) - self._head
+
+    def records(self, start=0):
+        """
+        Return list of records *(message, time, tags)* from the `start`-th on.
+
+        Messages are numbered from 0 in the order they were appended,
+        including those that have been dropped to honor `max_length`;
+        the latter are never returned.
+        """
+        start = self._head + max(0, start - self._dropped)
+        return list(zip(self._texts[start:], self._times[start:],
+                        self._tags[start:]))
+
+    @property
+    def _messages(self):
+        # records kept in memory, as a list of triples
+        return self.records(self._dropped)
 
     def last(self):
         """
         Return text of last message appended.
         If log is empty, return empty string.
         """
-        if len(self._messages) == 0:
+        if len(self._texts) == self._head:
             return ''
         else:
-            return self.format_message(self._messages[-1])
+            return self.format_message((self._texts[-1], self._times[-1]))
 
     def format_message(self, message):
         """Return a formatted message, appending to the message its timestamp
@@ -1033,13 +1197,56 @@ class History(object):
 
     def __iter__(self):
         """Iterate over messages in the temporal order they were added."""
-        return iter([self.format_message(record) for record in self._messages])
+        return iter([self.format_message(record)
+                     for record in zip(self._texts[self._head:],
+                                       self._times[self._head:])])
 
     def __str__(self):
         """Return all messages texts in a single string, separated by newline
         characters."""
         return '- ' + '\n- '.join([self.format_message(record)
-                               for record in self._messages]) + '\n'
+                               for record in zip(self._texts[self._head:],
+                                                 self._times[self._head:])]) + '\n'
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # the overflow handler is not persisted
+        del state['overflow']
+        # neither are dropped messages still in memory
+        head = state.pop('_head')
+        codes = self._codes
+        state['_texts'] = [
+            (('%s' % text) if isinstance(text, int) else codes.get(text, text))
+            for text in self._texts[head:]]
+        state['_times'] = self._times[head:].tolist()
+        state['_tags'] = self._tags[head:]
+        if not any(state['_tags']):
+            state['_tags'] = None
+        if not self._dropped:
+            del state['_dropped']
+        if self.max_length is None:
+            del state['max_length']
+        return state
+
+    def __setstate__(self, state):
+        if '_messages' in state:
+            # old format: list of `(message, time, tags)` triples
+            messages = state.pop('_messages')
+            state['_texts'] = [record[0] for record in messages]
+            state['_times'] = [record[1] for record in messages]
+            state['_tags'] = [record[2] for record in messages]
+        if state.get('_tags') is None:
+            state['_tags'] = [()] * len(state['_texts'])
+        state['_texts'] = [
+            (self._decode(text) if isinstance(text, int)
+             else self._shared(text))
+            for text in state['_texts']]
+        state['_times'] = array(str('d'), state['_times'])
+        state.setdefault('_dropped', 0)
+        state['_head'] = 0
+        state.setdefault('max_length', None)
+        state['overflow'] = None
+        self.__dict__.update(state)
 
 
 def lookup(obj, name):
@@ -38,10 +38,96 @@ from collections import defaultdict
 from gc3libs.compat.toposort import toposort
 
 from gc3libs import Run, Task
+from gc3libs.events import TaskStateChange, TermStatusChange
 import gc3libs.exceptions
 import gc3libs.utils
 
 
+class _StateCounters(object):
+    """
+    Count tasks in a list by state, updating counts on state-change events.
+
+    Each task in the list is subscribed to, so that `TaskStateChange`
+    and `TermStatusChange` events update the counters; lookup of any
+    count is then a constant-time operation.  The counters refer to
+    the list object given to the constructor: tasks appended to or
+    removed from the list must be notified with `add`:meth: and
+    `remove`:meth:.  Method `tracks` checks whether the counters are
+    still up-to-date with a given list.
+    """
+
+    def __init__(self, tasks):
+        self.tasks = tasks
+        self.counts = defaultdict(int)
+        # map `id(task)` to the list of counters that `task` is
+        # included in
+        self._keys = {}
+        for task in tasks:
+            self.add(task)
+
+    def tracks(self, tasks):
+        """
+        Return ``True`` if the counters are up-to-date with list `tasks`.
+
+        This detects replacement of the list and insertion or removal
+        of tasks that bypassed `add` and `remove`, but not in-place
+        replacement of a task with another one.
+        """
+        return tasks is self.tasks and len(tasks) == len(self._keys)
+
+    @staticmethod
+    def _keys_for(state, returncode):
+        if state == Run.State.TERMINATED:
+            return (state, ('ok' if returncode == 0 else 'failed'))
+        return (state,)
+
+    def _set(self, task, keys):
+        for key in self._keys.get(id(task), ()):
+            self.counts[key] -= 1
+        for key in keys:
+            self.counts[key] += 1
+        self._keys[id(task)] = keys
+
+    def add(self, task):
+        """
+        Include `task` in the counts.
+        """
+        self._set(task, self._keys_for(task.execution.state,
+                                       task.execution.returncode))
+        TaskStateChange.connect(self._on_state_change, sender=task)
+        TermStatusChange.connect(self._on_termstatus_change, sender=task)
+
+    def remove(self, task):
+        """
+        Remove `task` from the counts.
+        """
+        self._set(task, ())
+        del self._keys[id(task)]
+        self._disconnect(task)
+
+    def _disconnect(self, task):
+        TaskStateChange.disconnect(self._on_state_change, sender=task)
+        TermStatusChange.disconnect(self._on_termstatus_change, sender=task)
+
+    def close(self):
+        """
+        Stop receiving events for the counted tasks.
+        """
+        for task in self.tasks:
+            self._disconnect(task)
+
+    def _on_state_change(self, task, from_state, to_state):
+        if id(task) in self._keys:
+            self._set(task, self._keys_for(to_state,
+                                           task.execution.returncode))
+
+    def _on_termstatus_change(self, task, from_returncode, to_returncode):
+        keys = self._keys.get(id(task))
+        if keys and keys[0] == Run.State.TERMINATED:
+            self._set(task, self._keys_for(Run.State.TERMINATED,
+                                           to_returncode))
+
+
 class TaskCollection(Task):
 
     """
@@ -66,6 +152,46 @@ class TaskCollection(Task):
         else:
             self.tasks = tasks
         Task.__init__(self, **extra_args)
+        self._counters = None
+
+    # the state counters are not saved: they are rebuilt from the
+    # (possibly updated) task states at the first use after loading
+
+    def __getstate__(self):
+        state = Task.__getstate__(self)
+        state.pop('_counters', None)
+        return state
+
+    def __setstate__(self, state):
+        Task.__setstate__(self, state)
+        self._counters = None
+
+    def _get_counters(self):
+        """
+        Return the `_StateCounters` for `self.tasks`, rebuilding it if needed.
+        """
+        counters = self.__dict__.get('_counters')
+        if counters is None or not counters.tracks(self.tasks):
+            if counters is not None:
+                counters.close()
+            counters = self._counters = _StateCounters(self.tasks)
+        return counters
+
+    def _added(self, task):
+        """
+        Update state counters after `task` has been appended to `self.tasks`.
+        """
+        counters = self.__dict__.get('_counters')
+        if counters is not None and counters.tasks is self.tasks:
+            counters.add(task)
+
+    def _removed(self, task):
+        """
+        Update state counters after `task` has been removed from `self.tasks`.
+        """
+        counters = self.__dict__.get('_counters')
+        if counters is not None and counters.tasks is self.tasks:
+            counters.remove(task)
 
     def iter_workflow(self):
         """
@@ -137,6 +263,7 @@ class TaskCollection(Task):
         Remove a task from the collection.
         """
         self.tasks.remove(task)
+        self._removed(task)
         task.detach()
 
     # task execution manipulation -- these methods should be overriden
@@ -151,6 +278,10 @@ class TaskCollection(Task):
         """
         Update the running state of all managed tasks.
         """
+        counts = self._get_counters().counts
+        if counts[Run.State.NEW] + counts[Run.State.TERMINATED] == len(self.tasks):
+            # no task to update
+            return
         for task in self.tasks:
             if task.execution.state not in [Run.State.NEW, Run.State.TERMINATED]:
                 gc3libs.log.debug(
@@ -204,7 +335,8 @@ class TaskCollection(Task):
              " but then `fetch_output()` was called without any"
              " explicit `output_dir=...` argument."
              % (self,))
-        for task in self.tasks:
+        counts = self._get_counters().counts
+        for task in (self.tasks if counts[Run.State.TERMINATING] else []):
             if task.execution.state != Run.State.TERMINATING:
                 continue
             if 'output_dir' in task:
@@ -221,12 +353,7 @@ class TaskCollection(Task):
                 overwrite,
                 changed_only,
                 **extra_args)
-        # NOTE: `all()` of an empty list comprehension is ``True``
-        all_tasks_terminated = all(
-            task.execution.state == Run.State.TERMINATED
-            for task in self.tasks
-        )
-        if all_tasks_terminated:
+        if counts[Run.State.TERMINATED] == len(self.tasks):
             self.execution.state = Run.State.TERMINATED
         return coll_output_dir
 
@@ -265,7 +392,13 @@ class TaskCollection(Task):
 
         :param tuple only: Restrict counting to tasks of these classes.
 
+        Unless `only` is given, counts are kept up-to-date as tasks
+        change state, so this takes constant time.
         """
+        if not only:
+            result = defaultdict(int, self._get_counters().counts)
+            result['total'] = len(self.tasks)
+            return result
         result = defaultdict(int)
         for task in self.tasks:
             if only and not isinstance(task, only):
@@ -277,11 +410,8 @@ class TaskCollection(Task):
                     result['ok'] += 1
                 else:
                     result['failed'] += 1
-        if only:
-            result['total'] = len([task for task in self.tasks
-                                   if isinstance(task, only)])
-        else:
-            result['total'] = len(self.tasks)
+        result['total'] = len([task for task in self.tasks
+                               if isinstance(task, only)])
         return result
 
     def terminated(self):
@@ -341,6 +471,7 @@ class SequentialTaskCollection(TaskCollection):
     def add(self, task):
         task.detach()
         self.tasks.append(task)
+        self._added(task)
 
     def attach(self, controller):
         """
@@ -847,6 +978,7 @@ class ParallelTaskCollection(TaskCollection):
         Add a task to the collection.
         """
         self.tasks.append(task)
+        self._added(task)
         if self._attached:
             task.attach(self._controller)
         else:
@@ -1194,7 +1326,7 @@ class RetryableTask(Task):
             self.changed = True
 
 
-class DependentTaskCollection(SequentialTaskCollection):
+class DependentTaskCollection(ParallelTaskCollection):
 
     """
     Run a set of tasks, respecting inter-dependencies between them.
@@ -1205,6 +1337,12 @@ class DependentTaskCollection(SequentialTaskCollection):
     task is run before its dependencies have been successfully
     executed.
 
+    Each task is started as soon as all of its own dependencies have
+    terminated successfully, independently of the progress of other
+    tasks in the collection.  If a task fails, all the tasks that
+    depend on it (directly or indirectly) are not run: they are set
+    to state `TERMINATED` with a "cancelled" return code.
+
     The collection state is set to `TERMINATED` once all tasks have
     reached the same terminal status.
     """
@@ -1215,10 +1353,25 @@ class DependentTaskCollection(SequentialTaskCollection):
         # actual execution list when *this* TaskCollection is first
         # submitted
         self._deps = defaultdict(set)
+        # execution state of the DAG; tasks are referenced by their
+        # index in `self.tasks`
+        self._dependents = []  # tasks depending on each task
+        self._pending = []     # nr. of dependencies not yet terminated
+        self._active = set()   # tasks started and not yet terminated
+        self._ready = []       # tasks that can be started
         if tasks:
             for task in tasks:
                 self.add(task)
 
+    def __setstate__(self, state):
+        super(DependentTaskCollection, self).__setstate__(state)
+        if '_current_task' in state:
+            # saved by an older version of GC3Pie, which ran tasks in
+            # a sequence of `ParallelTaskCollection` stages
+            del self._current_task
+            tasks = [task for stage in self.tasks for task in stage.tasks]
+            self._setup(tasks)
+
     def add(self, task, after=None):
         """
         Add a task to the collection.
@@ -1249,17 +1402,187 @@ class DependentTaskCollection(SequentialTaskCollection):
         except AttributeError:
             pass
 
+    def _sorted_tasks(self):
+        """
+        Return list of all tasks, in topological order.
+
+        Within each group of independent tasks, the order in which
+        tasks were added is preserved.
+        """
+        order = {}
+        for task, deps in self._deps.items():
+            order.setdefault(task, len(order))
+            for dep in deps:
+                order.setdefault(dep, len(order))
+        tasks = []
+        for batch in toposort(self._deps):
+            tasks.extend(sorted(batch, key=order.get))
+        return tasks
+
+    def _setup(self, tasks):
+        """
+        Build the dependency graph of `tasks` and set it as `self.tasks`.
+
+        Counts of pending dependencies take into account the current
+        state of the tasks, so this can also resume a partially-run
+        collection.
+        """
+        index = dict((id(task), n) for n, task in enumerate(tasks))
+        self._dependents = [[] for _ in tasks]
+        self._pending = [0] * len(tasks)
+        for n, task in enumerate(tasks):
+            for dep in self._deps.get(task, ()):
+                self._dependents[index[id(dep)]].append(n)
+                self._pending[n] += 1
+        self.tasks = tasks
+        self._active = set()
+        self._ready = []
+        for n, task in enumerate(tasks):
+            state = task.execution.state
+            if state == Run.State.TERMINATED:
+                self._finished(n)
+            elif state != Run.State.NEW:
+                self._active.add(n)
+            elif self._pending[n] == 0:
+                self._ready.append(n)
+
+    def _finished(self, n):
+        """
+        Update dependency counts after task number `n` has terminated.
+        """
+        task = self.tasks[n]
+        if task.execution.returncode == 0:
+            for m in self._dependents[n]:
+                self._pending[m] -= 1
+                if (self._pending[m] == 0
+                        and self.tasks[m].execution.state == Run.State.NEW):
+                    self._ready.append(m)
+        else:
+            self._cancel_dependents(n)
+
+    def _cancel_dependents(self, n):
+        """
+        Terminate all tasks that depend on task number `n`, without running them.
+        """
+        failed = self.tasks[n]
+        queue = list(self._dependents[n])
+        while queue:
+            m = queue.pop()
+            task = self.tasks[m]
+            if task.execution.state != Run.State.NEW:
+                continue
+            gc3libs.log.debug(
+                "%s: not running task %s since task %s it depends upon failed.",
+                self, task, failed)
+            task.execution.history.append(
+                "Not run: dependency {0} failed".format(failed))
+            task.execution.state = Run.State.TERMINATED
+            task.execution.returncode = (Run.Signals.Cancelled, -1)
+            task.changed = True
+            queue.extend(self._dependents[m])
+
+    def _start_ready(self, resubmit=False, targets=None, **extra_args):
+        """
+        Start all tasks whose dependencies have all terminated successfully.
+        """
+        while self._ready:
+            ready, self._ready = self._ready, []
+            for n in ready:
+                task = self.tasks[n]
+                if task.execution.state != Run.State.NEW:
+                    continue
+                self._active.add(n)
+                task.attach(self._controller)
+                try:
+                    task.submit(resubmit, targets, **extra_args)
+                except (gc3libs.exceptions.ResourceNotReady,
+                        gc3libs.exceptions.MaximumCapacityReached) as err:
+                    # task stays in NEW state and will be submitted
+                    # again by `progress()` or by the controller
+                    gc3libs.log.debug(
+                        "%s: could not submit task %s: %s",
+                        self, task, err)
+
+    def attach(self, controller):
+        """
+        Use the given Controller interface for operations on the job
+        associated with this task.
+
+        Only tasks that have been started are attached to the
+        controller: the others must wait for their dependencies.
+        """
+        for n in self._active:
+            task = self.tasks[n]
+            if not task._attached:
+                task.attach(controller)
+        Task.attach(self, controller)
+
+    def kill(self, **extra_args):
+        """
+        Terminate all running tasks in the collection, and cancel all
+        the others.
+
+        The collection state is updated by `update_state`:meth: as
+        usual: it becomes `TERMINATED` only once the running tasks
+        have actually terminated.
+        """
+        for n in self._active:
+            self.tasks[n].kill(**extra_args)
+        for task in self.tasks:
+            if task.execution.state == Run.State.NEW:
+                task.execution.state = Run.State.TERMINATED
+                task.execution.returncode = (Run.Signals.Cancelled, -1)
+                task.changed = True
+        self._ready = []
+        self.execution.state = self._state()
+        self.changed = True
+
+    def progress(self):
+        """
+        Try to advance all started tasks to the next state in
+        a normal lifecycle.
+        """
+        for n in list(self._active):
+            self.tasks[n].progress()
+        Task.progress(self)
+
+    def redo(self, *args, **kwargs):
+        """
+        Reset collection and all included tasks to state ``NEW``.
+
+        The dependency graph is rebuilt when the collection is
+        submitted again.
+        """
+        super(DependentTaskCollection, self).redo(*args, **kwargs)
+        self._active = set()
+        self._ready = []
+
     def submit(self, resubmit=False, targets=None, **extra_args):
+        """
+        Start all tasks that do not depend on any other task.
+        """
         if self.execution.state == Run.State.NEW:
-            extras = {'would_output': self.would_output}
-            if 'output_dir' in self:
-                extras['output_dir'] = self.output_dir
-            # create DAG from dependency information
-            sorted_and_grouped_tasks = toposort(self._deps)
-            for batch in sorted_and_grouped_tasks:
-                step = ParallelTaskCollection(batch, **extras)
-                super(DependentTaskCollection, self).add(step)
-        super(DependentTaskCollection, self).submit(resubmit, targets, **extra_args)
+            self._setup(self._sorted_tasks())
+        self._start_ready(resubmit, targets, **extra_args)
+        self.execution.state = self._state()
+
+    def update_state(self, **extra_args):
+        """
+        Update state of running tasks, and start any task whose
+        dependencies have all terminated successfully.
+        """
+        for n in list(self._active):
+            task = self.tasks[n]
+            state = task.execution.state
+            if state not in [Run.State.NEW, Run.State.TERMINATED]:
+                task.update_state(**extra_args)
+                state = task.execution.state
+            if state == Run.State.TERMINATED:
+                self._active.discard(n)
+                self._finished(n)
+        if self._ready and self._attached:
+            self._start_ready()
+        self.execution.state = self._state()
 
 
 # main: run tests
@@ -30,6 +30,7 @@ __author__ = ', '.join([
 ])
 
 # stdlib imports
+from collections import deque
 import csv
 import sys
 import os
@@ -51,6 +52,9 @@ from gc3libs.session import Session, TemporarySession
 import gc3libs.cmdline
 import gc3libs.exceptions
 import gc3libs.persistence
+from gc3libs.persistence.filesystem import (FilesystemStore,
+                                            migrate_filesystemstore)
+from gc3libs.persistence.store import matches
 from gc3libs.url import Url
 import gc3libs.utils as utils
 
@@ -646,16 +650,15 @@ Print job state.
         # by default, DO NOT update job statuses
 
         if len(self.params.args) == 0:
-            # if no arguments, operate on all known jobs
-            self.session = self._get_session(self.params.session)
-            self.params.args = self._list_all_tasks()
+            # if no arguments, operate on all known jobs; these are
+            # loaded later on, and only if the store index is not enough
+            self.session = self._get_session(self.params.session,
+                                             task_ids=[])
+            all_tasks = True
         else:
             self.session = self._get_session(self.params.session,
                                              task_ids=self.params.args)
-
-        if len(self.params.args) == 0:
-            print("No jobs submitted.")
-            return 0
+            all_tasks = False
 
         if posix.isatty(sys.stdout.fileno()):
             # try to determine how many lines of output can we fit in a screen
@@ -679,6 +682,34 @@ Print job state.
         else:
             keys = []
 
+        # try answering with a single query to the store index, if
+        # only a summary table is going to be printed
+        if (all_tasks
+                and not self.params.update
+                and self.params.lifetimes is None
+                and (self.params.summary
+                     or (self.params.verbose == 0
+                         and capacity is not gc3libs.utils.PlusInfinity))):
+            stats, tot = self._count_states()
+            if tot == 0:
+                print("No jobs submitted.")
+                return 0
+            if states is None:
+                selected = tot
+            else:
+                selected = sum(stats.get(state, 0) for state in states)
+            if (self.params.summary
+                    or (selected > capacity and self.params.verbose == 0)):
+                print(self._make_summary_table(stats, tot, states))
+                return 0
+
+        if all_tasks:
+            self.params.args = self._list_all_tasks()
+
+        if len(self.params.args) == 0:
+            print("No jobs submitted.")
+            return 0
+
         # init lifetimes report (if requested)
         if self.params.lifetimes is not None:
             if isinstance(self.params.lifetimes, (str,)):
@@ -762,19 +793,7 @@ Print job state.
         )
         if summary_only:
             # only print table with statistics
-            table = PrettyTable(['state', 'num/tot', 'num/tot %'])
-            table.header = False
-            table.align['state'] = 'r'
-            table.align['num/tot'] = 'c'
-            table.align['num/tot %'] = 'r'
-
-            for state, num in sorted(stats.items()):
-                if (states is None) or (str(state) in states):
-                    table.add_row([
-                        state,
-                        "%d/%d" % (num, tot),
-                        "%.2f%%" % (100.0 * num / tot)
-                    ])
+            table = self._make_summary_table(stats, tot, states)
         else:
             # print table of job status
             table = PrettyTable(["JobID", "Job name", "State", "Info"] + keys)
@@ -802,6 +821,48 @@ Print job state.
         # exit code is practically limited to 7 bits ...
         return min(failed, 126)
 
+    def _count_states(self):
+        """
+        Return count of stored tasks per state, and total count.
+
+        The first item of the returned pair is a dictionary mapping
+        each state to the number of tasks in it; the special keys
+        ``ok`` and ``failed`` count the ``TERMINATED`` tasks with
+        zero and non-zero exit code, respectively.
+        """
+        stats = utils.defaultdict(lambda: 0)
+        tot = 0
+        counts = self.session.store.count('state', 'returncode')
+        for (state, returncode), num in counts.items():
+            tot += num
+            stats[state] += num
+            if state == Run.State.TERMINATED:
+                if returncode == 0:
+                    stats['ok'] += num
+                else:
+                    stats['failed'] += num
+        return stats, tot
+
+    @staticmethod
+    def _make_summary_table(stats, tot, states=None):
+        """
+        Return table with count of tasks per state.
+        """
+        table = PrettyTable(['state', 'num/tot', 'num/tot %'])
+        table.header = False
+        table.align['state'] = 'r'
+        table.align['num/tot'] = 'c'
+        table.align['num/tot %'] = 'r'
+
+        for state, num in sorted(stats.items()):
+            if (states is None) or (str(state) in states):
+                table.add_row([
+                    state,
+                    "%d/%d" % (num, tot),
+                    "%.2f%%" % (100.0 * num / tot)
+                ])
+        return table
+
 
 class cmd_gget(GC3UtilsScript):
     """
@@ -1245,6 +1306,15 @@ To get detailed info on a specific command, run:
             self.show_log,
             help="Show log entries for the session.")
 
+        subparser = self._add_subcmd(
+            'migrate',
+            self.migrate_store,
+            help="Change the layout of the session's jobs directory.")
+        subparser.add_argument('--layout', choices=FilesystemStore.LAYOUTS,
+                               default='sharded',
+                               help="Layout to convert the jobs directory to"
+                               " (default: %(default)s).")
+
     def setup_args(self):
         # prevent GC3UtilsScript.setup_args() to add the default JOBID
         # non optional argument
@@ -1356,6 +1426,34 @@ To get detailed info on a specific command, run:
             table.add_row(row)
         print(table)
 
+    def migrate_store(self):
+        """
+        Called with subcommand ``migrate``.
+
+        Move the files in the jobs directory of a session to the layout
+        given by option ``--layout``; see
+        `gc3libs.persistence.filesystem.FilesystemStore`:class: for
+        details.  The `SESSION` argument can also be the path to a jobs
+        directory that does not belong to a session.
+
+        No other process must be using the session while it is
+        migrated.
+        """
+        path = self.params.session
+        url_file = os.path.join(path, Session.STORE_URL_FILENAME)
+        if os.path.exists(url_file):
+            url = Url(utils.read_contents(url_file).strip())
+            if url.scheme != 'file':
+                raise gc3libs.exceptions.InvalidUsage(
+                    "Session '%s' does not store tasks in a directory"
+                    " (store URL is '%s'); cannot migrate it."
+                    % (path, url))
+            path = url.path
+        count = migrate_filesystemstore(path, self.params.layout)
+        self.log.info("Moved %d objects in directory '%s' to layout '%s'.",
+                      count, path, self.params.layout)
+        return 0
+
     def show_log(self):
         """
         Called when subcommand is `log`.
@@ -1459,6 +1557,12 @@ in order to be selected.
             )
 
     def parse_args(self):
+        # criteria that can be checked on the store index; see
+        # `gc3libs.persistence.store.Store.query`
+        self.index_criteria = {}
+        self.jobname_re = None
+        self.jobid_re = None
+        # criteria that need the actual task objects
         self.criteria = []
 
         # --successful, --unsuccessful
@@ -1468,19 +1572,15 @@ in order to be selected.
                 " `--successful` or `--unsuccessful`.")
 
         if self.params.successful:
-            self.criteria.append(
-                (self.params.successful, self.filter_successful, ()))
+            self.index_criteria['ok'] = True
 
         if self.params.unsuccessful:
-            self.criteria.append(
-                (self.params.unsuccessful, self.filter_unsuccessful, ()))
+            self.index_criteria['ok'] = False
 
         # --jobname, --job-name
         if self.params.jobname:
             try:
                 self.jobname_re = re.compile(self.params.jobname, re.I)
-                self.criteria.append(
-                    (True, self.filter_by_jobname, (self.jobname_re,)))
             except re.error as err:
                 raise gc3libs.exceptions.InvalidUsage(
                     "Regexp `%s` for option `--job-name` is invalid: %s"
@@ -1490,9 +1590,6 @@ in order to be selected.
         if self.params.jobid:
             try:
                 self.jobid_re = re.compile(self.params.jobid, re.I)
-                self.criteria.append(
-                    (True, self.filter_by_jobid, (self.jobid_re,)))
-
             except re.error as err:
                 raise gc3libs.exceptions.InvalidUsage(
                     "Regexp `%s` for option `--job-id` is invalid: %s"
@@ -1507,8 +1604,7 @@ in order to be selected.
                 raise gc3libs.exceptions.InvalidUsage(
                     "Invalid state(s): %s" % str.join(", ", invalid))
 
-            self.criteria.append(
-                (True, self.filter_by_state, (self.allowed_states,)))
+            self.index_criteria['state'] = list(self.allowed_states)
 
         # --submitted-after, --submitted-before
         self.submission_start = None
@@ -1556,9 +1652,8 @@ in order to be selected.
             # then choose the end of (UNIX) time
             self.submission_end = float(sys.maxsize)
 
-        self.criteria.append(
-            (True, self.filter_by_submission_date,
-             (self.submission_start, self.submission_end)))
+        self.index_criteria['since'] = self.submission_start
+        self.index_criteria['until'] = self.submission_end
 
         # --input-file
         if self.params.input_file:
@@ -1582,46 +1677,72 @@ in order to be selected.
                  (self.params.output_message,)))
 
     def main(self):
-        self.session = self._get_session(self.params.session)
-
-        # Load tasks from the store
-        current_jobs = list(self.session.iter_workflow())
+        # tasks are loaded later on, and only if needed
+        self.session = self._get_session(self.params.session, task_ids=[])
+
+        # first select tasks by looking at the store index only
+        # (a single query, as session membership must be determined
+        # also for tasks that do not match)
+        columns = ('id', 'parent', 'jobname',
+                   'state', 'returncode', 'submitted')
+        rows = [dict(zip(columns, row)) for row in
+                self.session.store.query(*columns)]
+        current_ids = []
+        for row in self._in_session(rows):
+            if not matches(row, self.index_criteria):
+                continue
+            if (self.jobname_re is not None
+                    and not (row['jobname']
+                             and self.jobname_re.search(row['jobname']))):
+                continue
+            if (self.jobid_re is not None
+                    and not self.jobid_re.search(str(row['id']))):
+                continue
+            current_ids.append(row['id'])
 
         # pipeline of checks to perform; more expensive checks should come last
         # so they look at less jobs (do I long for LISP? Oh yes I do...)
-        for cond, fn, args in self.criteria:
-            if cond:
-                current_jobs = fn(current_jobs, *args)
-                if not current_jobs:
-                    break
+        if current_ids and any(cond for cond, _, _ in self.criteria):
+            current_jobs = [
+                job for job in self.session.store.load_many(current_ids)
+                if not isinstance(job, Exception)]
+            for cond, fn, args in self.criteria:
+                if cond:
+                    current_jobs = fn(current_jobs, *args)
+                    if not current_jobs:
+                        break
+            current_ids = [job.persistent_id for job in current_jobs]
 
         # Print remaining job IDs, if any
-        if current_jobs:
-            print(str.join('\n',
-                           (str(job.persistent_id) for job in current_jobs)))
+        if current_ids:
+            print(str.join('\n', (str(id_) for id_ in current_ids)))
         else:
             gc3libs.log.info("No jobs match the specified conditions.")
 
-    @staticmethod
-    def _filter_by_regexp(job_list, regexp, attribute):
+    def _in_session(self, rows):
         """
-        Return list of items in `job_list` whose attribute
-        named `attribute` matches the supplied (non-anchored) regexp.
+        Return the items of `rows` that belong to the current session.
 
-        Jobs that do not possess an attribute with the specified name do *not*
-        match.
+        Each item of `rows` is a dictionary with (at least) keys ``id``
+        and ``parent``; returned items are sorted in the same order
+        as `Session.iter_workflow`:meth: would visit the tasks.
         """
-        # I know this could be written in one line but it would be
-        # quite harder to read.
-        matching_jobs = []
-        for job in job_list:
-            try:
-                attrvalue = getattr(job, attribute)
-            except AttributeError:
-                continue
-            if regexp.search(attrvalue):
-                matching_jobs.append(job)
-        return matching_jobs
+        if isinstance(self.session, TemporarySession):
+            # a temporary session comprises the whole store
+            return rows
+        by_id = dict((str(row['id']), row) for row in rows)
+        children = utils.defaultdict(list)
+        for row in rows:
+            if row['parent'] is not None:
+                children[str(row['parent'])].append(row)
+        queue = deque(by_id[id_] for id_ in self.session.read_index()
+                      if id_ in by_id)
+        result = []
+        while queue:
+            row = queue.popleft()
+            result.append(row)
+            queue.extend(children[str(row['id'])])
+        return result
 
     @staticmethod
     def filter_by_exitcode(job_list, codes):
@@ -1691,25 +1812,6 @@ in order to be selected.
                 matching_jobs.append(job)
         return matching_jobs
 
-    @staticmethod
-    def filter_by_jobid(job_list, regexp):
-        """
-        Return list of items in `job_list` whose ID (i.e., the `.persistent_id`
-        attribute) matches the supplied regexp.  Jobs that do not have a
-        `.persistent_id` attribute do *not* match.
-        """
-        return cmd_gselect._filter_by_regexp(job_list, regexp, 'persistent_id')
-
-    @staticmethod
-    def filter_by_jobname(job_list, regexp):
-        """
-        Return list of items in `job_list` whose `.jobname` attribute
-        matches the supplied regexp.  Jobs that do not have a
-        `jobname` attribute do *not* match.
-
-        """
-        return cmd_gselect._filter_by_regexp(job_list, regexp, 'jobname')
-
     @staticmethod
     def filter_by_outmsg(job_list, msg):
         """
@@ -1722,56 +1824,6 @@ in order to be selected.
                         msg, os.path.join(job.output_dir, job.stdout)
                     ))]
 
-    @staticmethod
-    def filter_successful(job_list):
-        """
-        Return list of tasks from `job_list` that were successfully terminated.
-        """
-        return [job for job in job_list
-                if job.execution.returncode == 0]
-
-    @staticmethod
-    def filter_by_state(job_list, states):
-        """
-        Return list of elements in `job_list` whose state
-        is one of the given states.
-        """
-        return [job for job in job_list if job.execution.state in states]
-
-    @staticmethod
-    def filter_unsuccessful(job_list):
-        """
-        Return list of tasks from `job_list` that were unsuccessfully
-        terminated.
-        """
-        return [job for job in job_list
-                if job.execution.returncode is not None
-                and job.execution.returncode != 0]
-
-    @staticmethod
-    def filter_by_submission_date(job_list, start, end):
-        """
-        Return list of items in `job_list` which have been
-        submitted within the range specified by `start` and `end`.
-        """
-        matching_jobs = []
-        for job in job_list:
-            submission_time = job.execution.timestamp.get(
-                Run.State.SUBMITTED, None)
-            if submission_time is None:
-                # Jobs run by the ShellCmd backend transition directly to
-                # RUNNING; use that timestamp if available.
-                #
-                # Since jobs in NEW state will not have any timestamp
-                # at all, set the default to 0.0.
-                submission_time = job.execution.timestamp.get(
-                    Run.State.RUNNING, 0.0)
-
-            if (submission_time <= end
-                    and submission_time >= start):
-                    matching_jobs.append(job)
-        return matching_jobs
-
 
 class cmd_gcloud(GC3UtilsScript):
     """